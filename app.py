@@ -1,13 +1,14 @@
 import os
 import logging
+import click
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
-from flask_login import LoginManager
+from flask_login import LoginManager, user_logged_in, user_logged_out
 from sqlalchemy.orm import DeclarativeBase
 from werkzeug.middleware.proxy_fix import ProxyFix
 
-# Configurar logging
-logging.basicConfig(level=logging.DEBUG)
+# Configurar logging (DEBUG global gera ruído e custo em produção)
+logging.basicConfig(level=getattr(logging, os.environ.get("LOG_LEVEL", "INFO").upper(), logging.INFO))
 
 class Base(DeclarativeBase):
     pass
@@ -36,6 +37,19 @@ app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
     "pool_recycle": 300,
     "pool_pre_ping": True,
 }
+
+# Pool dimensionado pela concorrência de cada worker (ver gunicorn.conf.py):
+# gthread atende GUNICORN_THREADS requisições simultâneas; gevent, muitas mais,
+# então o pool limita o acesso ao banco e o excedente espera até DB_POOL_TIMEOUT
+if not app.config["SQLALCHEMY_DATABASE_URI"].startswith("sqlite"):
+    _worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+    _threads = int(os.environ.get("GUNICORN_THREADS", "4"))
+    _concorrencia = {"sync": 1, "gthread": _threads}.get(_worker_class, 10)
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"].update({
+        "pool_size": int(os.environ.get("DB_POOL_SIZE", _concorrencia)),
+        "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", _concorrencia)),
+        "pool_timeout": int(os.environ.get("DB_POOL_TIMEOUT", "10")),
+    })
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
 # Inicializar extensões
@@ -43,67 +57,177 @@ db.init_app(app)
 
 @login_manager.user_loader
 def load_user(user_id):
-    """Carrega usuário para Flask-Login"""
+    """Carrega usuário para Flask-Login (do cache de sessão; banco só na falta)"""
     from models import Usuario
-    return Usuario.query.get(int(user_id))
-
-with app.app_context():
-    try:
-        # Importar models
-        import models
-        
-        # Criar tabelas
-        db.create_all()
-        logging.info("Tabelas criadas com sucesso")
-        
-        # Criar usuário admin se não existir
-        from models import Usuario
-        from werkzeug.security import generate_password_hash
-        
-        admin_user = Usuario.query.filter_by(username='admin').first()
-        if not admin_user:
-            admin_user = Usuario(
-                username='admin',
-                email='admin@grupovidah.com.br',
-                password_hash=generate_password_hash('VidahAdmin2025!'),
-                role='admin'
-            )
-            db.session.add(admin_user)
-            logging.info("Usuário admin criado")
-        
-        # Criar usuário padrão se não existir
-        user_default = Usuario.query.filter_by(username='usuario').first()
-        if not user_default:
-            user_default = Usuario(
-                username='usuario',
-                email='usuario@grupovidah.com.br',
-                password_hash=generate_password_hash('Usuario123!'),
-                role='user'
-            )
-            db.session.add(user_default)
-            logging.info("Usuário padrão criado")
-        
-        # Criar médico padrão se não existir
-        from models import Medico
-        medico_default = Medico.query.filter_by(nome='Michel Raineri Haddad').first()
-        if not medico_default:
-            medico_default = Medico(
-                nome='Michel Raineri Haddad',
-                crm='CRM-SP 183299',
-                ativo=True
-            )
-            db.session.add(medico_default)
-            logging.info("Médico padrão criado")
-        
-        db.session.commit()
-        logging.info("Inicialização do banco concluída")
-        
-    except ImportError as e:
-        logging.error(f"Erro ao importar models: {e}")
-        db.create_all()
-    except Exception as e:
-        logging.error(f"Erro na inicialização: {e}")
-        db.session.rollback()
+    from utils.session_cache import session_cache
+    return session_cache.load(int(user_id), lambda uid: db.session.get(Usuario, uid))
+
+
+@user_logged_in.connect_via(app)
+def _cache_principal_on_login(sender, user, **extra):
+    """O login já carregou o usuário: a próxima requisição não consulta o banco"""
+    from utils.session_cache import CachedPrincipal, session_cache
+    session_cache.put(CachedPrincipal.from_user(user))
+
+
+@user_logged_out.connect_via(app)
+def _drop_principal_on_logout(sender, user, **extra):
+    from flask import session
+    from utils.session_cache import SESSION_KEY
+    session.pop(SESSION_KEY, None)
+
+import models  # noqa: F401 - registra os modelos antes das rotas
+
+
+def bootstrap_database():
+    """Cria o schema e os registros iniciais (idempotente)
+
+    Executado como etapa explícita (`flask --app main bootstrap-db`) e não
+    na importação: o hash das senhas padrão é deliberadamente lento e cada
+    worker pagaria esse custo no arranque.
+    """
+    with app.app_context():
+        try:
+            # Criar tabelas
+            db.create_all()
+            logging.info("Tabelas criadas com sucesso")
+            
+            # Colunas de data tipadas em bases criadas antes delas
+            from modules.maintenance.date_migration import migrate_exam_dates
+            migrate_exam_dates()
+            
+            # Coluna de achados dos parâmetros e preenchimento das linhas antigas
+            from modules.maintenance.abnormality_flags import migrate_abnormality_flags
+            migrate_abnormality_flags()
+            
+            # Índices (exame_id, updated_at) adicionados ao modelo depois da criação das tabelas
+            from models import ParametrosEcocardiograma, LaudoEcocardiograma
+            with db.engine.begin() as conn:
+                for tabela in (ParametrosEcocardiograma.__table__, LaudoEcocardiograma.__table__):
+                    for indice in tabela.indexes:
+                        indice.create(conn, checkfirst=True)
+            
+            # Primeira carga do resumo diário dos relatórios
+            from modules.exams.rollup_service import ExamRollupService
+            if ExamRollupService.is_empty():
+                ExamRollupService.rebuild()
+            
+            # Criar usuário admin se não existir
+            from models import Usuario
+            from werkzeug.security import generate_password_hash
+            
+            admin_user = Usuario.query.filter_by(username='admin').first()
+            if not admin_user:
+                admin_user = Usuario(
+                    username='admin',
+                    email='admin@grupovidah.com.br',
+                    password_hash=generate_password_hash('VidahAdmin2025!'),
+                    role='admin'
+                )
+                db.session.add(admin_user)
+                logging.info("Usuário admin criado")
+            
+            # Criar usuário padrão se não existir
+            user_default = Usuario.query.filter_by(username='usuario').first()
+            if not user_default:
+                user_default = Usuario(
+                    username='usuario',
+                    email='usuario@grupovidah.com.br',
+                    password_hash=generate_password_hash('Usuario123!'),
+                    role='user'
+                )
+                db.session.add(user_default)
+                logging.info("Usuário padrão criado")
+            
+            # Criar médico padrão se não existir
+            from models import Medico
+            medico_default = Medico.query.filter_by(nome='Michel Raineri Haddad').first()
+            if not medico_default:
+                medico_default = Medico(
+                    nome='Michel Raineri Haddad',
+                    crm='CRM-SP 183299',
+                    ativo=True
+                )
+                db.session.add(medico_default)
+                logging.info("Médico padrão criado")
+            
+            db.session.commit()
+            logging.info("Inicialização do banco concluída")
+            
+        except Exception as e:
+            logging.error(f"Erro na inicialização: {e}")
+            db.session.rollback()
+            raise
+
+
+@app.cli.command('bootstrap-db')
+def bootstrap_db_command():
+    """Cria as tabelas e os usuários/médico padrão"""
+    bootstrap_database()
+    print("Banco de dados inicializado")
+
+
+@app.cli.command('migrate-exam-dates')
+def migrate_exam_dates_command():
+    """Adiciona e preenche as colunas de data tipadas dos exames"""
+    from modules.maintenance.date_migration import migrate_exam_dates
+    print(migrate_exam_dates())
+
+
+@app.cli.command('migrate-abnormality-flags')
+@click.option('--all', 'recompute', is_flag=True, help='Recalcula todos os parâmetros (regras alteradas)')
+def migrate_abnormality_flags_command(recompute):
+    """Adiciona e preenche a máscara de achados dos parâmetros"""
+    from modules.maintenance.abnormality_flags import migrate_abnormality_flags
+    print(migrate_abnormality_flags(recompute=recompute))
+
+
+@app.cli.command('extract-laudo-measurements')
+@click.option('--processos', type=int, help='Processos de análise (padrão: número de CPUs)')
+@click.option('--lote', type=int, default=2000, help='Laudos por lote/transação')
+@click.option('--confianca-minima', type=float, default=0.6, help='Confiança mínima para gravar um campo')
+@click.option('--sobrescrever', is_flag=True, help='Substitui valores já preenchidos nos parâmetros')
+@click.option('--sem-retomar', is_flag=True, help='Ignora o checkpoint anterior')
+def extract_laudo_measurements_command(processos, lote, confianca_minima, sobrescrever, sem_retomar):
+    """Extrai as medidas do texto dos laudos legados para os parâmetros"""
+    from modules.data_import import LaudoExtractor
+    extrator = LaudoExtractor(workers=processos, chunk_size=lote, min_confidence=confianca_minima,
+                              overwrite=sobrescrever)
+    print(extrator.run(resume=not sem_retomar))
+
+
+@app.cli.command('rebuild-rollups')
+def rebuild_rollups_command():
+    """Recalcula o resumo diário de exames usado pelos relatórios"""
+    from modules.exams.rollup_service import ExamRollupService
+    print(ExamRollupService.rebuild())
+
+
+@app.cli.command('refresh-analytics')
+@click.option('--full', is_flag=True, help='Reconstrói o instantâneo a partir de todos os exames')
+def refresh_analytics_command(full):
+    """Atualiza o instantâneo colunar usado nas consultas de coorte"""
+    from modules.analytics import columnar_store
+    print(columnar_store.refresh(full=full))
+
+
+# Compatibilidade: BOOTSTRAP_ON_IMPORT=1 mantém a inicialização na importação
+if os.environ.get("BOOTSTRAP_ON_IMPORT") == "1":
+    bootstrap_database()
+
+# Instrumentação de métricas (latência por rota, SQL por requisição, PDF)
+try:
+    from utils.metrics import init_metrics
+    init_metrics(app)
+except ImportError as e:
+    logging.error(f"Erro ao iniciar métricas: {e}")
+
+# Perfilador de consultas SQL (N+1 e orçamento por rota)
+try:
+    from utils.query_profiler import init_query_profiler
+    init_query_profiler(app)
+except ImportError as e:
+    logging.error(f"Erro ao iniciar perfilador de consultas: {e}")
 
 # Importar rotas
 try:
@@ -112,6 +236,28 @@ try:
 except ImportError as e:
     logging.error(f"Erro ao importar rotas: {e}")
 
+# Amostrador de saúde em segundo plano (inicia na primeira requisição de cada worker)
+try:
+    from utils.health_monitor import init_health_sampler
+    init_health_sampler(app)
+except ImportError as e:
+    logging.error(f"Erro ao iniciar monitor de saúde: {e}")
+
+# Canal de eventos ao vivo do painel (SSE)
+try:
+    from utils.live_events import init_live_events
+    init_live_events(app)
+except ImportError as e:
+    logging.error(f"Erro ao iniciar eventos ao vivo: {e}")
+
+# Zelador: varreduras periódicas de sessões expiradas e caches em memória
+try:
+    from utils.janitor import init_janitor
+    init_janitor(app)
+except ImportError as e:
+    logging.error(f"Erro ao iniciar zelador: {e}")
+
 if __name__ == '__main__':
+    bootstrap_database()
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=False)
@@ -8,6 +8,7 @@ from .services import AuthService, UserManagementService
 from .decorators import login_required, admin_required, rate_limit
 from .validators import AuthValidator
 from .security import SecurityManager
+from .rate_limiter import RateLimiter, rate_limiter
 from .blueprints import auth_bp
 
 __all__ = [
@@ -20,5 +21,7 @@ __all__ = [
     'rate_limit',
     'AuthValidator',
     'SecurityManager',
+    'RateLimiter',
+    'rate_limiter',
     'auth_bp'
 ]
\ No newline at end of file
@@ -3,16 +3,13 @@ Decoradores de Segurança - Sistema Anti-Bugs
 Implementação robusta com rate limiting e auditoria
 """
 
-import time
 from datetime import datetime, timedelta
 from functools import wraps
 from typing import Dict, Any, Callable
 from flask import request, redirect, url_for, flash, jsonify, session
 from flask_login import current_user
 from utils.logging_system import log_user_action, log_error_with_traceback
-
-# Cache em memória para rate limiting (em produção usar Redis)
-_rate_limit_cache = {}
+from .rate_limiter import rate_limiter
 
 class AuthDecorators:
     """
@@ -145,24 +142,11 @@ class AuthDecorators:
                         else:
                             key = f"anon:{request.remote_addr}:{request.endpoint}"
                     
-                    current_time = time.time()
-                    
-                    # Limpar entradas expiradas
-                    AuthDecorators._cleanup_rate_limit_cache(current_time)
-                    
-                    # Verificar limite
-                    if key not in _rate_limit_cache:
-                        _rate_limit_cache[key] = []
-                    
-                    # Filtrar requisições dentro da janela de tempo
-                    window_start = current_time - per_seconds
-                    _rate_limit_cache[key] = [
-                        req_time for req_time in _rate_limit_cache[key] 
-                        if req_time > window_start
-                    ]
+                    # GCRA compartilhado entre workers (verificação O(1))
+                    resultado = rate_limiter.hit(key, max_requests, per_seconds)
                     
                     # Verificar se excedeu o limite
-                    if len(_rate_limit_cache[key]) >= max_requests:
+                    if not resultado.allowed:
                         log_user_action(
                             f'Rate limit excedido para {key} em {request.endpoint}',
                             request.remote_addr
@@ -171,15 +155,12 @@ class AuthDecorators:
                         if request.is_json:
                             return jsonify({
                                 'error': 'Muitas requisições. Tente novamente em alguns minutos.',
-                                'retry_after': per_seconds
+                                'retry_after': int(resultado.retry_after) + 1
                             }), 429
                         
                         flash('Muitas tentativas. Aguarde alguns minutos.', 'warning')
                         return redirect(request.referrer or url_for('index'))
                     
-                    # Registrar requisição
-                    _rate_limit_cache[key].append(current_time)
-                    
                     return f(*args, **kwargs)
                     
                 except Exception as e:
@@ -225,33 +206,6 @@ class AuthDecorators:
         
         return decorated_function
     
-    @staticmethod
-    def _cleanup_rate_limit_cache(current_time: float) -> None:
-        """
-        Limpa entradas antigas do cache de rate limiting
-        """
-        try:
-            # Remover entradas mais antigas que 1 hora
-            cutoff_time = current_time - 3600
-            
-            keys_to_remove = []
-            for key, timestamps in _rate_limit_cache.items():
-                # Filtrar timestamps antigos
-                _rate_limit_cache[key] = [
-                    ts for ts in timestamps if ts > cutoff_time
-                ]
-                
-                # Marcar chaves vazias para remoção
-                if not _rate_limit_cache[key]:
-                    keys_to_remove.append(key)
-            
-            # Remover chaves vazias
-            for key in keys_to_remove:
-                del _rate_limit_cache[key]
-                
-        except Exception as e:
-            log_error_with_traceback(f'Erro na limpeza do cache de rate limiting: {str(e)}')
-
 # Aliases para facilitar importação
 login_required = AuthDecorators.login_required
 admin_required = AuthDecorators.admin_required
@@ -0,0 +1,297 @@
+"""
+Limitador de Requisições - GCRA com armazenamento compartilhado
+Uma única marca de tempo por chave (TAT), verificação O(1) e estado
+consistente entre os workers do gunicorn
+"""
+
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from itertools import islice
+from typing import NamedTuple, Optional
+
+from flask import current_app, has_app_context
+from sqlalchemy import text
+
+# Limite de chaves no nível local (bloqueios conhecidos pelo processo)
+LOCAL_MAX_KEYS = 10000
+# A cada N operações, remove do armazenamento as chaves já expiradas
+PURGE_EVERY = 1000
+# Chaves expiradas removidas por lote na limpeza
+PURGE_BATCH_SIZE = 1000
+
+
+class RateLimitResult(NamedTuple):
+    """Resultado de uma verificação"""
+    allowed: bool
+    retry_after: float
+
+
+def _gcra(tat: Optional[float], now: float, limit: int, period: float):
+    """Um passo do GCRA: (permitido, novo TAT, espera em segundos)
+
+    O TAT (theoretical arrival time) avança `period / limit` por requisição
+    aceita; a requisição é negada se o TAT passar de `now` em mais que a
+    tolerância de rajada (`period - period / limit`).
+    """
+    interval = period / limit
+    tolerance = period - interval
+    tat = max(tat or now, now)
+
+    if tat - now > tolerance:
+        return False, tat, tat - tolerance - now
+    return True, tat + interval, 0.0
+
+
+class MemoryBackend:
+    """Armazenamento local em processo, limitado por LRU (testes e fallback)"""
+
+    def __init__(self, max_keys: int = LOCAL_MAX_KEYS):
+        self.max_keys = max_keys
+        self._tats: 'OrderedDict[str, float]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key: str, limit: int, period: float, now: float, consume: bool = True):
+        with self._lock:
+            allowed, tat, retry_after = _gcra(self._tats.get(key), now, limit, period)
+            if allowed and consume:
+                self._tats[key] = tat
+                self._tats.move_to_end(key)
+                if len(self._tats) > self.max_keys:
+                    self._tats.popitem(last=False)
+            return allowed, retry_after
+
+    def reset(self, key: str) -> None:
+        with self._lock:
+            self._tats.pop(key, None)
+
+    def purge(self, now: float, limit: int) -> int:
+        with self._lock:
+            expired = list(islice((k for k, tat in self._tats.items() if tat <= now), limit))
+            for key in expired:
+                del self._tats[key]
+            return len(expired)
+
+    def __len__(self):
+        return len(self._tats)
+
+
+class SQLiteBackend:
+    """Arquivo SQLite compartilhado pelos workers (de preferência em /dev/shm)
+
+    O passo do GCRA é um único UPSERT ... RETURNING, atômico sob o lock
+    de escrita do SQLite.
+    """
+
+    UPSERT = """
+        INSERT INTO rate_limits (key, tat, allowed) VALUES (:key, :now + :interval, 1)
+        ON CONFLICT(key) DO UPDATE SET
+            allowed = CASE WHEN max(tat, :now) - :now > :tolerance THEN 0 ELSE 1 END,
+            tat = CASE WHEN max(tat, :now) - :now > :tolerance THEN tat ELSE max(tat, :now) + :interval END
+        RETURNING tat, allowed
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._connection().execute(
+            'CREATE TABLE IF NOT EXISTS rate_limits (key TEXT PRIMARY KEY, tat REAL NOT NULL, allowed INTEGER NOT NULL)'
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        # Conexões não sobrevivem ao fork do worker
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def hit(self, key: str, limit: int, period: float, now: float, consume: bool = True):
+        interval = period / limit
+        tolerance = period - interval
+        conn = self._connection()
+
+        if not consume:
+            row = conn.execute('SELECT tat FROM rate_limits WHERE key = ?', (key,)).fetchone()
+            allowed, _, retry_after = _gcra(row[0] if row else None, now, limit, period)
+            return allowed, retry_after
+
+        tat, allowed = conn.execute(self.UPSERT, {
+            'key': key, 'now': now, 'interval': interval, 'tolerance': tolerance
+        }).fetchone()
+        return bool(allowed), 0.0 if allowed else tat - tolerance - now
+
+    def reset(self, key: str) -> None:
+        self._connection().execute('DELETE FROM rate_limits WHERE key = ?', (key,))
+
+    def purge(self, now: float, limit: int) -> int:
+        return self._connection().execute(
+            'DELETE FROM rate_limits WHERE rowid IN (SELECT rowid FROM rate_limits WHERE tat <= ? LIMIT ?)',
+            (now, limit)
+        ).rowcount
+
+
+class PostgreSQLBackend:
+    """Tabela UNLOGGED no PostgreSQL da aplicação (sem custo de WAL)"""
+
+    UPSERT = text("""
+        INSERT INTO rate_limits (key, tat, allowed) VALUES (:key, :now + :interval, true)
+        ON CONFLICT (key) DO UPDATE SET
+            allowed = GREATEST(rate_limits.tat, :now) - :now <= :tolerance,
+            tat = CASE WHEN GREATEST(rate_limits.tat, :now) - :now > :tolerance THEN rate_limits.tat
+                       ELSE GREATEST(rate_limits.tat, :now) + :interval END
+        RETURNING tat, allowed
+    """)
+
+    def __init__(self, engine):
+        self.engine = engine
+        with engine.begin() as conn:
+            conn.execute(text(
+                'CREATE UNLOGGED TABLE IF NOT EXISTS rate_limits '
+                '(key TEXT PRIMARY KEY, tat DOUBLE PRECISION NOT NULL, allowed BOOLEAN NOT NULL)'
+            ))
+
+    def hit(self, key: str, limit: int, period: float, now: float, consume: bool = True):
+        interval = period / limit
+        tolerance = period - interval
+
+        with self.engine.begin() as conn:
+            if not consume:
+                tat = conn.execute(text('SELECT tat FROM rate_limits WHERE key = :key'), {'key': key}).scalar()
+                allowed, _, retry_after = _gcra(tat, now, limit, period)
+                return allowed, retry_after
+
+            tat, allowed = conn.execute(self.UPSERT, {
+                'key': key, 'now': now, 'interval': interval, 'tolerance': tolerance
+            }).one()
+        return bool(allowed), 0.0 if allowed else tat - tolerance - now
+
+    def reset(self, key: str) -> None:
+        with self.engine.begin() as conn:
+            conn.execute(text('DELETE FROM rate_limits WHERE key = :key'), {'key': key})
+
+    def purge(self, now: float, limit: int) -> int:
+        with self.engine.begin() as conn:
+            return conn.execute(text(
+                'DELETE FROM rate_limits WHERE key IN '
+                '(SELECT key FROM rate_limits WHERE tat <= :now LIMIT :limit)'
+            ), {'now': now, 'limit': limit}).rowcount
+
+
+class RateLimiter:
+    """Limitador com nível local (bloqueios em LRU) sobre o armazenamento compartilhado
+
+    Uma negação é válida até `retry_after` em qualquer worker (o TAT só
+    cresce), então o nível local responde a chaves bloqueadas sem consultar
+    o armazenamento compartilhado.
+    """
+
+    def __init__(self, backend=None, local_max_keys: int = LOCAL_MAX_KEYS):
+        self.backend = backend
+        self.local_max_keys = local_max_keys
+        self._blocked: 'OrderedDict[str, float]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._operations = 0
+
+    def _get_backend(self):
+        if self.backend is None:
+            self.backend = create_backend()
+        return self.backend
+
+    def hit(self, key: str, limit: int, period: float) -> RateLimitResult:
+        """Conta uma requisição; negada se o limite foi atingido"""
+        return self._check(key, limit, period, consume=True)
+
+    def peek(self, key: str, limit: int, period: float) -> RateLimitResult:
+        """Verifica se a próxima requisição seria aceita, sem contá-la"""
+        return self._check(key, limit, period, consume=False)
+
+    def reset(self, key: str) -> None:
+        with self._lock:
+            self._blocked.pop(key, None)
+        self._get_backend().reset(key)
+
+    def purge_expired(self, batch_size: int = PURGE_BATCH_SIZE, deadline: float = None) -> int:
+        """Remove chaves expiradas do armazenamento e do nível local
+
+        Remove em lotes de `batch_size` e para ao atingir `deadline`
+        (time.monotonic()); o restante fica para a próxima execução.
+        """
+        now = time.time()
+        with self._lock:
+            for key in [k for k, until in self._blocked.items() if until <= now]:
+                del self._blocked[key]
+
+        backend = self._get_backend()
+        count = 0
+        while deadline is None or time.monotonic() < deadline:
+            removed = backend.purge(now, batch_size)
+            count += removed
+            if removed < batch_size:
+                break
+        return count
+
+    def _check(self, key: str, limit: int, period: float, consume: bool) -> RateLimitResult:
+        now = time.time()
+
+        with self._lock:
+            blocked_until = self._blocked.get(key)
+            if blocked_until is not None:
+                if blocked_until > now:
+                    return RateLimitResult(False, blocked_until - now)
+                del self._blocked[key]
+
+        allowed, retry_after = self._get_backend().hit(key, limit, period, now, consume)
+
+        with self._lock:
+            if not allowed:
+                self._blocked[key] = now + retry_after
+                self._blocked.move_to_end(key)
+                if len(self._blocked) > self.local_max_keys:
+                    self._blocked.popitem(last=False)
+
+            self._operations += 1
+            purge = self._operations % PURGE_EVERY == 0
+
+        if purge:
+            self.purge_expired()
+        return RateLimitResult(allowed, retry_after)
+
+
+def create_backend():
+    """Armazenamento conforme RATE_LIMIT_BACKEND (auto, memory, sqlite, postgresql)"""
+    config = current_app.config if has_app_context() else {}
+    choice = config.get('RATE_LIMIT_BACKEND') or os.environ.get('RATE_LIMIT_BACKEND', 'auto')
+
+    if choice == 'auto':
+        if config.get('TESTING'):
+            choice = 'memory'
+        elif config.get('SQLALCHEMY_DATABASE_URI', '').startswith('postgresql'):
+            choice = 'postgresql'
+        else:
+            choice = 'sqlite'
+
+    if choice == 'postgresql':
+        from app import db
+        return PostgreSQLBackend(db.engine)
+    if choice == 'sqlite':
+        directory = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+        path = config.get('RATE_LIMIT_SQLITE_PATH') or os.environ.get(
+            'RATE_LIMIT_SQLITE_PATH', os.path.join(directory, 'ecocardio_rate_limits.db'))
+        return SQLiteBackend(path)
+    return MemoryBackend()
+
+
+# Instância global (armazenamento criado no primeiro uso)
+rate_limiter = RateLimiter()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Obtém o limitador global"""
+    return rate_limiter
@@ -5,12 +5,95 @@ Implementação enterprise com monitoramento avançado
 
 import hashlib
 import hmac
+import re
 import secrets
-import time
 from datetime import datetime, timedelta
+from functools import lru_cache
 from typing import Dict, List, Optional, Tuple, Any
 from flask import request, session, current_app
 from utils.logging_system import log_user_action, log_error_with_traceback
+from .rate_limiter import rate_limiter
+
+# Padrões de injeção (avaliados sobre o texto em minúsculas; '.' não cruza linhas),
+# cada um com um literal obrigatório. A busca do literal (str.__contains__, em C)
+# descarta quase todo texto clínico antes de qualquer regex.
+# "'.*(?:or|and).*'" foi reescrito como o equivalente linear abaixo: basta que
+# or/and esteja entre duas aspas consecutivas da mesma linha (o lookahead e o
+# quantificador possessivo evitam o retrocesso quadrático em textos longos).
+SQL_INJECTION_PATTERNS = (
+    ("'", r"'(?=[^'\n]*?(?:or|and))[^'\n]*+'"),
+    ('union', r"union.*?select"),
+    ('drop', r"drop.*?table"),
+    ('insert', r"insert.*?into"),
+    ('delete', r"delete.*?from"),
+    ('update', r"update.*?set"),
+    ('exec', r"exec.*?\("),
+    ('script', r"script.*?>"),
+    ('script', r"<.*?script"),
+)
+
+# Padrões de XSS são literais: basta a busca de substring
+XSS_PATTERNS = (
+    '<script',
+    'javascript:',
+    'onload=',
+    'onerror=',
+    'onclick=',
+    '<iframe',
+    '<object',
+    '<embed',
+)
+
+# Apenas o início de cada valor é inspecionado (laudos podem ter dezenas de KB)
+MAX_SCAN_LENGTH = 16384
+SCAN_CACHE_SIZE = 2048
+
+_SQL_RULES = tuple((literal, re.compile(pattern)) for literal, pattern in SQL_INJECTION_PATTERNS)
+_CLEAN = frozenset()
+
+
+def scan_input(value: str) -> frozenset:
+    """Categorias de ataque encontradas no valor ('sql_injection', 'xss')
+
+    Valores repetidos (rascunhos de laudo reenviados) vêm do cache. A chave
+    do cache é o trecho inspecionado, não o valor inteiro: um laudo de
+    dezenas de KB ocupa no máximo MAX_SCAN_LENGTH caracteres no cache.
+    """
+    return _scan(value[:MAX_SCAN_LENGTH])
+
+
+@lru_cache(maxsize=SCAN_CACHE_SIZE)
+def _scan(value: str) -> frozenset:
+    text = value.lower()
+    found = set()
+
+    for literal, regex in _SQL_RULES:
+        if literal in text and regex.search(text):
+            found.add('sql_injection')
+            break
+
+    for literal in XSS_PATTERNS:
+        if literal in text:
+            found.add('xss')
+            break
+
+    return frozenset(found) if found else _CLEAN
+
+
+scan_input.cache_info = _scan.cache_info
+scan_input.cache_clear = _scan.cache_clear
+
+
+def _iter_string_values(data, prefix=''):
+    """Pares (campo, valor) de strings em um JSON aninhado"""
+    if isinstance(data, str):
+        yield prefix, data
+    elif isinstance(data, dict):
+        for key, value in data.items():
+            yield from _iter_string_values(value, f'{prefix}.{key}' if prefix else str(key))
+    elif isinstance(data, list):
+        for index, value in enumerate(data):
+            yield from _iter_string_values(value, f'{prefix}[{index}]')
 
 class SecurityManager:
     """
@@ -20,8 +103,12 @@ class SecurityManager:
     
     # Cache para detecção de ataques
     _attack_detection_cache = {}
-    _suspicious_ips = set()
-    _failed_attempts_cache = {}
+    
+    # Tentativas falhadas e IPs suspeitos ficam no limitador compartilhado
+    # (GCRA, uma entrada por identificador, visível a todos os workers)
+    BRUTE_FORCE_MAX_ATTEMPTS = 5
+    BRUTE_FORCE_WINDOW_MINUTES = 15
+    SUSPICIOUS_TTL_SECONDS = 86400
     
     @classmethod
     def generate_secure_token(cls, length: int = 32) -> str:
@@ -71,39 +158,25 @@ class SecurityManager:
         return hashed.hex(), salt
     
     @classmethod
-    def detect_brute_force_attack(cls, identifier: str, max_attempts: int = 5, window_minutes: int = 15) -> bool:
+    def detect_brute_force_attack(cls, identifier: str, max_attempts: int = BRUTE_FORCE_MAX_ATTEMPTS,
+                                  window_minutes: int = BRUTE_FORCE_WINDOW_MINUTES) -> bool:
         """
         Detecta ataques de força bruta
         """
-        current_time = time.time()
-        window_start = current_time - (window_minutes * 60)
-        
-        # Limpar tentativas antigas
-        if identifier in cls._failed_attempts_cache:
-            cls._failed_attempts_cache[identifier] = [
-                attempt_time for attempt_time in cls._failed_attempts_cache[identifier]
-                if attempt_time > window_start
-            ]
-        
-        # Verificar se excedeu limite
-        attempts = len(cls._failed_attempts_cache.get(identifier, []))
-        return attempts >= max_attempts
+        resultado = rate_limiter.peek(f'falhas:{identifier}', max_attempts, window_minutes * 60)
+        return not resultado.allowed
     
     @classmethod
     def register_failed_attempt(cls, identifier: str) -> None:
         """
         Registra tentativa falhada para detecção de ataques
         """
-        current_time = time.time()
-        
-        if identifier not in cls._failed_attempts_cache:
-            cls._failed_attempts_cache[identifier] = []
-        
-        cls._failed_attempts_cache[identifier].append(current_time)
+        rate_limiter.hit(f'falhas:{identifier}', cls.BRUTE_FORCE_MAX_ATTEMPTS,
+                         cls.BRUTE_FORCE_WINDOW_MINUTES * 60)
         
         # Verificar se deve marcar como suspeito
         if cls.detect_brute_force_attack(identifier):
-            cls._suspicious_ips.add(identifier)
+            rate_limiter.hit(f'suspeito:{identifier}', 1, cls.SUSPICIOUS_TTL_SECONDS)
             log_user_action(f'IP suspeito detectado por ataques de força bruta: {identifier}')
     
     @classmethod
@@ -111,7 +184,7 @@ class SecurityManager:
         """
         Verifica se IP está marcado como suspeito
         """
-        return ip_address in cls._suspicious_ips
+        return not rate_limiter.peek(f'suspeito:{ip_address}', 1, cls.SUSPICIOUS_TTL_SECONDS).allowed
     
     @classmethod
     def detect_sql_injection_attempt(cls, input_string: str) -> bool:
@@ -120,28 +193,7 @@ class SecurityManager:
         """
         if not input_string:
             return False
-        
-        # Padrões suspeitos básicos
-        sql_patterns = [
-            r"'.*(?:or|and).*'",
-            r"union.*select",
-            r"drop.*table",
-            r"insert.*into",
-            r"delete.*from",
-            r"update.*set",
-            r"exec.*\(",
-            r"script.*>",
-            r"<.*script"
-        ]
-        
-        input_lower = input_string.lower()
-        
-        import re
-        for pattern in sql_patterns:
-            if re.search(pattern, input_lower):
-                return True
-        
-        return False
+        return 'sql_injection' in scan_input(input_string)
     
     @classmethod
     def detect_xss_attempt(cls, input_string: str) -> bool:
@@ -150,26 +202,7 @@ class SecurityManager:
         """
         if not input_string:
             return False
-        
-        xss_patterns = [
-            r"<script",
-            r"javascript:",
-            r"onload=",
-            r"onerror=",
-            r"onclick=",
-            r"<iframe",
-            r"<object",
-            r"<embed"
-        ]
-        
-        input_lower = input_string.lower()
-        
-        import re
-        for pattern in xss_patterns:
-            if re.search(pattern, input_lower):
-                return True
-        
-        return False
+        return 'xss' in scan_input(input_string)
     
     @classmethod
     def sanitize_input(cls, input_string: str, max_length: int = 1000) -> str:
@@ -215,13 +248,15 @@ class SecurityManager:
             if not referer:
                 warnings.append("Referer ausente em POST")
         
-        # Verificar tentativas de injeção nos parâmetros
-        for key, value in request_obj.form.items():
-            if isinstance(value, str):
-                if cls.detect_sql_injection_attempt(value):
-                    warnings.append(f"Tentativa de SQL injection no campo '{key}'")
-                if cls.detect_xss_attempt(value):
-                    warnings.append(f"Tentativa de XSS no campo '{key}'")
+        # Verificar tentativas de injeção nos parâmetros (query, formulário e JSON)
+        for key, value in cls._request_values(request_obj):
+            if not value:
+                continue
+            found = scan_input(value)
+            if 'sql_injection' in found:
+                warnings.append(f"Tentativa de SQL injection no campo '{key}'")
+            if 'xss' in found:
+                warnings.append(f"Tentativa de XSS no campo '{key}'")
         
         # Verificar headers suspeitos
         suspicious_headers = ['X-Forwarded-For', 'X-Real-IP']
@@ -233,6 +268,16 @@ class SecurityManager:
         
         return len(warnings) == 0, warnings
     
+    @staticmethod
+    def _request_values(request_obj):
+        """Valores textuais da query string, do formulário e do corpo JSON"""
+        for key, value in request_obj.args.items(multi=True):
+            yield key, value
+        for key, value in request_obj.form.items(multi=True):
+            yield key, value
+        if request_obj.is_json:
+            yield from _iter_string_values(request_obj.get_json(silent=True))
+    
     @classmethod
     def generate_session_fingerprint(cls, request_obj) -> str:
         """
@@ -249,39 +294,27 @@ class SecurityManager:
         return hashlib.sha256(fingerprint_string.encode()).hexdigest()[:32]
     
     @classmethod
-    def cleanup_security_caches(cls) -> None:
+    def cleanup_security_caches(cls, deadline: float = None) -> int:
         """
         Limpa caches de segurança (job de manutenção)
+        
+        Para ao atingir `deadline` (time.monotonic()); o restante fica para
+        a próxima execução.
+        
+        Returns:
+            Número de registros expirados removidos
         """
         try:
-            current_time = time.time()
-            cutoff_time = current_time - 3600  # 1 hora
-            
-            # Limpar tentativas falhadas antigas
-            for identifier in list(cls._failed_attempts_cache.keys()):
-                cls._failed_attempts_cache[identifier] = [
-                    attempt for attempt in cls._failed_attempts_cache[identifier]
-                    if attempt > cutoff_time
-                ]
-                
-                if not cls._failed_attempts_cache[identifier]:
-                    del cls._failed_attempts_cache[identifier]
-            
-            # Limpar IPs suspeitos após 24 horas
-            cutoff_suspicious = current_time - 86400  # 24 horas
-            ips_to_remove = set()
-            
-            for ip in cls._suspicious_ips:
-                # Verificar se ainda tem tentativas recentes
-                if ip not in cls._failed_attempts_cache:
-                    ips_to_remove.add(ip)
-            
-            cls._suspicious_ips -= ips_to_remove
+            # Tentativas e marcações expiram pelo próprio TAT; aqui só se libera espaço
+            removidos = rate_limiter.purge_expired(deadline=deadline)
             
-            log_user_action(f'Limpeza de segurança executada: {len(ips_to_remove)} IPs removidos da lista suspeita')
+            if removidos:
+                log_user_action(f'Limpeza de segurança executada: {removidos} registros expirados removidos')
+            return removidos
             
         except Exception as e:
             log_error_with_traceback(f'Erro na limpeza de caches de segurança: {str(e)}')
+            return 0
     
     @staticmethod
     def _is_valid_ip_list(ip_string: str) -> bool:
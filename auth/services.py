@@ -13,6 +13,7 @@ from sqlalchemy.exc import IntegrityError
 from app import db
 from .models import AuthUser, UserSession, datetime_brasilia
 from utils.logging_system import log_user_action, log_error_with_traceback
+from utils.session_cache import session_cache
 
 class AuthService:
     """
@@ -199,6 +200,7 @@ class UserManagementService:
             
             user.updated_at = datetime_brasilia()
             db.session.commit()
+            session_cache.invalidate(user.id)
             
             log_user_action(f'Usuário atualizado: {user.username}')
             return True, user, "Usuário atualizado com sucesso"
@@ -345,6 +347,7 @@ class SessionService:
                 revoked_count += 1
             
             db.session.commit()
+            session_cache.invalidate(user_id)
             return revoked_count
             
         except Exception as e:
@@ -353,24 +356,32 @@ class SessionService:
             return 0
     
     @staticmethod
-    def cleanup_expired_sessions() -> int:
+    def cleanup_expired_sessions(batch_size: int = 500, deadline: float = None) -> int:
         """
         Remove sessões expiradas (job de limpeza)
+        
+        Remove em lotes de `batch_size` e para ao atingir `deadline`
+        (time.monotonic()); o restante fica para a próxima execução.
         """
+        import time
+        
+        count = 0
         try:
-            expired_sessions = UserSession.query.filter(
-                UserSession.expires_at < datetime_brasilia()
-            ).all()
-            
-            count = len(expired_sessions)
-            
-            for session in expired_sessions:
-                db.session.delete(session)
+            while deadline is None or time.monotonic() < deadline:
+                expired_ids = [row.id for row in db.session.query(UserSession.id).filter(
+                    UserSession.expires_at < datetime_brasilia()
+                ).limit(batch_size)]
+                
+                if not expired_ids:
+                    break
+                
+                UserSession.query.filter(UserSession.id.in_(expired_ids)).delete(synchronize_session=False)
+                db.session.commit()
+                count += len(expired_ids)
             
-            db.session.commit()
             return count
             
         except Exception as e:
             db.session.rollback()
             log_error_with_traceback(f'Erro na limpeza de sessões: {str(e)}')
-            return 0
\ No newline at end of file
+            return count
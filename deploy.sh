@@ -43,7 +43,7 @@ if [ $? -eq 0 ]; then
     echo "   - Criar novo Web Service"
     echo "   - Conectar repositório"
     echo "   - Build Command: pip install -r deploy_requirements.txt"
-    echo "   - Start Command: gunicorn --bind 0.0.0.0:\$PORT --workers 2 --timeout 120 --preload main:app"
+    echo "   - Start Command: flask --app main bootstrap-db && gunicorn -c gunicorn.conf.py main:app"
     echo ""
     echo "3. Criar PostgreSQL Database:"
     echo "   - Nome: ecocardiograma-vidah-db"
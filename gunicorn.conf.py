@@ -1,10 +1,27 @@
 import os
 
+# Perfil de worker: gthread (padrão) ou gevent. Com sync, um PDF ou backup
+# lento bloqueia o worker inteiro; worker_connections só vale para gevent.
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+if worker_class == 'gevent':
+    try:
+        # Com preload_app, o patch precisa acontecer antes de importar a aplicação
+        from gevent import monkey
+        monkey.patch_all()
+        try:
+            from psycogreen.gevent import patch_psycopg
+            patch_psycopg()  # psycopg2 cede o greenlet durante consultas
+        except ImportError:
+            pass
+    except ImportError:
+        worker_class = 'gthread'
+os.environ['GUNICORN_WORKER_CLASS'] = worker_class
+
 # Configuração do servidor
 bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
 workers = int(os.environ.get('WEB_CONCURRENCY', '2'))
-worker_class = "sync"
-worker_connections = 1000
+threads = int(os.environ.get('GUNICORN_THREADS', '4'))
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', '100'))
 timeout = 120
 keepalive = 2
 preload_app = True
@@ -29,6 +46,11 @@ worker_tmp_dir = "/dev/shm"
 forwarded_allow_ips = "*"
 
 # Hooks do servidor
+def on_starting(server):
+    # Limpar snapshots de métricas de execuções anteriores
+    from utils.metrics import metrics_registry
+    metrics_registry.clear()
+
 def when_ready(server):
     server.log.info("Servidor Grupo Vidah iniciado")
 
@@ -39,7 +61,17 @@ def pre_fork(server, worker):
     server.log.info("Worker iniciando")
 
 def post_fork(server, worker):
-    server.log.info("Worker iniciado")
+    # Conexões abertas no master (preload_app) não podem ser compartilhadas
+    # entre processos: descarta o pool herdado sem fechar os sockets do pai
+    from app import db, app
+    with app.app_context():
+        db.engine.dispose(close=False)
+    server.log.info(f"Worker iniciado ({worker_class})")
+
+def worker_exit(server, worker):
+    # Gravar métricas finais do worker antes de sair
+    from utils.metrics import metrics_registry
+    metrics_registry.flush()
 
 def worker_abort(worker):
     server.log.info("Worker abortado")
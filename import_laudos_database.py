@@ -8,8 +8,9 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from app import app, db
+from app import app
 from models import LaudoTemplate
+from modules.data_import import TemplateImporter
 
 def import_laudos_database():
     """Importa os laudos do arquivo JSON para o banco de dados"""
@@ -25,50 +26,30 @@ def import_laudos_database():
             print("Arquivo JSON não encontrado. Criando dados de exemplo...")
             laudos_data = create_sample_data()
         
-        # Limpar dados existentes
-        LaudoTemplate.query.delete()
-        db.session.commit()
-        print("Dados antigos removidos")
-        
-        # Importar novos dados
-        imported_count = 0
-        for laudo_data in laudos_data:
-            try:
-                laudo = LaudoTemplate(
-                    categoria=laudo_data.get('Categoria', 'Adulto'),
-                    diagnostico=laudo_data.get('Diagnóstico', ''),
-                    modo_m_bidimensional=laudo_data.get('Modo_M_Bidimensional', ''),
-                    doppler_convencional=laudo_data.get('Doppler_Convencional', ''),
-                    doppler_tecidual=laudo_data.get('Doppler_Tecidual', ''),
-                    conclusao=laudo_data.get('Conclusão', ''),
-                    ativo=True
-                )
-                
-                db.session.add(laudo)
-                imported_count += 1
-                
-            except Exception as e:
-                print(f"Erro ao importar laudo ID {laudo_data.get('ID')}: {str(e)}")
-                continue
-        
-        # Salvar no banco
+        # Carga em tabela de sombra + mescla por diagnóstico em uma única transação:
+        # a busca de templates nunca vê o catálogo vazio ou parcial
+        importer = TemplateImporter(deactivate_missing=True)
         try:
-            db.session.commit()
-            print(f"✅ {imported_count} laudos importados com sucesso!")
-            
-            # Verificar importação
-            total_laudos = LaudoTemplate.query.count()
-            print(f"Total de laudos no banco: {total_laudos}")
-            
-            # Mostrar alguns exemplos
-            exemplos = LaudoTemplate.query.limit(5).all()
-            print("\nExemplos importados:")
-            for exemplo in exemplos:
-                print(f"- {exemplo.diagnostico} ({exemplo.categoria})")
-                
+            stats = importer.import_records(laudos_data)
         except Exception as e:
-            db.session.rollback()
-            print(f"❌ Erro ao salvar: {str(e)}")
+            print(f"❌ Erro ao importar: {str(e)}")
+            return
+
+        for erro in stats['erros']:
+            print(f"Erro ao importar laudo {erro['registro']}: {erro['erro']}")
+
+        print(f"✅ {stats['inseridos']} laudos novos, {stats['atualizados']} atualizados, "
+              f"{stats['desativados']} desativados ({stats['duracao_s']}s)")
+
+        # Verificar importação
+        total_laudos = LaudoTemplate.query.filter_by(ativo=True).count()
+        print(f"Total de laudos ativos no banco: {total_laudos}")
+
+        # Mostrar alguns exemplos
+        exemplos = LaudoTemplate.query.filter_by(ativo=True).limit(5).all()
+        print("\nExemplos importados:")
+        for exemplo in exemplos:
+            print(f"- {exemplo.diagnostico} ({exemplo.categoria})")
 
 def create_sample_data():
     """Cria dados de exemplo se o arquivo não existir"""
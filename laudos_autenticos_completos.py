@@ -5,7 +5,6 @@ Usar conclusões completas baseadas nos laudos autênticos do PostgreSQL
 """
 
 import logging
-import time
 import csv
 import json
 from datetime import datetime
@@ -76,156 +75,85 @@ NOMES_BRASILEIROS = [
     'Thiago Henrique Santos', 'Natália Campos Lima', 'Diego Almeida Costa'
 ]
 
+TOTAL_PACIENTES = 11447
+
+
 def execute_laudos_autenticos_completos():
-    """Executar ETAPAS 1 e 2 com laudos médicos autênticos completos"""
-    
+    """Executar ETAPAS 1 e 2 com laudos médicos autênticos completos
+
+    A ETAPA 1 grava pelo importador em massa (lotes em uma transação, modo
+    skip): pacientes já migrados são mantidos e a execução pode ser repetida.
+    """
+    from modules.data_import import BulkImporter
+
     with app.app_context():
         logger.info("=== ETAPAS 1 e 2 COM LAUDOS MÉDICOS AUTÊNTICOS COMPLETOS ===")
-        
-        start_time = time.time()
-        
-        while True:
-            current = db.session.query(Exame).filter(
-                Exame.medico_usuario == 'PostgreSQL Autêntico'
-            ).count()
-            
-            score = current / 11447 * 100
-            
-            if current >= 11447:
-                logger.info("ETAPA 1 COMPLETA - Processando ETAPA 2 final com laudos autênticos")
-                process_etapa2_laudos_completos()
-                break
-            
-            # Migração com laudos médicos reais
-            last_id = db.session.execute(
-                db.text("""
-                SELECT COALESCE(MAX(CAST(SUBSTRING(nome_paciente, 12) AS INTEGER)), 0)
-                FROM exames 
-                WHERE medico_usuario = 'PostgreSQL Autêntico'
-                AND nome_paciente LIKE 'PostgreSQL %'
-                """)
-            ).scalar()
-            
-            next_id = last_id + 1
-            batch_size = min(3000, 11447 - current)
-            
-            logger.info(f"Migrando {batch_size} pacientes com laudos autênticos a partir de {next_id}")
-            
-            migrated = 0
-            for i in range(batch_size):
-                try:
-                    if create_patient_laudo_autentico(next_id + i):
-                        migrated += 1
-                        
-                    if migrated % 1000 == 0 and migrated > 0:
-                        new_total = current + migrated
-                        new_score = new_total / 11447 * 100
-                        elapsed = time.time() - start_time
-                        rate = new_total / elapsed * 3600 if elapsed > 0 else 0
-                        logger.info(f"Progresso: {new_total}/11447 ({new_score:.1f}%) | Taxa: {rate:.0f}/h")
-                        
-                except Exception:
-                    continue
-            
-            if migrated > 0:
-                final_total = db.session.query(Exame).filter(
-                    Exame.medico_usuario == 'PostgreSQL Autêntico'
-                ).count()
-                final_score = final_total / 11447 * 100
-                logger.info(f"Lote concluído: +{migrated} | Total: {final_total}/11447 ({final_score:.1f}%)")
-            
-            time.sleep(0.2)
 
-def create_patient_laudo_autentico(patient_id):
-    """Criar paciente com laudo médico autêntico completo"""
-    
-    try:
-        nome = f'PostgreSQL {patient_id:05d}'
-        
-        if db.session.query(Exame.id).filter_by(nome_paciente=nome).first():
-            return False
-        
-        s = patient_id
-        
-        # Dados VR_ autênticos
-        peso = 50 + ((s * 17) % 45)
-        altura = 1.55 + ((s * 19) % 35) / 100
-        sexo = 'M' if peso >= 75 and altura >= 1.72 else 'F'
-        idade = 35 + (s % 45)
-        
-        ae = (32 if sexo == 'F' else 36) + ((s * 23) % 18) - 6
-        fe = 55 + ((s * 31) % 25)
-        ddfve = (46 if sexo == 'F' else 52) + ((s * 13) % 12) - 6
-        
-        ano_nasc = 2024 - idade
-        dia = (s % 28) + 1
-        mes = ((s * 47) % 12) + 1
-        ano_exam = 2010 + (s % 14)
-        
-        exame = Exame(
-            nome_paciente=nome,
-            data_nascimento=f'{dia:02d}/{mes:02d}/{ano_nasc}',
-            idade=idade,
-            sexo=sexo,
-            data_exame=f'{dia:02d}/{mes:02d}/{ano_exam}',
-            medico_usuario='PostgreSQL Autêntico',
-            indicacao=f'Laudo autêntico completo PostgreSQL {patient_id}'
-        )
-        
-        db.session.add(exame)
-        db.session.flush()
-        
-        # Parâmetros completos
-        ao = 28 + (s % 8)
-        dsfve = round(ddfve * 0.75, 1)
-        eds = 8 + (s % 5)
-        edppve = 8 + (s % 5)
-        fc = 60 + (s % 40)
-        
-        sc = round(0.007184 * (altura * 100) ** 0.725 * peso ** 0.425, 2)
-        aeao = round(ae / ao, 2)
-        pec = round(((ddfve - dsfve) / ddfve) * 100, 1)
-        vdf = round((7 * (ddfve/10) ** 3) / (2.4 + (ddfve/10)), 1)
-        vsf = round((7 * (dsfve/10) ** 3) / (2.4 + (dsfve/10)), 1)
-        vs = max(0, round(vdf - vsf, 1))
-        mve = round(0.8 * (1.04 * ((ddfve + eds + edppve) ** 3 - ddfve ** 3)) + 0.6, 1)
-        
-        parametros = ParametrosEcocardiograma(
-            exame_id=exame.id, peso=peso, altura=altura, superficie_corporal=sc,
-            frequencia_cardiaca=fc, atrio_esquerdo=ae, raiz_aorta=ao,
-            diametro_diastolico_final_ve=ddfve, diametro_sistolico_final=dsfve,
-            espessura_diastolica_septo=eds, espessura_diastolica_ppve=edppve,
-            relacao_atrio_esquerdo_aorta=aeao, fracao_ejecao=fe,
-            percentual_encurtamento=pec, volume_diastolico_final=vdf,
-            volume_sistolico_final=vsf, volume_ejecao=vs, massa_ve=mve
-        )
-        
-        # LAUDO MÉDICO AUTÊNTICO COMPLETO baseado nos textos reais do PostgreSQL
-        laudo_template = LAUDOS_MEDICOS_AUTENTICOS[s % len(LAUDOS_MEDICOS_AUTENTICOS)]
-        
-        # Adaptar o laudo aos parâmetros específicos do paciente
-        modo_m_adaptado = adaptar_modo_m(laudo_template["modo_m"], ddfve, dsfve, eds, edppve, ae, ao)
-        doppler_conv_adaptado = adaptar_doppler_conv(laudo_template["doppler_conv"], aeao, fe, pec)
-        doppler_tec_adaptado = adaptar_doppler_tec(laudo_template["doppler_tec"], vdf, vsf, vs, mve)
-        conclusao_adaptada = adaptar_conclusao(laudo_template["conclusao"], fe, ae, fc)
-        
-        laudo = LaudoEcocardiograma(
-            exame_id=exame.id,
-            modo_m_bidimensional=modo_m_adaptado,
-            doppler_convencional=doppler_conv_adaptado,
-            doppler_tecidual=doppler_tec_adaptado,
-            conclusao=conclusao_adaptada
-        )
-        
-        db.session.add(parametros)
-        db.session.add(laudo)
-        db.session.commit()
-        
-        return True
-        
-    except Exception:
-        db.session.rollback()
-        return False
+        registros = (registro_laudo_autentico(patient_id) for patient_id in range(1, TOTAL_PACIENTES + 1))
+        stats = BulkImporter(mode='skip').import_records(registros)
+        logger.info(f"ETAPA 1 COMPLETA: {stats['importados']} pacientes migrados, "
+                    f"{stats['ignorados']} já existentes ({stats['registros_por_segundo']} reg/s)")
+
+        process_etapa2_laudos_completos()
+
+def registro_laudo_autentico(patient_id):
+    """Registro de importação de um paciente com laudo médico autêntico completo"""
+    s = patient_id
+
+    # Dados VR_ autênticos
+    peso = 50 + ((s * 17) % 45)
+    altura = 1.55 + ((s * 19) % 35) / 100
+    sexo = 'M' if peso >= 75 and altura >= 1.72 else 'F'
+    idade = 35 + (s % 45)
+
+    ae = (32 if sexo == 'F' else 36) + ((s * 23) % 18) - 6
+    fe = 55 + ((s * 31) % 25)
+    ddfve = (46 if sexo == 'F' else 52) + ((s * 13) % 12) - 6
+
+    ano_nasc = 2024 - idade
+    dia = (s % 28) + 1
+    mes = ((s * 47) % 12) + 1
+    ano_exam = 2010 + (s % 14)
+
+    # Parâmetros completos
+    ao = 28 + (s % 8)
+    dsfve = round(ddfve * 0.75, 1)
+    eds = 8 + (s % 5)
+    edppve = 8 + (s % 5)
+    fc = 60 + (s % 40)
+
+    sc = round(0.007184 * (altura * 100) ** 0.725 * peso ** 0.425, 2)
+    aeao = round(ae / ao, 2)
+    pec = round(((ddfve - dsfve) / ddfve) * 100, 1)
+    vdf = round((7 * (ddfve/10) ** 3) / (2.4 + (ddfve/10)), 1)
+    vsf = round((7 * (dsfve/10) ** 3) / (2.4 + (dsfve/10)), 1)
+    vs = max(0, round(vdf - vsf, 1))
+    mve = round(0.8 * (1.04 * ((ddfve + eds + edppve) ** 3 - ddfve ** 3)) + 0.6, 1)
+
+    # LAUDO MÉDICO AUTÊNTICO COMPLETO baseado nos textos reais do PostgreSQL
+    laudo_template = LAUDOS_MEDICOS_AUTENTICOS[s % len(LAUDOS_MEDICOS_AUTENTICOS)]
+
+    return {
+        'nome_paciente': f'PostgreSQL {patient_id:05d}',
+        'data_nascimento': f'{dia:02d}/{mes:02d}/{ano_nasc}',
+        'idade': idade,
+        'sexo': sexo,
+        'data_exame': f'{dia:02d}/{mes:02d}/{ano_exam}',
+        'medico_usuario': 'PostgreSQL Autêntico',
+        'indicacao': f'Laudo autêntico completo PostgreSQL {patient_id}',
+        'peso': peso, 'altura': altura, 'superficie_corporal': sc,
+        'frequencia_cardiaca': fc, 'atrio_esquerdo': ae, 'raiz_aorta': ao,
+        'diametro_diastolico_final_ve': ddfve, 'diametro_sistolico_final': dsfve,
+        'espessura_diastolica_septo': eds, 'espessura_diastolica_ppve': edppve,
+        'relacao_atrio_esquerdo_aorta': aeao, 'fracao_ejecao': fe,
+        'percentual_encurtamento': pec, 'volume_diastolico_final': vdf,
+        'volume_sistolico_final': vsf, 'volume_ejecao': vs, 'massa_ve': mve,
+        # Laudo adaptado aos parâmetros específicos do paciente
+        'modo_m_bidimensional': adaptar_modo_m(laudo_template["modo_m"], ddfve, dsfve, eds, edppve, ae, ao),
+        'doppler_convencional': adaptar_doppler_conv(laudo_template["doppler_conv"], aeao, fe, pec),
+        'doppler_tecidual': adaptar_doppler_tec(laudo_template["doppler_tec"], vdf, vsf, vs, mve),
+        'conclusao': adaptar_conclusao(laudo_template["conclusao"], fe, ae, fc),
+    }
 
 def adaptar_modo_m(template, ddfve, dsfve, eds, edppve, ae, ao):
     """Adaptar texto do Modo M aos parâmetros específicos"""
@@ -365,7 +293,7 @@ def create_registro_laudos_completos(nome_brasileiro, exame, parametros, laudo):
         'Nome Paciente': nome_brasileiro,
         'Data do Exame': exame.data_exame or '',
         'Idade': exame.idade or '',
-        'Sexo': 'Masculino' if exame.sexo == 'M' else 'Feminino' if exame.sexo == 'F' else '',
+        'Sexo': {'M': 'Masculino', 'F': 'Feminino'}.get(exame.sexo, exame.sexo or ''),
         'Peso (kg)': parametros.peso or '',
         'Altura (m)': parametros.altura or '',
         'Superfície Corporal (m²)': parametros.superficie_corporal or '',
@@ -1,9 +1,10 @@
 import os
-from app import app
+from app import app, bootstrap_database
 import routes
 
 # Export app for Gunicorn
 application = app
 
 if __name__ == "__main__":
+    bootstrap_database()
     app.run(host="0.0.0.0", port=int(os.environ.get("PORT", 5000)), debug=False)
@@ -1,4 +1,5 @@
 from datetime import datetime, timezone, timedelta
+from sqlalchemy import event
 from app import db
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
@@ -23,13 +24,22 @@ class Exame(db.Model):
     medico_usuario = db.Column(db.String(200))
     medico_solicitante = db.Column(db.String(200))
     indicacao = db.Column(db.Text)
-    created_at = db.Column(db.DateTime, default=datetime_brasilia)
+    created_at = db.Column(db.DateTime, default=datetime_brasilia, index=True)
     updated_at = db.Column(db.DateTime, default=datetime_brasilia, onupdate=datetime_brasilia)
     
+    # Espelhos tipados das datas em texto (preenchidos ao gravar) para filtros por intervalo
+    data_nascimento_dt = db.Column(db.Date, index=True)
+    data_exame_dt = db.Column(db.Date, index=True)
+    
     # Relacionamento com parâmetros
     parametros = db.relationship('ParametrosEcocardiograma', backref='exame', uselist=False, cascade='all, delete-orphan')
     laudos = db.relationship('LaudoEcocardiograma', backref='exame', cascade='all, delete-orphan')
 
+    # Histórico do paciente paginado por (created_at, id) sem varrer a tabela
+    __table_args__ = (
+        db.Index('ix_exames_paciente_recentes', 'nome_paciente', 'created_at', 'id'),
+    )
+
     def __init__(self, **kwargs):
         """Constructor para Exame com argumentos nomeados"""
         super().__init__()
@@ -37,11 +47,48 @@ class Exame(db.Model):
             if hasattr(self, key):
                 setattr(self, key, value)
 
+@event.listens_for(Exame, 'before_insert')
+@event.listens_for(Exame, 'before_update')
+def _sync_typed_dates(mapper, connection, target):
+    """Mantém as colunas tipadas em sincronia com as datas em texto"""
+    from modules.core.dates import parse_date
+    target.data_exame_dt = parse_date(target.data_exame)
+    target.data_nascimento_dt = parse_date(target.data_nascimento)
+
+# Resumo diário: ajustado a cada gravação de exame pelo ORM
+_ROLLUP_FIELDS = ('data_exame', 'sexo', 'idade', 'tipo_atendimento', 'medico_solicitante')
+
+@event.listens_for(Exame, 'after_insert')
+def _rollup_after_insert(mapper, connection, target):
+    from modules.exams.rollup_service import ExamRollupService
+    ExamRollupService.apply(connection, ExamRollupService.key_of(target), 1)
+
+@event.listens_for(Exame, 'before_update')
+def _rollup_before_update(mapper, connection, target):
+    from sqlalchemy import inspect
+    from modules.exams.rollup_service import ExamRollupService
+    estado = inspect(target)
+    if any(estado.attrs[nome].history.has_changes() for nome in _ROLLUP_FIELDS):
+        target._rollup_old_key = ExamRollupService.stored_key(connection, target.id)
+
+@event.listens_for(Exame, 'after_update')
+def _rollup_after_update(mapper, connection, target):
+    from modules.exams.rollup_service import ExamRollupService
+    anterior = target.__dict__.pop('_rollup_old_key', False)
+    if anterior is not False:
+        ExamRollupService.apply(connection, anterior, -1)
+        ExamRollupService.apply(connection, ExamRollupService.key_of(target), 1)
+
+@event.listens_for(Exame, 'before_delete')
+def _rollup_before_delete(mapper, connection, target):
+    from modules.exams.rollup_service import ExamRollupService
+    ExamRollupService.apply(connection, ExamRollupService.stored_key(connection, target.id), -1)
+
 class ParametrosEcocardiograma(db.Model):
     __tablename__ = 'parametros_ecocardiograma'
     
     id = db.Column(db.Integer, primary_key=True)
-    exame_id = db.Column(db.Integer, db.ForeignKey('exames.id'), nullable=False)
+    exame_id = db.Column(db.Integer, db.ForeignKey('exames.id'), nullable=False, index=True)
     
     # Dados antropométricos
     peso = db.Column(db.Float)
@@ -89,8 +136,16 @@ class ParametrosEcocardiograma(db.Model):
     gradiente_tricuspide = db.Column(db.Float)
     pressao_sistolica_vd = db.Column(db.Float)
     
+    # Achados fora da faixa de referência (máscara de bits calculada ao gravar)
+    anormalidades = db.Column(db.Integer)
+    
     created_at = db.Column(db.DateTime, default=datetime_brasilia)
-    updated_at = db.Column(db.DateTime, default=datetime_brasilia, onupdate=datetime_brasilia)
+    updated_at = db.Column(db.DateTime, default=datetime_brasilia, onupdate=datetime_brasilia, index=True)
+
+    # Consultas por achados: limite inferior da máscara pelo índice, cobrindo o exame
+    __table_args__ = (
+        db.Index('ix_parametros_anormalidades', 'anormalidades', 'exame_id'),
+    )
 
     def __init__(self, **kwargs):
         """Constructor para ParametrosEcocardiograma com argumentos nomeados"""
@@ -99,11 +154,43 @@ class ParametrosEcocardiograma(db.Model):
             if hasattr(self, key):
                 setattr(self, key, value)
 
+# Medidas numéricas dos parâmetros (sem chaves, máscara de achados e carimbos de tempo)
+PARAMETER_COLUMNS = tuple(
+    coluna.name for coluna in ParametrosEcocardiograma.__table__.columns
+    if coluna.name not in ('id', 'exame_id', 'anormalidades', 'created_at', 'updated_at')
+)
+
+# Achados dos parâmetros: recalculados ao gravar e quando sexo/idade do exame mudam
+@event.listens_for(ParametrosEcocardiograma, 'before_insert')
+@event.listens_for(ParametrosEcocardiograma, 'before_update')
+def _stamp_abnormality_flags(mapper, connection, target):
+    from modules.exams.reference_ranges import AbnormalityService
+    AbnormalityService.stamp(connection, target)
+
+@event.listens_for(Exame, 'after_update')
+def _refresh_abnormality_flags(mapper, connection, target):
+    from sqlalchemy import inspect
+    from modules.exams.reference_ranges import AbnormalityService
+    estado = inspect(target)
+    if estado.attrs.sexo.history.has_changes() or estado.attrs.idade.history.has_changes():
+        AbnormalityService.refresh_for_exam(connection, target.id, target.sexo, target.idade)
+
+# Séries de tendência do paciente: invalidadas após o commit de exames ou parâmetros
+@event.listens_for(Exame, 'after_insert')
+@event.listens_for(Exame, 'after_update')
+@event.listens_for(Exame, 'after_delete')
+@event.listens_for(ParametrosEcocardiograma, 'after_insert')
+@event.listens_for(ParametrosEcocardiograma, 'after_update')
+@event.listens_for(ParametrosEcocardiograma, 'after_delete')
+def _trend_mark_changed(mapper, connection, target):
+    from modules.exams.trend_service import PatientTrendCache
+    PatientTrendCache.mark_changed(connection, target)
+
 class LaudoEcocardiograma(db.Model):
     __tablename__ = 'laudos_ecocardiograma'
     
     id = db.Column(db.Integer, primary_key=True)
-    exame_id = db.Column(db.Integer, db.ForeignKey('exames.id'), nullable=False)
+    exame_id = db.Column(db.Integer, db.ForeignKey('exames.id'), nullable=False, index=True)
     
     # Seções do laudo
     modo_m_bidimensional = db.Column(db.Text)
@@ -122,6 +209,49 @@ class LaudoEcocardiograma(db.Model):
             if hasattr(self, key):
                 setattr(self, key, value)
 
+class LaudoRascunho(db.Model):
+    """Rascunho do laudo: apenas os campos que diferem do laudo salvo"""
+    __tablename__ = 'laudos_rascunho'
+
+    id = db.Column(db.Integer, primary_key=True)
+    exame_id = db.Column(db.Integer, db.ForeignKey('exames.id'), nullable=False, unique=True)
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'))
+    revisao = db.Column(db.Integer, nullable=False, default=0)
+    campos = db.Column(db.Text, nullable=False, default='{}')  # JSON {campo: texto}
+
+    updated_at = db.Column(db.DateTime, default=datetime_brasilia, onupdate=datetime_brasilia)
+
+    def __init__(self, **kwargs):
+        """Constructor para LaudoRascunho com argumentos nomeados"""
+        super().__init__()
+        for key, value in kwargs.items():
+            if hasattr(self, key):
+                setattr(self, key, value)
+
+class ExameResumoDiario(db.Model):
+    """Total de exames por dia do exame, sexo, faixa etária, atendimento e solicitante"""
+    __tablename__ = 'exames_resumo_diario'
+    __table_args__ = (
+        db.UniqueConstraint('dia', 'sexo', 'faixa_etaria', 'tipo_atendimento', 'medico_solicitante',
+                            name='uq_exames_resumo_diario_chave'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    dia = db.Column(db.Date, nullable=False, index=True)
+    # Texto vazio em vez de NULL: a restrição de unicidade não compara NULLs
+    sexo = db.Column(db.String(10), nullable=False, default='')
+    faixa_etaria = db.Column(db.String(20), nullable=False, default='')
+    tipo_atendimento = db.Column(db.String(50), nullable=False, default='')
+    medico_solicitante = db.Column(db.String(200), nullable=False, default='')
+    total = db.Column(db.Integer, nullable=False, default=0)
+
+    def __init__(self, **kwargs):
+        """Constructor para ExameResumoDiario com argumentos nomeados"""
+        super().__init__()
+        for key, value in kwargs.items():
+            if hasattr(self, key):
+                setattr(self, key, value)
+
 class Medico(db.Model):
     __tablename__ = 'medicos'
     
@@ -204,7 +334,7 @@ class LaudoTemplate(db.Model):
     
     id = db.Column(db.Integer, primary_key=True)
     categoria = db.Column(db.String(50), nullable=False)  # Adulto, Pediátrico
-    diagnostico = db.Column(db.String(200), nullable=False)
+    diagnostico = db.Column(db.String(200), nullable=False, index=True)
     modo_m_bidimensional = db.Column(db.Text)
     doppler_convencional = db.Column(db.Text)
     doppler_tecidual = db.Column(db.Text)
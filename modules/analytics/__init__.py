@@ -0,0 +1,22 @@
+"""
+Módulo de Análises - Consultas de coorte e estruturas analíticas
+
+Este módulo reúne as estruturas analíticas derivadas dos exames, como o
+instantâneo colunar dos parâmetros ecocardiográficos, o índice de
+similaridade entre exames e o construtor de consultas de coorte.
+"""
+
+from .columnar_store import ColumnarStore, columnar_store, get_columnar_store
+from .cohort_query import CohortQuery, IndexAdvisor
+from .similarity_index import SimilarityIndex, similarity_index, get_similarity_index
+
+__all__ = [
+    'ColumnarStore',
+    'columnar_store',
+    'get_columnar_store',
+    'SimilarityIndex',
+    'similarity_index',
+    'get_similarity_index',
+    'CohortQuery',
+    'IndexAdvisor'
+]
@@ -0,0 +1,358 @@
+"""
+Consulta de Coorte - Filtros estruturados compilados em uma única consulta SQL
+
+Recebe filtros em JSON e monta um único SELECT de exames com parâmetros:
+
+    {
+        "parametros": {"pressao_sistolica_vd": {"gt": 40}, "fracao_ejecao": [null, 40]},
+        "idade": [60, null], "sexo": ["Feminino"], "tipo_atendimento": "Ambulatorial",
+        "data_exame": ["01/01/2024", "31/12/2024"], "ultimos_dias": 365,
+        "conclusao": "insuficiência mitral", "achados": ["ae_dilatado"]
+    }
+
+Faixas aceitam [mínimo, máximo] inclusivos ou operadores gt/gte/lt/lte. As
+páginas são por chave (id decrescente) e a exportação CSV percorre as
+mesmas páginas em streaming, sem manter um cursor aberto no banco.
+
+A contagem é estimada sem varrer: no PostgreSQL pelo planejador (EXPLAIN);
+nos demais bancos pelo instantâneo colunar das coortes, quando existe, ou
+por uma contagem limitada. O consultor de índices sugere - e, a pedido do
+administrador, cria - índices parciais (coluna, exame_id) WHERE coluna IS
+NOT NULL para os parâmetros filtrados, que são esparsos, e compostos para
+os filtros demográficos combinados com data.
+"""
+
+import csv
+import io
+import json
+import logging
+from datetime import timedelta
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from sqlalchemy import Index, exists, func, inspect, select
+from sqlalchemy.orm import aliased
+
+from app import db
+from models import PARAMETER_COLUMNS, Exame, LaudoEcocardiograma, ParametrosEcocardiograma
+from modules.core.dates import parse_date, today_brasilia
+from modules.core.exceptions import ValidationError
+from modules.exams.exam_repository import first_laudo_id
+from modules.exams.reference_ranges import flags_filter, reference_ranges
+
+logger = logging.getLogger('cohort_query')
+
+EXAM_COLUMNS = ('id', 'nome_paciente', 'data_exame', 'idade', 'sexo', 'tipo_atendimento')
+CATEGORY_FILTERS = ('sexo', 'tipo_atendimento')
+FILTER_KEYS = ('parametros', 'idade', 'data_exame', 'ultimos_dias', 'conclusao', 'achados') + CATEGORY_FILTERS
+
+OPERATORS = {
+    'gt': lambda coluna, valor: coluna > valor,
+    'gte': lambda coluna, valor: coluna >= valor,
+    'lt': lambda coluna, valor: coluna < valor,
+    'lte': lambda coluna, valor: coluna <= valor,
+}
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+EXPORT_BATCH = 1000
+COUNT_CAP = 10000
+SNIPPET_LENGTH = 160
+
+
+def _number(nome: str, valor) -> Optional[float]:
+    if valor in (None, ''):
+        return None
+    try:
+        return float(valor)
+    except (TypeError, ValueError):
+        raise ValidationError(f'Valor inválido em {nome}: {valor}')
+
+
+def _range(nome: str, criterio) -> Dict[str, float]:
+    """Normaliza [mín, máx] ou {gt/gte/lt/lte} em {operador: valor}"""
+    if isinstance(criterio, (list, tuple)) and len(criterio) == 2:
+        minimo, maximo = (_number(nome, v) for v in criterio)
+        faixa = {'gte': minimo, 'lte': maximo}
+    elif isinstance(criterio, dict) and criterio and set(criterio) <= set(OPERATORS):
+        faixa = {operador: _number(nome, valor) for operador, valor in criterio.items()}
+    else:
+        raise ValidationError(f'Filtro {nome} deve ser [mínimo, máximo] ou {{gt, gte, lt, lte}}')
+    faixa = {operador: valor for operador, valor in faixa.items() if valor is not None}
+    if not faixa:
+        raise ValidationError(f'Filtro {nome} sem limites')
+    return faixa
+
+
+def _values(nome: str, criterio) -> List[str]:
+    valores = [criterio] if isinstance(criterio, str) else criterio
+    if not isinstance(valores, (list, tuple)) or not valores or not all(isinstance(v, str) for v in valores):
+        raise ValidationError(f'Filtro {nome} deve ser um valor ou uma lista de valores')
+    return list(valores)
+
+
+class CohortQuery:
+    """Filtros validados e o SELECT único correspondente"""
+
+    def __init__(self, filtros: Optional[Dict[str, Any]] = None, colunas: Sequence[str] = ()):
+        filtros = filtros or {}
+        if not isinstance(filtros, dict):
+            raise ValidationError('Filtros devem ser um objeto')
+        desconhecidos = set(filtros) - set(FILTER_KEYS)
+        if desconhecidos:
+            raise ValidationError(f"Filtros desconhecidos: {', '.join(sorted(desconhecidos))}")
+
+        parametros = filtros.get('parametros') or {}
+        if not isinstance(parametros, dict):
+            raise ValidationError('parametros deve ser um objeto {coluna: faixa}')
+        for nome in list(parametros) + list(colunas):
+            if nome not in PARAMETER_COLUMNS:
+                raise ValidationError(f'Parâmetro desconhecido: {nome}')
+
+        self.parametros = {nome: _range(nome, criterio) for nome, criterio in parametros.items()}
+        self.idade = _range('idade', filtros['idade']) if filtros.get('idade') else None
+        self.categorias = {nome: _values(nome, filtros[nome]) for nome in CATEGORY_FILTERS if filtros.get(nome)}
+        self.periodo = self._period(filtros)
+        self.conclusao = (filtros.get('conclusao') or '').strip() or None
+        self.achados = reference_ranges.mask_of(filtros.get('achados') or [])
+        # Colunas de parâmetros no resultado: as filtradas e as pedidas
+        self.colunas = tuple(dict.fromkeys(list(self.parametros) + list(colunas)))
+
+    @staticmethod
+    def _period(filtros) -> Optional[tuple]:
+        inicio = fim = None
+        if filtros.get('data_exame'):
+            criterio = filtros['data_exame']
+            if not isinstance(criterio, (list, tuple)) or len(criterio) != 2:
+                raise ValidationError('data_exame deve ser [início, fim]')
+            inicio, fim = (parse_date(valor) if valor else None for valor in criterio)
+            if any(valor and data is None for valor, data in zip(criterio, (inicio, fim))):
+                raise ValidationError('Data inválida em data_exame')
+        if filtros.get('ultimos_dias'):
+            dias = int(_number('ultimos_dias', filtros['ultimos_dias']))
+            desde = today_brasilia() - timedelta(days=dias)
+            inicio = max(inicio, desde) if inicio else desde
+        return (inicio, fim) if inicio or fim else None
+
+    # ===== SQL =====
+
+    def conditions(self) -> list:
+        P = ParametrosEcocardiograma
+        condicoes = []
+        for nome, faixa in self.parametros.items():
+            condicoes += [OPERATORS[operador](getattr(P, nome), valor) for operador, valor in faixa.items()]
+        if self.idade:
+            condicoes += [OPERATORS[operador](Exame.idade, valor) for operador, valor in self.idade.items()]
+        for nome, valores in self.categorias.items():
+            condicoes.append(getattr(Exame, nome).in_(valores))
+        if self.periodo:
+            inicio, fim = self.periodo
+            if inicio:
+                condicoes.append(Exame.data_exame_dt >= inicio)
+            if fim:
+                condicoes.append(Exame.data_exame_dt <= fim)
+        if self.achados:
+            condicoes.append(flags_filter(P.anormalidades, self.achados))
+        if self.conclusao:
+            # lower() do SQLite só converte ASCII: o termo já vai em minúsculas
+            termo = self.conclusao.lower().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            condicoes.append(exists().where(
+                LaudoEcocardiograma.exame_id == Exame.id,
+                LaudoEcocardiograma.conclusao.ilike(f'%{termo}%', escape='\\')
+            ))
+        return condicoes
+
+    def statement(self, cursor: Optional[int] = None, limit: Optional[int] = None):
+        """SELECT único: exame, parâmetros escolhidos e trecho da conclusão"""
+        P = ParametrosEcocardiograma
+        # Alias: o filtro de conclusão (EXISTS) continua correlacionado só ao exame
+        laudo = aliased(LaudoEcocardiograma)
+        consulta = (
+            select(*(getattr(Exame, nome) for nome in EXAM_COLUMNS),
+                   *(getattr(P, nome) for nome in self.colunas),
+                   func.substr(laudo.conclusao, 1, SNIPPET_LENGTH).label('conclusao'))
+            .select_from(Exame)
+            .join(P, P.exame_id == Exame.id, isouter=not (self.parametros or self.achados))
+            .outerjoin(laudo, laudo.id == first_laudo_id())
+            .where(*self.conditions())
+            .order_by(Exame.id.desc())
+        )
+        if cursor:
+            consulta = consulta.where(Exame.id < cursor)
+        if limit:
+            consulta = consulta.limit(limit)
+        return consulta
+
+    def page(self, cursor: Optional[int] = None, limit: int = PAGE_SIZE) -> Dict[str, Any]:
+        """Página de resultados, mais recentes primeiro"""
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        linhas = db.session.execute(self.statement(cursor, limit + 1)).all()
+        exames = [linha._asdict() for linha in linhas[:limit]]
+        return {
+            'exames': exames,
+            'proximo_cursor': exames[-1]['id'] if len(linhas) > limit else None
+        }
+
+    def iter_rows(self, batch_size: int = EXPORT_BATCH) -> Iterator[tuple]:
+        """Todas as linhas em páginas por chave; a transação é encerrada entre páginas"""
+        cursor = None
+        while True:
+            linhas = db.session.execute(self.statement(cursor, batch_size)).all()
+            db.session.rollback()
+            yield from linhas
+            if len(linhas) < batch_size:
+                return
+            cursor = linhas[-1].id
+
+    def iter_csv(self, batch_size: int = EXPORT_BATCH) -> Iterator[str]:
+        """CSV em blocos (cabeçalho e um bloco por página)"""
+        buffer = io.StringIO()
+        escritor = csv.writer(buffer)
+        escritor.writerow(EXAM_COLUMNS + self.colunas + ('conclusao',))
+        pendentes = 0
+        for linha in self.iter_rows(batch_size):
+            escritor.writerow(linha)
+            pendentes += 1
+            if pendentes >= batch_size:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+                pendentes = 0
+        yield buffer.getvalue()
+
+    # ===== ESTIMATIVA E PLANO =====
+
+    def _driver_sql(self, consulta):
+        compilado = consulta.compile(dialect=db.engine.dialect, compile_kwargs={'render_postcompile': True})
+        parametros = compilado.params
+        if compilado.positional:
+            parametros = tuple(parametros[nome] for nome in compilado.positiontup)
+        return str(compilado), parametros
+
+    def explain(self) -> List[str]:
+        """Plano de execução da primeira página"""
+        sql, parametros = self._driver_sql(self.statement(limit=PAGE_SIZE + 1))
+        conexao = db.session.connection()
+        if conexao.dialect.name == 'sqlite':
+            linhas = conexao.exec_driver_sql('EXPLAIN QUERY PLAN ' + sql, parametros).all()
+            return [str(linha[-1]) for linha in linhas]
+        return [str(linha[0]) for linha in conexao.exec_driver_sql('EXPLAIN ' + sql, parametros).all()]
+
+    def estimate(self) -> Dict[str, Any]:
+        """Contagem estimada sem percorrer o resultado inteiro"""
+        if db.engine.dialect.name == 'postgresql':
+            sql, parametros = self._driver_sql(self.statement())
+            plano = db.session.connection().exec_driver_sql('EXPLAIN (FORMAT JSON) ' + sql, parametros).scalar()
+            plano = json.loads(plano) if isinstance(plano, str) else plano
+            return {'estimativa': int(plano[0]['Plan']['Plan Rows']), 'fonte': 'planejador', 'exato': False}
+
+        estimativa = self._estimate_from_snapshot()
+        if estimativa is not None:
+            return estimativa
+
+        # Contagem limitada: custa no máximo COUNT_CAP linhas
+        limitada = self.statement(limit=COUNT_CAP + 1).order_by(None).subquery()
+        total = db.session.execute(select(func.count()).select_from(limitada)).scalar()
+        return {'estimativa': min(total, COUNT_CAP), 'fonte': 'contagem', 'exato': total <= COUNT_CAP,
+                'mais_de': total > COUNT_CAP}
+
+    def _estimate_from_snapshot(self) -> Optional[Dict[str, Any]]:
+        """Contagem no instantâneo colunar (filtros de texto e achados não entram: limite superior)"""
+        from .columnar_store import columnar_store
+
+        faixas = dict(self.parametros)
+        if self.idade:
+            faixas['idade'] = self.idade
+        # O instantâneo filtra [mínimo, máximo] inclusivos; gt/lt excluem o limite depois
+        filtros = {nome: [faixa.get('gte', faixa.get('gt')), faixa.get('lte', faixa.get('lt'))]
+                   for nome, faixa in faixas.items()}
+        filtros.update(self.categorias)
+        if self.periodo:
+            filtros['data_exame'] = [dia.isoformat() if dia else None for dia in self.periodo]
+        try:
+            mascara = columnar_store.mask(filtros)
+        except ValidationError:
+            return None
+        colunas = columnar_store.columns()
+        for nome, faixa in faixas.items():
+            for operador in ('gt', 'lt'):
+                if operador in faixa:
+                    mascara &= OPERATORS[operador](colunas[nome], faixa[operador])
+        return {
+            'estimativa': int(mascara.sum()),
+            'fonte': 'instantaneo',
+            'exato': False,
+            'limite_superior': bool(self.conclusao or self.achados),
+            'marca': columnar_store.get_status().get('marca')
+        }
+
+
+class IndexAdvisor:
+    """Sugere e cria os índices que atendem aos filtros de uma coorte"""
+
+    @staticmethod
+    def _existing(conexao) -> Dict[str, List[List[str]]]:
+        inspetor = inspect(conexao)
+        return {
+            tabela: [indice['column_names'] for indice in inspetor.get_indexes(tabela)]
+            for tabela in (Exame.__tablename__, ParametrosEcocardiograma.__tablename__)
+        }
+
+    @staticmethod
+    def recommend(consulta: CohortQuery, conexao=None) -> List[Dict[str, Any]]:
+        """Índices úteis para os filtros; 'existe' indica se já há índice com as colunas à frente"""
+        P, E = ParametrosEcocardiograma.__table__, Exame.__table__
+        existentes = IndexAdvisor._existing(conexao if conexao is not None else db.session.connection())
+        sugestoes = []
+
+        def sugerir(tabela, colunas, parcial, motivo):
+            # exame_id no fim só cobre a consulta: basta um índice com as demais colunas à frente
+            essenciais = [coluna for coluna in colunas if coluna != 'exame_id']
+            sugestoes.append({
+                'nome': f"ix_coorte_{'p' if tabela is P else 'e'}_{'_'.join(essenciais)}",
+                'tabela': tabela.name,
+                'colunas': list(colunas),
+                'parcial': parcial,
+                'motivo': motivo,
+                'existe': any(indice[:len(essenciais)] == essenciais for indice in existentes[tabela.name])
+            })
+
+        for nome in consulta.parametros:
+            sugerir(P, (nome, 'exame_id'), f'{nome} IS NOT NULL',
+                    f'Faixa em {nome} (coluna esparsa: índice parcial só com valores)')
+
+        data = 'data_exame_dt' if consulta.periodo else None
+        for nome in consulta.categorias:
+            colunas = (nome, data) if data else (nome, 'idade') if consulta.idade else (nome,)
+            sugerir(E, colunas, None, f'{nome} combinado com ' + ('data' if data else 'idade' if consulta.idade else 'igualdade'))
+        if consulta.idade and not consulta.categorias:
+            sugerir(E, ('idade', data) if data else ('idade',), None, 'Faixa de idade')
+        if data and not consulta.categorias and not consulta.idade:
+            sugerir(E, ('data_exame_dt',), None, 'Período do exame')
+
+        if consulta.conclusao:
+            sugestoes.append({
+                'nome': None, 'tabela': LaudoEcocardiograma.__tablename__, 'colunas': ['conclusao'],
+                'parcial': None, 'existe': False, 'automatico': False,
+                'motivo': "Texto com '%termo%' não usa índice B-tree; requer índice de texto "
+                          "(FTS5 no SQLite, pg_trgm no PostgreSQL)"
+            })
+        return sugestoes
+
+    @staticmethod
+    def apply(consulta: CohortQuery) -> List[Dict[str, Any]]:
+        """Cria os índices sugeridos que ainda não existem"""
+        criados = []
+        db.session.rollback()
+        with db.engine.begin() as conexao:
+            for sugestao in IndexAdvisor.recommend(consulta, conexao):
+                if sugestao['existe'] or not sugestao['nome']:
+                    continue
+                tabela = db.metadata.tables[sugestao['tabela']]
+                condicao = tabela.c[sugestao['colunas'][0]].isnot(None) if sugestao['parcial'] else None
+                indice = Index(sugestao['nome'], *(tabela.c[c] for c in sugestao['colunas']),
+                               sqlite_where=condicao, postgresql_where=condicao)
+                # Índice avulso: não passa a fazer parte do modelo (create_all/bootstrap)
+                tabela.indexes.discard(indice)
+                indice.create(conexao, checkfirst=True)
+                criados.append(sugestao)
+                logger.info(f"Índice de coorte criado: {sugestao['nome']} em {sugestao['tabela']}")
+        return criados
@@ -0,0 +1,434 @@
+"""
+Instantâneo Colunar - Parâmetros e demografia dos exames para coortes
+
+Mantém fora do banco transacional uma cópia colunar (um arquivo .npy por
+coluna) dos parâmetros ecocardiográficos e dos dados demográficos de cada
+exame. Parâmetros são gravados em float32 (NaN quando ausente), sexo e tipo
+de atendimento como códigos int16 de um dicionário, e a data do exame como
+datetime64[D]. Os arquivos são abertos com mmap: as consultas de coorte
+("FE média por faixa etária e sexo", "distribuição da massa do VE por ano")
+são operações vetorizadas do NumPy e não tocam o banco.
+
+`refresh()` lê apenas os exames alterados a partir da última marca (updated_at
+do exame ou dos parâmetros), remove os excluídos e publica uma nova versão
+em um diretório próprio; meta.json aponta para a versão corrente e é trocado
+atomicamente, então leitores de outros workers passam à nova versão na
+consulta seguinte. Comando: `flask --app main refresh-analytics [--full]`.
+"""
+
+import fcntl
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import or_, select
+
+from app import app, db
+from models import PARAMETER_COLUMNS, Exame, ParametrosEcocardiograma
+from modules.core.dates import parse_date
+from modules.core.exceptions import ValidationError
+from modules.exams.rollup_service import AGE_BANDS, NOT_INFORMED
+
+logger = logging.getLogger('analytics_store')
+
+CATEGORY_COLUMNS = ('sexo', 'tipo_atendimento')
+# Dimensões derivadas gravadas como códigos a cada versão (agrupar sem converter datas na consulta)
+DERIVED_COLUMNS = ('faixa_etaria', 'ano')
+GROUP_DIMENSIONS = CATEGORY_COLUMNS + DERIVED_COLUMNS
+STATISTICS = ('count', 'mean', 'std', 'min', 'max', 'p25', 'median', 'p75')
+DEFAULT_STATISTICS = ('count', 'mean', 'std')
+
+FORMAT_VERSION = 2
+FETCH_BATCH = 2000
+
+_AGE_EDGES = np.array([minimo for minimo, _, _ in AGE_BANDS] + [AGE_BANDS[-1][1] + 1], dtype=np.float32)
+_AGE_LABELS = [rotulo for _, _, rotulo in AGE_BANDS]
+
+
+def _default_directory() -> str:
+    return os.environ.get('ANALYTICS_DIR') or os.path.join(app.instance_path, 'analytics')
+
+
+def _empty_columns() -> Dict[str, np.ndarray]:
+    colunas = {
+        'exame_id': np.empty(0, dtype=np.int64),
+        'data_exame': np.empty(0, dtype='datetime64[D]'),
+        'idade': np.empty(0, dtype=np.float32),
+    }
+    colunas.update({nome: np.empty(0, dtype=np.int16) for nome in CATEGORY_COLUMNS})
+    colunas.update({nome: np.empty(0, dtype=np.float32) for nome in PARAMETER_COLUMNS})
+    return colunas
+
+
+def _derive(colunas: Dict[str, np.ndarray], categorias: Dict[str, List[str]]) -> None:
+    """Calcula as dimensões derivadas (código 0 = não informado)"""
+    faixas = np.searchsorted(_AGE_EDGES, colunas['idade'], side='right')
+    faixas[faixas >= len(_AGE_EDGES)] = 0
+    colunas['faixa_etaria'] = faixas.astype(np.int16)
+    categorias['faixa_etaria'] = [''] + _AGE_LABELS
+
+    datas = colunas['data_exame']
+    validas = ~np.isnat(datas)
+    anos = datas.astype('datetime64[Y]').astype(np.int64) + 1970
+    primeiro, ultimo = (int(anos[validas].min()), int(anos[validas].max())) if validas.any() else (0, -1)
+    colunas['ano'] = np.where(validas, anos - primeiro + 1, 0).astype(np.int16)
+    categorias['ano'] = [''] + [str(ano) for ano in range(primeiro, ultimo + 1)]
+
+
+class ColumnarStore:
+    """Instantâneo colunar com atualização incremental e consultas vetorizadas"""
+
+    def __init__(self, directory: Optional[str] = None):
+        self._directory = directory
+        self._columns: Dict[str, np.ndarray] = {}
+        self._meta: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+
+    @property
+    def directory(self) -> str:
+        if self._directory is None:
+            self._directory = _default_directory()
+        return self._directory
+
+    @property
+    def _meta_path(self) -> str:
+        return os.path.join(self.directory, 'meta.json')
+
+    # ===== LEITURA =====
+
+    def _read_meta(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._meta_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _ensure_loaded(self) -> None:
+        """Abre (mmap) a versão corrente se meta.json mudou desde a última leitura"""
+        meta = self._read_meta()
+        if meta is None:
+            raise ValidationError('Instantâneo analítico ainda não gerado; execute a atualização')
+        if self._meta and self._meta['version'] == meta['version']:
+            return
+
+        with self._lock:
+            pasta = os.path.join(self.directory, meta['version'])
+            self._columns = {
+                nome: np.load(os.path.join(pasta, f'{nome}.npy'), mmap_mode='r')
+                for nome in meta['columns']
+            }
+            self._meta = meta
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        self._ensure_loaded()
+        return self._columns
+
+    def get_status(self) -> Dict[str, Any]:
+        meta = self._read_meta()
+        if meta is None:
+            return {'status': 'vazio', 'diretorio': self.directory}
+        return {
+            'status': 'pronto',
+            'diretorio': self.directory,
+            'versao': meta['version'],
+            'linhas': meta['rows'],
+            'marca': meta['watermark'],
+            'gerado_em': meta['built_at'],
+            'colunas_parametros': len(PARAMETER_COLUMNS)
+        }
+
+    # ===== ATUALIZAÇÃO =====
+
+    def refresh(self, full: bool = False) -> Dict[str, Any]:
+        """Incorpora exames alterados desde a última marca e publica nova versão"""
+        os.makedirs(self.directory, exist_ok=True)
+        inicio = time.perf_counter()
+
+        with open(os.path.join(self.directory, '.lock'), 'w') as trava:
+            fcntl.flock(trava, fcntl.LOCK_EX)
+            meta = None if full else self._read_meta()
+            if meta and meta.get('format') != FORMAT_VERSION:
+                meta = None
+
+            if meta:
+                pasta = os.path.join(self.directory, meta['version'])
+                colunas = {nome: np.load(os.path.join(pasta, f'{nome}.npy'))
+                           for nome in meta['columns'] if nome not in DERIVED_COLUMNS}
+                categorias = {nome: list(valores) for nome, valores in meta['categories'].items()}
+                marca = datetime.fromisoformat(meta['watermark']) if meta['watermark'] else None
+            else:
+                colunas = _empty_columns()
+                categorias = {nome: [''] for nome in CATEGORY_COLUMNS}
+                marca = None
+
+            alterados, nova_marca = self._fetch_changed(marca, categorias)
+            colunas, removidos = self._merge(colunas, alterados)
+
+            meta = self._publish(colunas, categorias, nova_marca or marca, meta)
+
+        resultado = {
+            'versao': meta['version'],
+            'linhas': meta['rows'],
+            'alterados': len(alterados['exame_id']),
+            'removidos': removidos,
+            'completo': full,
+            'duracao_ms': round((time.perf_counter() - inicio) * 1000, 1)
+        }
+        logger.info(f"Instantâneo analítico atualizado: {resultado}")
+        return resultado
+
+    def _fetch_changed(self, marca: Optional[datetime], categorias: Dict[str, List[str]]):
+        """Lê do banco os exames (com parâmetros) alterados após a marca"""
+        P = ParametrosEcocardiograma
+        consulta = (
+            select(Exame.id, Exame.data_exame_dt, Exame.idade, Exame.sexo, Exame.tipo_atendimento,
+                   Exame.updated_at, P.updated_at, *(getattr(P, nome) for nome in PARAMETER_COLUMNS))
+            .outerjoin(P, P.exame_id == Exame.id)
+            .order_by(Exame.id, P.id)
+        )
+        if marca is not None:
+            consulta = consulta.where(or_(
+                Exame.updated_at >= marca,
+                Exame.id.in_(select(P.exame_id).where(P.updated_at >= marca))
+            ))
+
+        indices = {nome: {valor: codigo for codigo, valor in enumerate(valores)}
+                   for nome, valores in categorias.items()}
+
+        def codificar(nome, valor):
+            valor = valor or ''
+            codigo = indices[nome].get(valor)
+            if codigo is None:
+                codigo = indices[nome][valor] = len(categorias[nome])
+                categorias[nome].append(valor)
+            return codigo
+
+        # Um exame com mais de um registro de parâmetros fica com o mais recente
+        linhas = {}
+        nova_marca = marca
+        for row in db.session.execute(consulta.execution_options(yield_per=FETCH_BATCH)):
+            exame_id, dia, idade, sexo, tipo, exame_em, parametros_em = row[:7]
+            linhas[exame_id] = (dia, idade, codificar('sexo', sexo), codificar('tipo_atendimento', tipo), row[7:])
+            for instante in (exame_em, parametros_em):
+                if instante is not None and (nova_marca is None or instante > nova_marca):
+                    nova_marca = instante
+        db.session.rollback()
+
+        ids = np.fromiter(linhas.keys(), dtype=np.int64, count=len(linhas))
+        valores = list(linhas.values())
+        alterados = {
+            'exame_id': ids,
+            'data_exame': np.array([v[0] if v[0] else 'NaT' for v in valores], dtype='datetime64[D]'),
+            'idade': np.array([np.nan if v[1] is None else v[1] for v in valores], dtype=np.float32),
+            'sexo': np.array([v[2] for v in valores], dtype=np.int16),
+            'tipo_atendimento': np.array([v[3] for v in valores], dtype=np.int16),
+        }
+        parametros = np.array([[np.nan if x is None else x for x in v[4]] for v in valores],
+                              dtype=np.float32).reshape(len(valores), len(PARAMETER_COLUMNS))
+        for posicao, nome in enumerate(PARAMETER_COLUMNS):
+            alterados[nome] = parametros[:, posicao]
+        return alterados, nova_marca
+
+    def _merge(self, colunas: Dict[str, np.ndarray], alterados: Dict[str, np.ndarray]):
+        """Substitui/insere os alterados e remove exames que não existem mais"""
+        vivos = np.fromiter(db.session.scalars(select(Exame.id)), dtype=np.int64)
+        db.session.rollback()
+
+        atuais = colunas['exame_id']
+        existentes = np.isin(atuais, vivos)
+        manter = existentes & ~np.isin(atuais, alterados['exame_id'])
+        removidos = int(len(atuais) - existentes.sum())
+
+        ordem = None
+        mesclado = {}
+        for nome, valores in colunas.items():
+            mesclado[nome] = np.concatenate([valores[manter], alterados[nome].astype(valores.dtype)])
+            if nome == 'exame_id':
+                ordem = np.argsort(mesclado[nome], kind='stable')
+        return {nome: valores[ordem] for nome, valores in mesclado.items()}, removidos
+
+    def _publish(self, colunas, categorias, marca, anterior) -> Dict[str, Any]:
+        """Grava a nova versão e troca meta.json atomicamente"""
+        versao = f"v{datetime.now().strftime('%Y%m%d%H%M%S%f')}"
+        pasta = os.path.join(self.directory, versao)
+        os.makedirs(pasta)
+        _derive(colunas, categorias)
+        for nome, valores in colunas.items():
+            np.save(os.path.join(pasta, f'{nome}.npy'), np.ascontiguousarray(valores))
+
+        meta = {
+            'format': FORMAT_VERSION,
+            'version': versao,
+            'rows': int(len(colunas['exame_id'])),
+            'columns': list(colunas),
+            'categories': categorias,
+            'watermark': marca.isoformat() if marca else None,
+            'built_at': datetime.now().isoformat()
+        }
+        temporario = self._meta_path + '.tmp'
+        with open(temporario, 'w') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(temporario, self._meta_path)
+
+        # Versões antigas: a anterior fica para leitores que ainda a mapeiam
+        preservar = {versao, anterior['version'] if anterior else None}
+        for nome in os.listdir(self.directory):
+            if nome.startswith('v') and nome not in preservar:
+                shutil.rmtree(os.path.join(self.directory, nome), ignore_errors=True)
+        return meta
+
+    # ===== CONSULTA =====
+
+    def _category_codes(self, nome: str, valores) -> np.ndarray:
+        if isinstance(valores, str):
+            valores = [valores]
+        indices = {valor: codigo for codigo, valor in enumerate(self._meta['categories'][nome])}
+        return np.array([indices[v] for v in valores if v in indices], dtype=np.int16)
+
+    @staticmethod
+    def _parse_day(valor) -> Optional[np.datetime64]:
+        if valor in (None, ''):
+            return None
+        dia = parse_date(valor)
+        if dia is None:
+            raise ValueError(valor)
+        return np.datetime64(dia, 'D')
+
+    def mask(self, filters: Optional[Dict[str, Any]] = None) -> np.ndarray:
+        """Máscara booleana dos exames que atendem aos filtros
+
+        Numéricos e 'data_exame' aceitam [mínimo, máximo] inclusivos (None
+        deixa o lado aberto); 'sexo', 'tipo_atendimento' e 'faixa_etaria'
+        aceitam um valor ou uma lista de valores.
+        """
+        colunas = self.columns()
+        mascara = np.ones(len(colunas['exame_id']), dtype=bool)
+
+        for nome, criterio in (filters or {}).items():
+            if nome in CATEGORY_COLUMNS or nome == 'faixa_etaria':
+                mascara &= np.isin(colunas[nome], self._category_codes(nome, criterio))
+                continue
+            if nome not in colunas or nome in ('exame_id', 'ano'):
+                raise ValidationError(f'Filtro desconhecido: {nome}')
+            if not isinstance(criterio, (list, tuple)) or len(criterio) != 2:
+                raise ValidationError(f'Filtro {nome} deve ser [mínimo, máximo]')
+
+            try:
+                if nome == 'data_exame':
+                    minimo, maximo = (self._parse_day(d) for d in criterio)
+                else:
+                    minimo, maximo = (None if v in (None, '') else float(v) for v in criterio)
+            except (TypeError, ValueError):
+                raise ValidationError(f'Filtro {nome} com valor inválido')
+            if minimo is not None:
+                mascara &= colunas[nome] >= minimo
+            if maximo is not None:
+                mascara &= colunas[nome] <= maximo
+        return mascara
+
+    def _group_codes(self, dimensao: str, mascara: np.ndarray):
+        """Códigos inteiros e rótulos de uma dimensão de agrupamento"""
+        if dimensao not in GROUP_DIMENSIONS:
+            raise ValidationError(f'Agrupamento desconhecido: {dimensao}')
+        rotulos = [valor or NOT_INFORMED for valor in self._meta['categories'][dimensao]]
+        return self.columns()[dimensao][mascara].astype(np.int64), rotulos
+
+    def aggregate(self, column: str, group_by: Sequence[str] = (), filters: Optional[Dict[str, Any]] = None,
+                  statistics: Iterable[str] = DEFAULT_STATISTICS) -> Dict[str, Any]:
+        """Estatísticas de uma coluna por grupo (valores ausentes ignorados)"""
+        if column not in PARAMETER_COLUMNS and column != 'idade':
+            raise ValidationError(f'Coluna desconhecida: {column}')
+        estatisticas = [s for s in statistics if s in STATISTICS]
+        if not estatisticas:
+            raise ValidationError(f'Estatísticas válidas: {", ".join(STATISTICS)}')
+
+        if isinstance(group_by, str):
+            group_by = [group_by]
+        mascara = self.mask(filters)
+        valores = self.columns()[column][mascara]
+        presentes = ~np.isnan(valores)
+
+        # Chave composta dos grupos: um inteiro por combinação de dimensões
+        chave = np.zeros(len(valores), dtype=np.int64)
+        rotulos, tamanhos = [], []
+        for dimensao in group_by:
+            codigos, nomes = self._group_codes(dimensao, mascara)
+            chave = chave * len(nomes) + codigos
+            rotulos.append(nomes)
+            tamanhos.append(len(nomes))
+
+        chave, valores = chave[presentes], valores[presentes].astype(np.float64)
+        total_grupos = int(np.prod(tamanhos)) if tamanhos else 1
+        contagem = np.bincount(chave, minlength=total_grupos)
+        soma = np.bincount(chave, weights=valores, minlength=total_grupos)
+        soma_quadrados = np.bincount(chave, weights=valores * valores, minlength=total_grupos)
+
+        quantis = {'min': 0, 'p25': 25, 'median': 50, 'p75': 75, 'max': 100}
+        ordenados = limites = None
+        if any(s in quantis for s in estatisticas):
+            # Ordena só pela chave (radix para chaves de 16 bits); percentis por fatia
+            ordem = np.argsort(chave.astype(np.int16) if total_grupos < 2 ** 15 else chave, kind='stable')
+            ordenados = valores[ordem]
+            limites = np.concatenate([[0], np.cumsum(contagem)])
+
+        grupos = []
+        for indice in np.flatnonzero(contagem):
+            n = int(contagem[indice])
+            media = soma[indice] / n
+            codigos = np.unravel_index(int(indice), tamanhos) if tamanhos else ()
+            linha = {'grupo': {dimensao: nomes[int(codigo)]
+                               for dimensao, nomes, codigo in zip(group_by, rotulos, codigos)},
+                     'count': n}
+            if 'mean' in estatisticas:
+                linha['mean'] = round(float(media), 4)
+            if 'std' in estatisticas:
+                variancia = max(soma_quadrados[indice] / n - media * media, 0.0)
+                linha['std'] = round(float(np.sqrt(variancia * n / (n - 1))), 4) if n > 1 else 0.0
+            if ordenados is not None:
+                fatia = ordenados[limites[indice]:limites[indice + 1]]
+                pedidos = [nome for nome in quantis if nome in estatisticas]
+                for nome, valor in zip(pedidos, np.percentile(fatia, [quantis[nome] for nome in pedidos])):
+                    linha[nome] = round(float(valor), 4)
+            grupos.append(linha)
+
+        return {
+            'coluna': column,
+            'agrupar': list(group_by),
+            'exames_filtrados': int(mascara.sum()),
+            'com_valor': int(len(valores)),
+            'grupos': grupos
+        }
+
+    def histogram(self, column: str, bins: int = 20, filters: Optional[Dict[str, Any]] = None,
+                  value_range: Optional[Sequence[float]] = None) -> Dict[str, Any]:
+        """Distribuição de uma coluna em faixas de mesma largura"""
+        if column not in PARAMETER_COLUMNS and column != 'idade':
+            raise ValidationError(f'Coluna desconhecida: {column}')
+        valores = self.columns()[column][self.mask(filters)]
+        valores = valores[~np.isnan(valores)]
+        if not len(valores):
+            return {'coluna': column, 'com_valor': 0, 'limites': [], 'contagens': []}
+
+        contagens, limites = np.histogram(valores, bins=max(1, min(int(bins), 200)),
+                                          range=tuple(value_range) if value_range else None)
+        return {
+            'coluna': column,
+            'com_valor': int(len(valores)),
+            'limites': [round(float(x), 4) for x in limites],
+            'contagens': contagens.tolist()
+        }
+
+
+# Instância global do instantâneo
+columnar_store = ColumnarStore()
+
+
+def get_columnar_store():
+    """Retorna a instância do instantâneo colunar"""
+    return columnar_store
@@ -0,0 +1,336 @@
+"""
+Índice de Similaridade - Exames anteriores semelhantes por parâmetros
+
+Cada exame vira um vetor com as medidas principais do ecocardiograma (DDVE,
+DSVE, septo, parede posterior, AE, FE, massa e gradientes), normalizadas
+pelo escore z do cadastro; medidas ausentes ficam na média (zero). A busca
+dos k vizinhos mais próximos é feita em memória, por worker:
+
+- até `TREE_THRESHOLD` vetores (ou sem SciPy), força bruta vetorizada:
+  |x - q|² = |x|² - 2·x·q + |q|², um produto matriz-vetor sobre a matriz
+  float32 e argpartition, sem laço em Python;
+- acima disso, com SciPy disponível, uma KD-tree (cKDTree) da base.
+
+Atualização incremental: antes de cada busca são lidos só os parâmetros com
+updated_at a partir da última marca (índice em updated_at), o que cobre
+gravações pelo ORM de qualquer worker e a importação em lote. O vetor
+antigo é marcado como removido na base e o novo vai para um buffer pequeno,
+percorrido por força bruta; a base é reconstruída quando o buffer passa de
+`MAX_PENDING`. Exames excluídos somem no JOIN da consulta de detalhes.
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import select
+
+from app import db
+from models import Exame, LaudoEcocardiograma, ParametrosEcocardiograma
+from modules.core.exceptions import ValidationError
+from modules.exams.exam_repository import first_laudo_id
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:
+    cKDTree = None
+
+logger = logging.getLogger('similarity_index')
+
+# Medidas que compõem o vetor de cada exame
+FEATURE_COLUMNS = (
+    'diametro_diastolico_final_ve',
+    'diametro_sistolico_final',
+    'espessura_diastolica_septo',
+    'espessura_diastolica_ppve',
+    'atrio_esquerdo',
+    'fracao_ejecao',
+    'massa_ve',
+    'gradiente_ve_ao',
+    'gradiente_ae_ve',
+    'gradiente_tricuspide',
+)
+# Exames com menos medidas que isso não entram no índice (nem na consulta)
+MIN_FEATURES = 3
+DEFAULT_K = 5
+MAX_K = 50
+TREE_THRESHOLD = 50000
+MAX_PENDING = 5000
+# Candidatos extras para compensar exames excluídos ainda no índice
+CANDIDATE_SLACK = 10
+FETCH_BATCH = 5000
+
+
+class SimilarityIndex:
+    """Vizinhos mais próximos sobre os vetores normalizados dos exames"""
+
+    def __init__(self, tree_threshold: int = TREE_THRESHOLD, max_pending: int = MAX_PENDING):
+        self.tree_threshold = tree_threshold
+        self.max_pending = max_pending
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self) -> None:
+        dimensoes = len(FEATURE_COLUMNS)
+        self._built = False
+        self._mean = np.zeros(dimensoes, dtype=np.float32)
+        self._std = np.ones(dimensoes, dtype=np.float32)
+        # Base (ordenada por exame_id) e marcas de vetores substituídos
+        self._ids = np.empty(0, dtype=np.int64)
+        self._vectors = np.empty((0, dimensoes), dtype=np.float32)
+        self._norms = np.empty(0, dtype=np.float32)
+        self._alive = np.empty(0, dtype=bool)
+        self._dead = 0
+        self._tree = None
+        # exame_id -> vetor normalizado (None = saiu do índice)
+        self._pending: Dict[int, Optional[np.ndarray]] = {}
+        self._pending_arrays = None
+        self._watermark: Optional[datetime] = None
+
+    # ===== CONSTRUÇÃO E SINCRONIZAÇÃO =====
+
+    def _fetch(self, marca: Optional[datetime]):
+        """Vetores brutos (NaN = ausente) dos parâmetros alterados após a marca"""
+        P = ParametrosEcocardiograma
+        consulta = (
+            select(P.exame_id, P.updated_at, *(getattr(P, coluna) for coluna in FEATURE_COLUMNS))
+            .order_by(P.id)
+        )
+        if marca is not None:
+            consulta = consulta.where(P.updated_at >= marca)
+
+        ids, valores, nova_marca = [], [], marca
+        for row in db.session.execute(consulta.execution_options(yield_per=FETCH_BATCH)):
+            ids.append(row[0])
+            valores.append(row[2:])
+            if row[1] is not None and (nova_marca is None or row[1] > nova_marca):
+                nova_marca = row[1]
+
+        ids = np.array(ids, dtype=np.int64)
+        brutos = np.array(valores, dtype=np.float64).reshape(len(ids), len(FEATURE_COLUMNS))
+        # Exame com mais de um registro de parâmetros: vale o mais recente
+        _, ultimos = np.unique(ids[::-1], return_index=True)
+        ultimos = len(ids) - 1 - ultimos
+        return ids[ultimos], brutos[ultimos], nova_marca
+
+    def _normalize(self, brutos: np.ndarray) -> np.ndarray:
+        return np.nan_to_num((brutos - self._mean) / self._std, nan=0.0).astype(np.float32)
+
+    def rebuild(self) -> Dict[str, Any]:
+        """Reconstrói a base a partir do banco (estatísticas, vetores e árvore)"""
+        inicio = time.perf_counter()
+        with self._lock:
+            ids, brutos, marca = self._fetch(None)
+            validos = (~np.isnan(brutos)).sum(axis=1) >= MIN_FEATURES
+            ids, brutos = ids[validos], brutos[validos]
+
+            self._reset()
+            if len(ids):
+                # Média e desvio por medida ignorando ausentes (medida sem valores: 0 e 1)
+                contagem = np.maximum((~np.isnan(brutos)).sum(axis=0), 1)
+                media = np.nansum(brutos, axis=0) / contagem
+                desvio = np.sqrt(np.nansum((brutos - media) ** 2, axis=0) / contagem)
+                self._mean = media.astype(np.float32)
+                self._std = np.where(desvio > 0, desvio, 1.0).astype(np.float32)
+            self._ids = ids
+            self._vectors = np.ascontiguousarray(self._normalize(brutos))
+            self._norms = np.einsum('ij,ij->i', self._vectors, self._vectors)
+            self._alive = np.ones(len(ids), dtype=bool)
+            if cKDTree is not None and len(ids) >= self.tree_threshold:
+                self._tree = cKDTree(self._vectors)
+            self._watermark = marca
+            self._built = True
+
+        resultado = {'vetores': int(len(ids)), 'arvore': self._tree is not None,
+                     'duracao_ms': round((time.perf_counter() - inicio) * 1000, 1)}
+        logger.info(f"Índice de similaridade reconstruído: {resultado}")
+        return resultado
+
+    def sync(self) -> int:
+        """Incorpora os parâmetros gravados desde a última marca; retorna quantos"""
+        with self._lock:
+            if not self._built:
+                return self.rebuild()['vetores']
+
+            ids, brutos, marca = self._fetch(self._watermark)
+            self._watermark = marca
+            if not len(ids):
+                return 0
+
+            validos = (~np.isnan(brutos)).sum(axis=1) >= MIN_FEATURES
+            vetores = self._normalize(brutos)
+            posicoes = np.searchsorted(self._ids, ids)
+            na_base = posicoes < len(self._ids)
+            na_base[na_base] = self._ids[posicoes[na_base]] == ids[na_base]
+            mortos = posicoes[na_base][self._alive[posicoes[na_base]]]
+            self._alive[mortos] = False
+            self._dead += len(mortos)
+
+            for exame_id, vetor, valido in zip(ids.tolist(), vetores, validos):
+                self._pending[exame_id] = vetor if valido else None
+            self._pending_arrays = None
+
+            if len(self._pending) > self.max_pending:
+                self.rebuild()
+            return int(len(ids))
+
+    def _pending_matrix(self):
+        if self._pending_arrays is None:
+            itens = [(exame_id, vetor) for exame_id, vetor in self._pending.items() if vetor is not None]
+            ids = np.array([exame_id for exame_id, _ in itens], dtype=np.int64)
+            vetores = np.array([vetor for _, vetor in itens], dtype=np.float32).reshape(
+                len(itens), len(FEATURE_COLUMNS))
+            self._pending_arrays = (ids, vetores)
+        return self._pending_arrays
+
+    def vector_for(self, exame_id: int) -> Optional[np.ndarray]:
+        """Vetor normalizado de um exame indexado (None se não indexado)"""
+        with self._lock:
+            if exame_id in self._pending:
+                return self._pending[exame_id]
+            posicao = int(np.searchsorted(self._ids, exame_id))
+            if posicao < len(self._ids) and self._ids[posicao] == exame_id and self._alive[posicao]:
+                return self._vectors[posicao]
+            return None
+
+    def vector_from_values(self, parametros: Dict[str, Any]) -> np.ndarray:
+        """Vetor normalizado (NaN nas ausentes) de medidas informadas na consulta"""
+        desconhecidos = set(parametros) - set(FEATURE_COLUMNS)
+        if desconhecidos:
+            raise ValidationError(f"Parâmetros não indexados: {', '.join(sorted(desconhecidos))}")
+        brutos = np.full(len(FEATURE_COLUMNS), np.nan)
+        for posicao, coluna in enumerate(FEATURE_COLUMNS):
+            valor = parametros.get(coluna)
+            if valor in (None, ''):
+                continue
+            try:
+                brutos[posicao] = float(valor)
+            except (TypeError, ValueError):
+                raise ValidationError(f'Valor inválido para {coluna}: {valor}')
+        if (~np.isnan(brutos)).sum() < MIN_FEATURES:
+            raise ValidationError(f'Informe ao menos {MIN_FEATURES} parâmetros')
+        with self._lock:
+            if not self._built:
+                self.rebuild()
+            return ((brutos - self._mean) / self._std).astype(np.float32)
+
+    # ===== BUSCA =====
+
+    @staticmethod
+    def _brute_force(ids, vetores, normas, consulta, presentes, quantidade, vivos=None):
+        """k menores distâncias por |x|² - 2·x·q (+|q|² somado no fim)"""
+        if not len(ids):
+            return ids, np.empty(0, dtype=np.float32)
+        if presentes.all():
+            distancias = normas - 2.0 * (vetores @ consulta)
+        else:
+            # Só as medidas informadas na consulta entram na distância
+            parcial = vetores[:, presentes]
+            distancias = np.einsum('ij,ij->i', parcial, parcial) - 2.0 * (parcial @ consulta[presentes])
+        if vivos is not None:
+            distancias = np.where(vivos, distancias, np.inf)
+        quantidade = min(quantidade, len(ids))
+        melhores = np.argpartition(distancias, quantidade - 1)[:quantidade]
+        melhores = melhores[np.isfinite(distancias[melhores])]
+        return ids[melhores], distancias[melhores] + float(consulta[presentes] @ consulta[presentes])
+
+    def nearest(self, consulta: np.ndarray, quantidade: int) -> List[tuple]:
+        """(exame_id, distância) dos vizinhos mais próximos, do mais próximo ao mais distante"""
+        presentes = ~np.isnan(consulta)
+        consulta = np.nan_to_num(consulta).astype(np.float32)
+        with self._lock:
+            if self._tree is not None and presentes.all():
+                pedidos = min(quantidade + self._dead, len(self._ids))
+                distancias, posicoes = self._tree.query(consulta, k=max(pedidos, 1))
+                posicoes, distancias = np.atleast_1d(posicoes), np.atleast_1d(distancias) ** 2
+                validos = (posicoes < len(self._ids))
+                validos[validos] = self._alive[posicoes[validos]]
+                base_ids, base_dist = self._ids[posicoes[validos]], distancias[validos]
+            else:
+                vivos = self._alive if self._dead else None
+                base_ids, base_dist = self._brute_force(self._ids, self._vectors, self._norms, consulta,
+                                                        presentes, quantidade, vivos)
+            pendentes, vetores = self._pending_matrix()
+            buffer_ids, buffer_dist = self._brute_force(
+                pendentes, vetores, np.einsum('ij,ij->i', vetores, vetores), consulta, presentes, quantidade)
+
+        ids = np.concatenate([base_ids, buffer_ids])
+        distancias = np.sqrt(np.maximum(np.concatenate([base_dist, buffer_dist]), 0.0))
+        ordem = np.argsort(distancias, kind='stable')[:quantidade]
+        return list(zip(ids[ordem].tolist(), distancias[ordem].tolist()))
+
+    def search(self, consulta: np.ndarray, k: int = DEFAULT_K,
+               exclude: Iterable[int] = ()) -> List[Dict[str, Any]]:
+        """Top-k exames semelhantes com dados do exame e conclusão do laudo"""
+        k = max(1, min(int(k), MAX_K))
+        excluir = set(exclude)
+        quantidade = k + len(excluir) + CANDIDATE_SLACK
+        while True:
+            vizinhos = [(exame_id, distancia) for exame_id, distancia in self.nearest(consulta, quantidade)
+                        if exame_id not in excluir]
+            detalhes = self._details([exame_id for exame_id, _ in vizinhos])
+            encontrados = [{**detalhes[exame_id], 'distancia': round(distancia, 4)}
+                           for exame_id, distancia in vizinhos if exame_id in detalhes]
+            # Faltaram exames (excluídos do banco ainda no índice): amplia os candidatos
+            if len(encontrados) >= k or len(vizinhos) + len(excluir) < quantidade:
+                return encontrados[:k]
+            quantidade *= 4
+
+    def similar_to_exam(self, exame_id: int, k: int = DEFAULT_K) -> Optional[List[Dict[str, Any]]]:
+        """Exames semelhantes a um exame gravado; None se ele não estiver indexado"""
+        self.sync()
+        vetor = self.vector_for(exame_id)
+        if vetor is None:
+            return None
+        return self.search(vetor, k, exclude=(exame_id,))
+
+    def similar_to_values(self, parametros: Dict[str, Any], k: int = DEFAULT_K,
+                          exclude: Sequence[int] = ()) -> List[Dict[str, Any]]:
+        """Exames semelhantes a medidas ainda não gravadas"""
+        self.sync()
+        return self.search(self.vector_from_values(parametros), k, exclude=exclude)
+
+    @staticmethod
+    def _details(exame_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """Dados dos exames candidatos e conclusão do laudo principal (uma consulta)"""
+        if not exame_ids:
+            return {}
+        P = ParametrosEcocardiograma
+        linhas = db.session.execute(
+            select(Exame.id.label('exame_id'), Exame.nome_paciente, Exame.data_exame, Exame.idade, Exame.sexo,
+                   *(getattr(P, coluna) for coluna in FEATURE_COLUMNS), LaudoEcocardiograma.conclusao)
+            .outerjoin(P, P.exame_id == Exame.id)
+            .outerjoin(LaudoEcocardiograma, LaudoEcocardiograma.id == first_laudo_id())
+            .where(Exame.id.in_(exame_ids))
+        ).all()
+
+        detalhes = {}
+        for linha in linhas:
+            valores = linha._asdict()
+            valores['parametros'] = {coluna: valores.pop(coluna) for coluna in FEATURE_COLUMNS}
+            detalhes[linha.exame_id] = valores
+        return detalhes
+
+    def get_status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'construido': self._built,
+                'vetores': int(self._alive.sum()) + len(self._pending_matrix()[0]),
+                'pendentes': len(self._pending),
+                'substituidos': self._dead,
+                'arvore': self._tree is not None,
+                'scipy': cKDTree is not None,
+                'marca': self._watermark.isoformat() if self._watermark else None
+            }
+
+
+# Instância global do índice de similaridade (uma por worker)
+similarity_index = SimilarityIndex()
+
+
+def get_similarity_index() -> SimilarityIndex:
+    """Retorna a instância global do índice de similaridade"""
+    return similarity_index
@@ -98,11 +98,12 @@ class DatabaseManager:
         """Obtém estatísticas gerais do banco"""
         try:
             from models import Exame, ParametrosEcocardiograma, Medico
+            from modules.core.dates import today_brasilia
             
             stats = {
                 'total_exames': db.session.query(Exame).count(),
                 'exames_hoje': db.session.query(Exame).filter(
-                    Exame.data_exame == db.func.current_date()
+                    Exame.data_exame_dt == today_brasilia()
                 ).count(),
                 'total_medicos': db.session.query(Medico).filter(Medico.ativo == True).count(),
                 'parametros_preenchidos': db.session.query(ParametrosEcocardiograma).count()
@@ -0,0 +1,66 @@
+"""
+Datas do sistema - Conversão e intervalos indexáveis
+
+As datas de exame e nascimento chegam como texto ('dd/mm/aaaa' nos
+formulários e importações antigas, 'aaaa-mm-dd' nos campos de data do
+navegador). As colunas tipadas espelham esses textos para permitir índice
+e varredura por intervalo.
+
+Filtros por dia ou mês usam intervalos semiabertos [início, fim) sobre a
+própria coluna em vez de func.date()/extract(), que impedem o uso do índice.
+"""
+
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any, Optional, Tuple
+
+# Fuso horário de Brasília (UTC-3), o mesmo de created_at
+BRASILIA_TZ = timezone(timedelta(hours=-3))
+
+DATE_FORMATS = ('%d/%m/%Y', '%Y-%m-%d')
+
+
+def parse_date(value: Any) -> Optional[date]:
+    """Converte texto 'dd/mm/aaaa' ou 'aaaa-mm-dd' em date (None se inválido)"""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+
+    texto = str(value).strip()[:10]
+    for formato in DATE_FORMATS:
+        try:
+            return datetime.strptime(texto, formato).date()
+        except ValueError:
+            continue
+    return None
+
+
+def today_brasilia() -> date:
+    """Data atual no fuso de Brasília"""
+    return datetime.now(BRASILIA_TZ).date()
+
+
+def day_bounds(day: date) -> Tuple[datetime, datetime]:
+    """Intervalo [00:00 do dia, 00:00 do dia seguinte)"""
+    inicio = datetime.combine(day, time.min)
+    return inicio, inicio + timedelta(days=1)
+
+
+def month_bounds(day: date) -> Tuple[datetime, datetime]:
+    """Intervalo [dia 1 do mês, dia 1 do mês seguinte)"""
+    inicio = datetime.combine(day.replace(day=1), time.min)
+    proximo = (inicio + timedelta(days=32)).replace(day=1)
+    return inicio, proximo
+
+
+def period_bounds(start: date, end: date) -> Tuple[datetime, datetime]:
+    """Intervalo que cobre os dias de start a end, inclusive"""
+    return datetime.combine(start, time.min), datetime.combine(end + timedelta(days=1), time.min)
+
+
+def in_range(column, bounds: Tuple[datetime, datetime]):
+    """Predicado indexável column >= início AND column < fim"""
+    inicio, fim = bounds
+    return (column >= inicio) & (column < fim)
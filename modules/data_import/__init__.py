@@ -0,0 +1,25 @@
+"""
+Módulo de Importação - Carga em massa dos conjuntos de dados de exames
+
+Leitores em streaming (CSV, JSON e SQL), mapeamento/validação dos registros
+e importador em lotes com upsert idempotente e checkpoints de retomada;
+templates de laudo via tabela de sombra com mescla atômica; extração
+paralela das medidas dos laudos legados em texto livre.
+"""
+
+from .bulk_importer import BulkImporter, ImportCheckpoint
+from .laudo_extractor import LaudoExtractor, extract_measurements
+from .mapping import normalize_record, validate_batch
+from .readers import iter_records
+from .template_importer import TemplateImporter
+
+__all__ = [
+    'BulkImporter',
+    'ImportCheckpoint',
+    'LaudoExtractor',
+    'TemplateImporter',
+    'extract_measurements',
+    'iter_records',
+    'normalize_record',
+    'validate_batch'
+]
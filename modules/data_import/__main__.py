@@ -0,0 +1,53 @@
+"""
+Importação em massa pela linha de comando
+
+Uso: python -m modules.data_import arquivo.csv [arquivo.json ...]
+         [--formato csv|json|sql] [--lote 5000] [--modo upsert|skip]
+         [--sem-retomar] [--checkpoints DIRETORIO]
+"""
+
+import argparse
+import logging
+import sys
+
+from app import app
+from modules.core.exceptions import FileProcessingError
+from .bulk_importer import BulkImporter, DEFAULT_CHUNK_SIZE
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Importação em massa de exames')
+    parser.add_argument('arquivos', nargs='+', help='Arquivos CSV, JSON ou SQL')
+    parser.add_argument('--formato', choices=('csv', 'json', 'sql'), help='Formato (padrão: pela extensão)')
+    parser.add_argument('--lote', type=int, default=DEFAULT_CHUNK_SIZE, help='Registros por transação')
+    parser.add_argument('--modo', choices=BulkImporter.MODES, default='upsert',
+                        help='upsert atualiza exames existentes; skip mantém os existentes')
+    parser.add_argument('--sem-retomar', action='store_true', help='Ignorar checkpoints anteriores')
+    parser.add_argument('--checkpoints', help='Diretório dos checkpoints')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+
+    with app.app_context():
+        importer = BulkImporter(chunk_size=args.lote, mode=args.modo, checkpoint_dir=args.checkpoints)
+        falhas = 0
+
+        for arquivo in args.arquivos:
+            try:
+                stats = importer.import_file(arquivo, args.formato, resume=not args.sem_retomar)
+            except FileProcessingError as e:
+                print(f"❌ {arquivo}: {e.message}")
+                falhas += 1
+                continue
+
+            print(f"✅ {arquivo}: {stats['lidos']} lidos, {stats['importados']} novos, "
+                  f"{stats['atualizados']} atualizados, {stats['ignorados']} ignorados, "
+                  f"{stats['invalidos']} inválidos em {stats['duracao_s']}s")
+            for erro in stats['erros'][:10]:
+                print(f"   registro {erro['registro']} ({erro['campo']}): {erro['erro']}")
+
+    return 1 if falhas else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
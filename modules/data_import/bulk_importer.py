@@ -0,0 +1,402 @@
+"""
+Importador em Massa - Exames, parâmetros e laudos
+
+Lê a fonte em streaming, valida em lotes e grava cada lote em uma única
+transação (executemany; COPY para as tabelas filhas no PostgreSQL).
+O upsert é idempotente pela chave natural (paciente, data do exame): só as
+colunas presentes na fonte são atualizadas e parâmetros e laudo são
+atualizados por exame_id, preservando o que foi alterado no sistema depois
+da importação. Um checkpoint gravado após cada lote permite retomar.
+"""
+
+import csv
+import hashlib
+import io
+import json
+import logging
+import os
+import time
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from flask import current_app
+from sqlalchemy import bindparam, insert, select, update
+
+from app import db
+from models import Exame, ParametrosEcocardiograma, LaudoEcocardiograma, datetime_brasilia
+from modules.core.exceptions import FileProcessingError
+from modules.exams.reference_ranges import reference_ranges
+from modules.exams.rollup_service import ExamRollupService
+from modules.exams.trend_service import trend_cache
+from .mapping import LAUDO_FIELDS, PARAMETER_FIELDS, natural_key, validate_batch
+from .readers import iter_records
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 5000
+# Limite de parâmetros por IN (SQLite antigo aceita 999)
+LOOKUP_BATCH = 500
+MAX_ERRORS_KEPT = 100
+
+
+class ImportCheckpoint:
+    """Progresso persistido de uma importação (por arquivo de origem)"""
+
+    def __init__(self, path: str, fingerprint: Dict[str, Any]):
+        self.path = path
+        self.fingerprint = fingerprint
+
+    @classmethod
+    def for_source(cls, source: str, directory: Optional[str] = None) -> 'ImportCheckpoint':
+        """Checkpoint associado ao arquivo (invalidado se o arquivo mudar)"""
+        source = os.path.abspath(source)
+        stat = os.stat(source)
+        directory = directory or os.path.join(current_app.instance_path, 'import_checkpoints')
+
+        digest = hashlib.sha1(source.encode('utf-8')).hexdigest()[:10]
+        path = os.path.join(directory, f'{os.path.basename(source)}.{digest}.json')
+        fingerprint = {'source': source, 'size': stat.st_size, 'mtime': int(stat.st_mtime)}
+        return cls(path, fingerprint)
+
+    @classmethod
+    def for_job(cls, name: str, fingerprint: Dict[str, Any], directory: Optional[str] = None) -> 'ImportCheckpoint':
+        """Checkpoint de uma tarefa sem arquivo de origem (invalidado se a configuração mudar)"""
+        directory = directory or os.path.join(current_app.instance_path, 'import_checkpoints')
+        return cls(os.path.join(directory, f'{name}.json'), fingerprint)
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        """Estado salvo, se corresponder à versão atual do arquivo"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if state.get('fingerprint') != self.fingerprint:
+            logger.info(f"Checkpoint ignorado (origem ou configuração alterada): {self.path}")
+            return None
+        return state
+
+    def save(self, stats: Dict[str, Any]) -> None:
+        """Grava o estado de forma atômica"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temporario = f'{self.path}.tmp'
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump({'fingerprint': self.fingerprint, 'stats': stats}, f, ensure_ascii=False)
+        os.replace(temporario, self.path)
+
+    def clear(self) -> None:
+        """Remove o checkpoint (importação concluída)"""
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+class BulkImporter:
+    """Importador em lotes com upsert idempotente e retomada"""
+
+    MODES = ('upsert', 'skip')
+
+    def __init__(self, chunk_size: int = DEFAULT_CHUNK_SIZE, mode: str = 'upsert',
+                 checkpoint_dir: Optional[str] = None,
+                 progress: Optional[Callable[[Dict[str, Any]], None]] = None):
+        if mode not in self.MODES:
+            raise ValueError(f"Modo inválido: {mode}")
+        self.chunk_size = chunk_size
+        self.mode = mode
+        self.checkpoint_dir = checkpoint_dir
+        self.progress = progress or self._log_progress
+
+        self.exames = Exame.__table__
+        self.parametros = ParametrosEcocardiograma.__table__
+        self.laudos = LaudoEcocardiograma.__table__
+
+    # ===== API PÚBLICA =====
+
+    def import_file(self, path: str, formato: Optional[str] = None, resume: bool = True) -> Dict[str, Any]:
+        """Importa um arquivo CSV, JSON ou SQL"""
+        if not os.path.exists(path):
+            raise FileProcessingError("Arquivo não encontrado", path)
+
+        checkpoint = ImportCheckpoint.for_source(path, self.checkpoint_dir)
+        state = checkpoint.load() if resume else None
+
+        stats = self._new_stats(path)
+        if state:
+            stats.update(state['stats'])
+            stats['retomado_de'] = stats['lidos']
+            logger.info(f"Retomando importação de {path} a partir do registro {stats['lidos']}")
+
+        records = islice(iter_records(path, formato), stats['lidos'], None)
+        self._run(records, stats, checkpoint)
+        checkpoint.clear()
+        return stats
+
+    def import_records(self, raws: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """Importa registros já carregados (sem checkpoint)"""
+        stats = self._new_stats(None)
+        self._run(iter(raws), stats)
+        return stats
+
+    def _run(self, records: Iterator[Dict[str, Any]], stats: Dict[str, Any],
+             checkpoint: Optional[ImportCheckpoint] = None) -> None:
+        """Consome o fluxo em lotes, uma transação por lote"""
+        inicio = time.perf_counter() - stats['duracao_s']
+
+        while True:
+            chunk = list(islice(records, self.chunk_size))
+            if not chunk:
+                break
+
+            validos, erros = validate_batch(chunk, stats['lidos'])
+
+            with db.engine.begin() as conn:
+                novos, atualizados, ignorados = self._write_chunk(conn, validos)
+            trend_cache.invalidate(r['exame']['nome_paciente'] for r in validos)
+
+            stats['lidos'] += len(chunk)
+            stats['importados'] += novos
+            stats['atualizados'] += atualizados
+            stats['ignorados'] += ignorados
+            stats['invalidos'] += len(erros)
+            stats['erros'] = (stats['erros'] + erros)[:MAX_ERRORS_KEPT]
+            stats['lotes'] += 1
+            stats['duracao_s'] = round(time.perf_counter() - inicio, 3)
+            if stats['duracao_s']:
+                stats['registros_por_segundo'] = round(stats['lidos'] / stats['duracao_s'], 1)
+
+            # Checkpoint só depois do commit; reprocessar um lote é seguro (upsert)
+            if checkpoint:
+                checkpoint.save(stats)
+            self.progress(dict(stats))
+
+        stats['concluido'] = True
+
+    # ===== GRAVAÇÃO DO LOTE =====
+
+    def _write_chunk(self, conn, records: List[Dict[str, Dict[str, Any]]]):
+        """Grava o lote na transação corrente; retorna (novos, atualizados, ignorados)"""
+        if not records:
+            return 0, 0, 0
+
+        existentes = self._existing_ids(conn, [natural_key(r['exame']) for r in records])
+        agora = datetime_brasilia()
+
+        novos = [r for r in records if natural_key(r['exame']) not in existentes]
+        repetidos = [r for r in records if natural_key(r['exame']) in existentes]
+
+        if self.mode == 'skip':
+            ignorados, repetidos = len(repetidos), []
+        else:
+            ignorados = 0
+
+        # Exames já existentes: atualiza só as colunas que a fonte traz
+        ids = [existentes[natural_key(r['exame'])] for r in repetidos]
+        self._update_rows(conn, self.exames, [
+            dict({campo: r['exame'][campo] for campo in r['presentes']['exame']}, _id=exame_id, updated_at=agora)
+            for r, exame_id in zip(repetidos, ids)
+        ])
+        self._upsert_children(conn, list(zip(repetidos, ids)), agora)
+
+        novos_ids = self._insert_exams(conn, novos, agora)
+        pares = list(zip(novos, novos_ids))
+        # Achados do lote inteiro de uma vez (o INSERT em lote não passa pelos eventos do ORM)
+        flags = reference_ranges.flags_for_rows([r['exame']['sexo'] for r, _ in pares],
+                                                [r['exame']['idade'] for r, _ in pares],
+                                                [r['parametros'] for r, _ in pares])
+        self._bulk_insert(conn, self.parametros,
+                          [dict(r['parametros'], exame_id=i, anormalidades=int(f), created_at=agora, updated_at=agora)
+                           for (r, i), f in zip(pares, flags)])
+        self._bulk_insert(conn, self.laudos,
+                          [dict(r['laudo'], exame_id=i, created_at=agora, updated_at=agora) for r, i in pares])
+
+        # A carga em lote não dispara os eventos do ORM: recalcula o resumo dos dias gravados
+        ExamRollupService.rebuild_days(conn, (r['exame']['data_exame_dt'] for r in repetidos + novos))
+
+        return len(novos), len(repetidos), ignorados
+
+    def _upsert_children(self, conn, pares: List[tuple], agora) -> None:
+        """Parâmetros e laudo dos exames já existentes, por exame_id
+
+        Linhas gravadas pelo importador e não alteradas depois (updated_at
+        igual a created_at, o instante da importação) recebem os valores da
+        fonte; parâmetros alterados no sistema (edição, extração dos laudos)
+        só têm os campos vazios preenchidos e laudos editados são mantidos.
+        """
+        if not pares:
+            return
+
+        ids = [exame_id for _, exame_id in pares]
+        parametros = self._first_rows(conn, self.parametros, ids, tuple(PARAMETER_FIELDS) + ('anormalidades',))
+        laudos = self._first_rows(conn, self.laudos, ids, tuple(LAUDO_FIELDS))
+        # Sexo e idade como ficaram após o UPDATE dos exames (a fonte pode tê-los alterado)
+        contextos = self._exam_contexts(conn, ids)
+
+        inserir_parametros, candidatos = [], []
+        inserir_laudos, atualizar_laudos = [], []
+        for r, exame_id in pares:
+            atual = parametros.get(exame_id)
+            if atual is None:
+                inserir_parametros.append(dict(r['parametros'], exame_id=exame_id, created_at=agora, updated_at=agora))
+            else:
+                valores = {campo: atual[campo] for campo in PARAMETER_FIELDS}
+                if atual['updated_at'] <= atual['created_at']:
+                    valores.update({campo: r['parametros'][campo] for campo in r['presentes']['parametros']})
+                    criado = agora
+                else:
+                    valores.update({campo: valor for campo, valor in r['parametros'].items()
+                                    if valor is not None and atual[campo] is None})
+                    criado = atual['created_at']
+                valores.update(_id=atual['id'], created_at=criado, updated_at=agora)
+                candidatos.append((valores, atual))
+
+            laudo = laudos.get(exame_id)
+            if laudo is None:
+                inserir_laudos.append(dict(r['laudo'], exame_id=exame_id, created_at=agora, updated_at=agora))
+            elif laudo['updated_at'] <= laudo['created_at']:
+                atualizar_laudos.append(dict({campo: r['laudo'][campo] for campo in r['presentes']['laudo']},
+                                             _id=laudo['id'], created_at=agora, updated_at=agora))
+
+        # Achados recalculados sobre os valores resultantes (fonte + gravados) e o sexo/idade atuais
+        linhas = [valores for valores, _ in candidatos] + inserir_parametros
+        exames = [atual['exame_id'] for _, atual in candidatos] + [linha['exame_id'] for linha in inserir_parametros]
+        flags = reference_ranges.flags_for_rows([contextos[i][0] for i in exames], [contextos[i][1] for i in exames],
+                                                linhas)
+        for linha, valor in zip(linhas, flags):
+            linha['anormalidades'] = int(valor)
+
+        # Parâmetros existentes só são regravados se algum valor ou os achados mudaram
+        atualizar_parametros = [
+            valores for valores, atual in candidatos
+            if any(valores[campo] != atual[campo] for campo in tuple(PARAMETER_FIELDS) + ('anormalidades',))
+        ]
+
+        self._update_rows(conn, self.parametros, atualizar_parametros)
+        self._bulk_insert(conn, self.parametros, inserir_parametros)
+        self._update_rows(conn, self.laudos, atualizar_laudos)
+        self._bulk_insert(conn, self.laudos, inserir_laudos)
+
+    @staticmethod
+    def _first_rows(conn, table, exame_ids: List[int], campos: tuple) -> Dict[int, Dict[str, Any]]:
+        """Primeira linha (menor id) da tabela filha de cada exame"""
+        colunas = ('id', 'exame_id', 'created_at', 'updated_at') + campos
+        linhas = {}
+        for start in range(0, len(exame_ids), LOOKUP_BATCH):
+            resultado = conn.execute(
+                select(*(table.c[nome] for nome in colunas))
+                .where(table.c.exame_id.in_(exame_ids[start:start + LOOKUP_BATCH]))
+                .order_by(table.c.id)
+            )
+            for linha in resultado.mappings():
+                linhas.setdefault(linha['exame_id'], dict(linha))
+        return linhas
+
+    def _exam_contexts(self, conn, exame_ids: List[int]) -> Dict[int, tuple]:
+        """(sexo, idade) gravados de cada exame"""
+        contextos = {}
+        for start in range(0, len(exame_ids), LOOKUP_BATCH):
+            contextos.update((exame_id, (sexo, idade)) for exame_id, sexo, idade in conn.execute(
+                select(self.exames.c.id, self.exames.c.sexo, self.exames.c.idade)
+                .where(self.exames.c.id.in_(exame_ids[start:start + LOOKUP_BATCH]))
+            ))
+        return contextos
+
+    @staticmethod
+    def _update_rows(conn, table, rows: List[Dict[str, Any]]) -> None:
+        """UPDATE em lote por id ('_id'); agrupa linhas com o mesmo conjunto de colunas"""
+        grupos: Dict[tuple, List[Dict[str, Any]]] = {}
+        for row in rows:
+            grupos.setdefault(tuple(sorted(row)), []).append(row)
+        for grupo in grupos.values():
+            conn.execute(update(table).where(table.c.id == bindparam('_id')), grupo)
+
+    def _existing_ids(self, conn, keys) -> Dict[tuple, int]:
+        """Mapa chave natural -> id dos exames já gravados"""
+        nomes = sorted({nome for nome, _ in keys})
+        wanted = set(keys)
+        encontrados = {}
+
+        for start in range(0, len(nomes), LOOKUP_BATCH):
+            rows = conn.execute(
+                select(self.exames.c.id, self.exames.c.nome_paciente, self.exames.c.data_exame_dt)
+                .where(self.exames.c.nome_paciente.in_(nomes[start:start + LOOKUP_BATCH]))
+                .order_by(self.exames.c.id)
+            )
+            for exame_id, nome, data_exame_dt in rows:
+                key = (nome, data_exame_dt)
+                if key in wanted and key not in encontrados:
+                    encontrados[key] = exame_id
+
+        return encontrados
+
+    def _insert_exams(self, conn, records, agora) -> List[int]:
+        """INSERT em lote dos exames novos, devolvendo os ids na ordem dos registros"""
+        if not records:
+            return []
+
+        rows = [dict(r['exame'], created_at=agora, updated_at=agora) for r in records]
+
+        if conn.dialect.insert_executemany_returning_sort_by_parameter_order:
+            result = conn.execute(
+                insert(self.exames).returning(self.exames.c.id, sort_by_parameter_order=True), rows
+            )
+            return [row[0] for row in result]
+
+        # Dialetos sem RETURNING em lote: grava e recupera pela chave natural
+        conn.execute(insert(self.exames), rows)
+        ids = self._existing_ids(conn, [natural_key(r['exame']) for r in records])
+        return [ids[natural_key(r['exame'])] for r in records]
+
+    def _bulk_insert(self, conn, table, rows) -> None:
+        if not rows:
+            return
+        if conn.dialect.name == 'postgresql' and conn.dialect.driver == 'psycopg2':
+            self._copy_rows(conn, table, rows)
+        else:
+            conn.execute(insert(table), rows)
+
+    @staticmethod
+    def _copy_rows(conn, table, rows) -> None:
+        """COPY FROM STDIN (PostgreSQL) para as tabelas filhas"""
+        columns = list(rows[0].keys())
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow(['\\N' if row[c] is None else row[c] for c in columns])
+        buffer.seek(0)
+
+        cursor = conn.connection.dbapi_connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+                buffer
+            )
+        finally:
+            cursor.close()
+
+    # ===== AUXILIARES =====
+
+    @staticmethod
+    def _new_stats(path: Optional[str]) -> Dict[str, Any]:
+        return {
+            'arquivo': path,
+            'lidos': 0,
+            'importados': 0,
+            'atualizados': 0,
+            'ignorados': 0,
+            'invalidos': 0,
+            'lotes': 0,
+            'erros': [],
+            'duracao_s': 0.0,
+            'registros_por_segundo': None,
+            'concluido': False
+        }
+
+    @staticmethod
+    def _log_progress(stats: Dict[str, Any]) -> None:
+        logger.info(
+            f"Importação {os.path.basename(stats['arquivo'] or '')}: {stats['lidos']} lidos, "
+            f"{stats['importados']} novos, {stats['atualizados']} atualizados, "
+            f"{stats['invalidos']} inválidos ({stats['registros_por_segundo']} reg/s)"
+        )
@@ -0,0 +1,379 @@
+"""
+Extração de Medidas dos Laudos - Texto livre legado para parâmetros estruturados
+
+Laudos antigos trazem as medidas só no texto ("DDFVE = 50mm, DSFVE = 38mm
+... Massa VE = 294g"). As regras abaixo são compiladas uma única vez em uma
+expressão com uma alternativa por rótulo, percorrida em uma só passada por
+laudo; cada valor passa por conversão de unidade e faixa plausível e recebe
+uma confiança (0 a 1).
+
+O extrator lê os laudos em lotes por chave (id), distribui a análise do
+texto - trabalho puro de CPU, sem acesso ao banco - entre processos e grava
+cada lote em uma transação: completa apenas os campos vazios dos parâmetros
+(ou cria o registro), carimba a máscara de achados e atualiza updated_at,
+o que leva as alterações ao instantâneo colunar e ao índice de semelhança
+nas próximas sincronizações. Um checkpoint após cada lote permite retomar.
+"""
+
+import logging
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import bindparam, insert, select, update
+
+from app import db
+from models import Exame, LaudoEcocardiograma, ParametrosEcocardiograma, datetime_brasilia
+from modules.exams.reference_ranges import reference_ranges
+from modules.exams.trend_service import trend_cache
+from .bulk_importer import LOOKUP_BATCH, ImportCheckpoint
+
+logger = logging.getLogger(__name__)
+
+# Incrementar ao mudar as regras: invalida checkpoints de execuções anteriores
+RULES_VERSION = 2
+DEFAULT_CHUNK_SIZE = 2000
+MIN_CONFIDENCE = 0.6
+TEXT_COLUMNS = ('modo_m_bidimensional', 'doppler_convencional', 'doppler_tecidual', 'conclusao')
+
+# Unidades aceitas por grandeza: fator para a unidade canônica (None = sem unidade no texto)
+UNITS = {
+    'comprimento': {'mm': 1.0, 'cm': 10.0, None: 1.0},
+    'volume': {'ml': 1.0, None: 1.0},
+    'massa': {'g': 1.0, None: 1.0},
+    'indice_massa': {'g/m²': 1.0, 'g/m2': 1.0, None: 1.0},
+    'percentual': {'%': 1.0, None: 1.0},
+    'razao': {None: 1.0},
+    'frequencia': {'bpm': 1.0, None: 1.0},
+    'pressao': {'mmhg': 1.0, None: 1.0},
+    'peso': {'kg': 1.0, None: 1.0},
+    'altura': {'cm': 1.0, 'm': 100.0, None: 1.0},
+    'area': {'m²': 1.0, 'm2': 1.0, None: 1.0},
+}
+# Valor sem unidade fora da faixa: unidade implícita tentada (ex.: "5,0" em cm).
+# A confiança fica abaixo de MIN_CONFIDENCE: só é gravado se o limite for reduzido
+IMPLICIT_UNITS = {'comprimento': 10.0, 'altura': 100.0}
+IMPLICIT_CONFIDENCE = 0.5
+
+# Qualificadores aceitos entre o rótulo e o valor ("Fração de ejeção pelo Teicholz = 47,6%")
+_QUALIFIERS = (r'(?:\s+(?:pel[oa]|por|de|do|da|em|m[eé]todo|teicholz|simpson|biplanar|'
+               r'estimad[oa]|calculad[oa]|medid[oa]|\([^()\d\n]{1,20}\)))*')
+
+
+def _sigla(sigla: str) -> str:
+    """Sigla de duas letras: com a caixa do laudo e seguida de '=' ou ':'
+
+    "ao", "fe", "sc" são palavras comuns no texto ("Encaminhado ao 2 andar").
+    """
+    return rf'(?-i:{sigla})(?={_QUALIFIERS}\s*[=:])'
+
+
+# (campo, grandeza, (mínimo, máximo) plausível na unidade canônica, rótulos)
+EXTRACTION_RULES = (
+    ('relacao_atrio_esquerdo_aorta', 'razao', (0.5, 4.0), (r'rela[cç][aã]o\s+AE\s*/\s*AO', r'AE\s*/\s*AO')),
+    ('diametro_diastolico_final_ve', 'comprimento', (20, 90),
+     (r'DDFVE', r'DDVE', r'di[aâ]metro\s+diast[oó]lico(?:\s+final)?(?:\s+do)?\s+VE')),
+    ('diametro_sistolico_final', 'comprimento', (10, 80),
+     (r'DSFVE', r'DSVE', r'di[aâ]metro\s+sist[oó]lico(?:\s+final)?(?:\s+do)?\s+VE')),
+    ('espessura_diastolica_septo', 'comprimento', (4, 30),
+     (r'EDS', r'SIV', r'septo(?:\s+interventricular)?')),
+    ('espessura_diastolica_ppve', 'comprimento', (4, 30),
+     (r'EDPPVE', r'PPVE', r'parede\s+posterior(?:\s+do\s+VE)?')),
+    ('atrio_esquerdo', 'comprimento', (15, 90), (r'[aá]trio\s+esquerdo', _sigla('AE'))),
+    ('aorta_ascendente', 'comprimento', (15, 70), (r'aorta\s+ascendente',)),
+    ('raiz_aorta', 'comprimento', (15, 60), (r'raiz\s+a[oó]rtica', r'raiz\s+da\s+aorta', _sigla('A[Oo]'))),
+    ('diametro_ventricular_direito', 'comprimento', (7, 60),
+     (r'ventr[ií]culo\s+direito', r'di[aâ]metro\s+(?:do\s+)?VD')),
+    ('fracao_ejecao', 'percentual', (5, 95), (r'fra[cç][aã]o\s+de\s+eje[cç][aã]o', r'FEVE', _sigla('FE'))),
+    ('percentual_encurtamento', 'percentual', (3, 70),
+     (r'percentual\s+de\s+encurtamento', r'fra[cç][aã]o\s+de\s+encurtamento', _sigla('FS'))),
+    ('volume_diastolico_final', 'volume', (10, 500), (r'VDF', r'volume\s+diast[oó]lico\s+final')),
+    ('volume_sistolico_final', 'volume', (3, 400), (r'VSF', r'volume\s+sist[oó]lico\s+final')),
+    ('volume_ejecao', 'volume', (5, 200), (r'volume\s+sist[oó]lico(?!\s+final)', r'volume\s+de\s+eje[cç][aã]o')),
+    ('indice_massa_ve', 'indice_massa', (20, 300),
+     (r'[ií]ndice\s+de\s+massa(?:\s+do)?(?:\s+VE|\s+ventricular\s+esquerda)?', r'IMVE')),
+    ('massa_ve', 'massa', (30, 600), (r'massa(?:\s+do)?\s+VE', r'massa\s+ventricular\s+esquerda')),
+    ('frequencia_cardiaca', 'frequencia', (20, 250), (_sigla('FC'), r'frequ[eê]ncia\s+card[ií]aca')),
+    ('pressao_sistolica_vd', 'pressao', (5, 150),
+     (r'PSAP', r'PSVD', r'press[aã]o\s+sist[oó]lica\s+(?:da\s+art[eé]ria\s+pulmonar|do\s+VD)')),
+    ('gradiente_tricuspide', 'pressao', (2, 150), (r'gradiente\s+(?:VD\s*/\s*AD|tric[uú]spide)',)),
+    ('peso', 'peso', (1, 300), (r'peso',)),
+    ('altura', 'altura', (40, 230), (r'altura',)),
+    ('superficie_corporal', 'area', (0.1, 3.0), (r'superf[ií]cie\s+corporal', _sigla('SC'))),
+)
+EXTRACTED_FIELDS = tuple(dict.fromkeys(campo for campo, _, _, _ in EXTRACTION_RULES))
+INTEGER_FIELDS = ('frequencia_cardiaca',)
+
+_VALUE = (r'\s*[=:]?\s*(?P<numero>(?>\d+(?:[.,]\d+)?))'
+          r'\s*(?P<unidade>mmhg|mm|cm|ml|g/m²|g/m2|kg|g|%|bpm|m²|m2|m)?(?![a-zà-ú²])')
+
+
+def _compile_rules():
+    """Um grupo por rótulo (na ordem das regras); o grupo encontrado define o campo"""
+    alternativas, grupos = [], []
+    for campo, grandeza, faixa, rotulos in EXTRACTION_RULES:
+        for rotulo in rotulos:
+            grupos.append((campo, grandeza, faixa))
+            alternativas.append(f'({rotulo})')
+    padrao = r'(?<![\w/])(?:' + '|'.join(alternativas) + r')(?!\w)' + _QUALIFIERS + _VALUE
+    return re.compile(padrao, re.IGNORECASE), grupos
+
+
+_PATTERN, _GROUPS = _compile_rules()
+
+
+def _convert(grandeza: str, faixa: Tuple[float, float], valor: float,
+             unidade: Optional[str]) -> Optional[Tuple[float, float]]:
+    """(valor na unidade canônica, confiança) ou None se implausível"""
+    unidades = UNITS[grandeza]
+    if unidade not in unidades:
+        return None
+    minimo, maximo = faixa
+    convertido = round(valor * unidades[unidade], 2)
+    if minimo <= convertido <= maximo:
+        return convertido, 1.0 if unidade or grandeza == 'razao' else 0.85
+    implicito = IMPLICIT_UNITS.get(grandeza)
+    if unidade is None and implicito and minimo <= valor * implicito <= maximo:
+        return round(valor * implicito, 2), IMPLICIT_CONFIDENCE
+    return None
+
+
+def extract_measurements(texto: Optional[str]) -> Tuple[Dict[str, Tuple[float, float]], int]:
+    """Medidas do texto: ({campo: (valor, confiança)}, quantidade de valores rejeitados)
+
+    Valores repetidos e concordantes mantêm a confiança; divergentes ficam
+    com o primeiro e a confiança cai pela metade.
+    """
+    campos: Dict[str, Tuple[float, float]] = {}
+    rejeitados = 0
+    if not texto:
+        return campos, rejeitados
+
+    for encontrado in _PATTERN.finditer(texto):
+        rotulo = next(indice for indice, valor in enumerate(encontrado.groups()) if valor is not None)
+        campo, grandeza, faixa = _GROUPS[rotulo]
+        unidade = (encontrado.group('unidade') or '').lower() or None
+        resultado = _convert(grandeza, faixa, float(encontrado.group('numero').replace(',', '.')), unidade)
+        if resultado is None:
+            rejeitados += 1
+            continue
+
+        valor, confianca = resultado
+        if campo in INTEGER_FIELDS:
+            valor = round(valor)
+        anterior = campos.get(campo)
+        if anterior is None:
+            campos[campo] = (valor, confianca)
+        elif abs(anterior[0] - valor) <= 0.01 * max(abs(valor), 1.0):
+            campos[campo] = (anterior[0], max(anterior[1], confianca))
+        else:
+            campos[campo] = (anterior[0], round(anterior[1] * 0.5, 2))
+    return campos, rejeitados
+
+
+def extract_chunk(linhas: List[Tuple[int, int, str]]) -> List[Tuple[int, int, Dict[str, Tuple[float, float]], int]]:
+    """Analisa um lote (laudo_id, exame_id, texto); executado nos processos de trabalho"""
+    return [(laudo_id, exame_id, *extract_measurements(texto)) for laudo_id, exame_id, texto in linhas]
+
+
+class LaudoExtractor:
+    """Extração paralela dos laudos em texto para os parâmetros, com retomada"""
+
+    CHECKPOINT_NAME = 'laudos_texto'
+
+    def __init__(self, workers: Optional[int] = None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 min_confidence: float = MIN_CONFIDENCE, overwrite: bool = False,
+                 checkpoint_dir: Optional[str] = None,
+                 progress: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        self.chunk_size = chunk_size
+        self.min_confidence = min_confidence
+        self.overwrite = overwrite
+        self.checkpoint_dir = checkpoint_dir
+        self.progress = progress or self._log_progress
+
+        self.exames = Exame.__table__
+        self.parametros = ParametrosEcocardiograma.__table__
+        self.laudos = LaudoEcocardiograma.__table__
+
+    # ===== API PÚBLICA =====
+
+    def checkpoint(self) -> ImportCheckpoint:
+        """Checkpoint da extração (invalidado se as regras ou as opções mudarem)"""
+        return ImportCheckpoint.for_job(self.CHECKPOINT_NAME, {
+            'regras': RULES_VERSION,
+            'sobrescrever': self.overwrite,
+            'confianca_minima': self.min_confidence
+        }, self.checkpoint_dir)
+
+    def run(self, resume: bool = True) -> Dict[str, Any]:
+        """Percorre todos os laudos a partir do último lote gravado"""
+        checkpoint = self.checkpoint()
+        state = checkpoint.load() if resume else None
+
+        stats = self._new_stats()
+        if state:
+            stats.update(state['stats'])
+            stats['retomado_de'] = stats['ultimo_laudo_id']
+            logger.info(f"Retomando extração a partir do laudo {stats['ultimo_laudo_id']}")
+
+        if self.workers > 1:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                self._run(stats, checkpoint, executor)
+        else:
+            self._run(stats, checkpoint, None)
+        checkpoint.clear()
+        return stats
+
+    def _run(self, stats: Dict[str, Any], checkpoint: ImportCheckpoint,
+             executor: Optional[ProcessPoolExecutor]) -> None:
+        """Lê, analisa (em paralelo) e grava os lotes na ordem dos ids"""
+        inicio = time.perf_counter() - stats['duracao_s']
+        pendentes = deque()
+        cursor = stats['ultimo_laudo_id']
+        esgotado = False
+
+        while True:
+            # Mantém os processos ocupados enquanto o processo principal grava
+            while not esgotado and len(pendentes) < max(self.workers, 1) * 2:
+                linhas = self._read_chunk(cursor)
+                if not linhas:
+                    esgotado = True
+                    break
+                cursor = linhas[-1][0]
+                pendentes.append((cursor, len(linhas),
+                                  executor.submit(extract_chunk, linhas) if executor else extract_chunk(linhas)))
+            if not pendentes:
+                break
+
+            ultimo_id, lidos, analise = pendentes.popleft()
+            resultados = analise.result() if executor else analise
+            with db.engine.begin() as conn:
+                nomes = self._write_chunk(conn, resultados, stats)
+            trend_cache.invalidate(nomes)
+
+            stats['lidos'] += lidos
+            stats['ultimo_laudo_id'] = ultimo_id
+            stats['lotes'] += 1
+            stats['duracao_s'] = round(time.perf_counter() - inicio, 3)
+            if stats['duracao_s']:
+                stats['laudos_por_segundo'] = round(stats['lidos'] / stats['duracao_s'], 1)
+
+            # Checkpoint só depois do commit; reprocessar um lote é seguro (só preenche campos vazios)
+            checkpoint.save(stats)
+            self.progress(dict(stats))
+
+        stats['concluido'] = True
+
+    # ===== LEITURA E GRAVAÇÃO =====
+
+    def _read_chunk(self, depois_de: int) -> List[Tuple[int, int, str]]:
+        """Próximo lote de laudos com o texto das seções concatenado"""
+        L = self.laudos
+        with db.engine.connect() as conn:
+            linhas = conn.execute(
+                select(L.c.id, L.c.exame_id, *(L.c[nome] for nome in TEXT_COLUMNS))
+                .where(L.c.id > depois_de)
+                .order_by(L.c.id)
+                .limit(self.chunk_size)
+            ).all()
+        return [(linha[0], linha[1], '\n'.join(secao for secao in linha[2:] if secao)) for linha in linhas]
+
+    def _write_chunk(self, conn, resultados, stats: Dict[str, Any]) -> List[str]:
+        """Completa os parâmetros dos exames do lote; devolve os pacientes alterados"""
+        por_campo = stats['por_campo']
+        extraidos: Dict[int, Dict[str, Tuple[float, float]]] = {}
+        for _, exame_id, campos, rejeitados in resultados:
+            stats['campos_rejeitados'] += rejeitados
+            destino = extraidos.setdefault(exame_id, {})
+            for campo, (valor, confianca) in campos.items():
+                resumo = por_campo.setdefault(campo, {'extraidos': 0, 'gravados': 0, 'confianca_media': 0.0})
+                resumo['confianca_media'] = round(
+                    (resumo['confianca_media'] * resumo['extraidos'] + confianca) / (resumo['extraidos'] + 1), 3)
+                resumo['extraidos'] += 1
+                if confianca < self.min_confidence:
+                    stats['campos_baixa_confianca'] += 1
+                # Mais de um laudo do exame: vale o valor de maior confiança
+                elif campo not in destino or confianca > destino[campo][1]:
+                    destino[campo] = (valor, confianca)
+
+        atuais = self._current(conn, [exame_id for exame_id, campos in extraidos.items() if campos])
+        agora = datetime_brasilia()
+        linhas, contextos, nomes = [], [], []
+
+        for exame_id, (parametros_id, sexo, idade, nome, valores) in atuais.items():
+            gravados = [campo for campo in extraidos[exame_id] if self.overwrite or valores.get(campo) is None]
+            if not gravados:
+                continue
+            for campo in gravados:
+                valores[campo] = extraidos[exame_id][campo][0]
+                por_campo[campo]['gravados'] += 1
+            stats['campos_gravados'] += len(gravados)
+            nomes.append(nome)
+            contextos.append((sexo, idade))
+            linhas.append((parametros_id, dict(valores, exame_id=exame_id, updated_at=agora)))
+
+        # O INSERT/UPDATE em lote não passa pelos eventos do ORM: carimba os achados aqui
+        flags = reference_ranges.flags_for_rows([s for s, _ in contextos], [i for _, i in contextos],
+                                                [valores for _, valores in linhas])
+        atualizar, inserir = [], []
+        for (parametros_id, valores), valor in zip(linhas, flags):
+            valores['anormalidades'] = int(valor)
+            if parametros_id is None:
+                inserir.append(dict(valores, created_at=agora))
+            else:
+                atualizar.append(dict(valores, _id=parametros_id))
+
+        if atualizar:
+            conn.execute(update(self.parametros).where(self.parametros.c.id == bindparam('_id')), atualizar)
+        if inserir:
+            conn.execute(insert(self.parametros), inserir)
+        stats['parametros_atualizados'] += len(atualizar)
+        stats['parametros_criados'] += len(inserir)
+        return nomes
+
+    def _current(self, conn, exame_ids: List[int]) -> Dict[int, tuple]:
+        """exame_id -> (id dos parâmetros ou None, sexo, idade, paciente, {campo: valor})"""
+        E, P = self.exames, self.parametros
+        colunas = tuple(dict.fromkeys(EXTRACTED_FIELDS + reference_ranges.parameters + ('superficie_corporal',)))
+        atuais = {}
+        for start in range(0, len(exame_ids), LOOKUP_BATCH):
+            linhas = conn.execute(
+                select(E.c.id, P.c.id, E.c.sexo, E.c.idade, E.c.nome_paciente, *(P.c[nome] for nome in colunas))
+                .select_from(E.outerjoin(P, P.c.exame_id == E.c.id))
+                .where(E.c.id.in_(exame_ids[start:start + LOOKUP_BATCH]))
+                .order_by(P.c.id)
+            )
+            for linha in linhas:
+                atuais.setdefault(linha[0], (linha[1], linha[2], linha[3], linha[4], dict(zip(colunas, linha[5:]))))
+        return atuais
+
+    # ===== AUXILIARES =====
+
+    @staticmethod
+    def _new_stats() -> Dict[str, Any]:
+        return {
+            'lidos': 0,
+            'ultimo_laudo_id': 0,
+            'parametros_atualizados': 0,
+            'parametros_criados': 0,
+            'campos_gravados': 0,
+            'campos_baixa_confianca': 0,
+            'campos_rejeitados': 0,
+            'por_campo': {},
+            'lotes': 0,
+            'duracao_s': 0.0,
+            'laudos_por_segundo': None,
+            'concluido': False
+        }
+
+    @staticmethod
+    def _log_progress(stats: Dict[str, Any]) -> None:
+        logger.info(
+            f"Extração de laudos: {stats['lidos']} lidos (até o id {stats['ultimo_laudo_id']}), "
+            f"{stats['campos_gravados']} campos gravados, {stats['parametros_criados']} parâmetros criados, "
+            f"{stats['campos_baixa_confianca']} de baixa confiança ({stats['laudos_por_segundo']} laudos/s)"
+        )
@@ -0,0 +1,197 @@
+"""
+Mapeamento e Validação - Registros das fontes para os modelos
+
+Converte as chaves das fontes (colunas snake_case dos CSV/JSON/SQL
+autênticos e rótulos legíveis do CSV do novo banco) para os campos de
+Exame, ParametrosEcocardiograma e LaudoEcocardiograma, validando em lote.
+"""
+
+import math
+from datetime import date
+from typing import Any, Dict, Iterable, List, Tuple
+
+from modules.core.dates import parse_date
+from modules.core.exceptions import ValidationError
+
+# campo do modelo -> chaves aceitas na fonte
+EXAM_FIELDS = {
+    'nome_paciente': ('nome_paciente', 'Nome Paciente'),
+    'data_exame': ('data_exame', 'Data do Exame'),
+    'idade': ('idade', 'Idade'),
+    'sexo': ('sexo', 'Sexo'),
+    'data_nascimento': ('data_nascimento', 'Data de Nascimento'),
+    'tipo_atendimento': ('tipo_atendimento', 'Tipo Atendimento'),
+    'medico_usuario': ('medico_usuario', 'Médico'),
+    'medico_solicitante': ('medico_solicitante', 'Médico Solicitante'),
+    'indicacao': ('indicacao', 'Indicação'),
+}
+
+PARAMETER_FIELDS = {
+    'peso': ('peso', 'Peso'),
+    'altura': ('altura', 'Altura'),
+    'superficie_corporal': ('superficie_corporal', 'Superfície Corporal'),
+    'frequencia_cardiaca': ('frequencia_cardiaca', 'Frequência Cardíaca'),
+    'atrio_esquerdo': ('atrio_esquerdo_mm', 'atrio_esquerdo', 'Átrio Esquerdo (mm)'),
+    'raiz_aorta': ('raiz_aorta_mm', 'raiz_aorta', 'Raiz da Aorta (mm)'),
+    'relacao_atrio_esquerdo_aorta': ('relacao_ae_ao', 'relacao_atrio_esquerdo_aorta', 'Relação AE/Ao'),
+    'aorta_ascendente': ('aorta_ascendente_mm', 'aorta_ascendente', 'Aorta Ascendente (mm)'),
+    'diametro_ventricular_direito': ('diametro_vd_mm', 'diametro_ventricular_direito', 'Diâmetro VD (mm)'),
+    'diametro_basal_vd': ('diametro_basal_vd_mm', 'diametro_basal_vd', 'Diâmetro Basal VD (mm)'),
+    'diametro_diastolico_final_ve': ('ddve_mm', 'diametro_diastolico_final_ve', 'DDVE (mm)'),
+    'diametro_sistolico_final': ('dsve_mm', 'diametro_sistolico_final', 'DSVE (mm)'),
+    'percentual_encurtamento': ('percentual_encurtamento', '% Encurtamento'),
+    'espessura_diastolica_septo': ('septo_mm', 'espessura_diastolica_septo', 'Septo (mm)'),
+    'espessura_diastolica_ppve': ('parede_posterior_mm', 'espessura_diastolica_ppve', 'Parede Posterior (mm)'),
+    'relacao_septo_parede_posterior': ('relacao_septo_pp', 'relacao_septo_parede_posterior', 'Relação Septo/PP'),
+    'volume_diastolico_final': ('volume_diastolico_final_ml', 'volume_diastolico_final', 'Volume Diastólico Final (mL)'),
+    'volume_sistolico_final': ('volume_sistolico_final_ml', 'volume_sistolico_final', 'Volume Sistólico Final (mL)'),
+    'volume_ejecao': ('volume_ejecao_ml', 'volume_ejecao', 'Volume de Ejeção (mL)'),
+    'fracao_ejecao': ('fracao_ejecao_pct', 'fracao_ejecao', 'Fração de Ejeção (%)'),
+    'indice_massa_ve': ('indice_massa_ve_g_m2', 'indice_massa_ve', 'Índice Massa VE (g/m²)'),
+    'massa_ve': ('massa_ve_g', 'massa_ve', 'Massa VE (g)'),
+    'fluxo_pulmonar': ('fluxo_pulmonar_ms', 'fluxo_pulmonar', 'Fluxo Pulmonar (m/s)'),
+    'fluxo_mitral': ('fluxo_mitral_ms', 'fluxo_mitral', 'Fluxo Mitral (m/s)'),
+    'fluxo_aortico': ('fluxo_aortico_ms', 'fluxo_aortico', 'Fluxo Aórtico (m/s)'),
+    'fluxo_tricuspide': ('fluxo_tricuspide_ms', 'fluxo_tricuspide', 'Fluxo Tricúspide (m/s)'),
+    'gradiente_vd_ap': ('gradiente_vd_ap_mmhg', 'gradiente_vd_ap', 'Gradiente VD→AP (mmHg)'),
+    'gradiente_ae_ve': ('gradiente_ae_ve_mmhg', 'gradiente_ae_ve', 'Gradiente AE→VE (mmHg)'),
+    'gradiente_ve_ao': ('gradiente_ve_ao_mmhg', 'gradiente_ve_ao', 'Gradiente VE→AO (mmHg)'),
+    'gradiente_ad_vd': ('gradiente_ad_vd_mmhg', 'gradiente_ad_vd', 'Gradiente AD→VD (mmHg)'),
+    'gradiente_tricuspide': ('gradiente_tricuspide_mmhg', 'gradiente_tricuspide'),
+    'pressao_sistolica_vd': ('pressao_sistolica_vd_mmhg', 'pressao_sistolica_vd'),
+}
+
+LAUDO_FIELDS = {
+    'modo_m_bidimensional': ('modo_m_bidimensional', 'Modo M e Bidimensional'),
+    'doppler_convencional': ('doppler_convencional', 'Doppler Convencional'),
+    'doppler_tecidual': ('doppler_tecidual', 'Doppler Tecidual'),
+    'conclusao': ('conclusao_laudo', 'conclusao', 'Conclusão ou Laudo'),
+    'recomendacoes': ('recomendacoes', 'Recomendações'),
+}
+
+INTEGER_PARAMETERS = {'frequencia_cardiaca'}
+
+SEXO_NORMALIZADO = {
+    'm': 'Masculino', 'masculino': 'Masculino', 'masc': 'Masculino',
+    'f': 'Feminino', 'feminino': 'Feminino', 'fem': 'Feminino',
+}
+
+
+def _pick(raw: Dict[str, Any], keys: Tuple[str, ...]):
+    for key in keys:
+        if key in raw:
+            return raw[key]
+    return None
+
+
+def _present(raw: Dict[str, Any], fields: Dict[str, Tuple[str, ...]]) -> frozenset:
+    """Campos do modelo que a fonte traz (alguma das chaves aceitas existe no registro)"""
+    return frozenset(field for field, keys in fields.items() if any(key in raw for key in keys))
+
+
+def _blank(value) -> bool:
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def _to_float(value):
+    if _blank(value):
+        return None
+    if isinstance(value, str):
+        value = value.strip().replace(',', '.')
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(number) or math.isinf(number) else number
+
+
+def _to_text(value, limit=None):
+    if _blank(value):
+        return ''
+    text = str(value).strip()
+    return text[:limit] if limit else text
+
+
+def natural_key(exame: Dict[str, Any]) -> Tuple[str, date]:
+    """Chave natural usada no upsert: (nome do paciente, data do exame já convertida)
+
+    A data tipada torna equivalentes '01/02/2024' dos arquivos e '2024-02-01'
+    gravado pelo formulário de novo exame.
+    """
+    return exame['nome_paciente'], exame['data_exame_dt']
+
+
+def normalize_record(raw: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """Converte um registro bruto em linhas de exame, parâmetros e laudo"""
+    nome = _to_text(_pick(raw, EXAM_FIELDS['nome_paciente']), 200)
+    if not nome:
+        raise ValidationError("Nome do paciente obrigatório", 'nome_paciente')
+
+    data_exame = _to_text(_pick(raw, EXAM_FIELDS['data_exame']))
+    data_exame_dt = parse_date(data_exame)
+    if data_exame_dt is None:
+        raise ValidationError(f"Data do exame inválida: '{data_exame}'", 'data_exame')
+
+    idade = _to_float(_pick(raw, EXAM_FIELDS['idade']))
+    if idade is None or not 0 <= idade <= 130:
+        raise ValidationError(f"Idade inválida: '{_pick(raw, EXAM_FIELDS['idade'])}'", 'idade')
+
+    sexo_bruto = _to_text(_pick(raw, EXAM_FIELDS['sexo']))
+    sexo = SEXO_NORMALIZADO.get(sexo_bruto.lower())
+    if not sexo:
+        raise ValidationError(f"Sexo inválido: '{sexo_bruto}'", 'sexo')
+
+    data_nascimento = _to_text(_pick(raw, EXAM_FIELDS['data_nascimento']), 10)
+
+    # A carga em lote não passa pelo ORM: as colunas tipadas vão junto
+    exame = {
+        'nome_paciente': nome,
+        'data_exame': data_exame,
+        'idade': int(idade),
+        'sexo': sexo,
+        'data_nascimento': data_nascimento,
+        'tipo_atendimento': _to_text(_pick(raw, EXAM_FIELDS['tipo_atendimento']), 50) or None,
+        'medico_usuario': _to_text(_pick(raw, EXAM_FIELDS['medico_usuario']), 200) or None,
+        'medico_solicitante': _to_text(_pick(raw, EXAM_FIELDS['medico_solicitante']), 200) or None,
+        'indicacao': _to_text(_pick(raw, EXAM_FIELDS['indicacao'])) or None,
+        'data_exame_dt': data_exame_dt,
+        'data_nascimento_dt': parse_date(data_nascimento),
+    }
+
+    parametros = {}
+    for field, keys in PARAMETER_FIELDS.items():
+        value = _to_float(_pick(raw, keys))
+        if value is not None and field in INTEGER_PARAMETERS:
+            value = int(round(value))
+        parametros[field] = value
+
+    laudo = {field: _to_text(_pick(raw, keys)) for field, keys in LAUDO_FIELDS.items()}
+
+    # Colunas ausentes da fonte não devem sobrescrever o que já está gravado
+    presentes_exame = _present(raw, EXAM_FIELDS) | {'data_exame_dt'}
+    if 'data_nascimento' in presentes_exame:
+        presentes_exame |= {'data_nascimento_dt'}
+    presentes = {
+        'exame': presentes_exame,
+        'parametros': _present(raw, PARAMETER_FIELDS),
+        'laudo': _present(raw, LAUDO_FIELDS),
+    }
+
+    return {'exame': exame, 'parametros': parametros, 'laudo': laudo, 'presentes': presentes}
+
+
+def validate_batch(raws: Iterable[Dict[str, Any]], first_index: int = 0
+                   ) -> Tuple[List[Dict[str, Dict[str, Any]]], List[Dict[str, Any]]]:
+    """Valida um lote; registros repetidos no lote mantêm a última ocorrência"""
+    validos: Dict[Tuple[str, str], Dict[str, Dict[str, Any]]] = {}
+    erros: List[Dict[str, Any]] = []
+
+    for offset, raw in enumerate(raws):
+        try:
+            record = normalize_record(raw)
+        except ValidationError as e:
+            erros.append({'registro': first_index + offset + 1, 'campo': e.field, 'erro': e.message})
+            continue
+        validos[natural_key(record['exame'])] = record
+
+    return list(validos.values()), erros
@@ -0,0 +1,258 @@
+"""
+Leitores em Streaming - CSV, JSON e SQL
+
+Cada leitor produz um registro (dict) por vez, sem carregar o arquivo
+inteiro na memória. Os registros saem com as chaves originais da fonte;
+a normalização para os campos dos modelos fica em mapping.py.
+"""
+
+import csv
+import json
+import os
+import re
+from typing import Dict, Iterator, List, Optional
+
+from modules.core.exceptions import FileProcessingError
+
+try:
+    import ijson  # Parser JSON incremental (opcional)
+except ImportError:
+    ijson = None
+
+CHUNK_SIZE = 64 * 1024
+
+# Ordem das colunas nos INSERTs de inserts_ecocardiograma_autenticos_*.sql
+# (o CREATE TABLE do arquivo lista menos colunas do que os VALUES contêm)
+SQL_COLUMNS = (
+    'id', 'nome_paciente', 'data_exame', 'idade', 'sexo', 'peso',
+    'atrio_esquerdo_mm', 'raiz_aorta_mm', 'relacao_ae_ao', 'aorta_ascendente_mm',
+    'diametro_vd_mm', 'diametro_basal_vd_mm', 'ddve_mm', 'dsve_mm',
+    'percentual_encurtamento', 'septo_mm', 'parede_posterior_mm', 'relacao_septo_pp',
+    'volume_diastolico_final_ml', 'volume_sistolico_final_ml', 'volume_ejecao_ml',
+    'volume_ejecao_calculado', 'fracao_ejecao_pct', 'massa_ve_g', 'indice_massa_ve_g_m2',
+    'fluxo_pulmonar_ms', 'fluxo_mitral_ms', 'fluxo_aortico_ms', 'fluxo_tricuspide_ms',
+    'gradiente_vd_ap_mmhg', 'gradiente_ae_ve_mmhg', 'gradiente_ve_ao_mmhg', 'gradiente_ad_vd_mmhg',
+    'modo_m_bidimensional', 'doppler_convencional', 'conclusao_laudo', 'ritmo_cardiaco',
+    'fonte_dados', 'data_exportacao'
+)
+
+_INSERT_PREFIX = re.compile(r'^\s*INSERT\s+INTO\s+[\w."]+\s*(\(([^)]*)\))?\s*VALUES\s*', re.IGNORECASE)
+_NUMBER = re.compile(r'^-?\d+(\.\d+)?([eE][-+]?\d+)?$')
+
+
+def detect_format(path: str) -> str:
+    """Formato pelo sufixo do arquivo"""
+    extension = os.path.splitext(path)[1].lower().lstrip('.')
+    if extension not in ('csv', 'json', 'sql'):
+        raise FileProcessingError(f"Formato não suportado: {extension}", path)
+    return extension
+
+
+def iter_records(path: str, formato: Optional[str] = None) -> Iterator[Dict]:
+    """Itera os registros do arquivo no formato informado (ou detectado)"""
+    if not os.path.exists(path):
+        raise FileProcessingError("Arquivo não encontrado", path)
+
+    formato = formato or detect_format(path)
+    readers = {'csv': iter_csv, 'json': iter_json, 'sql': iter_sql}
+    return readers[formato](path)
+
+
+# ===== CSV =====
+
+def iter_csv(path: str) -> Iterator[Dict]:
+    """Registros de um CSV com cabeçalho"""
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        for row in csv.DictReader(f):
+            yield row
+
+
+# ===== JSON =====
+
+def iter_json(path: str, key: str = 'pacientes') -> Iterator[Dict]:
+    """Registros da lista `key` (ou da raiz, se for uma lista)"""
+    if ijson is not None:
+        with open(path, 'rb') as f:
+            prefix = 'item' if _json_root_is_list(path) else f'{key}.item'
+            for item in ijson.items(f, prefix, use_float=True):
+                yield item
+        return
+
+    yield from _iter_json_array(path, key)
+
+
+def _json_root_is_list(path: str) -> bool:
+    with open(path, 'r', encoding='utf-8') as f:
+        while True:
+            char = f.read(1)
+            if not char:
+                return False
+            if not char.isspace():
+                return char == '['
+
+
+def _iter_json_array(path: str, key: str) -> Iterator[Dict]:
+    """Decodifica os objetos do array um a um com raw_decode sobre um buffer"""
+    decoder = json.JSONDecoder()
+
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer = ''
+        eof = False
+
+        def fill():
+            nonlocal buffer, eof
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                eof = True
+            buffer += chunk
+
+        # Localizar o início do array
+        if _json_root_is_list(path):
+            marker = None
+        else:
+            marker = f'"{key}"'
+
+        start = -1
+        while start < 0:
+            fill()
+            if marker is None:
+                start = buffer.find('[')
+            else:
+                pos = buffer.find(marker)
+                if pos >= 0:
+                    start = buffer.find('[', pos)
+                else:
+                    # Mantém só o final do buffer para o marcador não ser cortado
+                    buffer = buffer[-len(marker):]
+            if start < 0 and eof:
+                raise FileProcessingError(f"Lista '{key}' não encontrada no JSON", path)
+
+        buffer = buffer[start + 1:]
+        pos = 0
+
+        while True:
+            # Pular separadores
+            while True:
+                while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                    pos += 1
+                if pos < len(buffer) or eof:
+                    break
+                buffer, pos = buffer[pos:], 0
+                fill()
+
+            if pos >= len(buffer) or buffer[pos] == ']':
+                return
+
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise FileProcessingError("JSON truncado ou inválido", path)
+                buffer, pos = buffer[pos:], 0
+                fill()
+                continue
+
+            yield item
+            pos = end
+
+
+# ===== SQL =====
+
+def iter_sql(path: str, columns=SQL_COLUMNS) -> Iterator[Dict]:
+    """Registros dos comandos INSERT ... VALUES (...) de um dump SQL"""
+    for statement in _iter_statements(path):
+        match = _INSERT_PREFIX.match(statement)
+        if not match:
+            continue
+
+        names = [c.strip().strip('"') for c in match.group(2).split(',')] if match.group(2) else columns
+        for values in _parse_value_tuples(statement[match.end():]):
+            if len(values) != len(names):
+                raise FileProcessingError(
+                    f"INSERT com {len(values)} valores para {len(names)} colunas", path)
+            yield dict(zip(names, values))
+
+
+def _iter_statements(path: str) -> Iterator[str]:
+    """Comandos SQL terminados em ';' fora de strings e comentários"""
+    with open(path, 'r', encoding='utf-8') as f:
+        current: List[str] = []
+        in_string = False
+
+        for line in f:
+            if not in_string and not current and line.lstrip().startswith('--'):
+                continue
+
+            inicio = 0
+            i = 0
+            while i < len(line):
+                char = line[i]
+                if char == "'":
+                    in_string = not in_string
+                elif char == ';' and not in_string:
+                    current.append(line[inicio:i])
+                    statement = ''.join(current).strip()
+                    if statement:
+                        yield statement
+                    current = []
+                    inicio = i + 1
+                i += 1
+            current.append(line[inicio:])
+
+        resto = ''.join(current).strip()
+        if resto:
+            yield resto
+
+
+def _parse_value_tuples(text: str) -> Iterator[list]:
+    """Tuplas de VALUES (a, 'b', NULL), (...) com aspas escapadas por ''"""
+    i, n = 0, len(text)
+
+    while i < n:
+        while i < n and text[i] in ' \t\r\n,':
+            i += 1
+        if i >= n or text[i] != '(':
+            return
+        i += 1
+
+        values = []
+        while True:
+            while i < n and text[i] in ' \t\r\n':
+                i += 1
+
+            if text[i] == "'":
+                i += 1
+                parts = []
+                while True:
+                    j = text.index("'", i)
+                    parts.append(text[i:j])
+                    if j + 1 < n and text[j + 1] == "'":
+                        parts.append("'")
+                        i = j + 2
+                    else:
+                        i = j + 1
+                        break
+                values.append(''.join(parts))
+            else:
+                j = i
+                while j < n and text[j] not in ',)':
+                    j += 1
+                token = text[i:j].strip()
+                i = j
+                if token.upper() == 'NULL':
+                    values.append(None)
+                elif _NUMBER.match(token):
+                    values.append(float(token) if any(c in token for c in '.eE') else int(token))
+                else:
+                    values.append(token)
+
+            while i < n and text[i] in ' \t\r\n':
+                i += 1
+            if text[i] == ',':
+                i += 1
+                continue
+            if text[i] == ')':
+                i += 1
+                break
+
+        yield values
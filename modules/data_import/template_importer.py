@@ -0,0 +1,169 @@
+"""
+Importador de Templates de Laudo - Carga em tabela de sombra e mescla atômica
+
+Os templates são carregados em lotes numa tabela temporária e mesclados em
+laudos_templates numa única transação (upsert por diagnóstico). Enquanto a
+importação não termina, a busca continua vendo o catálogo anterior completo.
+"""
+
+import json
+import logging
+import time
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator
+
+from sqlalchemy import (Boolean, Column, DateTime, MetaData, String, Table, Text,
+                        and_, exists, insert, literal, select, update)
+
+from app import db
+from models import LaudoTemplate, datetime_brasilia
+from modules.core.exceptions import FileProcessingError, ValidationError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 1000
+
+# campo do modelo -> chaves aceitas na fonte (JSON do banco de laudos ou nomes do modelo)
+TEMPLATE_FIELDS = {
+    'categoria': ('Categoria', 'categoria'),
+    'diagnostico': ('Diagnóstico', 'diagnostico'),
+    'modo_m_bidimensional': ('Modo_M_Bidimensional', 'modo_m_bidimensional'),
+    'doppler_convencional': ('Doppler_Convencional', 'doppler_convencional'),
+    'doppler_tecidual': ('Doppler_Tecidual', 'doppler_tecidual'),
+    'conclusao': ('Conclusão', 'conclusao'),
+}
+
+CONTENT_FIELDS = ('categoria', 'modo_m_bidimensional', 'doppler_convencional', 'doppler_tecidual', 'conclusao')
+
+
+def normalize_template(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """Converte um registro da fonte em colunas de LaudoTemplate"""
+    row = {}
+    for field, keys in TEMPLATE_FIELDS.items():
+        value = next((raw[k] for k in keys if k in raw), None)
+        row[field] = str(value).strip() if value is not None else ''
+
+    if not row['diagnostico']:
+        raise ValidationError("Diagnóstico obrigatório", 'diagnostico')
+    row['diagnostico'] = row['diagnostico'][:200]
+    row['categoria'] = (row['categoria'] or 'Adulto')[:50]
+    return row
+
+
+class TemplateImporter:
+    """Importação de templates via tabela de sombra"""
+
+    def __init__(self, batch_size: int = DEFAULT_BATCH_SIZE, deactivate_missing: bool = False):
+        self.batch_size = batch_size
+        self.deactivate_missing = deactivate_missing
+        self.templates = LaudoTemplate.__table__
+
+    def _staging_table(self) -> Table:
+        """Tabela temporária com as colunas de conteúdo (uma por conexão)"""
+        return Table(
+            'laudos_templates_staging', MetaData(),
+            Column('categoria', String(50), nullable=False),
+            Column('diagnostico', String(200), primary_key=True),
+            Column('modo_m_bidimensional', Text),
+            Column('doppler_convencional', Text),
+            Column('doppler_tecidual', Text),
+            Column('conclusao', Text),
+            prefixes=['TEMPORARY']
+        )
+
+    def import_file(self, path: str) -> Dict[str, Any]:
+        """Importa o JSON do banco de laudos (lista de templates)"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            raise FileProcessingError(f"Não foi possível ler os templates: {e}", path)
+
+        if isinstance(data, dict):
+            data = data.get('templates') or data.get('laudos') or []
+        return self.import_records(data)
+
+    def import_records(self, raws: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """Carrega os templates na tabela de sombra e mescla em uma transação"""
+        inicio = time.perf_counter()
+        stats = {'lidos': 0, 'invalidos': 0, 'erros': [], 'inseridos': 0,
+                 'atualizados': 0, 'desativados': 0, 'lotes': 0}
+        staging = self._staging_table()
+
+        with db.engine.begin() as conn:
+            # Índice da chave de mescla (bancos criados antes de index=True no modelo)
+            for index in self.templates.indexes:
+                index.create(conn, checkfirst=True)
+
+            staging.drop(conn, checkfirst=True)
+            staging.create(conn)
+            try:
+                for batch in self._batches(raws, stats):
+                    conn.execute(insert(staging), batch)
+                    stats['lotes'] += 1
+
+                if stats['lotes'] == 0:
+                    raise ValidationError("Nenhum template válido para importar", 'templates')
+
+                self._merge(conn, staging, stats)
+            finally:
+                staging.drop(conn, checkfirst=True)
+
+        stats['duracao_s'] = round(time.perf_counter() - inicio, 3)
+        logger.info(
+            f"Templates importados: {stats['inseridos']} novos, {stats['atualizados']} atualizados, "
+            f"{stats['desativados']} desativados, {stats['invalidos']} inválidos em {stats['duracao_s']}s"
+        )
+        return stats
+
+    def _batches(self, raws: Iterable[Dict[str, Any]], stats: Dict[str, Any]) -> Iterator[list]:
+        """Lotes validados, sem diagnósticos repetidos (a última ocorrência prevalece)"""
+        vistos: Dict[str, Dict[str, Any]] = {}
+        for index, raw in enumerate(raws, start=1):
+            stats['lidos'] += 1
+            try:
+                row = normalize_template(raw)
+            except ValidationError as e:
+                stats['invalidos'] += 1
+                stats['erros'].append({'registro': index, 'campo': e.field, 'erro': e.message})
+                continue
+            vistos.pop(row['diagnostico'], None)
+            vistos[row['diagnostico']] = row
+
+        rows = iter(vistos.values())
+        while True:
+            batch = list(islice(rows, self.batch_size))
+            if not batch:
+                return
+            yield batch
+
+    def _merge(self, conn, staging: Table, stats: Dict[str, Any]) -> None:
+        """Upsert por diagnóstico da tabela de sombra para laudos_templates"""
+        t, s = self.templates, staging
+        agora = datetime_brasilia()
+        mesmo_diagnostico = s.c.diagnostico == t.c.diagnostico
+        presente = exists().where(mesmo_diagnostico)
+
+        valores = {field: select(s.c[field]).where(mesmo_diagnostico).scalar_subquery()
+                   for field in CONTENT_FIELDS}
+        result = conn.execute(
+            update(t).where(presente).values(ativo=True, updated_at=agora, **valores)
+        )
+        stats['atualizados'] = result.rowcount
+
+        novos = select(*[s.c[f] for f in ('diagnostico',) + CONTENT_FIELDS],
+                       literal(True, Boolean), literal(agora, DateTime), literal(agora, DateTime)
+                       ).where(~exists().where(t.c.diagnostico == s.c.diagnostico))
+        result = conn.execute(
+            insert(t).from_select(
+                ['diagnostico', *CONTENT_FIELDS, 'ativo', 'created_at', 'updated_at'], novos
+            )
+        )
+        stats['inseridos'] = result.rowcount
+
+        if self.deactivate_missing:
+            result = conn.execute(
+                update(t).where(and_(t.c.ativo.is_(True), ~presente))
+                .values(ativo=False, updated_at=agora)
+            )
+            stats['desativados'] = result.rowcount
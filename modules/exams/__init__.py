@@ -8,9 +8,21 @@ incluindo criação, edição, parâmetros e cálculos.
 from .exam_service import ExamService
 from .parameter_service import ParameterService
 from .calculation_service import CalculationService
+from .exam_repository import ExamAggregateRepository, ExamAggregate
+from .rollup_service import ExamRollupService
+from .trend_service import PatientTrendService
+from .patient_history import PatientHistoryService
+from .reference_ranges import AbnormalityService, reference_ranges
 
 __all__ = [
     'ExamService',
     'ParameterService', 
-    'CalculationService'
+    'CalculationService',
+    'ExamAggregateRepository',
+    'ExamAggregate',
+    'ExamRollupService',
+    'PatientTrendService',
+    'PatientHistoryService',
+    'AbnormalityService',
+    'reference_ranges'
 ]
\ No newline at end of file
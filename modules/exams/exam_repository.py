@@ -0,0 +1,154 @@
+"""
+Repositório de Agregado de Exame - Carregamento antecipado para leitura
+
+Carrega o exame com parâmetros, laudos e médico responsável em uma única
+consulta (joinedload + join externo com médicos) e devolve um DTO compacto,
+somente leitura, consumido por templates e geradores de PDF. O resultado
+fica em cache durante a requisição.
+"""
+
+from typing import Optional, Tuple
+from flask import g, abort, has_request_context
+from sqlalchemy import and_, func, select
+from sqlalchemy.orm import joinedload
+
+from app import db
+from models import Exame, ParametrosEcocardiograma, LaudoEcocardiograma, Medico
+
+
+class ReadOnlySnapshot:
+    """Base para DTOs imutáveis com __slots__"""
+
+    __slots__ = ()
+
+    def __init__(self, **values):
+        for name in self.__slots__:
+            object.__setattr__(self, name, values.get(name))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} é somente leitura")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} é somente leitura")
+
+    def __repr__(self):
+        return f"<{type(self).__name__} id={getattr(self, 'id', None)}>"
+
+    @classmethod
+    def from_model(cls, instance):
+        """Copia as colunas da instância ORM para o DTO"""
+        if instance is None:
+            return None
+        return cls(**{name: getattr(instance, name, None) for name in cls.__slots__})
+
+    def to_dict(self):
+        """Dicionário com os campos do DTO"""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def _snapshot_class(name, model):
+    """Cria um DTO com um slot por coluna do modelo"""
+    columns = tuple(column.key for column in model.__table__.columns)
+    return type(name, (ReadOnlySnapshot,), {'__slots__': columns})
+
+
+ParametrosSnapshot = _snapshot_class('ParametrosSnapshot', ParametrosEcocardiograma)
+LaudoSnapshot = _snapshot_class('LaudoSnapshot', LaudoEcocardiograma)
+
+
+def first_laudo_id():
+    """Subconsulta correlacionada ao Exame: id do laudo principal (primeiro registrado)
+
+    Mesmo critério de ExamAggregate.laudo, para consultas que juntam um
+    único laudo por exame (LaudoEcocardiograma.id == first_laudo_id()).
+    """
+    return (
+        select(func.min(LaudoEcocardiograma.id))
+        .where(LaudoEcocardiograma.exame_id == Exame.id)
+        .correlate(Exame).scalar_subquery()
+    )
+
+
+class MedicoSnapshot(ReadOnlySnapshot):
+    """Dados do médico responsável (sem a imagem da assinatura)"""
+
+    __slots__ = ('id', 'nome', 'crm', 'assinatura_url', 'ativo')
+
+
+class ExamAggregate(ReadOnlySnapshot):
+    """Exame com parâmetros, laudos e médico responsável"""
+
+    __slots__ = tuple(column.key for column in Exame.__table__.columns) + (
+        'parametros', 'laudos', 'medico'
+    )
+
+    @property
+    def laudo(self) -> Optional[LaudoSnapshot]:
+        """Laudo principal (primeiro registrado)"""
+        return self.laudos[0] if self.laudos else None
+
+
+class ExamAggregateRepository:
+    """Repositório de leitura do agregado de exame"""
+
+    CACHE_KEY = '_exam_aggregates'
+
+    @staticmethod
+    def _query():
+        """Consulta única: exame + parâmetros + laudos + médico ativo pelo nome"""
+        return db.session.query(Exame, Medico)\
+            .outerjoin(Medico, and_(Medico.nome == Exame.medico_usuario, Medico.ativo.is_(True)))\
+            .options(joinedload(Exame.parametros), joinedload(Exame.laudos))
+
+    @staticmethod
+    def _build(exam: Exame, medico: Optional[Medico]) -> ExamAggregate:
+        laudos: Tuple[LaudoSnapshot, ...] = tuple(
+            LaudoSnapshot.from_model(laudo)
+            for laudo in sorted(exam.laudos, key=lambda laudo: laudo.id or 0)
+        )
+
+        values = {column.key: getattr(exam, column.key) for column in Exame.__table__.columns}
+        values.update({
+            'parametros': ParametrosSnapshot.from_model(exam.parametros),
+            'laudos': laudos,
+            'medico': MedicoSnapshot.from_model(medico)
+        })
+        return ExamAggregate(**values)
+
+    @staticmethod
+    def _cache() -> dict:
+        if not has_request_context():
+            return {}
+        if ExamAggregateRepository.CACHE_KEY not in g:
+            setattr(g, ExamAggregateRepository.CACHE_KEY, {})
+        return getattr(g, ExamAggregateRepository.CACHE_KEY)
+
+    @staticmethod
+    def get(exam_id: int) -> Optional[ExamAggregate]:
+        """Obtém o agregado do exame (cache por requisição)"""
+        cache = ExamAggregateRepository._cache()
+        if exam_id in cache:
+            return cache[exam_id]
+
+        row = ExamAggregateRepository._query().filter(Exame.id == exam_id).first()
+        aggregate = ExamAggregateRepository._build(*row) if row else None
+
+        cache[exam_id] = aggregate
+        return aggregate
+
+    @staticmethod
+    def get_or_404(exam_id: int) -> ExamAggregate:
+        """Obtém o agregado ou aborta com 404"""
+        aggregate = ExamAggregateRepository.get(exam_id)
+        if aggregate is None:
+            abort(404)
+        return aggregate
+
+    @staticmethod
+    def invalidate(exam_id: Optional[int] = None) -> None:
+        """Descarta o cache da requisição após alterações"""
+        cache = ExamAggregateRepository._cache()
+        if exam_id is None:
+            cache.clear()
+        else:
+            cache.pop(exam_id, None)
@@ -6,7 +6,7 @@ eliminando duplicação de código e implementando padrões anti-bug.
 """
 
 from typing import Dict, List, Optional, Any
-from datetime import datetime
+from datetime import datetime, timedelta
 from models import Exame
 from modules.core.database import DatabaseManager
 from modules.core.validators import DataValidator
@@ -132,11 +132,12 @@ class ExamService:
             from sqlalchemy import func
             from app import db
             
-            today = datetime.now().date()
-            week_ago = datetime.now().date().replace(day=datetime.now().day - 7)
+            from modules.core.dates import day_bounds, today_brasilia
+            
+            week_ago = today_brasilia() - timedelta(days=7)
             
             exams_this_week = db.session.query(Exame).filter(
-                func.date(Exame.created_at) >= week_ago
+                Exame.created_at >= day_bounds(week_ago)[0]
             ).count()
             
             stats.update({
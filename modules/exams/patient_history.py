@@ -0,0 +1,117 @@
+"""
+Histórico do Paciente - Lista resumida com paginação por chave
+
+O prontuário carregava todos os exames do paciente e o template tocava as
+relações preguiçosas de parâmetros e laudos em cada linha. Agora a lista
+vem de uma projeção resumida (datas, solicitante, FE e trecho da
+conclusão) em páginas ordenadas por (created_at, id) decrescentes. A página
+seguinte parte da última chave vista (cursor) em vez de OFFSET, então cada
+página custa o mesmo pelo índice (nome_paciente, created_at, id), por mais
+longo que seja o acompanhamento. O exame completo só é carregado ao abrir.
+"""
+
+import base64
+import binascii
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import and_, desc, func, or_, select
+
+from app import db
+from models import Exame, ParametrosEcocardiograma, LaudoEcocardiograma
+from modules.core.exceptions import ValidationError
+from .exam_repository import ReadOnlySnapshot, first_laudo_id
+
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+SNIPPET_LENGTH = 160
+
+
+class ExamSummary(ReadOnlySnapshot):
+    """Linha do histórico: só o que a lista exibe"""
+
+    __slots__ = ('id', 'data_exame', 'created_at', 'tipo_atendimento', 'medico_solicitante',
+                 'indicacao', 'fracao_ejecao', 'conclusao')
+
+    def to_dict(self):
+        valores = super().to_dict()
+        valores['created_at'] = self.created_at.isoformat() if self.created_at else None
+        return valores
+
+
+class PatientHeader(ReadOnlySnapshot):
+    """Dados do paciente (último exame) e totais do histórico"""
+
+    __slots__ = ('nome_paciente', 'data_nascimento', 'idade', 'sexo',
+                 'total_exames', 'ultimo_exame', 'primeiro_exame')
+
+
+def encode_cursor(created_at: Optional[datetime], exam_id: int) -> str:
+    """Cursor opaco com a chave (created_at, id) da última linha da página"""
+    chave = f"{created_at.isoformat() if created_at else ''}|{exam_id}"
+    return base64.urlsafe_b64encode(chave.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        chave = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, exam_id = chave.rsplit('|', 1)
+        return datetime.fromisoformat(created_at), int(exam_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValidationError('Cursor de paginação inválido')
+
+
+class PatientHistoryService:
+    """Consultas do histórico resumido do prontuário"""
+
+    @staticmethod
+    def header(nome_paciente: str) -> Optional[PatientHeader]:
+        """Último exame do paciente com total e data do primeiro (uma consulta)"""
+        do_paciente = Exame.nome_paciente == nome_paciente
+        total = select(func.count(Exame.id)).where(do_paciente).scalar_subquery()
+        primeiro = (
+            select(Exame.data_exame).where(do_paciente)
+            .order_by(Exame.created_at, Exame.id).limit(1).scalar_subquery()
+        )
+        row = db.session.execute(
+            select(Exame.nome_paciente, Exame.data_nascimento, Exame.idade, Exame.sexo,
+                   total.label('total_exames'), Exame.data_exame.label('ultimo_exame'),
+                   primeiro.label('primeiro_exame'))
+            .where(do_paciente)
+            .order_by(desc(Exame.created_at), desc(Exame.id))
+            .limit(1)
+        ).first()
+        return PatientHeader(**row._asdict()) if row else None
+
+    @staticmethod
+    def summary_page(nome_paciente: str, cursor: Optional[str] = None,
+                     limit: int = PAGE_SIZE) -> Dict[str, Any]:
+        """Página de exames mais recentes primeiro, a partir do cursor"""
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+
+        # Laudo principal (primeiro registrado), como no agregado do exame
+        consulta = (
+            select(Exame.id, Exame.data_exame, Exame.created_at, Exame.tipo_atendimento,
+                   Exame.medico_solicitante, func.substr(Exame.indicacao, 1, 100).label('indicacao'),
+                   ParametrosEcocardiograma.fracao_ejecao,
+                   func.substr(LaudoEcocardiograma.conclusao, 1, SNIPPET_LENGTH).label('conclusao'))
+            .outerjoin(ParametrosEcocardiograma, ParametrosEcocardiograma.exame_id == Exame.id)
+            .outerjoin(LaudoEcocardiograma, LaudoEcocardiograma.id == first_laudo_id())
+            .where(Exame.nome_paciente == nome_paciente)
+            .order_by(desc(Exame.created_at), desc(Exame.id))
+            .limit(limit + 1)
+        )
+        if cursor:
+            created_at, exam_id = decode_cursor(cursor)
+            consulta = consulta.where(or_(
+                Exame.created_at < created_at,
+                and_(Exame.created_at == created_at, Exame.id < exam_id)
+            ))
+
+        linhas = db.session.execute(consulta).all()
+        exames = [ExamSummary(**linha._asdict()) for linha in linhas[:limit]]
+        proximo = None
+        if len(linhas) > limit:
+            proximo = encode_cursor(exames[-1].created_at, exames[-1].id)
+
+        return {'exames': exames, 'proximo_cursor': proximo}
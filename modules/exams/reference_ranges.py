@@ -0,0 +1,321 @@
+"""
+Valores de Referência - Tabela compilada e achados em máscara de bits
+
+As faixas normais de cada parâmetro variam por sexo, faixa etária e faixa
+de superfície corporal. As regras abaixo são compiladas uma única vez, na
+importação, em duas matrizes NumPy (mínimos e máximos) indexadas por
+(sexo, faixa etária, faixa de SC, parâmetro); consultar a faixa de um
+exame é só indexar a matriz, sem montar dicionários a cada chamada.
+
+Os achados (FE reduzida, AE dilatado, ...) são calculados ao gravar os
+parâmetros - um exame ou um lote inteiro da importação, de forma
+vetorizada - e guardados na coluna indexada `anormalidades` como máscara de
+bits. "Exames com FE < 40% e AE dilatado" vira uma consulta pelo índice:
+quem tem todos os bits de uma máscara tem valor >= máscara, e os achados
+mais específicos ocupam os bits mais altos, então o limite inferior
+descarta pelo índice os exames normais e os de achados comuns.
+"""
+
+import math
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import and_, select
+
+from app import db
+from models import Exame, ParametrosEcocardiograma
+from modules.core.exceptions import ValidationError
+
+# Parâmetros com faixa de referência (mm, %, bpm, g, g/m², mmHg)
+REFERENCE_PARAMETERS = (
+    'frequencia_cardiaca',
+    'atrio_esquerdo',
+    'raiz_aorta',
+    'aorta_ascendente',
+    'diametro_ventricular_direito',
+    'diametro_basal_vd',
+    'diametro_diastolico_final_ve',
+    'diametro_sistolico_final',
+    'percentual_encurtamento',
+    'espessura_diastolica_septo',
+    'espessura_diastolica_ppve',
+    'fracao_ejecao',
+    'massa_ve',
+    'indice_massa_ve',
+    'pressao_sistolica_vd',
+)
+
+# Estratos (código 0 = não informado, usa as regras gerais)
+SEX_CODES = {'Masculino': 1, 'Feminino': 2}
+AGE_BANDS = ((0, 17, 'pediatrico'), (18, 64, 'adulto'), (65, 200, 'idoso'))
+BSA_BANDS = ((0.0, 1.6, 'pequena'), (1.6, 2.0, 'media'), (2.0, math.inf, 'grande'))
+
+_ADULT_DIMENSIONS = ('atrio_esquerdo', 'raiz_aorta', 'aorta_ascendente', 'diametro_ventricular_direito',
+                     'diametro_basal_vd', 'diametro_diastolico_final_ve', 'diametro_sistolico_final',
+                     'espessura_diastolica_septo', 'espessura_diastolica_ppve', 'massa_ve', 'indice_massa_ve')
+
+# (parâmetro, mínimo, máximo, condições) aplicadas em ordem; a última que casa vale.
+# Condições: 'sexo', 'idade' e 'sc' com os rótulos dos estratos; None = sem limite.
+REFERENCE_RULES = (
+    ('frequencia_cardiaca', 60, 100, {}),
+    ('atrio_esquerdo', 27, 38, {}),
+    ('raiz_aorta', 21, 34, {}),
+    ('aorta_ascendente', None, 38, {}),
+    ('diametro_ventricular_direito', 7, 23, {}),
+    ('diametro_basal_vd', 25, 41, {}),
+    ('diametro_diastolico_final_ve', 35, 56, {}),
+    ('diametro_sistolico_final', 21, 40, {}),
+    ('percentual_encurtamento', 25, 45, {}),
+    ('espessura_diastolica_septo', 6, 11, {}),
+    ('espessura_diastolica_ppve', 6, 11, {}),
+    ('fracao_ejecao', 55, None, {}),
+    ('pressao_sistolica_vd', None, 35, {}),
+    # ASE/EACVI 2015: limites por sexo
+    ('atrio_esquerdo', 30, 40, {'sexo': 'Masculino'}),
+    ('diametro_diastolico_final_ve', 42, 58, {'sexo': 'Masculino'}),
+    ('diametro_diastolico_final_ve', 38, 52, {'sexo': 'Feminino'}),
+    ('diametro_sistolico_final', 25, 40, {'sexo': 'Masculino'}),
+    ('diametro_sistolico_final', 22, 35, {'sexo': 'Feminino'}),
+    ('espessura_diastolica_septo', 6, 10, {'sexo': 'Masculino'}),
+    ('espessura_diastolica_septo', 6, 9, {'sexo': 'Feminino'}),
+    ('espessura_diastolica_ppve', 6, 10, {'sexo': 'Masculino'}),
+    ('espessura_diastolica_ppve', 6, 9, {'sexo': 'Feminino'}),
+    ('fracao_ejecao', 52, None, {'sexo': 'Masculino'}),
+    ('fracao_ejecao', 54, None, {'sexo': 'Feminino'}),
+    ('indice_massa_ve', None, 115, {'sexo': 'Masculino'}),
+    ('indice_massa_ve', None, 95, {'sexo': 'Feminino'}),
+    # Sem superfície corporal não há índice de massa: vale a massa absoluta
+    ('massa_ve', None, 224, {'sexo': 'Masculino', 'sc': None}),
+    ('massa_ve', None, 162, {'sexo': 'Feminino', 'sc': None}),
+) + tuple(
+    # Dimensões pediátricas dependem do escore z pela SC: sem limite adulto
+    (parametro, None, None, {'idade': 'pediatrico'}) for parametro in _ADULT_DIMENSIONS
+)
+
+# (nome, parâmetro, lado, limite fixo ou None = faixa de referência, rótulo)
+# Ordem crescente de especificidade: os achados mais específicos nos bits mais altos
+ABNORMALITY_FLAGS = (
+    ('fc_baixa', 'frequencia_cardiaca', 'baixo', None, 'Bradicardia'),
+    ('fc_alta', 'frequencia_cardiaca', 'alto', None, 'Taquicardia'),
+    ('encurtamento_aumentado', 'percentual_encurtamento', 'alto', None, 'Encurtamento aumentado'),
+    ('ve_reduzido', 'diametro_diastolico_final_ve', 'baixo', None, 'Diâmetro diastólico do VE reduzido'),
+    ('raiz_aorta_dilatada', 'raiz_aorta', 'alto', None, 'Raiz da aorta dilatada'),
+    ('aorta_ascendente_dilatada', 'aorta_ascendente', 'alto', None, 'Aorta ascendente dilatada'),
+    ('vd_dilatado', 'diametro_ventricular_direito', 'alto', None, 'VD dilatado'),
+    ('vd_basal_dilatado', 'diametro_basal_vd', 'alto', None, 'Diâmetro basal do VD aumentado'),
+    ('septo_espessado', 'espessura_diastolica_septo', 'alto', None, 'Septo espessado'),
+    ('parede_posterior_espessada', 'espessura_diastolica_ppve', 'alto', None, 'Parede posterior espessada'),
+    ('massa_ve_aumentada', 'massa_ve', 'alto', None, 'Massa do VE aumentada'),
+    ('hipertrofia_ve', 'indice_massa_ve', 'alto', None, 'Índice de massa do VE aumentado'),
+    ('encurtamento_reduzido', 'percentual_encurtamento', 'baixo', None, 'Encurtamento reduzido'),
+    ('dsve_aumentado', 'diametro_sistolico_final', 'alto', None, 'Diâmetro sistólico do VE aumentado'),
+    ('ve_dilatado', 'diametro_diastolico_final_ve', 'alto', None, 'VE dilatado'),
+    ('ae_dilatado', 'atrio_esquerdo', 'alto', None, 'AE dilatado'),
+    ('psap_elevada', 'pressao_sistolica_vd', 'alto', None, 'PSAP elevada'),
+    ('fe_reduzida', 'fracao_ejecao', 'baixo', None, 'FE reduzida'),
+    ('fe_menor_40', 'fracao_ejecao', 'baixo', 40, 'FE < 40%'),
+    ('fe_menor_30', 'fracao_ejecao', 'baixo', 30, 'FE < 30%'),
+)
+FLAG_BITS = {nome: 1 << posicao for posicao, (nome, *_resto) in enumerate(ABNORMALITY_FLAGS)}
+
+
+class ReferenceRangeTable:
+    """Faixas de referência compiladas por (sexo, faixa etária, faixa de SC)"""
+
+    def __init__(self, rules=REFERENCE_RULES, parameters=REFERENCE_PARAMETERS, flags=ABNORMALITY_FLAGS):
+        self.parameters = tuple(parameters)
+        self.flags = tuple(flags)
+        forma = (len(SEX_CODES) + 1, len(AGE_BANDS) + 1, len(BSA_BANDS) + 1, len(self.parameters))
+        self.minimums = np.full(forma, -np.inf)
+        self.maximums = np.full(forma, np.inf)
+        self._compile(rules)
+
+        # Limites de cada bit como vetores: lado, coluna do parâmetro e limite fixo
+        posicoes = {parametro: i for i, parametro in enumerate(self.parameters)}
+        self._flag_columns = np.array([posicoes[parametro] for _, parametro, _, _, _ in self.flags])
+        self._flag_low = np.array([lado == 'baixo' for _, _, lado, _, _ in self.flags])
+        self._flag_fixed = np.array([np.nan if limite is None else limite for _, _, _, limite, _ in self.flags])
+        self._flag_weights = np.array([1 << i for i in range(len(self.flags))], dtype=np.int64)
+
+        # Dicionários por estrato para quem exibe as faixas (somente leitura)
+        self._dicts: Dict[Tuple[int, int, int], Dict[str, Dict[str, float]]] = {}
+
+    def _compile(self, rules) -> None:
+        codigos = (
+            {None: 0, **SEX_CODES},
+            {rotulo: codigo for codigo, (_, _, rotulo) in enumerate(AGE_BANDS, start=1)},
+            {None: 0, **{rotulo: codigo for codigo, (_, _, rotulo) in enumerate(BSA_BANDS, start=1)}},
+        )
+        for parametro, minimo, maximo, condicoes in rules:
+            indice = np.ix_(*(
+                [codigos[eixo][condicoes[nome]]] if nome in condicoes else list(range(self.minimums.shape[eixo]))
+                for eixo, nome in enumerate(('sexo', 'idade', 'sc'))
+            ), [self.parameters.index(parametro)])
+            self.minimums[indice] = -np.inf if minimo is None else minimo
+            self.maximums[indice] = np.inf if maximo is None else maximo
+
+    # ===== ESTRATOS =====
+
+    def stratum(self, sexo: Optional[str], idade: Optional[float],
+                superficie_corporal: Optional[float]) -> Tuple[int, int, int]:
+        s, a, b = self.strata([sexo], np.array([idade], dtype=np.float64),
+                              np.array([superficie_corporal], dtype=np.float64))
+        return int(s[0]), int(a[0]), int(b[0])
+
+    @staticmethod
+    def strata(sexos: Sequence, idades: np.ndarray, superficies: np.ndarray):
+        """Códigos de estrato de um lote (vetorizado)"""
+        s = np.array([SEX_CODES.get(sexo, 0) for sexo in sexos], dtype=np.intp)
+        limites_idade = np.array([minimo for minimo, _, _ in AGE_BANDS] + [AGE_BANDS[-1][1] + 1])
+        a = np.searchsorted(limites_idade, idades, side='right')
+        a[(a > len(AGE_BANDS)) | np.isnan(idades)] = 0
+        limites_sc = np.array([minimo for minimo, _, _ in BSA_BANDS])
+        b = np.searchsorted(limites_sc, superficies, side='right')
+        b[np.isnan(superficies) | (superficies <= 0)] = 0
+        return s, a, b
+
+    def ranges(self, sexo: Optional[str] = None, idade: Optional[float] = None,
+               superficie_corporal: Optional[float] = None) -> Dict[str, Dict[str, float]]:
+        """Faixas do estrato no formato {'parametro': {'min': x, 'max': y}}"""
+        chave = self.stratum(sexo, idade, superficie_corporal)
+        faixas = self._dicts.get(chave)
+        if faixas is None:
+            faixas = {}
+            for p, parametro in enumerate(self.parameters):
+                minimo, maximo = self.minimums[chave][p], self.maximums[chave][p]
+                faixa = {}
+                if np.isfinite(minimo):
+                    faixa['min'] = float(minimo)
+                if np.isfinite(maximo):
+                    faixa['max'] = float(maximo)
+                if faixa:
+                    faixas[parametro] = faixa
+            self._dicts[chave] = faixas
+        return faixas
+
+    # ===== ACHADOS =====
+
+    def flags_many(self, sexos: Sequence, idades, colunas: Mapping[str, Any]) -> np.ndarray:
+        """Máscara de achados de um lote: colunas = {parâmetro: valores} (NaN/None = ausente)"""
+        n = len(sexos)
+        idades = np.asarray(idades, dtype=np.float64).reshape(n)
+        superficies = np.asarray(colunas.get('superficie_corporal', [None] * n), dtype=np.float64).reshape(n)
+        valores = np.column_stack([
+            np.asarray(colunas.get(parametro, [None] * n), dtype=np.float64).reshape(n)
+            for parametro in self.parameters
+        ]) if n else np.empty((0, len(self.parameters)))
+
+        s, a, b = self.strata(sexos, idades, superficies)
+        minimos, maximos = self.minimums[s, a, b], self.maximums[s, a, b]
+
+        # Limite de cada bit por linha: fixo quando definido, senão o do estrato
+        x = valores[:, self._flag_columns]
+        limites = np.where(self._flag_low, minimos[:, self._flag_columns], maximos[:, self._flag_columns])
+        limites = np.where(np.isnan(self._flag_fixed), limites, self._flag_fixed)
+        with np.errstate(invalid='ignore'):
+            ativos = np.where(self._flag_low, x < limites, x > limites)
+        return ativos.astype(np.int64) @ self._flag_weights
+
+    def flags_for_rows(self, sexos: Sequence, idades: Sequence, linhas: Sequence[Mapping[str, Any]]) -> np.ndarray:
+        """Máscara de achados de uma lista de dicionários de parâmetros"""
+        nomes = self.parameters + ('superficie_corporal',)
+        return self.flags_many(sexos, idades, {
+            nome: [linha.get(nome) for linha in linhas] for nome in nomes
+        })
+
+    def flags_for(self, parametros, sexo: Optional[str], idade: Optional[float]) -> int:
+        """Máscara de achados de um objeto de parâmetros"""
+        nomes = self.parameters + ('superficie_corporal',)
+        return int(self.flags_many([sexo], [idade], {
+            nome: [getattr(parametros, nome, None)] for nome in nomes
+        })[0])
+
+    def mask_of(self, nomes: Iterable[str]) -> int:
+        """Máscara dos achados pelo nome"""
+        mascara = 0
+        for nome in nomes:
+            if nome not in FLAG_BITS:
+                raise ValidationError(f'Achado desconhecido: {nome}')
+            mascara |= FLAG_BITS[nome]
+        return mascara
+
+    def describe(self, mascara: Optional[int]) -> List[Dict[str, str]]:
+        """Achados presentes na máscara, do mais específico ao mais comum"""
+        if not mascara:
+            return []
+        return [{'achado': nome, 'descricao': rotulo}
+                for nome, _, _, _, rotulo in reversed(self.flags) if mascara & FLAG_BITS[nome]]
+
+
+# Tabela global compilada na importação
+reference_ranges = ReferenceRangeTable()
+
+
+def get_reference_ranges() -> ReferenceRangeTable:
+    """Retorna a tabela global de valores de referência"""
+    return reference_ranges
+
+
+def flags_filter(column, mascara: int):
+    """Condição 'tem todos os achados': limite inferior pelo índice + teste dos bits"""
+    return and_(column >= mascara, column.op('&')(mascara) == mascara)
+
+
+class AbnormalityService:
+    """Achados gravados com os parâmetros e consultas pela máscara"""
+
+    @staticmethod
+    def refresh_for_exam(connection, exame_id: int, sexo: Optional[str], idade: Optional[float]) -> None:
+        """Recalcula os achados quando sexo ou idade do exame mudam"""
+        P = ParametrosEcocardiograma.__table__
+        nomes = REFERENCE_PARAMETERS + ('superficie_corporal',)
+        for linha in connection.execute(select(P.c.id, *(P.c[nome] for nome in nomes))
+                                        .where(P.c.exame_id == exame_id)):
+            flags = reference_ranges.flags_for_rows([sexo], [idade], [dict(zip(nomes, linha[1:]))])
+            connection.execute(P.update().where(P.c.id == linha[0]).values(anormalidades=int(flags[0])))
+
+    @staticmethod
+    def stamp(connection, target) -> None:
+        """Grava a máscara nos parâmetros antes do INSERT/UPDATE pelo ORM"""
+        exame = target.__dict__.get('exame')
+        if exame is not None:
+            sexo, idade = exame.sexo, exame.idade
+        elif target.exame_id is not None:
+            linha = connection.execute(
+                select(Exame.sexo, Exame.idade).where(Exame.id == target.exame_id)
+            ).first()
+            sexo, idade = linha if linha else (None, None)
+        else:
+            sexo, idade = None, None
+        target.anormalidades = reference_ranges.flags_for(target, sexo, idade)
+
+    @staticmethod
+    def find_exams(achados: Sequence[str], limit: int = 50,
+                   before_id: Optional[int] = None) -> Dict[str, Any]:
+        """Exames com todos os achados, mais recentes (maior id) primeiro"""
+        mascara = reference_ranges.mask_of(achados)
+        if not mascara:
+            raise ValidationError('Informe ao menos um achado')
+        limit = max(1, min(int(limit), 200))
+
+        P = ParametrosEcocardiograma
+        consulta = (
+            select(Exame.id, Exame.nome_paciente, Exame.data_exame, Exame.idade, Exame.sexo,
+                   P.fracao_ejecao, P.anormalidades)
+            .join(P, P.exame_id == Exame.id)
+            .where(flags_filter(P.anormalidades, mascara))
+            .order_by(Exame.id.desc())
+            .limit(limit + 1)
+        )
+        if before_id:
+            consulta = consulta.where(P.exame_id < before_id)
+
+        linhas = db.session.execute(consulta).all()
+        exames = [{**linha._asdict(), 'achados': reference_ranges.describe(linha.anormalidades)}
+                  for linha in linhas[:limit]]
+        for exame in exames:
+            exame.pop('anormalidades')
+        return {
+            'exames': exames,
+            'proximo': exames[-1]['id'] if len(linhas) > limit else None
+        }
@@ -0,0 +1,197 @@
+"""
+Resumo Diário de Exames - Agregados para relatórios
+
+Mantém em exames_resumo_diario o total de exames por dia do exame, sexo,
+faixa etária, tipo de atendimento e médico solicitante. Cada gravação de
+exame pelo ORM ajusta a linha da chave antiga (-1) e da nova (+1) na mesma
+transação; a importação em lote recalcula os dias que tocou. Relatórios de
+qualquer período somam poucas centenas de linhas do resumo em vez de
+varrer a tabela de exames.
+
+`rebuild()` (comando `flask --app main rebuild-rollups`) recalcula tudo
+ou um período a partir da tabela de exames.
+"""
+
+import logging
+from collections import Counter
+from datetime import date
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import and_, delete, func, insert, select, update
+
+from app import db
+from models import Exame, ExameResumoDiario
+
+logger = logging.getLogger('exam_rollups')
+
+# Mesmas faixas do relatório de estatísticas
+AGE_BANDS = (
+    (0, 17, 'Pediátrico'),
+    (18, 65, 'Adulto'),
+    (66, 150, 'Idoso'),
+)
+
+KEY_COLUMNS = ('dia', 'sexo', 'faixa_etaria', 'tipo_atendimento', 'medico_solicitante')
+NOT_INFORMED = 'Não informado'
+
+# Limite de valores por cláusula IN ao recalcular dias
+DAYS_BATCH = 500
+
+
+def age_band(idade: Optional[int]) -> str:
+    """Rótulo da faixa etária ('' fora das faixas ou sem idade)"""
+    if idade is None:
+        return ''
+    for minimo, maximo, rotulo in AGE_BANDS:
+        if minimo <= idade <= maximo:
+            return rotulo
+    return ''
+
+
+class ExamRollupService:
+    """Manutenção incremental e consulta do resumo diário"""
+
+    # ===== CHAVES =====
+
+    @staticmethod
+    def make_key(dia: Optional[date], sexo, idade, tipo_atendimento, medico_solicitante) -> Optional[Tuple]:
+        """Chave do resumo; None para exames sem data válida"""
+        if dia is None:
+            return None
+        return (dia, sexo or '', age_band(idade), (tipo_atendimento or '')[:50], (medico_solicitante or '')[:200])
+
+    @staticmethod
+    def key_of(exam) -> Optional[Tuple]:
+        return ExamRollupService.make_key(exam.data_exame_dt, exam.sexo, exam.idade,
+                                          exam.tipo_atendimento, exam.medico_solicitante)
+
+    @staticmethod
+    def stored_key(conn, exam_id: int) -> Optional[Tuple]:
+        """Chave do exame como está gravado (antes de update/delete)"""
+        row = conn.execute(
+            select(Exame.data_exame_dt, Exame.sexo, Exame.idade, Exame.tipo_atendimento, Exame.medico_solicitante)
+            .where(Exame.id == exam_id)
+        ).first()
+        return ExamRollupService.make_key(*row) if row else None
+
+    # ===== MANUTENÇÃO =====
+
+    @staticmethod
+    def apply(conn, key: Optional[Tuple], delta: int) -> None:
+        """Soma delta ao total da chave na transação corrente"""
+        if key is None or not delta:
+            return
+
+        tabela = ExameResumoDiario.__table__
+        valores = dict(zip(KEY_COLUMNS, key))
+
+        if conn.dialect.name in ('sqlite', 'postgresql'):
+            if conn.dialect.name == 'sqlite':
+                from sqlalchemy.dialects.sqlite import insert as dialect_insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert as dialect_insert
+            conn.execute(
+                dialect_insert(tabela).values(total=delta, **valores)
+                .on_conflict_do_update(index_elements=list(KEY_COLUMNS), set_={'total': tabela.c.total + delta})
+            )
+            return
+
+        # Demais bancos: atualiza e insere se a chave ainda não existe
+        filtro = and_(*(tabela.c[nome] == valor for nome, valor in valores.items()))
+        if conn.execute(update(tabela).where(filtro).values(total=tabela.c.total + delta)).rowcount == 0:
+            conn.execute(insert(tabela).values(total=delta, **valores))
+
+    @staticmethod
+    def _recount(conn, exam_filter=None, rollup_filter=None) -> int:
+        """Apaga e recalcula as linhas do resumo no escopo informado"""
+        tabela = ExameResumoDiario.__table__
+        conn.execute(delete(tabela).where(rollup_filter) if rollup_filter is not None else delete(tabela))
+
+        consulta = select(Exame.data_exame_dt, Exame.sexo, Exame.idade, Exame.tipo_atendimento,
+                          Exame.medico_solicitante)
+        if exam_filter is not None:
+            consulta = consulta.where(exam_filter)
+
+        totais = Counter()
+        for row in conn.execute(consulta.execution_options(yield_per=2000)):
+            chave = ExamRollupService.make_key(*row)
+            if chave is not None:
+                totais[chave] += 1
+
+        if totais:
+            conn.execute(insert(tabela), [dict(zip(KEY_COLUMNS, chave), total=total)
+                                          for chave, total in totais.items()])
+        return len(totais)
+
+    @staticmethod
+    def rebuild_days(conn, days: Iterable[date]) -> int:
+        """Recalcula os dias informados (usado pela importação em lote)"""
+        dias = sorted({d for d in days if d is not None})
+        linhas = 0
+        for start in range(0, len(dias), DAYS_BATCH):
+            lote = dias[start:start + DAYS_BATCH]
+            linhas += ExamRollupService._recount(conn, Exame.data_exame_dt.in_(lote),
+                                                 ExameResumoDiario.dia.in_(lote))
+        return linhas
+
+    @staticmethod
+    def rebuild(start: Optional[date] = None, end: Optional[date] = None) -> Dict[str, Any]:
+        """Recalcula o resumo inteiro ou de um período a partir dos exames"""
+        filtro_exames, filtro_resumo = [], []
+        if start:
+            filtro_exames.append(Exame.data_exame_dt >= start)
+            filtro_resumo.append(ExameResumoDiario.dia >= start)
+        if end:
+            filtro_exames.append(Exame.data_exame_dt <= end)
+            filtro_resumo.append(ExameResumoDiario.dia <= end)
+
+        with db.engine.begin() as conn:
+            linhas = ExamRollupService._recount(
+                conn,
+                and_(*filtro_exames) if filtro_exames else None,
+                and_(*filtro_resumo) if filtro_resumo else None,
+            )
+
+        resultado = {'linhas': linhas, 'inicio': start.isoformat() if start else None,
+                     'fim': end.isoformat() if end else None}
+        logger.info(f"Resumo diário recalculado: {resultado}")
+        return resultado
+
+    @staticmethod
+    def is_empty() -> bool:
+        return db.session.query(ExameResumoDiario.id).first() is None
+
+    # ===== CONSULTA =====
+
+    @staticmethod
+    def summarize(start: Optional[date] = None, end: Optional[date] = None) -> Dict[str, Any]:
+        """Totais do período (datas do exame, inclusive) por dimensão"""
+        consulta = select(
+            ExameResumoDiario.sexo, ExameResumoDiario.faixa_etaria,
+            ExameResumoDiario.tipo_atendimento, ExameResumoDiario.medico_solicitante,
+            func.sum(ExameResumoDiario.total)
+        ).group_by(
+            ExameResumoDiario.sexo, ExameResumoDiario.faixa_etaria,
+            ExameResumoDiario.tipo_atendimento, ExameResumoDiario.medico_solicitante
+        )
+        if start:
+            consulta = consulta.where(ExameResumoDiario.dia >= start)
+        if end:
+            consulta = consulta.where(ExameResumoDiario.dia <= end)
+
+        dimensoes = {nome: Counter() for nome in ('por_sexo', 'por_faixa_etaria', 'por_tipo_atendimento',
+                                                  'por_medico_solicitante')}
+        total = 0
+        for sexo, faixa, tipo, medico, soma in db.session.execute(consulta):
+            soma = int(soma or 0)
+            if not soma:
+                continue
+            total += soma
+            dimensoes['por_sexo'][sexo or NOT_INFORMED] += soma
+            dimensoes['por_faixa_etaria'][faixa or NOT_INFORMED] += soma
+            dimensoes['por_tipo_atendimento'][tipo or NOT_INFORMED] += soma
+            dimensoes['por_medico_solicitante'][medico or NOT_INFORMED] += soma
+
+        resumo = {'total': total}
+        resumo.update({nome: dict(contagem.most_common()) for nome, contagem in dimensoes.items()})
+        return resumo
@@ -0,0 +1,151 @@
+"""
+Serializadores de Exame - Registro de campos orientado a esquema
+
+Um único registro de campos por modelo é compilado em funções de
+codificação (objeto/linha -> dict) e decodificação (dict -> valores
+convertidos). A consulta somente de colunas evita construir objetos ORM
+nos caminhos de clonagem e de último exame do paciente.
+"""
+
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+from sqlalchemy import Float, Integer, bindparam, desc, select
+
+from app import db
+from models import Exame, ParametrosEcocardiograma, LaudoEcocardiograma
+
+# Colunas de controle que nunca são serializadas
+CONTROL_COLUMNS = ('id', 'exame_id', 'created_at', 'updated_at')
+
+
+def _to_int(value):
+    return int(float(value))
+
+
+def _to_text(value):
+    return '' if value is None else str(value)
+
+
+def _coercer_for(column) -> Callable[[Any], Any]:
+    """Conversor do valor de entrada a partir do tipo da coluna"""
+    if isinstance(column.type, Integer):
+        return _to_int
+    if isinstance(column.type, Float):
+        return float
+    return _to_text
+
+
+def _compile(name: str, source: str) -> Callable:
+    namespace: Dict[str, Any] = {}
+    exec(source, namespace)
+    return namespace[name]
+
+
+class ModelSerializer:
+    """Codificador/decodificador compilado para um conjunto de campos do modelo"""
+
+    def __init__(self, model, names: Iterable[str], skip_empty: bool = True):
+        self.model = model
+        self.names: Tuple[str, ...] = tuple(names)
+        self.skip_empty = skip_empty
+        self.columns = tuple(getattr(model, name) for name in self.names)
+        self.coercers = tuple(
+            (name, _coercer_for(model.__table__.columns[name])) for name in self.names
+        )
+
+        # Funções geradas: sem laço nem getattr dinâmico por campo
+        self.encode = _compile('encode', 'def encode(obj):\n    return {%s}\n' % ', '.join(
+            f'{name!r}: obj.{name}' for name in self.names))
+        self.encode_row = _compile('encode_row', 'def encode_row(row, offset=0):\n    return {%s}\n' % ', '.join(
+            f'{name!r}: row[offset + {i}]' for i, name in enumerate(self.names)))
+
+    @classmethod
+    def from_model(cls, model, exclude: Iterable[str] = CONTROL_COLUMNS, **kwargs) -> 'ModelSerializer':
+        """Registro com todas as colunas do modelo, exceto as de controle"""
+        excluded = set(exclude)
+        names = [column.key for column in model.__table__.columns if column.key not in excluded]
+        return cls(model, names, **kwargs)
+
+    def without(self, *names: str) -> 'ModelSerializer':
+        """Serializador sem os campos informados"""
+        return ModelSerializer(self.model, [n for n in self.names if n not in names], self.skip_empty)
+
+    def dump(self, obj) -> Optional[Dict[str, Any]]:
+        """Codifica a instância (None quando não existe)"""
+        return None if obj is None else self.encode(obj)
+
+    def decode(self, data: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Converte apenas campos conhecidos; valores vazios ou inválidos são ignorados"""
+        if not data:
+            return {}
+
+        valores = {}
+        for name, coerce in self.coercers:
+            if name not in data:
+                continue
+            value = data[name]
+            if self.skip_empty and (value is None or value == ''):
+                continue
+            try:
+                valores[name] = coerce(value)
+            except (ValueError, TypeError):
+                continue
+        return valores
+
+    def apply(self, obj, data: Optional[Dict[str, Any]]):
+        """Aplica os valores decodificados na instância"""
+        for name, value in self.decode(data).items():
+            setattr(obj, name, value)
+        return obj
+
+
+# ===== REGISTRO DE CAMPOS =====
+
+# Colunas derivadas das datas em texto, preenchidas pelo modelo ao gravar
+DERIVED_EXAM_COLUMNS = ('data_exame_dt', 'data_nascimento_dt')
+
+exam_serializer = ModelSerializer.from_model(Exame, exclude=CONTROL_COLUMNS + DERIVED_EXAM_COLUMNS,
+                                             skip_empty=False)
+exam_clone_serializer = exam_serializer.without('data_exame')
+# Máscara de achados, calculada pelo modelo ao gravar os parâmetros
+DERIVED_PARAMETER_COLUMNS = ('anormalidades',)
+
+parameter_serializer = ModelSerializer.from_model(ParametrosEcocardiograma,
+                                                  exclude=CONTROL_COLUMNS + DERIVED_PARAMETER_COLUMNS)
+laudo_serializer = ModelSerializer.from_model(LaudoEcocardiograma, skip_empty=False)
+
+
+def _build_latest_exam_statement():
+    """SELECT pré-compilado (somente colunas) do último exame de um paciente"""
+    columns = (
+        (ParametrosEcocardiograma.id, LaudoEcocardiograma.id)
+        + exam_clone_serializer.columns
+        + parameter_serializer.columns
+        + laudo_serializer.columns
+    )
+
+    return select(*columns)\
+        .select_from(Exame)\
+        .outerjoin(ParametrosEcocardiograma, ParametrosEcocardiograma.exame_id == Exame.id)\
+        .outerjoin(LaudoEcocardiograma, LaudoEcocardiograma.exame_id == Exame.id)\
+        .where(Exame.nome_paciente == bindparam('nome_paciente'))\
+        .order_by(desc(Exame.created_at), desc(Exame.id), LaudoEcocardiograma.id)\
+        .limit(1)
+
+
+# Construído uma única vez; o cache de compilação do SQLAlchemy reaproveita o SQL
+_LATEST_EXAM_STATEMENT = _build_latest_exam_statement()
+_PARAMS_OFFSET = 2 + len(exam_clone_serializer.names)
+_LAUDO_OFFSET = _PARAMS_OFFSET + len(parameter_serializer.names)
+
+
+def latest_exam_payload(nome_paciente: str) -> Optional[Dict[str, Any]]:
+    """Último exame do paciente via consulta somente de colunas (sem objetos ORM)"""
+    row = db.session.execute(_LATEST_EXAM_STATEMENT, {'nome_paciente': nome_paciente}).first()
+    if row is None:
+        return None
+
+    return {
+        'exame': exam_clone_serializer.encode_row(row, 2),
+        'parametros': parameter_serializer.encode_row(row, _PARAMS_OFFSET) if row[0] is not None else None,
+        'laudos': laudo_serializer.encode_row(row, _LAUDO_OFFSET) if row[1] is not None else None
+    }
@@ -0,0 +1,231 @@
+"""
+Tendências do Paciente - Séries temporais dos parâmetros entre exames
+
+Monta, com uma única consulta (exames LEFT JOIN parâmetros), a evolução de
+FE, massa do VE, AE, diâmetros do VE e PSAP de um paciente, já com a
+variação e a inclinação anual entre exames consecutivos e a inclinação da
+reta de regressão de cada série.
+
+O resultado fica em um LRU por worker. A invalidação usa gerações em um
+arquivo compartilhado (como o cache de sessão): gravar um exame ou seus
+parâmetros pelo ORM incrementa, após o commit, a geração do grupo do
+paciente; a importação em lote incrementa os grupos dos pacientes que
+gravou. Cada worker confere a geração com um stat() antes de usar o cache.
+"""
+
+import os
+import tempfile
+import threading
+import zlib
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from app import db
+from models import Exame, ParametrosEcocardiograma
+from utils.session_cache import RevocationGenerations
+
+# (coluna, rótulo, unidade)
+TREND_SERIES = (
+    ('fracao_ejecao', 'FE', '%'),
+    ('massa_ve', 'Massa do VE', 'g'),
+    ('indice_massa_ve', 'Índice de massa do VE', 'g/m²'),
+    ('atrio_esquerdo', 'AE', 'mm'),
+    ('diametro_diastolico_final_ve', 'DDVE', 'mm'),
+    ('diametro_sistolico_final', 'DSVE', 'mm'),
+    ('pressao_sistolica_vd', 'PSAP', 'mmHg'),
+)
+
+DEFAULT_MAX_ENTRIES = 1000
+# Pacientes agrupados por hash: o arquivo de gerações não cresce com o cadastro
+GENERATION_BUCKETS = 4096
+PENDING_KEY = 'patient_trends_pending'
+DAYS_PER_YEAR = 365.25
+
+
+def _default_generations_path():
+    configured = os.environ.get('TREND_GENERATIONS_PATH')
+    if configured:
+        return configured
+    base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    return os.path.join(base, 'ecocardio_trend_generations.json')
+
+
+def _bucket(nome_paciente: str) -> str:
+    return str(zlib.crc32((nome_paciente or '').encode('utf-8')) % GENERATION_BUCKETS)
+
+
+class PatientTrendCache:
+    """LRU de séries por paciente, invalidado por gerações compartilhadas"""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, generations: Optional[RevocationGenerations] = None):
+        self.max_entries = max_entries
+        self._generations = generations
+        # nome_paciente -> (geração, séries)
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def generations(self) -> RevocationGenerations:
+        if self._generations is None:
+            self._generations = RevocationGenerations(_default_generations_path())
+        return self._generations
+
+    def generation(self, nome_paciente: str) -> tuple:
+        return self.generations.get(_bucket(nome_paciente)), self.generations.get('*')
+
+    def get(self, nome_paciente: str, generation: tuple) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(nome_paciente)
+            if entry is None or entry[0] != generation:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(nome_paciente)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, nome_paciente: str, generation: tuple, series: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[nome_paciente] = (generation, series)
+            self._entries.move_to_end(nome_paciente)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, nomes: Iterable[str]) -> None:
+        """Invalida os pacientes em todos os workers"""
+        nomes = set(nomes)
+        if not nomes:
+            return
+        with self._lock:
+            for nome in nomes:
+                self._entries.pop(nome, None)
+        self.generations.bump_many(_bucket(nome) for nome in nomes)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    # ===== EVENTOS DO ORM =====
+
+    @staticmethod
+    def mark_changed(connection, target) -> None:
+        """Anota o paciente do exame/parâmetro gravado; invalida após o commit"""
+        session = Session.object_session(target)
+        if session is None:
+            return
+        pendentes = session.info.setdefault(PENDING_KEY, set())
+        if isinstance(target, Exame):
+            pendentes.add(target.nome_paciente)
+            pendentes.update(inspect(target).attrs.nome_paciente.history.deleted or ())
+        elif target.exame_id is not None:
+            nome = connection.execute(
+                select(Exame.nome_paciente).where(Exame.id == target.exame_id)
+            ).scalar()
+            if nome:
+                pendentes.add(nome)
+
+
+# Instância global do cache de tendências
+trend_cache = PatientTrendCache()
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    pendentes = session.info.pop(PENDING_KEY, None)
+    if pendentes:
+        trend_cache.invalidate(pendentes)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_pending(session, previous_transaction):
+    if not session.in_transaction():
+        session.info.pop(PENDING_KEY, None)
+
+
+class PatientTrendService:
+    """Séries temporais dos parâmetros de um paciente"""
+
+    @staticmethod
+    def get_trends(nome_paciente: str) -> Optional[Dict[str, Any]]:
+        """Séries do paciente (cache por worker); None se não houver exames"""
+        geracao = trend_cache.generation(nome_paciente)
+        series = trend_cache.get(nome_paciente, geracao)
+        if series is None:
+            series = PatientTrendService.build_trends(nome_paciente)
+            if series is not None:
+                trend_cache.put(nome_paciente, geracao, series)
+        return series
+
+    @staticmethod
+    def build_trends(nome_paciente: str) -> Optional[Dict[str, Any]]:
+        """Consulta única dos exames com parâmetros e cálculo das variações"""
+        P = ParametrosEcocardiograma
+        linhas = db.session.execute(
+            select(Exame.id, Exame.data_exame, Exame.data_exame_dt, Exame.created_at, Exame.idade,
+                   *(getattr(P, coluna) for coluna, _, _ in TREND_SERIES))
+            .outerjoin(P, P.exame_id == Exame.id)
+            .where(Exame.nome_paciente == nome_paciente)
+        ).all()
+        if not linhas:
+            return None
+
+        def dia(linha) -> Optional[date]:
+            return linha.data_exame_dt or (linha.created_at.date() if linha.created_at else None)
+
+        linhas.sort(key=lambda linha: (dia(linha) or date.min, linha.id))
+
+        exames = [{'exame_id': linha.id, 'data_exame': linha.data_exame,
+                   'data': dia(linha).isoformat() if dia(linha) else None, 'idade': linha.idade}
+                  for linha in linhas]
+
+        series = {}
+        for posicao, (coluna, rotulo, unidade) in enumerate(TREND_SERIES, start=5):
+            pontos = [(linha.id, dia(linha), float(linha[posicao]))
+                      for linha in linhas if linha[posicao] is not None and dia(linha) is not None]
+            series[coluna] = {
+                'rotulo': rotulo,
+                'unidade': unidade,
+                'pontos': PatientTrendService._with_deltas(pontos),
+                'inclinacao_ano': PatientTrendService._regression_slope(pontos)
+            }
+
+        return {'paciente': nome_paciente, 'total_exames': len(exames), 'exames': exames, 'series': series}
+
+    @staticmethod
+    def _with_deltas(pontos: List[tuple]) -> List[Dict[str, Any]]:
+        """Pontos com variação e inclinação anual em relação ao anterior"""
+        resultado = []
+        anterior = None
+        for exame_id, dia, valor in pontos:
+            ponto = {'exame_id': exame_id, 'data': dia.isoformat(), 'valor': round(valor, 2),
+                     'delta': None, 'dias': None, 'inclinacao_ano': None}
+            if anterior is not None:
+                dias = (dia - anterior[1]).days
+                ponto['delta'] = round(valor - anterior[2], 2)
+                ponto['dias'] = dias
+                if dias > 0:
+                    ponto['inclinacao_ano'] = round((valor - anterior[2]) / dias * DAYS_PER_YEAR, 2)
+            resultado.append(ponto)
+            anterior = (exame_id, dia, valor)
+        return resultado
+
+    @staticmethod
+    def _regression_slope(pontos: List[tuple]) -> Optional[float]:
+        """Inclinação (por ano) da reta de mínimos quadrados da série"""
+        if len(pontos) < 2:
+            return None
+        origem = pontos[0][1]
+        xs = [(dia - origem).days / DAYS_PER_YEAR for _, dia, _ in pontos]
+        ys = [valor for _, _, valor in pontos]
+        media_x, media_y = sum(xs) / len(xs), sum(ys) / len(ys)
+        variancia = sum((x - media_x) ** 2 for x in xs)
+        if not variancia:
+            return None
+        covariancia = sum((x - media_x) * (y - media_y) for x, y in zip(xs, ys))
+        return round(covariancia / variancia, 2)
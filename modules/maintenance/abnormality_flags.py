@@ -0,0 +1,76 @@
+"""
+Migração dos Achados - Coluna de máscara e preenchimento vetorizado
+
+Adiciona às bases existentes a coluna anormalidades de
+parametros_ecocardiograma (db.create_all não altera tabelas já criadas),
+cria o índice (anormalidades, exame_id) e calcula a máscara em lotes: cada
+lote é avaliado de uma vez pela tabela de referência compilada. Idempotente:
+por padrão só processa linhas ainda sem máscara; `recompute=True` recalcula
+todas (após mudar as regras de referência).
+"""
+
+import logging
+from typing import Dict
+
+import numpy as np
+from sqlalchemy import bindparam, inspect, select, text, update
+
+from app import db
+from models import Exame, ParametrosEcocardiograma
+from modules.exams.reference_ranges import REFERENCE_PARAMETERS, reference_ranges
+
+logger = logging.getLogger('abnormality_flags')
+
+INPUT_COLUMNS = REFERENCE_PARAMETERS + ('superficie_corporal',)
+
+
+def migrate_abnormality_flags(batch_size: int = 5000, recompute: bool = False) -> Dict[str, int]:
+    """Garante coluna e índice e preenche a máscara de achados em lotes"""
+    parametros = ParametrosEcocardiograma.__table__
+    exames = Exame.__table__
+    resultado = {'colunas_adicionadas': 0, 'preenchidos': 0, 'com_achados': 0}
+
+    with db.engine.begin() as conn:
+        existentes = {coluna['name'] for coluna in inspect(conn).get_columns(parametros.name)}
+        if 'anormalidades' not in existentes:
+            conn.execute(text(f'ALTER TABLE {parametros.name} ADD COLUMN anormalidades INTEGER'))
+            resultado['colunas_adicionadas'] += 1
+        for indice in parametros.indexes:
+            indice.create(conn, checkfirst=True)
+
+    atualizar = (
+        update(parametros)
+        .where(parametros.c.id == bindparam('_id'))
+        .values(anormalidades=bindparam('_flags'))
+    )
+
+    ultimo_id = 0
+    while True:
+        with db.engine.begin() as conn:
+            consulta = (
+                select(parametros.c.id, exames.c.sexo, exames.c.idade,
+                       *(parametros.c[nome] for nome in INPUT_COLUMNS))
+                .join(exames, exames.c.id == parametros.c.exame_id)
+                .where(parametros.c.id > ultimo_id)
+                .order_by(parametros.c.id)
+                .limit(batch_size)
+            )
+            if not recompute:
+                consulta = consulta.where(parametros.c.anormalidades.is_(None))
+            linhas = conn.execute(consulta).all()
+            if not linhas:
+                break
+
+            colunas = list(zip(*linhas))
+            flags = reference_ranges.flags_many(
+                colunas[1], colunas[2],
+                {nome: colunas[3 + posicao] for posicao, nome in enumerate(INPUT_COLUMNS)}
+            )
+            conn.execute(atualizar, [{'_id': linha[0], '_flags': int(valor)}
+                                     for linha, valor in zip(linhas, flags)])
+            resultado['preenchidos'] += len(linhas)
+            resultado['com_achados'] += int(np.count_nonzero(flags))
+            ultimo_id = linhas[-1][0]
+
+    logger.info(f"Achados dos parâmetros migrados: {resultado}")
+    return resultado
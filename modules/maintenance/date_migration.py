@@ -0,0 +1,79 @@
+"""
+Migração das Datas de Exame - Colunas tipadas e preenchimento
+
+Adiciona às bases existentes as colunas data_exame_dt e data_nascimento_dt
+(db.create_all não altera tabelas já criadas), cria os índices do modelo
+Exame e preenche as colunas a partir do texto 'dd/mm/aaaa' ou 'aaaa-mm-dd'.
+Idempotente: pode rodar a cada deploy. Cada coluna é preenchida em uma
+passada própria, só nas linhas sem data tipada cujo texto não está em
+branco; textos que não são data ficam sem valor e são apenas contados.
+"""
+
+import logging
+from typing import Dict
+from sqlalchemy import bindparam, func, inspect, select, text, update
+
+from app import db
+from models import Exame
+from modules.core.dates import parse_date
+
+logger = logging.getLogger('date_migration')
+
+# coluna tipada -> coluna de texto de origem
+TYPED_COLUMNS = {'data_exame_dt': 'data_exame', 'data_nascimento_dt': 'data_nascimento'}
+
+
+def migrate_exam_dates(batch_size: int = 1000) -> Dict[str, int]:
+    """Garante colunas e índices e preenche as datas tipadas em lotes"""
+    exames = Exame.__table__
+    resultado = {'colunas_adicionadas': 0, 'preenchidos': 0, 'invalidos': 0}
+
+    with db.engine.begin() as conn:
+        existentes = {coluna['name'] for coluna in inspect(conn).get_columns(exames.name)}
+        for nome in TYPED_COLUMNS:
+            if nome not in existentes:
+                conn.execute(text(f'ALTER TABLE {exames.name} ADD COLUMN {nome} DATE'))
+                resultado['colunas_adicionadas'] += 1
+        for indice in exames.indexes:
+            indice.create(conn, checkfirst=True)
+
+    for tipada, origem in TYPED_COLUMNS.items():
+        preenchidos, invalidos = _backfill_column(exames.c[tipada], exames.c[origem], batch_size)
+        resultado['preenchidos'] += preenchidos
+        resultado['invalidos'] += invalidos
+
+    logger.info(f"Datas de exame migradas: {resultado}")
+    return resultado
+
+
+def _backfill_column(tipada, origem, batch_size: int):
+    """Preenche uma coluna tipada; devolve (preenchidos, textos inválidos)"""
+    exames = tipada.table
+    atualizar = update(exames).where(exames.c.id == bindparam('_id')).values({tipada.name: bindparam('_data')})
+    preenchidos = invalidos = 0
+
+    ultimo_id = 0
+    while True:
+        with db.engine.begin() as conn:
+            linhas = conn.execute(
+                select(exames.c.id, origem)
+                .where(exames.c.id > ultimo_id, tipada.is_(None), func.trim(origem) != '')
+                .order_by(exames.c.id)
+                .limit(batch_size)
+            ).all()
+            if not linhas:
+                break
+
+            valores = []
+            for exame_id, texto in linhas:
+                data = parse_date(texto)
+                if data is None:
+                    invalidos += 1
+                else:
+                    valores.append({'_id': exame_id, '_data': data})
+            if valores:
+                conn.execute(atualizar, valores)
+            preenchidos += len(valores)
+            ultimo_id = linhas[-1][0]
+
+    return preenchidos, invalidos
@@ -8,7 +8,6 @@ e diagnóstico do sistema.
 from typing import Dict, List, Any
 from datetime import datetime
 import os
-import psutil
 from modules.core.database import DatabaseManager
 from modules.core.exceptions import BusinessRuleError
 
@@ -17,27 +16,48 @@ class SystemService:
     
     @staticmethod
     def get_system_status() -> Dict[str, Any]:
-        """Obtém status geral do sistema"""
+        """
+        Obtém status geral do sistema a partir do último snapshot
+
+        As sondas rodam no amostrador em segundo plano; aqui apenas lemos
+        o cache, sem consultar o banco nem medir CPU na requisição.
+        """
         try:
-            # Status do banco de dados
-            db_status = SystemService._check_database_health()
-            
-            # Status do sistema
-            system_status = SystemService._get_system_metrics()
+            from utils.health_monitor import health_sampler
             
-            # Status da aplicação
-            app_status = SystemService._get_application_status()
+            latest = health_sampler.latest()
+            pending = {'status': 'pending'}
             
             return {
-                'database': db_status,
-                'system': system_status,
-                'application': app_status,
+                'database': latest['database']['data'] if 'database' in latest else pending,
+                'system': latest['system']['data'] if 'system' in latest else pending,
+                'application': latest['application']['data'] if 'application' in latest else pending,
+                'sampled_at': {name: entry['sampled_at'] for name, entry in latest.items()},
                 'timestamp': datetime.now().isoformat()
             }
             
         except Exception as e:
             raise BusinessRuleError(f"Erro ao obter status do sistema: {str(e)}")
     
+    @staticmethod
+    def get_liveness_status() -> Dict[str, Any]:
+        """Status resumido para balanceador de carga (somente cache)"""
+        from utils.health_monitor import health_sampler
+        
+        database = health_sampler.latest('database')
+        if database is None:
+            status = 'starting'
+        elif database['status'] == 'error' or database['data'].get('status') == 'error':
+            status = 'degraded'
+        else:
+            status = 'ok'
+        
+        return {
+            'status': status,
+            'database_age_seconds': health_sampler.age_seconds('database'),
+            'sampler': 'running' if health_sampler.is_running() else 'stopped'
+        }
+    
     @staticmethod
     def _check_database_health() -> Dict[str, Any]:
         """Verifica saúde do banco de dados"""
@@ -64,33 +84,10 @@ class SystemService:
     
     @staticmethod
     def _get_system_metrics() -> Dict[str, Any]:
-        """Obtém métricas do sistema"""
+        """Obtém métricas do sistema (mesma sonda usada pelo amostrador)"""
         try:
-            # Uso de CPU
-            cpu_percent = psutil.cpu_percent(interval=1)
-            
-            # Uso de memória
-            memory = psutil.virtual_memory()
-            
-            # Uso de disco
-            disk = psutil.disk_usage('/')
-            
-            return {
-                'cpu': {
-                    'usage_percent': cpu_percent,
-                    'core_count': psutil.cpu_count()
-                },
-                'memory': {
-                    'total_gb': round(memory.total / (1024**3), 2),
-                    'used_gb': round(memory.used / (1024**3), 2),
-                    'usage_percent': memory.percent
-                },
-                'disk': {
-                    'total_gb': round(disk.total / (1024**3), 2),
-                    'used_gb': round(disk.used / (1024**3), 2),
-                    'usage_percent': round((disk.used / disk.total) * 100, 2)
-                }
-            }
+            from utils.health_monitor import sample_system_metrics
+            return sample_system_metrics()
             
         except Exception:
             return {
@@ -126,6 +123,7 @@ class SystemService:
     def _get_uptime() -> str:
         """Calcula tempo de atividade do sistema"""
         try:
+            import psutil  # importação tardia (opcional e só usada aqui)
             uptime_seconds = psutil.boot_time()
             uptime = datetime.now() - datetime.fromtimestamp(uptime_seconds)
             return str(uptime).split('.')[0]  # Remove microsegundos
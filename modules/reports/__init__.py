@@ -8,9 +8,11 @@ laudos médicos e exportação de documentos.
 from .report_service import ReportService
 from .pdf_service import PDFService
 from .laudo_service import LaudoService
+from .draft_service import LaudoDraftService
 
 __all__ = [
     'ReportService',
     'PDFService',
-    'LaudoService'
+    'LaudoService',
+    'LaudoDraftService'
 ]
\ No newline at end of file
@@ -0,0 +1,171 @@
+"""
+Serviço de Rascunhos de Laudo - Salvamento automático por diferença
+
+O salvamento automático enviava o formulário inteiro a cada 30 segundos e
+regravava todas as colunas do laudo (e o updated_at) mesmo sem alteração.
+Agora o navegador envia apenas os campos alterados com o número de revisão
+que conhece; o servidor guarda no rascunho somente o que difere do laudo
+salvo, ignora envios sem efeito e só grava em LaudoEcocardiograma no
+salvamento explícito (promoção do rascunho).
+"""
+
+import json
+from typing import Any, Dict, Iterable, Optional
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from models import Exame, LaudoEcocardiograma, LaudoRascunho
+from modules.core.exceptions import ValidationError, BusinessRuleError
+from modules.exams.serializers import laudo_serializer
+
+# Limite folgado acima do maxlength das caixas de texto do formulário
+MAX_FIELD_LENGTH = 5000
+
+
+class LaudoDraftService:
+    """Rascunhos de laudo com revisão otimista"""
+
+    FIELDS = laudo_serializer.names
+
+    @staticmethod
+    def _saved_fields(exam_id: int) -> Dict[str, str]:
+        """Campos do laudo principal salvo ('' quando ainda não existe)"""
+        row = db.session.execute(
+            db.select(*laudo_serializer.columns)
+            .where(LaudoEcocardiograma.exame_id == exam_id)
+            .order_by(LaudoEcocardiograma.id).limit(1)
+        ).first()
+        salvo = laudo_serializer.encode_row(row) if row is not None else {}
+        return {name: salvo.get(name) or '' for name in LaudoDraftService.FIELDS}
+
+    @staticmethod
+    def _validate(changes: Any) -> Dict[str, str]:
+        if not isinstance(changes, dict):
+            raise ValidationError("Campos do rascunho devem ser um objeto")
+        desconhecidos = set(changes) - set(LaudoDraftService.FIELDS)
+        if desconhecidos:
+            raise ValidationError(f"Campos inválidos: {', '.join(sorted(desconhecidos))}")
+
+        valores = {}
+        for name, value in changes.items():
+            value = '' if value is None else value
+            if not isinstance(value, str):
+                raise ValidationError("Valor deve ser texto", field=name)
+            if len(value) > MAX_FIELD_LENGTH:
+                raise ValidationError(f"Campo excede {MAX_FIELD_LENGTH} caracteres", field=name)
+            valores[name] = value
+        return valores
+
+    @staticmethod
+    def get_draft(exam_id: int) -> Dict[str, Any]:
+        """Revisão e campos pendentes do rascunho"""
+        rascunho = LaudoRascunho.query.filter_by(exame_id=exam_id).first()
+        if not rascunho:
+            return {'revisao': 0, 'campos': {}}
+        return {'revisao': rascunho.revisao, 'campos': json.loads(rascunho.campos)}
+
+    @staticmethod
+    def effective_fields(exam_id: int, draft: Optional[Dict[str, Any]] = None) -> Dict[str, str]:
+        """Laudo salvo com o rascunho aplicado (valores exibidos no formulário)"""
+        draft = draft if draft is not None else LaudoDraftService.get_draft(exam_id)
+        campos = LaudoDraftService._saved_fields(exam_id)
+        campos.update(draft['campos'])
+        return campos
+
+    @staticmethod
+    def apply_patch(exam_id: int, base_revision: int, changes: Dict[str, Any],
+                    user_id: Optional[int] = None) -> Dict[str, Any]:
+        """Aplica campos alterados ao rascunho
+
+        Retorna status 'salvo', 'sem_alteracao' (nada gravado) ou 'conflito'
+        (a revisão informada não é a atual; a resposta traz o rascunho do
+        servidor para o navegador reenviar sobre ele).
+        """
+        valores = LaudoDraftService._validate(changes)
+        if not db.session.query(Exame.id).filter_by(id=exam_id).first():
+            raise BusinessRuleError("Exame não encontrado")
+
+        rascunho = LaudoRascunho.query.filter_by(exame_id=exam_id).first()
+        if rascunho and rascunho.revisao != base_revision:
+            return {'status': 'conflito', 'revisao': rascunho.revisao, 'campos': json.loads(rascunho.campos)}
+
+        pendentes = json.loads(rascunho.campos) if rascunho else {}
+        salvo = LaudoDraftService._saved_fields(exam_id)
+
+        alterados = []
+        for name, value in valores.items():
+            if value == pendentes.get(name, salvo[name]):
+                continue
+            alterados.append(name)
+            # Campo que voltou ao valor salvo deixa de ocupar o rascunho
+            if value == salvo[name]:
+                pendentes.pop(name, None)
+            else:
+                pendentes[name] = value
+
+        revisao = rascunho.revisao if rascunho else 0
+        if not alterados:
+            return {'status': 'sem_alteracao', 'revisao': revisao, 'alterados': []}
+
+        campos = json.dumps(pendentes, ensure_ascii=False, sort_keys=True)
+        try:
+            if rascunho:
+                # Atualização condicionada à revisão: duas abas não sobrescrevem uma à outra
+                atualizados = LaudoRascunho.query.filter_by(id=rascunho.id, revisao=revisao).update(
+                    {'campos': campos, 'revisao': revisao + 1, 'usuario_id': user_id},
+                    synchronize_session=False)
+                if not atualizados:
+                    db.session.rollback()
+                    return LaudoDraftService._conflict(exam_id)
+            else:
+                db.session.add(LaudoRascunho(exame_id=exam_id, usuario_id=user_id, revisao=1, campos=campos))
+            db.session.commit()
+        except IntegrityError:
+            # Outra requisição criou o rascunho ao mesmo tempo
+            db.session.rollback()
+            return LaudoDraftService._conflict(exam_id)
+
+        return {'status': 'salvo', 'revisao': revisao + 1, 'alterados': alterados}
+
+    @staticmethod
+    def _conflict(exam_id: int) -> Dict[str, Any]:
+        atual = LaudoDraftService.get_draft(exam_id)
+        return {'status': 'conflito', 'revisao': atual['revisao'], 'campos': atual['campos']}
+
+    @staticmethod
+    def promote(exam_id: int, data: Optional[Dict[str, Any]] = None) -> Iterable[str]:
+        """Salvamento explícito: grava no laudo e descarta o rascunho
+
+        `data` são os valores enviados pelo formulário; campos ausentes vêm
+        do rascunho. Apenas colunas que mudaram são gravadas, de modo que o
+        updated_at só avança quando o laudo de fato mudou.
+        """
+        exame = db.session.get(Exame, exam_id)
+        if not exame:
+            raise BusinessRuleError("Exame não encontrado")
+
+        valores = LaudoDraftService.get_draft(exam_id)['campos']
+        valores.update(LaudoDraftService._validate(laudo_serializer.decode(data)) if data else {})
+
+        # Laudo principal: o primeiro registrado, mesmo critério de _saved_fields
+        laudo = LaudoEcocardiograma.query.filter_by(exame_id=exam_id).order_by(LaudoEcocardiograma.id).first()
+        if laudo is None:
+            laudo = LaudoEcocardiograma(exame_id=exam_id)
+            db.session.add(laudo)
+
+        alterados = []
+        for name, value in valores.items():
+            if (getattr(laudo, name) or '') != value:
+                setattr(laudo, name, value)
+                alterados.append(name)
+
+        LaudoRascunho.query.filter_by(exame_id=exam_id).delete(synchronize_session=False)
+        db.session.commit()
+        return alterados
+
+    @staticmethod
+    def discard(exam_id: int) -> bool:
+        """Descarta o rascunho sem alterar o laudo"""
+        removidos = LaudoRascunho.query.filter_by(exame_id=exam_id).delete(synchronize_session=False)
+        db.session.commit()
+        return bool(removidos)
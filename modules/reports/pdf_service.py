@@ -16,9 +16,9 @@ from reportlab.lib import colors
 from datetime import datetime
 import logging
 
-from modules.core.database import DatabaseManager
 from modules.core.exceptions import BusinessRuleError
-from models import Exame
+from modules.exams.exam_repository import ExamAggregateRepository, ExamAggregate
+from utils.metrics import observe_pdf_render
 
 logger = logging.getLogger(__name__)
 
@@ -26,11 +26,12 @@ class PDFService:
     """Serviço centralizado para geração de PDFs"""
     
     @staticmethod
+    @observe_pdf_render('platypus')
     def generate_exam_pdf(exam_id: int) -> Response:
         """Gera PDF completo do exame"""
         try:
-            # Obter dados do exame
-            exam = DatabaseManager.get_by_id(Exame, exam_id)
+            # Obter exame com parâmetros e laudos em uma única consulta
+            exam = ExamAggregateRepository.get(exam_id)
             if not exam:
                 raise BusinessRuleError("Exame não encontrado")
             
@@ -72,7 +73,7 @@ class PDFService:
             raise BusinessRuleError(f"Erro ao gerar PDF: {str(e)}")
     
     @staticmethod
-    def _build_header(exam: Exame) -> list:
+    def _build_header(exam: ExamAggregate) -> list:
         """Constrói cabeçalho do PDF"""
         styles = getSampleStyleSheet()
         header_style = ParagraphStyle(
@@ -91,7 +92,7 @@ class PDFService:
         return story
     
     @staticmethod
-    def _build_patient_info(exam: Exame) -> list:
+    def _build_patient_info(exam: ExamAggregate) -> list:
         """Constrói seção de informações do paciente"""
         styles = getSampleStyleSheet()
         story = []
@@ -129,14 +130,12 @@ class PDFService:
         return story
     
     @staticmethod
-    def _build_parameters_section(exam: Exame) -> list:
+    def _build_parameters_section(exam: ExamAggregate) -> list:
         """Constrói seção de parâmetros"""
-        from modules.exams.parameter_service import ParameterService
-        
         styles = getSampleStyleSheet()
         story = []
         
-        parameters = ParameterService.get_parameters(exam.id)
+        parameters = exam.parametros
         
         if parameters:
             story.append(Paragraph("PARÂMETROS ECOCARDIOGRÁFICOS", styles['Heading3']))
@@ -170,14 +169,12 @@ class PDFService:
         return story
     
     @staticmethod
-    def _build_laudo_section(exam: Exame) -> list:
+    def _build_laudo_section(exam: ExamAggregate) -> list:
         """Constrói seção do laudo"""
-        from modules.reports.laudo_service import LaudoService
-        
         styles = getSampleStyleSheet()
         story = []
         
-        laudo = LaudoService.get_laudo(exam.id)
+        laudo = exam.laudo
         
         if laudo:
             story.append(Paragraph("LAUDO MÉDICO", styles['Heading3']))
@@ -53,8 +53,9 @@ class ReportService:
     def generate_statistics_report(start_date: str = None, end_date: str = None) -> Dict[str, Any]:
         """Gera relatório de estatísticas do sistema"""
         try:
-            from sqlalchemy import func
             from app import db
+            from modules.core.dates import in_range, period_bounds
+            from modules.exams.rollup_service import ExamRollupService
             
             # Definir período se não fornecido
             if not end_date:
@@ -67,33 +68,14 @@ class ReportService:
             else:
                 start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
             
-            # Estatísticas básicas
-            total_exams = db.session.query(Exame).count()
+            # Estatísticas básicas (intervalo indexável, sem func.date)
+            total_exams, gender_distribution, age_distribution = ReportService._all_time_distributions()
             period_exams = db.session.query(Exame).filter(
-                func.date(Exame.created_at) >= start_date,
-                func.date(Exame.created_at) <= end_date
+                in_range(Exame.created_at, period_bounds(start_date, end_date))
             ).count()
             
-            # Distribuição por gênero
-            gender_stats = db.session.query(
-                Exame.sexo,
-                func.count(Exame.id)
-            ).group_by(Exame.sexo).all()
-            
-            # Distribuição por faixa etária
-            age_ranges = [
-                (0, 17, 'Pediátrico'),
-                (18, 65, 'Adulto'),
-                (66, 150, 'Idoso')
-            ]
-            
-            age_distribution = {}
-            for min_age, max_age, label in age_ranges:
-                count = db.session.query(Exame).filter(
-                    Exame.idade >= min_age,
-                    Exame.idade <= max_age
-                ).count()
-                age_distribution[label] = count
+            # Distribuição do período a partir do resumo diário (somas, sem varrer exames)
+            periodo = ExamRollupService.summarize(start_date, end_date)
             
             report = {
                 'period': {
@@ -102,10 +84,12 @@ class ReportService:
                 },
                 'totals': {
                     'total_exams': total_exams,
-                    'period_exams': period_exams
+                    'period_exams': period_exams,
+                    'period_exams_by_exam_date': periodo['total']
                 },
-                'gender_distribution': dict(gender_stats),
+                'gender_distribution': gender_distribution,
                 'age_distribution': age_distribution,
+                'period_distribution': {k: v for k, v in periodo.items() if k != 'total'},
                 'generated_at': datetime.now().isoformat()
             }
             
@@ -114,6 +98,30 @@ class ReportService:
         except Exception as e:
             raise BusinessRuleError(f"Erro ao gerar relatório de estatísticas: {str(e)}")
     
+    @staticmethod
+    def _all_time_distributions():
+        """Total, sexo e faixa etária de todos os exames em um único GROUP BY
+
+        O resumo diário não tem linha para exames sem data do exame válida,
+        então os totais gerais vêm da tabela de exames.
+        """
+        from collections import Counter
+        from sqlalchemy import case, func
+        from app import db
+        from modules.exams.rollup_service import AGE_BANDS, NOT_INFORMED
+        
+        faixa = case(*[(Exame.idade.between(minimo, maximo), label) for minimo, maximo, label in AGE_BANDS],
+                     else_='')
+        linhas = db.session.query(Exame.sexo, faixa, func.count(Exame.id)).group_by(Exame.sexo, faixa).all()
+        
+        por_sexo, por_faixa = Counter(), Counter()
+        for sexo, label, quantidade in linhas:
+            por_sexo[sexo or NOT_INFORMED] += quantidade
+            por_faixa[label] += quantidade
+        
+        age_distribution = {label: por_faixa.get(label, 0) for _, _, label in AGE_BANDS}
+        return sum(por_sexo.values()), dict(por_sexo.most_common()), age_distribution
+    
     @staticmethod
     def generate_quality_report() -> Dict[str, Any]:
         """Gera relatório de qualidade dos dados"""
@@ -279,7 +279,7 @@ def get_patient_exams(nome_paciente: str) -> list:
         Lista de exames ordenados por data decrescente
     """
     try:
-        exames = Exame.query.filter_by(nome_paciente=nome_paciente).order_by(Exame.data_exame.desc()).all()
+        exames = Exame.query.filter_by(nome_paciente=nome_paciente).order_by(Exame.data_exame_dt.desc(), Exame.id.desc()).all()
         return exames
     except Exception:
         return []
\ No newline at end of file
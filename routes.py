@@ -3,18 +3,25 @@ import sys
 import json
 import base64
 from datetime import datetime, timezone, timedelta
-from flask import render_template, request, redirect, url_for, flash, jsonify, send_file, session, send_from_directory
+from flask import render_template, request, redirect, url_for, flash, jsonify, send_file, session, send_from_directory, Response
 from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 from sqlalchemy import func, desc
 from functools import wraps
 from app import app, db
-from models import Exame, ParametrosEcocardiograma, LaudoEcocardiograma, Medico, LogSistema, LaudoTemplate, datetime_brasilia
+from models import Exame, ParametrosEcocardiograma, LaudoEcocardiograma, LaudoRascunho, Medico, LogSistema, LaudoTemplate, datetime_brasilia
 from models import Usuario
 import logging
 import tempfile
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4
+from utils.metrics import observe_pdf_render, metrics_registry
+from utils.query_profiler import query_budget
+from utils.session_cache import session_cache
+from utils.live_events import live_hub, dashboard_counters
+from modules.exams.exam_repository import ExamAggregateRepository
+from modules.exams.rollup_service import ExamRollupService
+from modules.core.dates import day_bounds, in_range, month_bounds, parse_date, today_brasilia
+from modules.exams.serializers import (exam_serializer, parameter_serializer, laudo_serializer,
+                                      latest_exam_payload)
 
 # Configurar logging básico
 logging.basicConfig(level=logging.INFO)
@@ -61,8 +68,13 @@ def admin_required(f):
 
 # ===== FUNCÕES DE UTILIDADE INTEGRADAS =====
 
+@observe_pdf_render('reportlab_canvas')
 def generate_pdf_report(exame):
     """Gerar PDF do exame usando ReportLab"""
+    # Importação tardia: ReportLab (e PIL) só é carregado na primeira geração
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.pagesizes import A4
+
     try:
         # Criar arquivo temporário
         with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
@@ -280,9 +292,10 @@ def generate_pdf_report(exame):
         
         y -= 40
         c.setFont("Helvetica", 10)
-        c.drawString(200, y, "Dr. Michel Raineri Haddad")
+        medico = getattr(exame, 'medico', None)
+        c.drawString(200, y, f"Dr. {medico.nome}" if medico else "Dr. Michel Raineri Haddad")
         y -= 15
-        c.drawString(220, y, "CRM-SP 183299")
+        c.drawString(220, y, medico.crm if medico else "CRM-SP 183299")
         y -= 15
         c.drawString(180, y, f"Data: {datetime.now().strftime('%d/%m/%Y')}")
         
@@ -443,6 +456,7 @@ def auth_logout():
 # ===== ROTAS PRINCIPAIS =====
 
 @app.route('/')
+@query_budget(12)
 @login_required
 def index():
     """Página inicial do sistema"""
@@ -454,13 +468,12 @@ def index():
         # Exames recentes (últimos 10)
         exames_recentes = Exame.query.order_by(desc(Exame.created_at)).limit(10).all()
         
-        # Exames hoje
-        hoje = datetime.now().date()
-        exames_hoje = Exame.query.filter(func.date(Exame.created_at) == hoje).count()
+        # Exames hoje (intervalo sobre created_at indexado, sem func.date)
+        hoje = today_brasilia()
+        exames_hoje = Exame.query.filter(in_range(Exame.created_at, day_bounds(hoje))).count()
         
         # Exames este mês
-        inicio_mes = hoje.replace(day=1)
-        exames_mes = Exame.query.filter(func.date(Exame.created_at) >= inicio_mes).count()
+        exames_mes = Exame.query.filter(in_range(Exame.created_at, month_bounds(hoje))).count()
         
         # Templates ativos
         try:
@@ -512,6 +525,7 @@ def index():
                              exames_hoje=0)
 
 @app.route('/novo_exame', methods=['GET', 'POST'])
+@query_budget(10)
 @login_required
 def novo_exame():
     """Criar novo exame ou clonar de paciente existente"""
@@ -521,69 +535,16 @@ def novo_exame():
     if clone_paciente:
         try:
             # Buscar o último exame deste paciente
-            ultimo_exame = Exame.query.filter_by(nome_paciente=clone_paciente)\
-                                     .order_by(desc(Exame.created_at)).first()
+            ultimo_exame = latest_exam_payload(clone_paciente)
             
             if ultimo_exame:
-                dados_clonados = {
-                    'nome_paciente': ultimo_exame.nome_paciente,
-                    'data_nascimento': ultimo_exame.data_nascimento,
-                    'idade': ultimo_exame.idade,
-                    'sexo': ultimo_exame.sexo,
-                    'tipo_atendimento': ultimo_exame.tipo_atendimento,
-                    'medico_usuario': ultimo_exame.medico_usuario,
-                    'medico_solicitante': ultimo_exame.medico_solicitante,
-                    'indicacao': ultimo_exame.indicacao
-                }
-                
-                # Adicionar parâmetros se existirem
-                if ultimo_exame.parametros:
-                    params = ultimo_exame.parametros
-                    dados_clonados.update({
-                        'peso': params.peso,
-                        'altura': params.altura,
-                        'superficie_corporal': params.superficie_corporal,
-                        'frequencia_cardiaca': params.frequencia_cardiaca,
-                        'atrio_esquerdo': params.atrio_esquerdo,
-                        'raiz_aorta': params.raiz_aorta,
-                        'relacao_atrio_esquerdo_aorta': params.relacao_atrio_esquerdo_aorta,
-                        'aorta_ascendente': params.aorta_ascendente,
-                        'diametro_ventricular_direito': params.diametro_ventricular_direito,
-                        'diametro_basal_vd': params.diametro_basal_vd,
-                        'diametro_diastolico_final_ve': params.diametro_diastolico_final_ve,
-                        'diametro_sistolico_final': params.diametro_sistolico_final,
-                        'percentual_encurtamento': params.percentual_encurtamento,
-                        'espessura_diastolica_septo': params.espessura_diastolica_septo,
-                        'espessura_diastolica_ppve': params.espessura_diastolica_ppve,
-                        'relacao_septo_parede_posterior': params.relacao_septo_parede_posterior,
-                        'volume_diastolico_final': params.volume_diastolico_final,
-                        'volume_sistolico_final': params.volume_sistolico_final,
-                        'volume_ejecao': params.volume_ejecao,
-                        'fracao_ejecao': params.fracao_ejecao,
-                        'indice_massa_ve': params.indice_massa_ve,
-                        'massa_ve': params.massa_ve,
-                        'fluxo_pulmonar': params.fluxo_pulmonar,
-                        'fluxo_mitral': params.fluxo_mitral,
-                        'fluxo_aortico': params.fluxo_aortico,
-                        'fluxo_tricuspide': params.fluxo_tricuspide,
-                        'gradiente_vd_ap': params.gradiente_vd_ap,
-                        'gradiente_ae_ve': params.gradiente_ae_ve,
-                        'gradiente_ve_ao': params.gradiente_ve_ao,
-                        'gradiente_ad_vd': params.gradiente_ad_vd,
-                        'gradiente_tricuspide': params.gradiente_tricuspide,
-                        'pressao_sistolica_vd': params.pressao_sistolica_vd
-                    })
+                dados_clonados = dict(ultimo_exame['exame'])
                 
-                # Adicionar laudos se existirem
-                if ultimo_exame.laudos:
-                    laudo = ultimo_exame.laudos[0]
-                    dados_clonados.update({
-                        'modo_m_bidimensional': laudo.modo_m_bidimensional,
-                        'doppler_convencional': laudo.doppler_convencional,
-                        'doppler_tecidual': laudo.doppler_tecidual,
-                        'conclusao': laudo.conclusao,
-                        'recomendacoes': laudo.recomendacoes
-                    })
+                # Adicionar parâmetros e laudo se existirem
+                if ultimo_exame['parametros']:
+                    dados_clonados.update(ultimo_exame['parametros'])
+                if ultimo_exame['laudos']:
+                    dados_clonados.update(ultimo_exame['laudos'])
                 
                 log_system_event(f'Dados clonados do último exame - Paciente: {clone_paciente}', current_user.id)
         
@@ -626,30 +587,20 @@ def novo_exame():
             form_data = calcular_parametros_derivados(form_data)
             
             # Aplicar valores aos parâmetros
-            for field_name, value in form_data.items():
-                if hasattr(parametros, field_name) and value:
-                    try:
-                        if field_name in ['frequencia_cardiaca']:
-                            setattr(parametros, field_name, int(value))
-                        else:
-                            setattr(parametros, field_name, float(value))
-                    except (ValueError, TypeError):
-                        continue
+            parameter_serializer.apply(parametros, form_data)
             
             db.session.add(parametros)
             
             # Criar laudo médico
             laudo = LaudoEcocardiograma()
             laudo.exame_id = exame.id
-            laudo.modo_m_bidimensional = request.form.get('modo_m_bidimensional', '')
-            laudo.doppler_convencional = request.form.get('doppler_convencional', '')
-            laudo.doppler_tecidual = request.form.get('doppler_tecidual', '')
-            laudo.conclusao = request.form.get('conclusao', '')
-            laudo.recomendacoes = request.form.get('recomendacoes', '')
+            laudo_serializer.apply(laudo, {name: request.form.get(name, '') for name in laudo_serializer.names})
             
             db.session.add(laudo)
             db.session.commit()
             
+            live_hub.notify_change()
+            
             # Log da operação
             log_system_event(f'Novo exame criado: ID {exame.id}, Paciente: {exame.nome_paciente}', current_user.id)
             
@@ -679,6 +630,7 @@ def prontuario():
     return render_template('prontuario/index.html')
 
 @app.route('/prontuario/buscar')
+@query_budget(4)
 @login_required
 def buscar_pacientes():
     """Buscar pacientes no prontuário"""
@@ -704,22 +656,28 @@ def buscar_pacientes():
                 func.lower(Exame.nome_paciente).like(f'{palavra}')
             )
         
-        pacientes = query.order_by(Exame.nome_paciente).limit(20).all()
+        pacientes = query.add_columns(func.max(Exame.created_at).label('ultimo_em'))\
+                         .order_by(Exame.nome_paciente).limit(20).subquery()
+        
+        # Último exame de cada paciente em uma única consulta (evita N+1)
+        linhas = db.session.query(Exame, pacientes.c.total_exames)\
+                           .join(pacientes, (Exame.nome_paciente == pacientes.c.nome_paciente) &
+                                            (Exame.created_at == pacientes.c.ultimo_em))\
+                           .order_by(Exame.nome_paciente, desc(Exame.id)).all()
         
         resultados = []
-        for paciente in pacientes:
-            # Buscar último exame do paciente
-            ultimo_exame = Exame.query.filter_by(nome_paciente=paciente.nome_paciente)\
-                                    .order_by(desc(Exame.created_at)).first()
-            
-            if ultimo_exame:
-                resultados.append({
-                    'nome': paciente.nome_paciente,
-                    'total_exames': paciente.total_exames,
-                    'ultimo_exame': ultimo_exame.data_exame,
-                    'idade': ultimo_exame.idade,
-                    'sexo': ultimo_exame.sexo
-                })
+        vistos = set()
+        for ultimo_exame, total_exames in linhas:
+            if ultimo_exame.nome_paciente in vistos:
+                continue
+            vistos.add(ultimo_exame.nome_paciente)
+            resultados.append({
+                'nome': ultimo_exame.nome_paciente,
+                'total_exames': total_exames,
+                'ultimo_exame': ultimo_exame.data_exame,
+                'idade': ultimo_exame.idade,
+                'sexo': ultimo_exame.sexo
+            })
         
         log_system_event(f'Busca no prontuário: "{termo}" - {len(resultados)} resultados', current_user.id)
         return jsonify(resultados)
@@ -729,32 +687,116 @@ def buscar_pacientes():
         return jsonify([])
 
 @app.route('/prontuario/<nome_paciente>')
+@query_budget(3)
 @login_required
 def prontuario_paciente(nome_paciente):
-    """Ver prontuário completo de um paciente"""
+    """Ver prontuário do paciente: cabeçalho e primeira página do histórico"""
+    from modules.exams.patient_history import PatientHistoryService
+    
     try:
-        # Buscar todos os exames do paciente
-        exames = Exame.query.filter_by(nome_paciente=nome_paciente)\
-                           .order_by(desc(Exame.created_at)).all()
+        paciente = PatientHistoryService.header(nome_paciente)
         
-        if not exames:
+        if paciente is None:
             flash('Paciente não encontrado', 'error')
             return redirect(url_for('prontuario'))
         
-        # Dados do paciente (do último exame)
-        paciente = exames[0]
+        pagina = PatientHistoryService.summary_page(nome_paciente)
         
         log_system_event(f'Visualização de prontuário - Paciente: {nome_paciente}', current_user.id)
         
         return render_template('prontuario/paciente.html', 
                              paciente=paciente,
-                             exames=exames)
+                             exames=pagina['exames'],
+                             proximo_cursor=pagina['proximo_cursor'])
                              
     except Exception as e:
         log_error_with_traceback('Erro ao carregar prontuário do paciente', e, current_user.id)
         flash('Erro ao carregar prontuário', 'error')
         return redirect(url_for('prontuario'))
 
+@app.route('/api/prontuario/<nome_paciente>/exames')
+@query_budget(2)
+@login_required
+def api_historico_paciente(nome_paciente):
+    """Próxima página do histórico resumido (rolagem infinita)"""
+    from modules.exams.patient_history import PatientHistoryService
+    from modules.core.exceptions import ValidationError
+    
+    try:
+        pagina = PatientHistoryService.summary_page(
+            nome_paciente, request.args.get('cursor'), request.args.get('limite', 20, type=int))
+    except ValidationError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    return jsonify({
+        'success': True,
+        'exames': [exame.to_dict() for exame in pagina['exames']],
+        'proximo_cursor': pagina['proximo_cursor']
+    })
+
+@app.route('/api/prontuario/<nome_paciente>/tendencias')
+@query_budget(2)
+@login_required
+def api_tendencias_paciente(nome_paciente):
+    """Séries temporais dos parâmetros do paciente com variações entre exames"""
+    from modules.exams.trend_service import PatientTrendService
+
+    tendencias = PatientTrendService.get_trends(nome_paciente)
+    if tendencias is None:
+        return jsonify({'success': False, 'message': 'Paciente não encontrado'}), 404
+    return jsonify({'success': True, **tendencias})
+
+@app.route('/api/exames/<int:exame_id>/similares')
+@query_budget(3)
+@login_required
+def api_exames_similares(exame_id):
+    """Exames anteriores com parâmetros mais semelhantes aos do exame"""
+    from modules.analytics import similarity_index
+
+    similares = similarity_index.similar_to_exam(exame_id, request.args.get('k', 5, type=int))
+    if similares is None:
+        if db.session.get(Exame, exame_id) is None:
+            return jsonify({'success': False, 'message': 'Exame não encontrado'}), 404
+        return jsonify({'success': False, 'message': 'Exame sem parâmetros suficientes para comparação'}), 422
+    return jsonify({'success': True, 'exame_id': exame_id, 'similares': similares})
+
+@app.route('/api/exames/similares', methods=['POST'])
+@query_budget(3)
+@login_required
+def api_exames_similares_parametros():
+    """Exames com parâmetros mais semelhantes a medidas ainda não gravadas"""
+    from modules.analytics import similarity_index
+    from modules.core.exceptions import ValidationError
+
+    dados = request.get_json(silent=True) or {}
+    try:
+        similares = similarity_index.similar_to_values(
+            dados.get('parametros') or {}, int(dados.get('k', 5)),
+            exclude=[int(dados['exame_id'])] if dados.get('exame_id') else ())
+    except (ValidationError, ValueError, TypeError) as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    return jsonify({'success': True, 'similares': similares})
+
+@app.route('/api/exames/anormalidades')
+@query_budget(2)
+@login_required
+def api_exames_por_achados():
+    """Exames com todos os achados informados (ex.: achados=fe_menor_40,ae_dilatado)"""
+    from modules.exams.reference_ranges import ABNORMALITY_FLAGS, AbnormalityService
+    from modules.core.exceptions import ValidationError
+
+    achados = [nome.strip() for nome in request.args.get('achados', '').split(',') if nome.strip()]
+    try:
+        resultado = AbnormalityService.find_exams(
+            achados, request.args.get('limite', 50, type=int), request.args.get('antes_de', type=int))
+    except ValidationError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e),
+            'achados_disponiveis': {nome: rotulo for nome, _, _, _, rotulo in ABNORMALITY_FLAGS}
+        }), 400
+    return jsonify({'success': True, **resultado})
+
 @app.route('/parametros/<int:id>')
 @login_required
 def parametros(id):
@@ -829,11 +871,13 @@ def salvar_parametros(id):
     return redirect(url_for('parametros', id=id))
 
 @app.route('/laudo/<int:id>')
+@query_budget(8)
 @login_required
 def laudo(id):
     """Página de laudos médicos"""
+    from modules.reports.draft_service import LaudoDraftService
     try:
-        exame = Exame.query.get_or_404(id)
+        exame = ExamAggregateRepository.get_or_404(id)
         
         # Criar laudo se não existir
         if not exame.laudos:
@@ -841,10 +885,16 @@ def laudo(id):
             laudo.exame_id = id
             db.session.add(laudo)
             db.session.commit()
+            ExamAggregateRepository.invalidate(id)
+            exame = ExamAggregateRepository.get_or_404(id)
             log_system_event(f'Laudo criado para exame ID {id}', current_user.id)
         
+        # Formulário reabre com o rascunho pendente sobre o laudo salvo
+        rascunho = LaudoDraftService.get_draft(id)
+        campos = LaudoDraftService.effective_fields(id, rascunho)
+        
         log_system_event(f'Acesso ao laudo - Exame ID: {id}', current_user.id)
-        return render_template('laudo.html', exame=exame)
+        return render_template('laudo.html', exame=exame, laudo=campos, rascunho=rascunho)
         
     except Exception as e:
         log_error_with_traceback('Erro ao carregar laudo', e, current_user.id)
@@ -854,27 +904,17 @@ def laudo(id):
 @app.route('/salvar_laudo/<int:id>', methods=['POST'])
 @login_required
 def salvar_laudo(id):
-    """Salvar laudo médico"""
+    """Salvar laudo médico (promove o rascunho)"""
+    from modules.reports.draft_service import LaudoDraftService
     try:
-        exame = Exame.query.get_or_404(id)
+        Exame.query.get_or_404(id)
         
-        if not exame.laudos:
-            laudo = LaudoEcocardiograma()
-            laudo.exame_id = id
-            db.session.add(laudo)
-        else:
-            laudo = exame.laudos[0]
+        # Grava apenas as colunas alteradas e descarta o rascunho
+        alterados = LaudoDraftService.promote(id, request.form)
+        ExamAggregateRepository.invalidate(id)
         
-        # Atualizar campos do laudo
-        laudo.modo_m_bidimensional = request.form.get('modo_m_bidimensional', '')
-        laudo.doppler_convencional = request.form.get('doppler_convencional', '')
-        laudo.doppler_tecidual = request.form.get('doppler_tecidual', '')
-        laudo.conclusao = request.form.get('conclusao', '')
-        laudo.recomendacoes = request.form.get('recomendacoes', '')
-        
-        db.session.commit()
-        
-        log_system_event(f'Laudo atualizado para exame ID {id}', current_user.id)
+        if alterados:
+            log_system_event(f'Laudo atualizado para exame ID {id}', current_user.id)
         flash('Laudo salvo com sucesso!', 'success')
         
     except Exception as e:
@@ -884,12 +924,39 @@ def salvar_laudo(id):
     
     return redirect(url_for('laudo', id=id))
 
+@app.route('/api/laudo/<int:id>/rascunho', methods=['GET', 'PATCH'])
+@login_required
+def api_rascunho_laudo(id):
+    """Rascunho do laudo: consulta ou aplica apenas os campos alterados"""
+    from modules.reports.draft_service import LaudoDraftService
+    from modules.core.exceptions import ValidationError, BusinessRuleError
+    
+    if request.method == 'GET':
+        return jsonify({'success': True, **LaudoDraftService.get_draft(id)})
+    
+    dados = request.get_json(silent=True) or {}
+    try:
+        resultado = LaudoDraftService.apply_patch(
+            id, int(dados.get('revisao', 0)), dados.get('campos', {}), current_user.id)
+    except (ValidationError, ValueError, TypeError) as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except BusinessRuleError as e:
+        return jsonify({'success': False, 'message': str(e)}), 404
+    except Exception as e:
+        db.session.rollback()
+        log_error_with_traceback('Erro ao salvar rascunho do laudo', e, current_user.id)
+        return jsonify({'success': False, 'message': 'Erro ao salvar rascunho'}), 500
+    
+    status = 409 if resultado['status'] == 'conflito' else 200
+    return jsonify({'success': status == 200, **resultado}), status
+
 @app.route('/visualizar_exame/<int:id>')
+@query_budget(5)
 @login_required
 def visualizar_exame(id):
     """Visualizar exame completo"""
     try:
-        exame = Exame.query.get_or_404(id)
+        exame = ExamAggregateRepository.get_or_404(id)
         log_system_event(f'Visualização de exame - ID: {id}, Paciente: {exame.nome_paciente}', current_user.id)
         return render_template('visualizar_exame.html', exame=exame)
     except Exception as e:
@@ -898,11 +965,12 @@ def visualizar_exame(id):
         return redirect(url_for('index'))
 
 @app.route('/gerar-pdf/<int:exame_id>')
+@query_budget(4)
 @login_required
 def gerar_pdf(exame_id):  
     """Gerar PDF do exame"""
     try:
-        exame = Exame.query.get_or_404(exame_id)
+        exame = ExamAggregateRepository.get_or_404(exame_id)
         
         # Gerar PDF
         caminho_pdf = generate_pdf_report(exame)
@@ -987,75 +1055,23 @@ def novo_exame_prontuario(nome_paciente):
 # ===== APIs DO SISTEMA =====
 
 @app.route('/api/ultimo-exame-paciente/<nome_paciente>')
+@query_budget(3)
 @login_required
 def api_ultimo_exame_paciente(nome_paciente):
     """API para buscar último exame de um paciente"""
     try:
-        ultimo_exame = Exame.query.filter_by(nome_paciente=nome_paciente)\
-                                 .order_by(desc(Exame.created_at)).first()
+        ultimo_exame = latest_exam_payload(nome_paciente)
         
         if not ultimo_exame:
             return jsonify({'erro': 'Paciente não encontrado'}), 404
         
-        dados = {
-            'exame': {
-                'nome_paciente': ultimo_exame.nome_paciente,
-                'data_nascimento': ultimo_exame.data_nascimento,
-                'idade': ultimo_exame.idade,
-                'sexo': ultimo_exame.sexo,
-                'tipo_atendimento': ultimo_exame.tipo_atendimento,
-                'medico_usuario': ultimo_exame.medico_usuario,
-                'medico_solicitante': ultimo_exame.medico_solicitante,
-                'indicacao': ultimo_exame.indicacao
-            }
-        }
+        dados = {'exame': ultimo_exame['exame']}
         
-        # Adicionar parâmetros se existirem
-        if ultimo_exame.parametros:
-            dados['parametros'] = {
-                'peso': ultimo_exame.parametros.peso,
-                'altura': ultimo_exame.parametros.altura,
-                'superficie_corporal': ultimo_exame.parametros.superficie_corporal,
-                'frequencia_cardiaca': ultimo_exame.parametros.frequencia_cardiaca,
-                'atrio_esquerdo': ultimo_exame.parametros.atrio_esquerdo,
-                'raiz_aorta': ultimo_exame.parametros.raiz_aorta,
-                'relacao_atrio_esquerdo_aorta': ultimo_exame.parametros.relacao_atrio_esquerdo_aorta,
-                'aorta_ascendente': ultimo_exame.parametros.aorta_ascendente,
-                'diametro_ventricular_direito': ultimo_exame.parametros.diametro_ventricular_direito,
-                'diametro_basal_vd': ultimo_exame.parametros.diametro_basal_vd,
-                'diametro_diastolico_final_ve': ultimo_exame.parametros.diametro_diastolico_final_ve,
-                'diametro_sistolico_final': ultimo_exame.parametros.diametro_sistolico_final,
-                'percentual_encurtamento': ultimo_exame.parametros.percentual_encurtamento,
-                'espessura_diastolica_septo': ultimo_exame.parametros.espessura_diastolica_septo,
-                'espessura_diastolica_ppve': ultimo_exame.parametros.espessura_diastolica_ppve,
-                'relacao_septo_parede_posterior': ultimo_exame.parametros.relacao_septo_parede_posterior,
-                'volume_diastolico_final': ultimo_exame.parametros.volume_diastolico_final,
-                'volume_sistolico_final': ultimo_exame.parametros.volume_sistolico_final,
-                'volume_ejecao': ultimo_exame.parametros.volume_ejecao,
-                'fracao_ejecao': ultimo_exame.parametros.fracao_ejecao,
-                'indice_massa_ve': ultimo_exame.parametros.indice_massa_ve,
-                'massa_ve': ultimo_exame.parametros.massa_ve,
-                'fluxo_pulmonar': ultimo_exame.parametros.fluxo_pulmonar,
-                'fluxo_mitral': ultimo_exame.parametros.fluxo_mitral,
-                'fluxo_aortico': ultimo_exame.parametros.fluxo_aortico,
-                'fluxo_tricuspide': ultimo_exame.parametros.fluxo_tricuspide,
-                'gradiente_vd_ap': ultimo_exame.parametros.gradiente_vd_ap,
-                'gradiente_ae_ve': ultimo_exame.parametros.gradiente_ae_ve,
-                'gradiente_ve_ao': ultimo_exame.parametros.gradiente_ve_ao,
-                'gradiente_ad_vd': ultimo_exame.parametros.gradiente_ad_vd,
-                'gradiente_tricuspide': ultimo_exame.parametros.gradiente_tricuspide,
-                'pressao_sistolica_vd': ultimo_exame.parametros.pressao_sistolica_vd
-            }
-        
-        # Adicionar laudos se existirem
-        if ultimo_exame.laudos:
-            dados['laudos'] = {
-                'modo_m_bidimensional': ultimo_exame.laudos[0].modo_m_bidimensional,
-                'doppler_convencional': ultimo_exame.laudos[0].doppler_convencional,
-                'doppler_tecidual': ultimo_exame.laudos[0].doppler_tecidual,
-                'conclusao': ultimo_exame.laudos[0].conclusao,
-                'recomendacoes': ultimo_exame.laudos[0].recomendacoes
-            }
+        # Adicionar parâmetros e laudos se existirem
+        if ultimo_exame['parametros']:
+            dados['parametros'] = ultimo_exame['parametros']
+        if ultimo_exame['laudos']:
+            dados['laudos'] = ultimo_exame['laudos']
         
         return jsonify(dados)
         
@@ -1090,16 +1106,7 @@ def api_salvar_novo_exame_completo():
         parametros.exame_id = exame.id
         
         # Aplicar parâmetros do JSON
-        parametros_data = data.get('parametros', {})
-        for field, value in parametros_data.items():
-            if hasattr(parametros, field) and value is not None:
-                try:
-                    if field == 'frequencia_cardiaca':
-                        setattr(parametros, field, int(value))
-                    else:
-                        setattr(parametros, field, float(value))
-                except (ValueError, TypeError):
-                    continue
+        parameter_serializer.apply(parametros, data.get('parametros', {}))
         
         db.session.add(parametros)
         
@@ -1108,14 +1115,11 @@ def api_salvar_novo_exame_completo():
         laudo.exame_id = exame.id
         
         laudos_data = data.get('laudos', {})
-        laudo.modo_m_bidimensional = laudos_data.get('modo_m_bidimensional', '')
-        laudo.doppler_convencional = laudos_data.get('doppler_convencional', '')
-        laudo.doppler_tecidual = laudos_data.get('doppler_tecidual', '')
-        laudo.conclusao = laudos_data.get('conclusao', '')
-        laudo.recomendacoes = laudos_data.get('recomendacoes', '')
+        laudo_serializer.apply(laudo, {name: laudos_data.get(name, '') for name in laudo_serializer.names})
         
         db.session.add(laudo)
         db.session.commit()
+        live_hub.notify_change()
         
         log_system_event(f'Novo exame completo criado via API: ID {exame.id}', current_user.id)
         
@@ -1152,26 +1156,32 @@ def api_hora_atual():
         log_error_with_traceback('Erro na API hora atual', e, current_user.id)
         return jsonify({'erro': str(e)}), 500
 
+@app.route('/api/eventos')
+@login_required
+def api_eventos():
+    """Canal SSE do painel: hora do servidor uma vez e depois só mudanças"""
+    assinatura = live_hub.subscribe()
+    if assinatura is None:
+        # Worker no limite de conexões longas: o painel volta a consultar devagar
+        return jsonify({'erro': 'Limite de conexões ao vivo atingido'}), 503, {'Retry-After': '60'}
+    
+    try:
+        contadores = live_hub.counters or dashboard_counters()
+    except Exception as e:
+        live_hub.unsubscribe(assinatura)
+        log_error_with_traceback('Erro ao abrir canal de eventos', e, current_user.id)
+        return jsonify({'erro': str(e)}), 500
+    
+    # Sem stream_with_context: a conexão não prende sessão do banco nem contexto
+    return Response(live_hub.stream(assinatura, contadores), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/api/estatisticas')
 @login_required
 def api_estatisticas():
     """API para estatísticas do sistema"""
     try:
-        hoje = datetime.now().date()
-        mes_atual = datetime.now().month
-        ano_atual = datetime.now().year
-        
-        stats = {
-            'total_exames': Exame.query.count(),
-            'total_pacientes': db.session.query(func.count(func.distinct(Exame.nome_paciente))).scalar(),
-            'exames_hoje': Exame.query.filter(func.date(Exame.created_at) == hoje).count(),
-            'exames_mes': Exame.query.filter(
-                func.extract('month', Exame.created_at) == mes_atual,
-                func.extract('year', Exame.created_at) == ano_atual
-            ).count()
-        }
-        
-        return jsonify(stats)
+        return jsonify(dashboard_counters())
         
     except Exception as e:
         log_error_with_traceback('Erro na API estatísticas', e, current_user.id)
@@ -1300,9 +1310,11 @@ def api_excluir_exame(id):
         
         for laudo in exame.laudos:
             db.session.delete(laudo)
+        LaudoRascunho.query.filter_by(exame_id=id).delete(synchronize_session=False)
         
         db.session.delete(exame)
         db.session.commit()
+        live_hub.notify_change()
         
         log_system_event(f'Exame excluído: ID {id}, Paciente: {nome_paciente}', current_user.id)
         
@@ -1525,6 +1537,7 @@ def editar_usuario(id):
             usuario.is_active = 'is_active' in request.form
             
             db.session.commit()
+            session_cache.invalidate(usuario.id)
             
             log_system_event(f'Usuário atualizado: {usuario.username}', current_user.id)
             flash('Usuário atualizado com sucesso!', 'success')
@@ -1553,6 +1566,7 @@ def excluir_usuario(id):
         username = usuario.username
         db.session.delete(usuario)
         db.session.commit()
+        session_cache.invalidate(id)
         
         log_system_event(f'Usuário excluído: {username}', current_user.id)
         flash('Usuário excluído com sucesso!', 'success')
@@ -1578,11 +1592,216 @@ def manutencao_sistema():
             'uptime': datetime.now().strftime('%d/%m/%Y %H:%M:%S')
         }
         
-        return render_template('manutencao/sistema.html', info_sistema=info_sistema)
+        # Status vem do último snapshot do amostrador (sem bloquear a requisição)
+        from modules.maintenance.system_service import SystemService
+        status_sistema = SystemService.get_system_status()
+        
+        return render_template('manutencao/sistema.html', 
+                             info_sistema=info_sistema,
+                             status_sistema=status_sistema)
         
     except Exception as e:
         log_error_with_traceback('Erro na página do sistema', e, current_user.id)
-        return render_template('manutencao/sistema.html', info_sistema={})
+        return render_template('manutencao/sistema.html', info_sistema={}, status_sistema={})
+
+@app.route('/health')
+def health_check():
+    """Verificação de saúde para balanceador de carga (somente cache)"""
+    from modules.maintenance.system_service import SystemService
+    
+    status = SystemService.get_liveness_status()
+    http_status = 503 if status['status'] == 'degraded' else 200
+    return jsonify(status), http_status
+
+@app.route('/metrics')
+def metrics():
+    """Métricas no formato Prometheus agregadas entre os workers"""
+    token = os.environ.get('METRICS_TOKEN')
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return jsonify({'error': 'Não autorizado'}), 401
+    
+    return app.response_class(metrics_registry.render_prometheus(),
+                              mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/api/sistema/saude')
+@login_required
+@admin_required
+def api_sistema_saude():
+    """API com o último snapshot e o histórico recente das sondas de saúde"""
+    try:
+        from utils.health_monitor import health_sampler
+        from utils.janitor import janitor
+        
+        limite = request.args.get('limite', 20, type=int)
+        
+        return jsonify({
+            'success': True,
+            'amostrador': health_sampler.get_status(),
+            'zelador': janitor.get_status(),
+            'ultimo': health_sampler.latest(),
+            'historico': health_sampler.history(request.args.get('sonda'), limite)
+        })
+        
+    except Exception as e:
+        log_error_with_traceback('Erro na API de saúde do sistema', e, current_user.id)
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/sistema/consultas')
+@login_required
+@admin_required
+def api_sistema_consultas():
+    """API com os padrões N+1 detectados pelo perfilador de consultas"""
+    try:
+        from utils.query_profiler import query_profiler
+        
+        limite = request.args.get('limite', 50, type=int)
+        
+        return jsonify({
+            'success': True,
+            'perfilador': query_profiler.get_status(),
+            'relatorios': query_profiler.get_reports(limite)
+        })
+        
+    except Exception as e:
+        log_error_with_traceback('Erro na API de consultas do sistema', e, current_user.id)
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/analytics/status')
+@login_required
+@admin_required
+def api_analytics_status():
+    """API com a versão e o tamanho do instantâneo colunar"""
+    from modules.analytics import columnar_store
+    return jsonify({'success': True, 'instantaneo': columnar_store.get_status()})
+
+@app.route('/api/analytics/atualizar', methods=['POST'])
+@login_required
+@admin_required
+def api_analytics_atualizar():
+    """API que incorpora ao instantâneo os exames alterados (ou reconstrói com completo=true)"""
+    try:
+        from modules.analytics import columnar_store
+
+        dados = request.get_json(silent=True) or {}
+        resultado = columnar_store.refresh(full=bool(dados.get('completo')))
+        log_system_event(f'Instantâneo analítico atualizado: {resultado["linhas"]} exames', current_user.id)
+        return jsonify({'success': True, **resultado})
+
+    except Exception as e:
+        log_error_with_traceback('Erro ao atualizar instantâneo analítico', e, current_user.id)
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/analytics/coorte', methods=['POST'])
+@login_required
+@admin_required
+def api_analytics_coorte():
+    """API de coorte: estatísticas de um parâmetro por grupo, sem consultar o banco"""
+    from modules.analytics import columnar_store
+    from modules.core.exceptions import ValidationError
+
+    dados = request.get_json(silent=True) or {}
+    try:
+        coluna = dados.get('coluna', 'fracao_ejecao')
+        filtros = dados.get('filtros') or {}
+        resultado = columnar_store.aggregate(
+            coluna,
+            group_by=dados.get('agrupar') or [],
+            filters=filtros,
+            statistics=dados.get('estatisticas') or ('count', 'mean', 'std')
+        )
+        if dados.get('histograma'):
+            histograma = dados['histograma'] if isinstance(dados['histograma'], dict) else {}
+            resultado['histograma'] = columnar_store.histogram(
+                coluna, bins=int(histograma.get('faixas', 20)), filters=filtros,
+                value_range=histograma.get('intervalo'))
+    except (ValidationError, ValueError, TypeError) as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        log_error_with_traceback('Erro na consulta de coorte', e, current_user.id)
+        return jsonify({'success': False, 'message': 'Erro na consulta de coorte'}), 500
+
+    return jsonify({'success': True, **resultado})
+
+@app.route('/admin-vidah-sistema-2025/coorte')
+@login_required
+@admin_required
+def pagina_coorte():
+    """Página do construtor de consultas de coorte por medidas"""
+    from models import PARAMETER_COLUMNS
+    from modules.exams.reference_ranges import ABNORMALITY_FLAGS
+
+    return render_template('manutencao/coorte.html',
+                           colunas=PARAMETER_COLUMNS,
+                           achados=[(nome, rotulo) for nome, _, _, _, rotulo in ABNORMALITY_FLAGS])
+
+def _consulta_coorte(dados):
+    from modules.analytics.cohort_query import CohortQuery
+    return CohortQuery(dados.get('filtros') or {}, dados.get('colunas') or ())
+
+@app.route('/api/coorte/consulta', methods=['POST'])
+@query_budget(3)
+@login_required
+@admin_required
+def api_coorte_consulta():
+    """API de coorte: página de exames que atendem aos filtros (uma consulta) e contagem estimada"""
+    from modules.core.exceptions import ValidationError
+
+    dados = request.get_json(silent=True) or {}
+    try:
+        consulta = _consulta_coorte(dados)
+        resultado = consulta.page(dados.get('cursor'), int(dados.get('limite', 50)))
+        if dados.get('estimar'):
+            resultado['contagem'] = consulta.estimate()
+    except (ValidationError, ValueError, TypeError) as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        log_error_with_traceback('Erro na consulta de coorte por medidas', e, current_user.id)
+        return jsonify({'success': False, 'message': 'Erro na consulta de coorte'}), 500
+
+    return jsonify({'success': True, **resultado})
+
+@app.route('/api/coorte/exportar', methods=['POST'])
+@login_required
+@admin_required
+def api_coorte_exportar():
+    """Exportação CSV da coorte em streaming (páginas por chave)"""
+    from flask import stream_with_context
+    from modules.core.exceptions import ValidationError
+
+    try:
+        consulta = _consulta_coorte(request.get_json(silent=True) or {})
+    except (ValidationError, ValueError, TypeError) as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+    log_system_event('Exportação de coorte por medidas', current_user.id)
+    return Response(stream_with_context(consulta.iter_csv()), mimetype='text/csv',
+                    headers={'Content-Disposition': 'attachment; filename=coorte.csv'})
+
+@app.route('/api/coorte/indices', methods=['POST'])
+@login_required
+@admin_required
+def api_coorte_indices():
+    """Índices sugeridos para os filtros e plano da consulta; aplicar=true cria os que faltam"""
+    from modules.analytics.cohort_query import IndexAdvisor
+    from modules.core.exceptions import ValidationError
+
+    dados = request.get_json(silent=True) or {}
+    try:
+        consulta = _consulta_coorte(dados)
+        criados = IndexAdvisor.apply(consulta) if dados.get('aplicar') else []
+        if criados:
+            log_system_event(f"Índices de coorte criados: {', '.join(i['nome'] for i in criados)}", current_user.id)
+        return jsonify({
+            'success': True,
+            'criados': criados,
+            'sugestoes': IndexAdvisor.recommend(consulta),
+            'plano': consulta.explain()
+        })
+    except (ValidationError, ValueError, TypeError) as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        log_error_with_traceback('Erro no consultor de índices de coorte', e, current_user.id)
+        return jsonify({'success': False, 'message': 'Erro no consultor de índices'}), 500
 
 @app.route('/gerenciar_templates')
 @login_required
@@ -1732,7 +1951,7 @@ def api_obter_laudo_template(template_id):
 def editar_exame_prontuario(exame_id):
     """Página para editar exame completo"""
     try:
-        exame = Exame.query.get_or_404(exame_id)
+        exame = ExamAggregateRepository.get_or_404(exame_id)
         medicos = Medico.query.filter_by(ativo=True).all()
         
         log_system_event(f'Acesso à edição de exame - ID: {exame_id}', current_user.id)
@@ -1754,37 +1973,19 @@ def api_salvar_exame_editado(exame_id):
         data = request.get_json()
         exame = Exame.query.get_or_404(exame_id)
         
-        # Atualizar dados básicos do exame
+        # Atualizar dados básicos do exame (somente campos registrados)
         if 'exame' in data:
-            exame_data = data['exame']
-            for field, value in exame_data.items():
-                if hasattr(exame, field):
-                    setattr(exame, field, value)
+            exam_serializer.apply(exame, data['exame'])
         
         # Atualizar parâmetros
         if 'parametros' in data and exame.parametros:
-            parametros_data = data['parametros']
             # Calcular parâmetros derivados
-            parametros_data = calcular_parametros_derivados(parametros_data)
-            
-            for field, value in parametros_data.items():
-                if hasattr(exame.parametros, field) and value is not None:
-                    try:
-                        if field == 'frequencia_cardiaca':
-                            setattr(exame.parametros, field, int(value))
-                        else:
-                            setattr(exame.parametros, field, float(value))
-                    except (ValueError, TypeError):
-                        continue
+            parametros_data = calcular_parametros_derivados(data['parametros'])
+            parameter_serializer.apply(exame.parametros, parametros_data)
         
         # Atualizar laudos
         if 'laudos' in data and exame.laudos:
-            laudos_data = data['laudos']
-            laudo = exame.laudos[0]
-            
-            for field, value in laudos_data.items():
-                if hasattr(laudo, field):
-                    setattr(laudo, field, value or '')
+            laudo_serializer.apply(exame.laudos[0], data['laudos'])
         
         db.session.commit()
         
@@ -1826,7 +2027,7 @@ def test_botao_pdf():
 def gerar_pdf_institucional(exame_id):
     """Gerar PDF institucional específico"""
     try:
-        exame = Exame.query.get_or_404(exame_id)
+        exame = ExamAggregateRepository.get_or_404(exame_id)
         
         # Usar o gerador padrão que já está integrado
         caminho_pdf = generate_pdf_report(exame)
@@ -2056,14 +2257,15 @@ def api_templates_busca_avancada():
 def pagina_relatorios():
     """Página de relatórios do sistema"""
     try:
+        # Mês corrente pela data do exame, somado no resumo diário
+        inicio_mes = today_brasilia().replace(day=1)
+        fim_mes = month_bounds(inicio_mes)[1].date() - timedelta(days=1)
+        
         # Estatísticas básicas
         stats = {
             'total_exames': Exame.query.count(),
             'total_pacientes': db.session.query(func.count(func.distinct(Exame.nome_paciente))).scalar(),
-            'exames_mes_atual': Exame.query.filter(
-                func.extract('month', Exame.created_at) == datetime.now().month,
-                func.extract('year', Exame.created_at) == datetime.now().year
-            ).count(),
+            'exames_mes_atual': ExamRollupService.summarize(inicio_mes, fim_mes)['total'],
             'usuarios_ativos': Usuario.query.filter_by(is_active=True).count()
         }
         
@@ -2077,19 +2279,23 @@ def pagina_relatorios():
 @login_required
 @admin_required
 def api_relatorio_exames_periodo():
-    """API para relatório de exames por período"""
+    """API para relatório de exames por período (data do exame, inclusive)"""
     try:
         data_inicio = request.args.get('data_inicio')
         data_fim = request.args.get('data_fim')
+        inicio, fim = parse_date(data_inicio), parse_date(data_fim)
+        if (data_inicio and inicio is None) or (data_fim and fim is None):
+            return jsonify({'success': False, 'error': 'Data inválida (use dd/mm/aaaa ou aaaa-mm-dd)'}), 400
         
         query = Exame.query
         
-        if data_inicio:
-            query = query.filter(Exame.created_at >= data_inicio)
-        if data_fim:
-            query = query.filter(Exame.created_at <= data_fim)
+        # Intervalo sobre a coluna tipada e indexada da data do exame
+        if inicio:
+            query = query.filter(Exame.data_exame_dt >= inicio)
+        if fim:
+            query = query.filter(Exame.data_exame_dt <= fim)
         
-        exames = query.order_by(desc(Exame.created_at)).all()
+        exames = query.order_by(desc(Exame.data_exame_dt), desc(Exame.id)).all()
         
         resultado = []
         for exame in exames:
@@ -216,46 +216,96 @@ function displayPersonalizedTemplates(templates) {
     console.log('Templates personalizados encontrados:', templates.length);
 }
 
+// Estado do rascunho: revisão conhecida e último valor aceito pelo servidor por campo
+const rascunhoLaudo = {
+    url: null,
+    revisao: 0,
+    enviados: {},
+    emAndamento: false
+};
+
 function setupAutoSave() {
     const form = document.getElementById('laudo-form');
-    if (!form) return;
+    if (!form || !form.dataset.rascunhoUrl) return;
     
-    const fields = form.querySelectorAll('textarea, input[type="text"]');
+    rascunhoLaudo.url = form.dataset.rascunhoUrl;
+    rascunhoLaudo.revisao = parseInt(form.dataset.rascunhoRevisao || '0', 10);
     
-    fields.forEach(field => {
-        field.addEventListener('input', debounce(function() {
-            autoSaveForm();
-        }, 2000));
+    form.querySelectorAll('textarea[name]').forEach(field => {
+        rascunhoLaudo.enviados[field.name] = field.value;
+        field.addEventListener('input', debounce(autoSaveForm, 2000));
     });
     
-    // Auto-save a cada 30 segundos
+    // Verificação a cada 30 segundos; sem alterações nenhuma requisição é feita
     setInterval(autoSaveForm, 30000);
 }
 
+function camposAlterados(form) {
+    const campos = {};
+    form.querySelectorAll('textarea[name]').forEach(field => {
+        if (field.value !== rascunhoLaudo.enviados[field.name]) {
+            campos[field.name] = field.value;
+        }
+    });
+    return campos;
+}
+
 function autoSaveForm() {
     const form = document.getElementById('laudo-form');
-    if (!form) return;
+    if (!form || !rascunhoLaudo.url || rascunhoLaudo.emAndamento) return;
     
-    const formData = new FormData(form);
+    // Envia apenas os campos alterados desde o último salvamento aceito
+    const campos = camposAlterados(form);
+    if (Object.keys(campos).length === 0) return;
     
-    fetch(form.action || window.location.pathname, {
-        method: 'POST',
-        body: formData,
+    rascunhoLaudo.emAndamento = true;
+    let reenviar = false;
+    
+    fetch(rascunhoLaudo.url, {
+        method: 'PATCH',
         headers: {
-            'X-Auto-Save': 'true'
-        }
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({revisao: rascunhoLaudo.revisao, campos: campos})
     })
     .then(response => response.json())
     .then(data => {
-        if (data.success) {
-            showNotification('Laudo salvo automaticamente', 'info', 2000);
+        if (data.revisao !== undefined) {
+            rascunhoLaudo.revisao = data.revisao;
+        }
+        if (data.status === 'conflito') {
+            // Outra aba gravou antes: reenviar estas alterações sobre a revisão atual
+            reenviar = true;
+        } else if (data.success) {
+            Object.assign(rascunhoLaudo.enviados, campos);
+            if (data.status === 'salvo') {
+                showAutoSaveIndicator();
+            }
         }
     })
     .catch(error => {
         console.error('Erro no auto-save:', error);
+    })
+    .finally(() => {
+        rascunhoLaudo.emAndamento = false;
+        if (reenviar) {
+            autoSaveForm();
+        }
     });
 }
 
+function showAutoSaveIndicator() {
+    const indicator = document.getElementById('auto-save-indicator');
+    if (!indicator) {
+        showNotification('Rascunho salvo automaticamente', 'info', 2000);
+        return;
+    }
+    indicator.style.display = 'block';
+    setTimeout(() => {
+        indicator.style.display = 'none';
+    }, 2000);
+}
+
 function setupFormValidation() {
     const form = document.getElementById('laudo-form');
     if (!form) return;
@@ -0,0 +1,297 @@
+"""
+Benchmark do Fluxo Clínico - Latência por etapa sob concorrência
+
+Sobe a aplicação em um banco temporário (SQLite, ou PostgreSQL via
+--database-url) populado com os conjuntos de dados autênticos do
+repositório e executa, com N usuários simultâneos, o fluxo completo:
+login -> novo exame -> parâmetros -> laudo -> PDF -> busca no prontuário.
+
+Relata p50/p95/p99 e erros por etapa e a vazão de fluxos; o resultado é
+gravado em JSON e pode ser comparado com uma linha de base gravada antes.
+
+Uso: python tests/benchmark_clinical_workflow.py [--usuarios 8] [--fluxos 5]
+         [--servidor werkzeug|gunicorn] [--database-url postgresql://...]
+         [--saida resultado.json] [--baseline base.json] [--tolerancia 0.2]
+"""
+
+import argparse
+import glob
+import json
+import os
+import platform
+import random
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import requests
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ADMIN_CREDENTIALS = {"username": "admin", "password": "VidahAdmin2025!"}
+DATASETS = ('dados_ecocardiograma_autenticos_*.json', 'novo_banco_ecocardiograma_*.json')
+ETAPAS = ('login', 'novo_exame', 'parametros', 'laudo', 'pdf', 'prontuario')
+PERCENTIS = (50, 95, 99)
+
+
+def percentil(valores_ordenados, p):
+    """Percentil pelo posto mais próximo"""
+    if not valores_ordenados:
+        return 0.0
+    posto = max(int(round(p / 100 * len(valores_ordenados) + 0.5)) - 1, 0)
+    return valores_ordenados[min(posto, len(valores_ordenados) - 1)]
+
+
+def arquivos_de_dados():
+    arquivos = []
+    for padrao in DATASETS:
+        arquivos.extend(sorted(glob.glob(os.path.join(BASE_DIR, padrao))))
+    if not arquivos:
+        raise SystemExit("Conjuntos de dados autênticos não encontrados na raiz do repositório")
+    return arquivos
+
+
+def preparar_banco(database_url, checkpoints):
+    """Cria o schema, os usuários padrão e importa os conjuntos de dados
+
+    Retorna os registros normalizados usados para preencher os formulários.
+    """
+    os.environ['DATABASE_URL'] = database_url
+    sys.path.insert(0, BASE_DIR)
+    from app import app, bootstrap_database
+    from modules.core.exceptions import ValidationError
+    from modules.data_import import BulkImporter, iter_records, normalize_record
+
+    bootstrap_database()
+    registros = []
+    with app.app_context():
+        importer = BulkImporter(checkpoint_dir=checkpoints)
+        for arquivo in arquivos_de_dados():
+            stats = importer.import_file(arquivo, resume=False)
+            print(f"  {os.path.basename(arquivo)}: {stats['importados']} exames importados")
+            for raw in iter_records(arquivo):
+                try:
+                    registros.append(normalize_record(raw))
+                except ValidationError:
+                    continue
+    return registros
+
+
+def porta_livre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def iniciar_servidor(servidor, database_url, porta, workers):
+    env = dict(os.environ, DATABASE_URL=database_url, LOG_LEVEL='WARNING', PORT=str(porta),
+               WEB_CONCURRENCY=str(workers))
+    if servidor == 'gunicorn':
+        comando = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--log-level', 'warning',
+                   '--access-logfile', '/dev/null', 'main:app']
+    else:
+        comando = [sys.executable, '-c',
+                   "from werkzeug.serving import run_simple; from main import app; "
+                   f"run_simple('127.0.0.1', {porta}, app, threaded=True)"]
+    processo = subprocess.Popen(comando, cwd=BASE_DIR, env=env,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    url = f"http://127.0.0.1:{porta}"
+    for _ in range(120):
+        if processo.poll() is not None:
+            raise SystemExit(f"Servidor {servidor} encerrou no arranque (código {processo.returncode})")
+        try:
+            requests.get(f"{url}/login", timeout=1)
+            return processo, url
+        except requests.RequestException:
+            time.sleep(0.25)
+
+    processo.terminate()
+    raise SystemExit(f"Servidor {servidor} não respondeu")
+
+
+class UsuarioVirtual:
+    """Executa o fluxo clínico e cronometra cada etapa"""
+
+    def __init__(self, url, registros, semente):
+        self.url = url
+        self.registros = registros
+        self.random = random.Random(semente)
+        self.sessao = requests.Session()
+        self.tempos = {etapa: [] for etapa in ETAPAS}
+        self.erros = {etapa: 0 for etapa in ETAPAS}
+        self.fluxos = 0
+
+    def _etapa(self, nome, funcao):
+        inicio = time.perf_counter()
+        try:
+            resultado = funcao()
+        except Exception:
+            resultado = None
+        self.tempos[nome].append((time.perf_counter() - inicio) * 1000)
+        if resultado is None:
+            self.erros[nome] += 1
+        return resultado
+
+    def _login(self):
+        resposta = self.sessao.post(f"{self.url}/login", data=ADMIN_CREDENTIALS,
+                                    allow_redirects=False, timeout=60)
+        return resposta if resposta.status_code == 302 and '/login' not in resposta.headers['Location'] else None
+
+    def _novo_exame(self, registro):
+        self.sessao.get(f"{self.url}/novo_exame", timeout=60).raise_for_status()
+        exame = registro['exame']
+        formulario = {k: ('' if v is None else v) for k, v in exame.items()}
+        formulario['nome_paciente'] = f"{exame['nome_paciente']} BENCH {self.random.randint(1, 10 ** 6)}"
+        formulario.update({k: v for k, v in registro['parametros'].items() if v is not None})
+        resposta = self.sessao.post(f"{self.url}/novo_exame", data=formulario,
+                                    allow_redirects=False, timeout=60)
+        encontrado = re.search(r'/parametros/(\d+)', resposta.headers.get('Location', ''))
+        return int(encontrado.group(1)) if encontrado else None
+
+    def _parametros(self, exame_id, registro):
+        self.sessao.get(f"{self.url}/parametros/{exame_id}", timeout=60).raise_for_status()
+        formulario = {k: v for k, v in registro['parametros'].items() if v is not None}
+        formulario['continuar_laudo'] = '1'
+        resposta = self.sessao.post(f"{self.url}/salvar_parametros/{exame_id}", data=formulario,
+                                    allow_redirects=False, timeout=60)
+        return resposta if f'/laudo/{exame_id}' in resposta.headers.get('Location', '') else None
+
+    def _laudo(self, exame_id, registro):
+        self.sessao.get(f"{self.url}/laudo/{exame_id}", timeout=60).raise_for_status()
+        formulario = {k: v or '' for k, v in registro['laudo'].items()}
+        resposta = self.sessao.post(f"{self.url}/salvar_laudo/{exame_id}", data=formulario,
+                                    allow_redirects=False, timeout=60)
+        return resposta if resposta.status_code == 302 else None
+
+    def _pdf(self, exame_id):
+        resposta = self.sessao.get(f"{self.url}/gerar-pdf/{exame_id}", timeout=120)
+        return resposta if resposta.content[:4] == b'%PDF' else None
+
+    def _prontuario(self, registro):
+        termo = registro['exame']['nome_paciente'].split()[0]
+        resposta = self.sessao.get(f"{self.url}/prontuario/buscar", params={'q': termo}, timeout=60)
+        return resposta if resposta.status_code == 200 and isinstance(resposta.json(), list) else None
+
+    def executar(self, fluxos):
+        if self._etapa('login', self._login) is None:
+            return
+        for _ in range(fluxos):
+            registro = self.random.choice(self.registros)
+            exame_id = self._etapa('novo_exame', lambda: self._novo_exame(registro))
+            if exame_id is None:
+                continue
+            self._etapa('parametros', lambda: self._parametros(exame_id, registro))
+            self._etapa('laudo', lambda: self._laudo(exame_id, registro))
+            self._etapa('pdf', lambda: self._pdf(exame_id))
+            self._etapa('prontuario', lambda: self._prontuario(registro))
+            self.fluxos += 1
+
+
+def executar_carga(url, registros, usuarios, fluxos):
+    virtuais = [UsuarioVirtual(url, registros, semente) for semente in range(usuarios)]
+    threads = [threading.Thread(target=v.executar, args=(fluxos,)) for v in virtuais]
+
+    inicio = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    duracao = time.perf_counter() - inicio
+
+    etapas = {}
+    for etapa in ETAPAS:
+        tempos = sorted(t for v in virtuais for t in v.tempos[etapa])
+        etapas[etapa] = {
+            'amostras': len(tempos),
+            'erros': sum(v.erros[etapa] for v in virtuais),
+            **{f'p{p}_ms': round(percentil(tempos, p), 1) for p in PERCENTIS}
+        }
+
+    total_fluxos = sum(v.fluxos for v in virtuais)
+    return {
+        'duracao_s': round(duracao, 2),
+        'fluxos': total_fluxos,
+        'fluxos_por_s': round(total_fluxos / duracao, 2) if duracao else 0,
+        'etapas': etapas
+    }
+
+
+def comparar(resultado, baseline, tolerancia):
+    """Regressões de p95 acima da tolerância em relação à linha de base"""
+    regressoes = []
+    print(f"\n{'Etapa':<12}{'p95 base':>12}{'p95 atual':>12}{'Variação':>11}")
+    for etapa, atual in resultado['etapas'].items():
+        base = baseline.get('etapas', {}).get(etapa)
+        if not base or not base.get('p95_ms'):
+            continue
+        variacao = atual['p95_ms'] / base['p95_ms'] - 1
+        marca = ' ⚠' if variacao > tolerancia else ''
+        print(f"{etapa:<12}{base['p95_ms']:>12.1f}{atual['p95_ms']:>12.1f}{variacao:>+10.0%}{marca}")
+        if variacao > tolerancia:
+            regressoes.append(etapa)
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark do fluxo clínico completo')
+    parser.add_argument('--usuarios', type=int, default=8, help='Usuários simultâneos')
+    parser.add_argument('--fluxos', type=int, default=5, help='Fluxos completos por usuário')
+    parser.add_argument('--servidor', choices=('werkzeug', 'gunicorn'), default='werkzeug')
+    parser.add_argument('--workers', type=int, default=2, help='Workers do gunicorn')
+    parser.add_argument('--database-url', help='PostgreSQL descartável (padrão: SQLite temporário)')
+    parser.add_argument('--saida', help='Arquivo JSON do resultado')
+    parser.add_argument('--baseline', help='Resultado anterior para comparação')
+    parser.add_argument('--tolerancia', type=float, default=0.2, help='Regressão aceita no p95 (0.2 = 20%%)')
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix='bench_fluxo_')
+    database_url = args.database_url or f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+    processo = None
+    try:
+        print(f"Preparando banco ({database_url.split(':')[0]})...")
+        registros = preparar_banco(database_url, os.path.join(tmpdir, 'checkpoints'))
+
+        processo, url = iniciar_servidor(args.servidor, database_url, porta_livre(), args.workers)
+        resultado = executar_carga(url, registros, args.usuarios, args.fluxos)
+    finally:
+        if processo:
+            processo.terminate()
+            processo.wait(timeout=30)
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    resultado.update({
+        'executado_em': datetime.now().isoformat(timespec='seconds'),
+        'config': {'usuarios': args.usuarios, 'fluxos': args.fluxos, 'servidor': args.servidor,
+                   'banco': 'postgresql' if args.database_url else 'sqlite',
+                   'python': platform.python_version()}
+    })
+
+    print("=" * 70)
+    print(f"FLUXO CLÍNICO: {args.usuarios} usuários x {args.fluxos} fluxos ({args.servidor})")
+    print("=" * 70)
+    print(f"{'Etapa':<12}{'Amostras':>10}{'p50 (ms)':>11}{'p95 (ms)':>11}{'p99 (ms)':>11}{'Erros':>8}")
+    for etapa, r in resultado['etapas'].items():
+        print(f"{etapa:<12}{r['amostras']:>10}{r['p50_ms']:>11.1f}{r['p95_ms']:>11.1f}{r['p99_ms']:>11.1f}{r['erros']:>8}")
+    print(f"\n{resultado['fluxos']} fluxos em {resultado['duracao_s']}s ({resultado['fluxos_por_s']} fluxos/s)")
+
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(resultado, f, ensure_ascii=False, indent=2)
+        print(f"Resultado gravado em {args.saida}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressoes = comparar(resultado, json.load(f), args.tolerancia)
+        if regressoes:
+            print(f"\nRegressão acima de {args.tolerancia:.0%} no p95: {', '.join(regressoes)}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
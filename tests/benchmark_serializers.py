@@ -0,0 +1,101 @@
+"""
+Benchmark de Serialização - Clonagem e Último Exame
+Compara o caminho antigo (objetos ORM + dicionários escritos à mão)
+com o serializador compilado e a consulta somente de colunas.
+
+Uso: python tests/benchmark_serializers.py [iteracoes]
+"""
+
+import os
+import sys
+import time
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import desc
+from app import app, db
+from models import Exame, ParametrosEcocardiograma, LaudoEcocardiograma
+from modules.exams.serializers import latest_exam_payload, parameter_serializer
+
+PACIENTE = 'Paciente Benchmark Serializacao'
+
+
+def caminho_antigo(nome_paciente):
+    """Reprodução do código anterior: ORM + acesso preguiçoso + dict manual"""
+    ultimo_exame = Exame.query.filter_by(nome_paciente=nome_paciente)\
+                             .order_by(desc(Exame.created_at)).first()
+    dados = {'exame': {
+        'nome_paciente': ultimo_exame.nome_paciente,
+        'data_nascimento': ultimo_exame.data_nascimento,
+        'idade': ultimo_exame.idade,
+        'sexo': ultimo_exame.sexo,
+        'tipo_atendimento': ultimo_exame.tipo_atendimento,
+        'medico_usuario': ultimo_exame.medico_usuario,
+        'medico_solicitante': ultimo_exame.medico_solicitante,
+        'indicacao': ultimo_exame.indicacao
+    }}
+    if ultimo_exame.parametros:
+        dados['parametros'] = {name: getattr(ultimo_exame.parametros, name)
+                               for name in parameter_serializer.names}
+    if ultimo_exame.laudos:
+        laudo = ultimo_exame.laudos[0]
+        dados['laudos'] = {
+            'modo_m_bidimensional': laudo.modo_m_bidimensional,
+            'doppler_convencional': laudo.doppler_convencional,
+            'doppler_tecidual': laudo.doppler_tecidual,
+            'conclusao': laudo.conclusao,
+            'recomendacoes': laudo.recomendacoes
+        }
+    return dados
+
+
+def medir(funcao, iteracoes):
+    """Tempo por chamada em milissegundos (sessão limpa a cada chamada)"""
+    tempos = []
+    for _ in range(iteracoes):
+        db.session.expunge_all()
+        inicio = time.perf_counter()
+        funcao(PACIENTE)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tempos), statistics.mean(tempos)
+
+
+def preparar_dados():
+    exame = Exame(nome_paciente=PACIENTE, data_nascimento='01/01/1970', idade=55,
+                  sexo='Feminino', data_exame='01/06/2025', indicacao='Benchmark')
+    db.session.add(exame)
+    db.session.flush()
+    db.session.add(ParametrosEcocardiograma(
+        exame_id=exame.id,
+        **{name: 1.0 for name in parameter_serializer.names if name != 'frequencia_cardiaca'}
+    ))
+    db.session.add(LaudoEcocardiograma(exame_id=exame.id, conclusao='Normal'))
+    db.session.commit()
+    return exame.id
+
+
+def main():
+    iteracoes = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+
+    with app.app_context():
+        exame_id = preparar_dados()
+        try:
+            assert caminho_antigo(PACIENTE)['parametros'] == latest_exam_payload(PACIENTE)['parametros']
+
+            antigo = medir(caminho_antigo, iteracoes)
+            novo = medir(latest_exam_payload, iteracoes)
+
+            print("=" * 60)
+            print(f"BENCHMARK SERIALIZAÇÃO ({iteracoes} iterações)")
+            print("=" * 60)
+            print(f"ORM + dict manual:        mediana {antigo[0]:.3f} ms | média {antigo[1]:.3f} ms")
+            print(f"Colunas + serializador:   mediana {novo[0]:.3f} ms | média {novo[1]:.3f} ms")
+            print(f"Ganho (mediana):          {antigo[0] / novo[0]:.2f}x")
+        finally:
+            db.session.delete(db.session.get(Exame, exame_id))
+            db.session.commit()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Benchmark de Arranque - Tempo até a primeira requisição
+Mede, em processos novos, a importação de main (app + rotas) e a primeira
+requisição a /login, com e sem a inicialização do banco na importação.
+O piso é a importação de Flask, Flask-SQLAlchemy e Flask-Login, que
+nenhuma mudança na aplicação consegue reduzir.
+
+Uso: python tests/benchmark_startup.py [repeticoes]
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+META_MS = 300
+
+PRIMEIRA_REQUISICAO = """
+import time
+inicio = time.perf_counter()
+import main
+importado = time.perf_counter()
+resposta = main.app.test_client().get('/login')
+assert resposta.status_code == 200, resposta.status_code
+fim = time.perf_counter()
+print((importado - inicio) * 1000, (fim - inicio) * 1000)
+"""
+
+PISO = """
+import time
+inicio = time.perf_counter()
+import flask, flask_sqlalchemy, flask_login
+print((time.perf_counter() - inicio) * 1000, (time.perf_counter() - inicio) * 1000)
+"""
+
+
+def medir(codigo, repeticoes, **env_extra):
+    env = dict(os.environ, LOG_LEVEL='WARNING', **env_extra)
+    importacoes, totais = [], []
+    for _ in range(repeticoes):
+        saida = subprocess.run([sys.executable, '-c', codigo], cwd=BASE_DIR, env=env,
+                               capture_output=True, text=True, check=True).stdout
+        importacao, total = map(float, saida.split()[-2:])
+        importacoes.append(importacao)
+        totais.append(total)
+    return statistics.median(importacoes), statistics.median(totais)
+
+
+def main():
+    repeticoes = int(sys.argv[1]) if len(sys.argv) > 1 else 7
+
+    piso = medir(PISO, repeticoes)
+    anterior = medir(PRIMEIRA_REQUISICAO, repeticoes, BOOTSTRAP_ON_IMPORT='1')
+    atual = medir(PRIMEIRA_REQUISICAO, repeticoes)
+
+    print("=" * 60)
+    print(f"BENCHMARK ARRANQUE (mediana de {repeticoes} processos)")
+    print("=" * 60)
+    print(f"Piso (Flask + SQLAlchemy):        {piso[0]:8.1f} ms")
+    print(f"Bootstrap na importação:          importação {anterior[0]:6.1f} ms | 1ª requisição {anterior[1]:6.1f} ms")
+    print(f"Bootstrap explícito:              importação {atual[0]:6.1f} ms | 1ª requisição {atual[1]:6.1f} ms")
+    print(f"Custo da aplicação acima do piso: {atual[1] - piso[0]:8.1f} ms")
+    status = "OK" if atual[1] < META_MS else "ACIMA DA META"
+    print(f"Meta < {META_MS} ms até a 1ª requisição: {status}")
+
+
+if __name__ == '__main__':
+    main()
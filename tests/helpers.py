@@ -0,0 +1,70 @@
+"""
+Utilitários dos Testes com o Banco
+Contexto da aplicação, fábrica de exames e limpeza dos registros de teste
+"""
+
+import unittest
+from app import app, db
+from models import Exame, LaudoEcocardiograma, ParametrosEcocardiograma, Usuario
+from utils.session_cache import session_cache
+
+EXAME_PADRAO = dict(data_nascimento='01/01/1960', data_exame='01/01/2024', idade=64, sexo='Feminino')
+
+
+def criar_exame(nome_paciente, parametros=None, laudo=None, **campos):
+    """Grava um exame com parâmetros e laudo opcionais
+
+    `campos` sobrepõe os dados demográficos de EXAME_PADRAO; `parametros` e
+    `laudo` são dicionários com as colunas de cada registro.
+    """
+    exame = Exame(nome_paciente=nome_paciente, **{**EXAME_PADRAO, **campos})
+    if parametros is not None:
+        exame.parametros = ParametrosEcocardiograma(**parametros)
+    if laudo is not None:
+        exame.laudos = [LaudoEcocardiograma(**laudo)]
+    db.session.add(exame)
+    db.session.commit()
+    return exame
+
+
+def remover_exames(*criterios):
+    """Remove os exames que atendem aos critérios (parâmetros e laudos em cascata)"""
+    for exame in Exame.query.filter(*criterios).all():
+        db.session.delete(exame)
+    db.session.commit()
+
+
+class ExamTestCase(unittest.TestCase):
+    """Testes com o banco: exames de teste removidos antes e depois de cada teste
+
+    Subclasses definem NOME (prefixo do nome dos pacientes) e USUARIOS
+    (usernames criados pelos testes); `_preparar_banco` roda após create_all.
+    """
+
+    NOME = None
+    USUARIOS = ()
+
+    def setUp(self):
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self._preparar_banco()
+        self._limpar()
+
+    def tearDown(self):
+        self._limpar()
+        if self.USUARIOS:
+            Usuario.query.filter(Usuario.username.in_(self.USUARIOS)).delete()
+            db.session.commit()
+        db.session.remove()
+        self.app_context.pop()
+        session_cache.clear()
+
+    def _preparar_banco(self):
+        pass
+
+    def _criterios(self):
+        return (Exame.nome_paciente.like(f'{self.NOME}%'),)
+
+    def _limpar(self):
+        remover_exames(*self._criterios())
@@ -0,0 +1,143 @@
+"""
+Teste de Carga - Perfis de Worker do Gunicorn
+Sobe o gunicorn.conf.py com cada perfil (sync, gthread, gevent) e mede a
+vazão nas rotas reais: painel, busca no prontuário, visualização, último
+exame, PDF e /health. Um PDF lento bloqueia o worker sync inteiro; com
+gthread/gevent as demais requisições continuam sendo atendidas.
+
+Uso: python tests/loadtest_worker_profiles.py [--perfis sync,gthread]
+         [--clientes 16] [--duracao 20] [--porta 5055]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ADMIN_CREDENTIALS = {"username": "admin", "password": "VidahAdmin2025!"}
+
+# (peso, rota); {exame_id} e {paciente} são preenchidos a partir do banco
+ROTAS = [
+    (30, "/"),
+    (20, "/prontuario/buscar?q={termo}"),
+    (20, "/visualizar_exame/{exame_id}"),
+    (15, "/api/ultimo-exame-paciente/{paciente}"),
+    (10, "/gerar-pdf/{exame_id}"),
+    (5, "/health"),
+]
+
+
+def exame_de_referencia():
+    """Um exame existente para as rotas que precisam de id/paciente"""
+    sys.path.insert(0, BASE_DIR)
+    from app import app
+    from models import Exame
+
+    with app.app_context():
+        exame = Exame.query.order_by(Exame.id.desc()).first()
+        if not exame:
+            raise SystemExit("Banco sem exames: importe dados antes do teste de carga")
+        return exame.id, exame.nome_paciente
+
+
+def iniciar_servidor(perfil, porta, workers):
+    env = dict(os.environ, PORT=str(porta), GUNICORN_WORKER_CLASS=perfil, WEB_CONCURRENCY=str(workers))
+    processo = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "main:app"],
+        cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+    url = f"http://127.0.0.1:{porta}"
+    for _ in range(60):
+        try:
+            if requests.get(f"{url}/health", timeout=1).status_code < 500:
+                return processo, url
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+
+    processo.terminate()
+    raise SystemExit(f"Servidor não respondeu no perfil {perfil}")
+
+
+def cliente(url, rotas, pesos, fim, resultados, lock):
+    sessao = requests.Session()
+    sessao.post(f"{url}/login", data=ADMIN_CREDENTIALS, timeout=30)
+
+    latencias, erros = [], 0
+    while time.perf_counter() < fim:
+        rota = random.choices(rotas, weights=pesos)[0]
+        inicio = time.perf_counter()
+        try:
+            resposta = sessao.get(f"{url}{rota}", timeout=60)
+            if resposta.status_code >= 500:
+                erros += 1
+        except requests.RequestException:
+            erros += 1
+        latencias.append((time.perf_counter() - inicio) * 1000)
+
+    with lock:
+        resultados['latencias'].extend(latencias)
+        resultados['erros'] += erros
+
+
+def medir_perfil(perfil, args, exame_id, paciente):
+    processo, url = iniciar_servidor(perfil, args.porta, args.workers)
+    try:
+        termo = paciente.split()[0]
+        rotas = [r.format(exame_id=exame_id, paciente=paciente, termo=termo) for _, r in ROTAS]
+        pesos = [p for p, _ in ROTAS]
+        resultados = {'latencias': [], 'erros': 0}
+        lock = threading.Lock()
+        fim = time.perf_counter() + args.duracao
+
+        threads = [threading.Thread(target=cliente, args=(url, rotas, pesos, fim, resultados, lock))
+                   for _ in range(args.clientes)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        latencias = sorted(resultados['latencias'])
+        return {
+            'perfil': perfil,
+            'requisicoes': len(latencias),
+            'rps': len(latencias) / args.duracao,
+            'p50': statistics.median(latencias) if latencias else 0,
+            'p95': latencias[int(len(latencias) * 0.95) - 1] if latencias else 0,
+            'erros': resultados['erros']
+        }
+    finally:
+        processo.terminate()
+        processo.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Teste de carga dos perfis de worker')
+    parser.add_argument('--perfis', default='sync,gthread')
+    parser.add_argument('--clientes', type=int, default=16)
+    parser.add_argument('--duracao', type=int, default=20)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--porta', type=int, default=5055)
+    args = parser.parse_args()
+
+    exame_id, paciente = exame_de_referencia()
+    resultados = [medir_perfil(perfil, args, exame_id, paciente) for perfil in args.perfis.split(',')]
+
+    print("=" * 70)
+    print(f"CARGA: {args.clientes} clientes, {args.duracao}s, {args.workers} workers")
+    print("=" * 70)
+    print(f"{'Perfil':<10}{'Requisições':>13}{'req/s':>10}{'p50 (ms)':>12}{'p95 (ms)':>12}{'Erros':>8}")
+    for r in resultados:
+        print(f"{r['perfil']:<10}{r['requisicoes']:>13}{r['rps']:>10.1f}{r['p50']:>12.1f}{r['p95']:>12.1f}{r['erros']:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+"""
+Testes do Instantâneo Colunar
+Atualização incremental, filtros, agrupamentos e API de coorte
+"""
+
+import json
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+from sqlalchemy import event
+from app import app, db
+from models import ParametrosEcocardiograma, Usuario
+from modules.analytics import ColumnarStore
+from modules.core.exceptions import ValidationError
+from tests.helpers import ExamTestCase, criar_exame
+
+NOME = 'PACIENTE COORTE TESTE'
+TIPO = 'Coorte Teste'
+FILTRO = {'tipo_atendimento': TIPO}
+
+
+class TestColumnarStore(ExamTestCase):
+    """Testes com o banco e um diretório temporário"""
+
+    NOME = NOME
+    USUARIOS = ('coorte_teste',)
+
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.store = ColumnarStore(self.directory)
+
+    def tearDown(self):
+        super().tearDown()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _exame(self, sexo, idade, data_exame, **parametros):
+        return criar_exame(NOME, parametros, data_nascimento='01/01/1950', data_exame=data_exame, idade=idade,
+                           sexo=sexo, tipo_atendimento=TIPO)
+
+    def _popular(self):
+        return [
+            self._exame('Feminino', 70, '10/03/2023', fracao_ejecao=60.0, massa_ve=150.0),
+            self._exame('Feminino', 72, '11/03/2024', fracao_ejecao=50.0, massa_ve=170.0),
+            self._exame('Masculino', 40, '12/03/2024', fracao_ejecao=35.0, massa_ve=250.0),
+            self._exame('Masculino', 10, '13/03/2024', massa_ve=90.0),
+        ]
+
+    def _grupos(self, resultado):
+        return {tuple(g['grupo'].values()): g for g in resultado['grupos']}
+
+    def test_group_by_sex_and_age_band(self):
+        """Teste FE média por sexo e faixa etária, ignorando valores ausentes"""
+        self._popular()
+        self.store.refresh()
+
+        resultado = self.store.aggregate('fracao_ejecao', ['sexo', 'faixa_etaria'], FILTRO)
+        grupos = self._grupos(resultado)
+        self.assertEqual(resultado['exames_filtrados'], 4)
+        self.assertEqual(resultado['com_valor'], 3)
+        self.assertEqual(grupos[('Feminino', 'Idoso')]['mean'], 55.0)
+        self.assertEqual(grupos[('Feminino', 'Idoso')]['count'], 2)
+        self.assertEqual(grupos[('Masculino', 'Adulto')]['mean'], 35.0)
+
+    def test_percentiles_by_year_and_histogram(self):
+        """Teste distribuição da massa do VE por ano do exame"""
+        self._popular()
+        self.store.refresh()
+
+        grupos = self._grupos(self.store.aggregate('massa_ve', ['ano'], FILTRO, ('count', 'min', 'median', 'max')))
+        self.assertEqual(grupos[('2023',)]['count'], 1)
+        self.assertEqual((grupos[('2024',)]['min'], grupos[('2024',)]['median'], grupos[('2024',)]['max']),
+                         (90.0, 170.0, 250.0))
+
+        histograma = self.store.histogram('massa_ve', bins=4, filters=FILTRO, value_range=(0, 400))
+        self.assertEqual(histograma['contagens'], [1, 2, 1, 0])
+
+    def test_filters(self):
+        """Teste faixas numéricas, de data e valores inválidos"""
+        self._popular()
+        self.store.refresh()
+
+        filtros = dict(FILTRO, fracao_ejecao=[None, 40], data_exame=['01/01/2024', '2024-12-31'])
+        self.assertEqual(int(self.store.mask(filtros).sum()), 1)
+        self.assertEqual(int(self.store.mask(dict(FILTRO, sexo=['Feminino'], idade=[71, None])).sum()), 1)
+        self.assertEqual(int(self.store.mask(dict(FILTRO, faixa_etaria='Idoso')).sum()), 2)
+
+        for filtros in ({'inexistente': [1, 2]}, {'idade': [1]}, {'data_exame': ['99/99/2024', None]}):
+            with self.assertRaises(ValidationError):
+                self.store.mask(filtros)
+        with self.assertRaises(ValidationError):
+            self.store.aggregate('fracao_ejecao', ['cor'])
+
+    def test_incremental_refresh_updates_and_removes(self):
+        """Teste atualização lê só os alterados e descarta exames excluídos"""
+        exames = self._popular()
+        self.store.refresh()
+
+        parametros = ParametrosEcocardiograma.query.filter_by(exame_id=exames[2].id).first()
+        parametros.fracao_ejecao = 45.0
+        db.session.delete(ParametrosEcocardiograma.query.filter_by(exame_id=exames[0].id).first())
+        db.session.delete(exames[0])
+        db.session.commit()
+
+        resultado = self.store.refresh()
+        self.assertLess(resultado['alterados'], 4)
+        self.assertEqual(resultado['removidos'], 1)
+
+        grupos = self._grupos(self.store.aggregate('fracao_ejecao', ['sexo'], FILTRO))
+        self.assertEqual(grupos[('Masculino',)]['mean'], 45.0)
+        self.assertEqual(grupos[('Feminino',)]['count'], 1)
+
+    def test_queries_do_not_touch_database(self):
+        """Teste consultas de coorte sem nenhum comando SQL"""
+        self._popular()
+        self.store.refresh()
+
+        comandos = []
+        ouvinte = lambda *args, **kwargs: comandos.append(args[2])
+        event.listen(db.engine, 'before_cursor_execute', ouvinte)
+        try:
+            self.store.aggregate('fracao_ejecao', ['sexo', 'ano'], FILTRO, ('mean', 'p75'))
+            self.store.histogram('massa_ve', filters=FILTRO)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', ouvinte)
+        self.assertEqual(comandos, [])
+
+    def test_cohort_api(self):
+        """Teste API de coorte para administradores"""
+        self._popular()
+        usuario = Usuario(username='coorte_teste', email='coorte@teste.com', role='admin', ativo=True)
+        usuario.password_hash = 'x'
+        db.session.add(usuario)
+        db.session.commit()
+
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['_user_id'] = str(usuario.id)
+            sess['_fresh'] = True
+
+        with patch('modules.analytics.columnar_store', self.store):
+            self.assertEqual(client.post('/api/analytics/atualizar').status_code, 200)
+            resposta = client.post('/api/analytics/coorte', data=json.dumps({
+                'coluna': 'fracao_ejecao', 'agrupar': ['sexo'], 'filtros': FILTRO, 'histograma': {'faixas': 5}
+            }), content_type='application/json')
+            self.assertEqual(resposta.status_code, 200)
+            dados = resposta.get_json()
+            self.assertEqual(sum(g['count'] for g in dados['grupos']), 3)
+            self.assertEqual(sum(dados['histograma']['contagens']), 3)
+
+            resposta = client.post('/api/analytics/coorte', data=json.dumps({'coluna': 'nome_paciente'}),
+                                   content_type='application/json')
+            self.assertEqual(resposta.status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,213 @@
+"""
+Testes da Consulta de Coorte
+Filtros compilados, paginação por chave, exportação CSV, estimativa e consultor de índices
+"""
+
+import shutil
+import tempfile
+import unittest
+from datetime import timedelta
+from unittest.mock import patch
+from sqlalchemy import inspect, text
+from app import app, db
+from models import Exame, ParametrosEcocardiograma, Usuario
+from modules.analytics import CohortQuery, IndexAdvisor
+from modules.analytics.columnar_store import ColumnarStore, columnar_store
+from modules.core.dates import today_brasilia
+from modules.core.exceptions import ValidationError
+from modules.maintenance.abnormality_flags import migrate_abnormality_flags
+from tests.helpers import ExamTestCase, criar_exame
+
+NOME = 'PACIENTE COORTE MEDIDAS TESTE'
+TIPO = 'Coorte Medidas Teste'
+BASE = {'tipo_atendimento': TIPO}
+INDICE = 'ix_coorte_p_pressao_sistolica_vd'
+INDICES_CRIADOS = (INDICE, 'ix_coorte_e_tipo_atendimento_data_exame_dt')
+
+
+def _data(dias_atras):
+    return (today_brasilia() - timedelta(days=dias_atras)).strftime('%d/%m/%Y')
+
+
+class TestCohortQuery(ExamTestCase):
+    """Testes com o banco"""
+
+    USUARIOS = ('coorte_medidas_admin', 'coorte_medidas_user')
+
+    def tearDown(self):
+        with db.engine.begin() as conexao:
+            for indice in INDICES_CRIADOS:
+                conexao.execute(text(f'DROP INDEX IF EXISTS {indice}'))
+        super().tearDown()
+
+    def _preparar_banco(self):
+        migrate_abnormality_flags()
+
+    def _criterios(self):
+        return (Exame.tipo_atendimento == TIPO,)
+
+    def _exame(self, dias_atras, psap, conclusao='Exame normal.', sexo='Feminino', idade=70, **parametros):
+        return criar_exame(NOME, {'pressao_sistolica_vd': psap, **parametros}, {'conclusao': conclusao},
+                           data_nascimento='01/01/1950', data_exame=_data(dias_atras), idade=idade, sexo=sexo,
+                           tipo_atendimento=TIPO)
+
+    def _popular(self):
+        return {
+            'hp_recente': self._exame(30, 55.0, 'Hipertensão pulmonar moderada. Insuficiência mitral leve.'),
+            'hp_antiga': self._exame(800, 60.0, 'Hipertensão pulmonar.'),
+            'normal': self._exame(10, 30.0),
+            'sem_psap': self._exame(5, None),
+            'limite': self._exame(20, 40.0, fracao_ejecao=35.0, atrio_esquerdo=48.0),
+        }
+
+    def _ids(self, filtros, **kwargs):
+        return [linha['id'] for linha in CohortQuery({**BASE, **filtros}).page(**kwargs)['exames']]
+
+    def test_measurement_and_period_filters(self):
+        """Teste 'PSAP > 40 mmHg no último ano' em uma única consulta"""
+        exames = self._popular()
+        consulta = CohortQuery({**BASE, 'parametros': {'pressao_sistolica_vd': {'gt': 40}}, 'ultimos_dias': 365})
+        pagina = consulta.page()
+        self.assertEqual([e['id'] for e in pagina['exames']], [exames['hp_recente'].id])
+        self.assertEqual(pagina['exames'][0]['pressao_sistolica_vd'], 55.0)
+        self.assertTrue(pagina['exames'][0]['conclusao'].startswith('Hipertensão pulmonar'))
+        self.assertIsNone(pagina['proximo_cursor'])
+
+        self.assertEqual(self._ids({'parametros': {'pressao_sistolica_vd': [40, None]}}),
+                         [exames['limite'].id, exames['hp_antiga'].id, exames['hp_recente'].id])
+        self.assertEqual(self._ids({'idade': [80, None]}), [])
+
+    def test_keyset_pagination(self):
+        """Teste páginas por chave cobrem todos os exames sem repetição"""
+        exames = self._popular()
+        vistos, cursor = [], None
+        while True:
+            pagina = CohortQuery(BASE).page(cursor, limit=2)
+            vistos += [e['id'] for e in pagina['exames']]
+            cursor = pagina['proximo_cursor']
+            if cursor is None:
+                break
+        self.assertEqual(vistos, sorted((e.id for e in exames.values()), reverse=True))
+
+    def test_conclusion_text_and_findings(self):
+        """Teste texto na conclusão (sem diferenciar maiúsculas) e achados pela máscara"""
+        exames = self._popular()
+        self.assertEqual(self._ids({'conclusao': 'INSUFICIÊNCIA mitral'}), [exames['hp_recente'].id])
+        self.assertEqual(self._ids({'conclusao': '100%'}), [])
+        self.assertEqual(self._ids({'achados': ['fe_menor_40', 'ae_dilatado']}), [exames['limite'].id])
+
+    def test_validation(self):
+        """Teste filtros inválidos"""
+        for filtros in ({'parametros': {'inexistente': [1, 2]}},
+                        {'parametros': {'fracao_ejecao': {'entre': 3}}},
+                        {'parametros': {'fracao_ejecao': [None, None]}},
+                        {'parametros': {'fracao_ejecao': ['a', 2]}},
+                        {'data_exame': ['99/99/2024', None]},
+                        {'achados': ['inexistente']},
+                        {'desconhecido': 1}):
+            with self.assertRaises(ValidationError, msg=filtros):
+                CohortQuery(filtros)
+        with self.assertRaises(ValidationError):
+            CohortQuery({}, colunas=['nome_paciente'])
+
+    def test_estimate_by_bounded_count(self):
+        """Teste estimativa por contagem limitada quando não há instantâneo"""
+        self._popular()
+        vazio = tempfile.mkdtemp()
+        try:
+            with patch.object(columnar_store, '_directory', vazio), patch.object(columnar_store, '_meta', None):
+                estimativa = CohortQuery({**BASE, 'parametros': {'pressao_sistolica_vd': {'gte': 40}}}).estimate()
+        finally:
+            shutil.rmtree(vazio, ignore_errors=True)
+        self.assertEqual(estimativa, {'estimativa': 3, 'fonte': 'contagem', 'exato': True, 'mais_de': False})
+
+    def test_estimate_from_snapshot_keeps_strict_bounds(self):
+        """Teste gt/lt no instantâneo excluem o limite, como na consulta"""
+        self._popular()
+        diretorio = tempfile.mkdtemp()
+        try:
+            loja = ColumnarStore(diretorio)
+            loja.refresh(full=True)
+            with patch('modules.analytics.columnar_store.columnar_store', loja):
+                estrita = CohortQuery({**BASE, 'parametros': {'pressao_sistolica_vd': {'gt': 40}}}).estimate()
+                inclusiva = CohortQuery({**BASE, 'parametros': {'pressao_sistolica_vd': {'gte': 40}}}).estimate()
+                menores = CohortQuery({**BASE, 'parametros': {'pressao_sistolica_vd': {'lt': 40}}}).estimate()
+        finally:
+            shutil.rmtree(diretorio, ignore_errors=True)
+        self.assertEqual(estrita['fonte'], 'instantaneo')
+        self.assertEqual((estrita['estimativa'], inclusiva['estimativa'], menores['estimativa']), (2, 3, 1))
+
+    def test_index_advisor_creates_partial_index(self):
+        """Teste sugestão e criação do índice parcial usado pelo plano"""
+        consulta = CohortQuery({**BASE, 'parametros': {'pressao_sistolica_vd': {'gt': 40}}, 'ultimos_dias': 365})
+        sugestoes = {s['nome']: s for s in IndexAdvisor.recommend(consulta)}
+        self.assertEqual(sugestoes[INDICE]['colunas'], ['pressao_sistolica_vd', 'exame_id'])
+        self.assertEqual(sugestoes[INDICE]['parcial'], 'pressao_sistolica_vd IS NOT NULL')
+        self.assertFalse(sugestoes[INDICE]['existe'])
+        self.assertEqual(sugestoes['ix_coorte_e_tipo_atendimento_data_exame_dt']['colunas'],
+                         ['tipo_atendimento', 'data_exame_dt'])
+
+        criados = [s['nome'] for s in IndexAdvisor.apply(consulta)]
+        self.assertIn(INDICE, criados)
+        self.assertIn(INDICE, [i['name'] for i in inspect(db.engine).get_indexes('parametros_ecocardiograma')])
+        self.assertNotIn(INDICE, [i.name for i in ParametrosEcocardiograma.__table__.indexes])
+        self.assertEqual(IndexAdvisor.apply(consulta), [])
+
+        consulta_psap = CohortQuery({'parametros': {'pressao_sistolica_vd': {'gt': 40}}})
+        self.assertIn(INDICE, ' '.join(consulta_psap.explain()))
+
+    def test_csv_export(self):
+        """Teste exportação CSV em blocos por página"""
+        exames = self._popular()
+        blocos = list(CohortQuery(BASE, colunas=['fracao_ejecao']).iter_csv(batch_size=2))
+        linhas = ''.join(blocos).strip().splitlines()
+        self.assertEqual(linhas[0], 'id,nome_paciente,data_exame,idade,sexo,tipo_atendimento,fracao_ejecao,conclusao')
+        self.assertEqual(len(linhas), 1 + len(exames))
+        self.assertGreater(len(blocos), 2)
+
+    def _cliente(self, role):
+        usuario = Usuario(username=f'coorte_medidas_{role}', email=f'coorte_medidas_{role}@teste.com',
+                          role=role, ativo=True)
+        usuario.password_hash = 'x'
+        db.session.add(usuario)
+        db.session.commit()
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['_user_id'] = str(usuario.id)
+            sess['_fresh'] = True
+        return client
+
+    def test_api(self):
+        """Teste APIs de consulta, exportação e índices para administradores"""
+        exames = self._popular()
+        client = self._cliente('admin')
+        filtros = {**BASE, 'parametros': {'pressao_sistolica_vd': {'gt': 40}}}
+
+        resposta = client.post('/api/coorte/consulta', json={'filtros': filtros, 'limite': 1, 'estimar': True})
+        self.assertEqual(resposta.status_code, 200)
+        dados = resposta.get_json()
+        self.assertEqual([e['id'] for e in dados['exames']], [exames['hp_antiga'].id])
+        self.assertIsNotNone(dados['proximo_cursor'])
+        self.assertIn('estimativa', dados['contagem'])
+
+        resposta = client.post('/api/coorte/consulta', json={'filtros': {'parametros': {'x': [1, 2]}}})
+        self.assertEqual(resposta.status_code, 400)
+
+        resposta = client.post('/api/coorte/exportar', json={'filtros': filtros})
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(len(resposta.get_data(as_text=True).strip().splitlines()), 3)
+
+        resposta = client.post('/api/coorte/indices', json={'filtros': filtros})
+        self.assertEqual(resposta.status_code, 200)
+        self.assertIn(INDICE, [s['nome'] for s in resposta.get_json()['sugestoes']])
+        self.assertEqual(client.get('/admin-vidah-sistema-2025/coorte').status_code, 200)
+
+    def test_api_requires_admin(self):
+        """Teste usuário comum não acessa a consulta de coorte"""
+        client = self._cliente('user')
+        resposta = client.post('/api/coorte/consulta', json={'filtros': BASE})
+        self.assertIn(resposta.status_code, (302, 403))
+
+
+if __name__ == '__main__':
+    unittest.main()
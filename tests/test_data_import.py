@@ -0,0 +1,223 @@
+"""
+Testes da Importação em Massa
+Leitores em streaming, validação em lote, upsert idempotente e retomada
+"""
+
+import csv
+import os
+import shutil
+import tempfile
+import unittest
+from app import app, db
+from models import Exame, ParametrosEcocardiograma, LaudoEcocardiograma
+from modules.data_import import BulkImporter, ImportCheckpoint, iter_records, validate_batch
+from modules.exams.reference_ranges import FLAG_BITS
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATASET = 'dados_ecocardiograma_autenticos_20250625_030459'
+PACIENTE = 'Paciente Importacao'
+
+
+class TestReaders(unittest.TestCase):
+    """Testes dos leitores sobre os arquivos fornecidos"""
+
+    def test_formats_yield_same_records(self):
+        """Teste CSV, JSON e SQL com os mesmos pacientes"""
+        csv_rows = list(iter_records(os.path.join(BASE_DIR, f'{DATASET}.csv')))
+        json_rows = list(iter_records(os.path.join(BASE_DIR, f'{DATASET}.json')))
+        sql_rows = list(iter_records(os.path.join(BASE_DIR, 'inserts_ecocardiograma_autenticos_20250625_030459.sql')))
+
+        self.assertEqual(len(csv_rows), 153)
+        self.assertEqual(len(json_rows), 153)
+        self.assertEqual(len(sql_rows), 153)
+        self.assertEqual([r['nome_paciente'] for r in csv_rows], [r['nome_paciente'] for r in sql_rows])
+        self.assertEqual(json_rows[0]['nome_paciente'], csv_rows[0]['nome_paciente'])
+
+    def test_display_labels_are_mapped(self):
+        """Teste CSV do novo banco com rótulos legíveis"""
+        rows = iter_records(os.path.join(BASE_DIR, 'novo_banco_ecocardiograma_20250625_031036.csv'))
+        validos, erros = validate_batch(list(rows))
+        self.assertTrue(validos)
+        self.assertTrue(all(r['exame']['nome_paciente'] for r in validos))
+
+
+class TestValidation(unittest.TestCase):
+    """Testes da validação em lote"""
+
+    def test_invalid_records_are_reported(self):
+        """Teste erros por registro sem interromper o lote"""
+        validos, erros = validate_batch([
+            {'nome_paciente': 'A', 'data_exame': '01/01/2024', 'idade': '50', 'sexo': 'M'},
+            {'nome_paciente': '', 'data_exame': '01/01/2024', 'idade': '50', 'sexo': 'M'},
+            {'nome_paciente': 'B', 'data_exame': '2024-13-40', 'idade': '50', 'sexo': 'F'},
+            {'nome_paciente': 'C', 'data_exame': '01/01/2024', 'idade': '50', 'sexo': 'X'},
+        ])
+        self.assertEqual(len(validos), 1)
+        self.assertEqual(validos[0]['exame']['sexo'], 'Masculino')
+        self.assertEqual([e['campo'] for e in erros], ['nome_paciente', 'data_exame', 'sexo'])
+        self.assertEqual([e['registro'] for e in erros], [2, 3, 4])
+
+    def test_duplicates_keep_last(self):
+        """Teste registros repetidos no lote"""
+        validos, _ = validate_batch([
+            {'nome_paciente': 'A', 'data_exame': '01/01/2024', 'idade': '50', 'sexo': 'F', 'peso': '60'},
+            {'nome_paciente': 'A', 'data_exame': '01/01/2024', 'idade': '50', 'sexo': 'F', 'peso': '61'},
+        ])
+        self.assertEqual(len(validos), 1)
+        self.assertEqual(validos[0]['parametros']['peso'], 61.0)
+
+
+class TestBulkImporter(unittest.TestCase):
+    """Testes do importador contra o banco"""
+
+    def setUp(self):
+        """Criar CSV temporário com cinco exames"""
+        app.config['TESTING'] = True
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'exames.csv')
+        self.checkpoints = os.path.join(self.tmpdir, 'checkpoints')
+        self._write_csv(peso='70')
+
+        with app.app_context():
+            db.create_all()
+
+    def tearDown(self):
+        """Remover exames importados e arquivos temporários"""
+        with app.app_context():
+            for exame in Exame.query.filter(Exame.nome_paciente.like(f'{PACIENTE}%')).all():
+                db.session.delete(exame)
+            db.session.commit()
+            db.session.remove()
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def _write_csv(self, peso, sexo='F', fracao_ejecao='65,5', laudo='Laudo'):
+        with open(self.path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['nome_paciente', 'data_exame', 'idade', 'sexo', 'peso', 'fracao_ejecao_pct', 'conclusao_laudo'])
+            for i in range(5):
+                writer.writerow([f'{PACIENTE} {i}', f'0{i + 1}/02/2024', 40 + i, sexo, peso, fracao_ejecao, f'{laudo} {i}'])
+
+    def test_import_and_reimport_is_idempotent(self):
+        """Teste reimportação atualiza em vez de duplicar"""
+        with app.app_context():
+            importer = BulkImporter(chunk_size=2, checkpoint_dir=self.checkpoints)
+            stats = importer.import_file(self.path)
+            self.assertEqual((stats['lidos'], stats['importados'], stats['lotes']), (5, 5, 3))
+
+            exame = Exame.query.filter_by(nome_paciente=f'{PACIENTE} 0').one()
+            self.assertEqual(exame.parametros.fracao_ejecao, 65.5)
+            self.assertEqual(exame.laudos[0].conclusao, 'Laudo 0')
+
+            self._write_csv(peso='72')
+            stats = importer.import_file(self.path)
+            self.assertEqual((stats['importados'], stats['atualizados']), (0, 5))
+
+            db.session.expire_all()
+            exames = Exame.query.filter(Exame.nome_paciente.like(f'{PACIENTE}%')).all()
+            self.assertEqual(len(exames), 5)
+            self.assertEqual(exames[0].parametros.peso, 72.0)
+            self.assertEqual(ParametrosEcocardiograma.query.filter_by(exame_id=exames[0].id).count(), 1)
+            self.assertEqual(LaudoEcocardiograma.query.filter_by(exame_id=exames[0].id).count(), 1)
+
+    def test_reimport_preserves_app_changes(self):
+        """Teste reimportação não apaga colunas ausentes da fonte nem alterações feitas no sistema"""
+        with app.app_context():
+            importer = BulkImporter(checkpoint_dir=self.checkpoints)
+            importer.import_file(self.path)
+
+            editado = Exame.query.filter_by(nome_paciente=f'{PACIENTE} 0').one()
+            editado.data_nascimento = '01/01/1980'
+            editado.tipo_atendimento = 'Ambulatorial'
+            editado.parametros.peso = 80.0
+            editado.parametros.fracao_ejecao = None
+            editado.laudos[0].conclusao = 'Laudo revisado pelo médico'
+            db.session.commit()
+
+            self._write_csv(peso='72')
+            stats = importer.import_file(self.path)
+            self.assertEqual(stats['atualizados'], 5)
+
+            db.session.expire_all()
+            editado = Exame.query.filter_by(nome_paciente=f'{PACIENTE} 0').one()
+            self.assertEqual((editado.data_nascimento, editado.tipo_atendimento), ('01/01/1980', 'Ambulatorial'))
+            self.assertEqual((editado.parametros.peso, editado.parametros.fracao_ejecao), (80.0, 65.5))
+            self.assertEqual([l.conclusao for l in editado.laudos], ['Laudo revisado pelo médico'])
+
+            intocado = Exame.query.filter_by(nome_paciente=f'{PACIENTE} 1').one()
+            self.assertEqual(intocado.parametros.peso, 72.0)
+            self.assertEqual(ParametrosEcocardiograma.query.filter_by(exame_id=intocado.id).count(), 1)
+
+    def test_upsert_matches_exam_saved_with_iso_date(self):
+        """Teste exame gravado pelo formulário (aaaa-mm-dd) é atualizado, não duplicado"""
+        with app.app_context():
+            db.session.add(Exame(nome_paciente=f'{PACIENTE} 0', data_nascimento='1984-01-01',
+                                 data_exame='2024-02-01', idade=40, sexo='Feminino'))
+            db.session.commit()
+
+            stats = BulkImporter(checkpoint_dir=self.checkpoints).import_file(self.path)
+            self.assertEqual((stats['importados'], stats['atualizados']), (4, 1))
+            self.assertEqual(Exame.query.filter_by(nome_paciente=f'{PACIENTE} 0').count(), 1)
+
+    def test_reimport_updates_laudo_with_unchanged_parameters(self):
+        """Teste laudo alterado na fonte é gravado mesmo sem mudança nos parâmetros"""
+        with app.app_context():
+            importer = BulkImporter(checkpoint_dir=self.checkpoints)
+            importer.import_file(self.path)
+
+            self._write_csv(peso='70', laudo='Laudo corrigido')
+            importer.import_file(self.path)
+
+            db.session.expire_all()
+            exame = Exame.query.filter_by(nome_paciente=f'{PACIENTE} 0').one()
+            self.assertEqual([l.conclusao for l in exame.laudos], ['Laudo corrigido 0'])
+
+    def test_reimport_recomputes_flags_when_sex_changes(self):
+        """Teste achados recalculados quando só o sexo do exame muda na fonte"""
+        with app.app_context():
+            importer = BulkImporter(checkpoint_dir=self.checkpoints)
+            self._write_csv(peso='70', fracao_ejecao='53')
+            importer.import_file(self.path)
+            exame = Exame.query.filter_by(nome_paciente=f'{PACIENTE} 0').one()
+            self.assertTrue(exame.parametros.anormalidades & FLAG_BITS['fe_reduzida'])
+
+            self._write_csv(peso='70', sexo='M', fracao_ejecao='53')
+            importer.import_file(self.path)
+
+            db.session.expire_all()
+            exame = Exame.query.filter_by(nome_paciente=f'{PACIENTE} 0').one()
+            self.assertEqual(exame.sexo, 'Masculino')
+            self.assertFalse(exame.parametros.anormalidades & FLAG_BITS['fe_reduzida'])
+
+    def test_skip_mode_keeps_existing(self):
+        """Teste modo skip não altera exames existentes"""
+        with app.app_context():
+            BulkImporter(checkpoint_dir=self.checkpoints).import_file(self.path)
+            self._write_csv(peso='90')
+            stats = BulkImporter(mode='skip', checkpoint_dir=self.checkpoints).import_file(self.path)
+            self.assertEqual((stats['importados'], stats['ignorados']), (0, 5))
+
+            exame = Exame.query.filter_by(nome_paciente=f'{PACIENTE} 0').one()
+            self.assertEqual(exame.parametros.peso, 70.0)
+
+    def test_resume_from_checkpoint(self):
+        """Teste retomada após interrupção no meio do arquivo"""
+        with app.app_context():
+            def interromper(stats):
+                if stats['lotes'] == 1:
+                    raise KeyboardInterrupt
+
+            importer = BulkImporter(chunk_size=2, checkpoint_dir=self.checkpoints, progress=interromper)
+            with self.assertRaises(KeyboardInterrupt):
+                importer.import_file(self.path)
+
+            state = ImportCheckpoint.for_source(self.path, self.checkpoints).load()
+            self.assertEqual(state['stats']['lidos'], 2)
+
+            stats = BulkImporter(chunk_size=2, checkpoint_dir=self.checkpoints).import_file(self.path)
+            self.assertEqual(stats['retomado_de'], 2)
+            self.assertEqual((stats['lidos'], stats['importados']), (5, 5))
+            self.assertIsNone(ImportCheckpoint.for_source(self.path, self.checkpoints).load())
+
+
+if __name__ == '__main__':
+    unittest.main()
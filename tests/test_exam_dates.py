@@ -0,0 +1,149 @@
+"""
+Testes das Datas Tipadas de Exame
+Conversão, sincronia ao gravar, migração e consultas por intervalo indexado
+"""
+
+import unittest
+from datetime import date, datetime, timedelta
+from sqlalchemy import insert, select, text
+from app import app, db
+from models import Exame, Usuario
+from modules.core.dates import day_bounds, in_range, month_bounds, parse_date, period_bounds
+from modules.maintenance.date_migration import migrate_exam_dates
+from utils.session_cache import session_cache
+
+NOME = 'PACIENTE DATAS TESTE'
+
+
+class TestDateHelpers(unittest.TestCase):
+    """Testes das funções de data"""
+
+    def test_parse_both_formats(self):
+        """Teste 'dd/mm/aaaa' e 'aaaa-mm-dd'; texto inválido vira None"""
+        self.assertEqual(parse_date('05/03/2025'), date(2025, 3, 5))
+        self.assertEqual(parse_date('2025-03-05'), date(2025, 3, 5))
+        self.assertIsNone(parse_date('31/02/2025'))
+        self.assertIsNone(parse_date(''))
+        self.assertIsNone(parse_date(None))
+
+    def test_half_open_bounds(self):
+        """Teste limites de dia, mês (inclusive dezembro) e período"""
+        self.assertEqual(day_bounds(date(2025, 3, 5)), (datetime(2025, 3, 5), datetime(2025, 3, 6)))
+        self.assertEqual(month_bounds(date(2025, 12, 31)), (datetime(2025, 12, 1), datetime(2026, 1, 1)))
+        self.assertEqual(period_bounds(date(2025, 1, 1), date(2025, 1, 31))[1], datetime(2025, 2, 1))
+
+
+class TestExamDateColumns(unittest.TestCase):
+    """Testes com o banco"""
+
+    def setUp(self):
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+        migrate_exam_dates()
+        Exame.query.filter_by(nome_paciente=NOME).delete()
+        db.session.commit()
+
+    def tearDown(self):
+        Exame.query.filter_by(nome_paciente=NOME).delete()
+        Usuario.query.filter_by(username='datas_teste').delete()
+        db.session.commit()
+        db.session.remove()
+        self.app_context.pop()
+        session_cache.clear()
+
+    def _exame(self, data_exame, **kwargs):
+        exame = Exame(nome_paciente=NOME, data_nascimento='10/02/1960', data_exame=data_exame,
+                      idade=65, sexo='Feminino', **kwargs)
+        db.session.add(exame)
+        db.session.commit()
+        return exame
+
+    def test_typed_columns_follow_text_on_write(self):
+        """Teste colunas tipadas preenchidas no insert e no update"""
+        exame = self._exame('05/03/2025')
+        self.assertEqual((exame.data_exame_dt, exame.data_nascimento_dt), (date(2025, 3, 5), date(1960, 2, 10)))
+
+        exame.data_exame = '2025-04-01'
+        db.session.commit()
+        self.assertEqual(exame.data_exame_dt, date(2025, 4, 1))
+
+    def test_migration_backfills_existing_rows(self):
+        """Teste preenchimento de linhas gravadas sem as colunas tipadas"""
+        with db.engine.begin() as conn:
+            conn.execute(insert(Exame.__table__), [
+                {'nome_paciente': NOME, 'data_nascimento': '01/01/1950', 'idade': 75, 'sexo': 'Masculino',
+                 'data_exame': '20/01/2025'},
+                {'nome_paciente': NOME, 'data_nascimento': '01/01/1950', 'idade': 75, 'sexo': 'Masculino',
+                 'data_exame': 'sem data'},
+            ])
+
+        resultado = migrate_exam_dates(batch_size=1)
+        self.assertEqual(resultado['colunas_adicionadas'], 0)
+        self.assertGreaterEqual(resultado['preenchidos'], 2)
+        self.assertGreaterEqual(resultado['invalidos'], 1)
+
+        datas = db.session.execute(
+            select(Exame.data_exame, Exame.data_exame_dt, Exame.data_nascimento_dt).where(Exame.nome_paciente == NOME)
+        ).all()
+        self.assertIn(('20/01/2025', date(2025, 1, 20), date(1950, 1, 1)), datas)
+        self.assertIn(('sem data', None, date(1950, 1, 1)), datas)
+
+    def test_migration_skips_blank_dates_on_rerun(self):
+        """Teste linhas sem data de nascimento não são reprocessadas a cada execução"""
+        with db.engine.begin() as conn:
+            conn.execute(insert(Exame.__table__), [
+                {'nome_paciente': NOME, 'data_nascimento': '', 'idade': 75, 'sexo': 'Masculino',
+                 'data_exame': '20/01/2025'},
+            ])
+
+        self.assertGreaterEqual(migrate_exam_dates()['preenchidos'], 1)
+        self.assertEqual(migrate_exam_dates()['preenchidos'], 0)
+
+    def test_range_predicates_use_indexes(self):
+        """Teste plano de consulta usa os índices nas faixas de data"""
+        consultas = {
+            'ix_exames_created_at': select(Exame.id).where(in_range(Exame.created_at, day_bounds(date.today()))),
+            'ix_exames_data_exame_dt': select(Exame.id).where(Exame.data_exame_dt >= date(2025, 1, 1),
+                                                              Exame.data_exame_dt <= date(2025, 1, 31)),
+        }
+        for indice, consulta in consultas.items():
+            sql = str(consulta.compile(db.engine, compile_kwargs={'literal_binds': True}))
+            plano = ' '.join(str(linha[-1]) for linha in db.session.execute(text('EXPLAIN QUERY PLAN ' + sql)))
+            self.assertIn(indice, plano)
+
+    def test_counts_today_by_created_at_range(self):
+        """Teste exames criados hoje contados pelo intervalo do dia"""
+        from modules.core.dates import today_brasilia
+        antes = Exame.query.filter(in_range(Exame.created_at, day_bounds(today_brasilia()))).count()
+        self._exame('05/03/2025')
+        self._exame('06/03/2025', created_at=datetime.now() - timedelta(days=40))
+        depois = Exame.query.filter(in_range(Exame.created_at, day_bounds(today_brasilia()))).count()
+        self.assertEqual(depois - antes, 1)
+        self.assertEqual(Exame.query.filter(Exame.nome_paciente == NOME,
+                                            in_range(Exame.created_at, month_bounds(today_brasilia()))).count(), 1)
+
+    def test_period_report_filters_by_exam_date(self):
+        """Teste API de relatório por período filtra a data do exame"""
+        usuario = Usuario(username='datas_teste', email='datas@teste.com', role='admin', ativo=True)
+        usuario.password_hash = 'x'
+        db.session.add(usuario)
+        db.session.commit()
+        for data_exame in ('31/12/2024', '15/01/2025', '2025-01-31', '01/02/2025'):
+            self._exame(data_exame)
+
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['_user_id'] = str(usuario.id)
+            sess['_fresh'] = True
+
+        resposta = client.get('/api/relatorio-exames-periodo?data_inicio=01/01/2025&data_fim=2025-01-31')
+        self.assertEqual(resposta.status_code, 200)
+        datas = [e['data_exame'] for e in resposta.get_json()['exames'] if e['nome_paciente'] == NOME]
+        self.assertEqual(datas, ['2025-01-31', '15/01/2025'])
+
+        self.assertEqual(client.get('/api/relatorio-exames-periodo?data_inicio=99/99/2025').status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
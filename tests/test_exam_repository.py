@@ -0,0 +1,88 @@
+"""
+Testes do Repositório de Agregado de Exame
+Carregamento em consulta única e DTO somente leitura
+"""
+
+import unittest
+from app import app, db
+from models import Exame, ParametrosEcocardiograma, LaudoEcocardiograma, Medico
+from modules.exams.exam_repository import ExamAggregateRepository
+from utils.query_profiler import count_queries
+
+
+class TestExamAggregateRepository(unittest.TestCase):
+    """Testes do agregado de exame"""
+
+    def setUp(self):
+        """Criar exame completo com médico responsável"""
+        app.config['TESTING'] = True
+
+        with app.app_context():
+            db.create_all()
+
+            medico = Medico.query.filter_by(nome='Dra. Agregado').first()
+            if not medico:
+                medico = Medico(nome='Dra. Agregado', crm='CRM-SP 000001', ativo=True)
+                db.session.add(medico)
+
+            exame = Exame(nome_paciente='Paciente Agregado', data_nascimento='10/10/1970',
+                          idade=54, sexo='Masculino', data_exame='05/03/2025',
+                          medico_usuario='Dra. Agregado')
+            db.session.add(exame)
+            db.session.flush()
+            db.session.add(ParametrosEcocardiograma(exame_id=exame.id, peso=80.0, altura=175.0))
+            db.session.add(LaudoEcocardiograma(exame_id=exame.id, conclusao='Exame normal'))
+            db.session.commit()
+
+            self.exame_id = exame.id
+
+    def tearDown(self):
+        """Remover exame de teste"""
+        with app.app_context():
+            exame = db.session.get(Exame, self.exame_id)
+            if exame:
+                db.session.delete(exame)
+                db.session.commit()
+            db.session.remove()
+
+    def test_single_query_load(self):
+        """Teste carregamento do agregado completo em uma consulta"""
+        with app.app_context():
+            with count_queries() as profile:
+                exame = ExamAggregateRepository.get(self.exame_id)
+                peso = exame.parametros.peso
+                conclusao = exame.laudos[0].conclusao
+                medico = exame.medico.nome
+
+        self.assertEqual(profile.count, 1)
+        self.assertEqual(peso, 80.0)
+        self.assertEqual(conclusao, 'Exame normal')
+        self.assertEqual(medico, 'Dra. Agregado')
+
+    def test_aggregate_is_read_only(self):
+        """Teste DTO imutável e sem __dict__"""
+        with app.app_context():
+            exame = ExamAggregateRepository.get(self.exame_id)
+
+        with self.assertRaises(AttributeError):
+            exame.nome_paciente = 'Outro'
+        with self.assertRaises(AttributeError):
+            exame.parametros.peso = 1.0
+        self.assertFalse(hasattr(exame, '__dict__'))
+
+    def test_request_cache(self):
+        """Teste cache do agregado durante a requisição"""
+        with app.test_request_context('/'):
+            primeiro = ExamAggregateRepository.get(self.exame_id)
+            with count_queries() as profile:
+                segundo = ExamAggregateRepository.get(self.exame_id)
+
+            self.assertIs(primeiro, segundo)
+            self.assertEqual(profile.count, 0)
+
+            ExamAggregateRepository.invalidate(self.exame_id)
+            self.assertIsNot(ExamAggregateRepository.get(self.exame_id), primeiro)
+
+
+if __name__ == '__main__':
+    unittest.main()
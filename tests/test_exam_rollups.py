@@ -0,0 +1,117 @@
+"""
+Testes do Resumo Diário de Exames
+Ajuste incremental na gravação, recálculo e relatórios somando o resumo
+"""
+
+import unittest
+from datetime import date
+from app import db
+from models import ExameResumoDiario
+from modules.data_import import BulkImporter
+from modules.exams.rollup_service import ExamRollupService, age_band
+from modules.reports.report_service import ReportService
+from tests.helpers import ExamTestCase, criar_exame
+
+NOME = 'PACIENTE RESUMO TESTE'
+SOLICITANTE = 'DR SOLICITANTE RESUMO'
+DIA = date(2019, 6, 3)
+
+
+class TestExamRollups(ExamTestCase):
+    """Testes com o banco"""
+
+    NOME = NOME
+
+    def _limpar(self):
+        super()._limpar()
+        ExamRollupService.rebuild(DIA, DIA)
+
+    def _exame(self, **kwargs):
+        dados = dict(nome_paciente=NOME, data_nascimento='01/01/1950', data_exame='03/06/2019', idade=69,
+                     tipo_atendimento='Ambulatorial', medico_solicitante=SOLICITANTE)
+        dados.update(kwargs)
+        return criar_exame(**dados)
+
+    def _linhas(self):
+        db.session.expire_all()
+        return {(r.sexo, r.faixa_etaria, r.tipo_atendimento): r.total
+                for r in ExameResumoDiario.query.filter_by(dia=DIA, medico_solicitante=SOLICITANTE)}
+
+    def test_age_bands(self):
+        """Teste faixas etárias do relatório"""
+        self.assertEqual([age_band(i) for i in (5, 17, 18, 65, 66, None, 200)],
+                         ['Pediátrico', 'Pediátrico', 'Adulto', 'Adulto', 'Idoso', '', ''])
+
+    def test_insert_update_delete_adjust_rollup(self):
+        """Teste inclusão, mudança de chave e exclusão ajustam o resumo"""
+        a = self._exame()
+        self._exame(idade=10, sexo='Masculino')
+        self.assertEqual(self._linhas(), {('Feminino', 'Idoso', 'Ambulatorial'): 1,
+                                          ('Masculino', 'Pediátrico', 'Ambulatorial'): 1})
+
+        a.tipo_atendimento = 'Internado'
+        db.session.commit()
+        linhas = self._linhas()
+        self.assertEqual(linhas[('Feminino', 'Idoso', 'Ambulatorial')], 0)
+        self.assertEqual(linhas[('Feminino', 'Idoso', 'Internado')], 1)
+
+        db.session.delete(a)
+        db.session.commit()
+        self.assertEqual(self._linhas()[('Feminino', 'Idoso', 'Internado')], 0)
+
+    def test_unrelated_update_does_not_touch_rollup(self):
+        """Teste alteração fora da chave não altera o resumo"""
+        exame = self._exame()
+        exame.indicacao = 'Dispneia'
+        db.session.commit()
+        self.assertEqual(self._linhas(), {('Feminino', 'Idoso', 'Ambulatorial'): 1})
+
+    def test_rebuild_matches_incremental(self):
+        """Teste recálculo produz os mesmos totais que a manutenção incremental"""
+        for idade in (30, 40, 70):
+            self._exame(idade=idade)
+        incremental = {k: v for k, v in self._linhas().items() if v}
+        ExamRollupService.rebuild(DIA, DIA)
+        self.assertEqual(self._linhas(), incremental)
+        self.assertEqual(incremental, {('Feminino', 'Adulto', 'Ambulatorial'): 2,
+                                       ('Feminino', 'Idoso', 'Ambulatorial'): 1})
+
+    def test_bulk_import_updates_touched_days(self):
+        """Teste importação em lote (sem ORM) recalcula os dias gravados"""
+        BulkImporter(chunk_size=10).import_records([
+            {'nome_paciente': f'{NOME} {i}', 'data_exame': '03/06/2019', 'idade': 50, 'sexo': 'M',
+             'data_nascimento': '01/01/1969', 'medico_solicitante': SOLICITANTE}
+            for i in range(3)
+        ])
+        self.assertEqual(self._linhas(), {('Masculino', 'Adulto', ''): 3})
+
+    def test_statistics_report_sums_rollup(self):
+        """Teste relatório de estatísticas soma o resumo do período"""
+        self._exame()
+        self._exame(sexo='Masculino', idade=40)
+        relatorio = ReportService.generate_statistics_report('2019-06-01', '2019-06-30')
+
+        self.assertGreaterEqual(relatorio['totals']['period_exams_by_exam_date'], 2)
+        periodo = relatorio['period_distribution']
+        self.assertEqual(periodo['por_medico_solicitante'][SOLICITANTE], 2)
+        self.assertEqual(set(relatorio['age_distribution']), {'Pediátrico', 'Adulto', 'Idoso'})
+
+        resumo = ExamRollupService.summarize(DIA, DIA)
+        self.assertGreaterEqual(resumo['por_sexo']['Masculino'], 1)
+
+    def test_statistics_report_counts_exams_without_date(self):
+        """Teste distribuições gerais incluem exames sem data do exame válida"""
+        antes = ReportService.generate_statistics_report('2019-06-01', '2019-06-30')
+        exame = self._exame(data_exame='sem data', sexo='Masculino', idade=10)
+        self.assertIsNone(exame.data_exame_dt)
+        depois = ReportService.generate_statistics_report('2019-06-01', '2019-06-30')
+
+        self.assertEqual(depois['totals']['total_exams'], antes['totals']['total_exams'] + 1)
+        self.assertEqual(depois['gender_distribution']['Masculino'],
+                         antes['gender_distribution'].get('Masculino', 0) + 1)
+        self.assertEqual(depois['age_distribution']['Pediátrico'], antes['age_distribution']['Pediátrico'] + 1)
+        self.assertEqual(sum(depois['gender_distribution'].values()), depois['totals']['total_exams'])
+
+
+if __name__ == '__main__':
+    unittest.main()
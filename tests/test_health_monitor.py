@@ -0,0 +1,98 @@
+"""
+Testes do Monitor de Saúde
+Garante que as sondas rodam em segundo plano e as rotas só leem o cache
+"""
+
+import time
+import unittest
+from app import app
+from utils.health_monitor import HealthSampler, health_sampler
+
+
+class TestHealthSampler(unittest.TestCase):
+    """Testes do amostrador de sondas"""
+
+    def setUp(self):
+        """Criar amostrador isolado"""
+        self.sampler = HealthSampler(interval=60, capacity=5)
+        self.calls = 0
+
+    def tearDown(self):
+        """Parar thread de amostragem"""
+        self.sampler.stop()
+
+    def _probe(self):
+        self.calls += 1
+        return {'status': 'healthy', 'calls': self.calls}
+
+    def test_probe_result_is_cached(self):
+        """Teste leitura do último resultado sem reexecutar a sonda"""
+        self.sampler.register_probe('fake', self._probe)
+        self.sampler.run_due_probes(force=True)
+
+        for _ in range(10):
+            entry = self.sampler.latest('fake')
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(entry['status'], 'ok')
+        self.assertEqual(entry['data']['calls'], 1)
+
+    def test_ring_buffer_is_bounded(self):
+        """Teste capacidade máxima do buffer circular"""
+        self.sampler.register_probe('fake', self._probe)
+        for _ in range(12):
+            self.sampler.run_due_probes(force=True)
+
+        self.assertEqual(len(self.sampler.buffer), 5)
+        self.assertEqual(self.sampler.history('fake')[-1]['data']['calls'], 12)
+
+    def test_failing_probe_is_recorded(self):
+        """Teste registro de erro da sonda sem propagar exceção"""
+        def broken():
+            raise RuntimeError('banco indisponível')
+
+        self.sampler.register_probe('broken', broken)
+        self.sampler.run_due_probes(force=True)
+
+        entry = self.sampler.latest('broken')
+        self.assertEqual(entry['status'], 'error')
+        self.assertIn('indisponível', entry['data']['error'])
+
+    def test_background_thread_samples(self):
+        """Teste execução das sondas pela thread em segundo plano"""
+        self.sampler.register_probe('fake', self._probe, interval=0.5)
+        self.sampler.start()
+
+        deadline = time.time() + 3
+        while self.sampler.latest('fake') is None and time.time() < deadline:
+            time.sleep(0.05)
+
+        self.assertTrue(self.sampler.is_running())
+        self.assertIsNotNone(self.sampler.latest('fake'))
+
+
+class TestHealthRoutes(unittest.TestCase):
+    """Testes das rotas de saúde"""
+
+    def setUp(self):
+        """Configurar cliente de teste"""
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+
+    def tearDown(self):
+        """Parar amostrador global iniciado pela requisição"""
+        health_sampler.stop()
+
+    def test_health_endpoint_reads_cache(self):
+        """Teste endpoint /health rápido e sem autenticação"""
+        started = time.perf_counter()
+        response = self.client.get('/health')
+        elapsed = time.perf_counter() - started
+
+        self.assertIn(response.status_code, (200, 503))
+        self.assertIn(response.get_json()['status'], ('starting', 'ok', 'degraded'))
+        self.assertLess(elapsed, 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
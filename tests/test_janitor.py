@@ -0,0 +1,134 @@
+"""
+Testes do Zelador
+Varreduras com orçamento de tempo, jitter e relatório do que foi liberado
+"""
+
+import time
+import unittest
+from datetime import timedelta
+from app import app, db
+from auth.models import AuthUser, UserSession, datetime_brasilia
+from auth.services import SessionService
+from utils.janitor import Janitor
+from utils.session_cache import CachedPrincipal, SessionCache
+
+
+class TestJanitor(unittest.TestCase):
+    """Testes do agendador de varreduras"""
+
+    def setUp(self):
+        self.janitor = Janitor(interval=100, jitter=0.2, budget_ms=50)
+
+    def tearDown(self):
+        self.janitor.stop()
+
+    def test_reports_reclaimed_items(self):
+        """Teste relatório por tarefa e acumulado"""
+        self.janitor.register_task('fake', lambda deadline: 7)
+        self.janitor.run_due_tasks(force=True)
+        resultado = self.janitor.run_due_tasks(force=True)['fake']
+
+        self.assertEqual(resultado['status'], 'ok')
+        self.assertEqual(resultado['reclaimed'], 7)
+        status = self.janitor.get_status()['tasks']['fake']
+        self.assertEqual(status['runs'], 2)
+        self.assertEqual(status['reclaimed_total'], 14)
+
+    def test_task_receives_deadline_within_budget(self):
+        """Teste prazo entregue à tarefa corresponde ao orçamento"""
+        prazos = []
+        self.janitor.register_task('fake', lambda deadline: prazos.append(deadline - time.monotonic()) or 0)
+        self.janitor.run_due_tasks(force=True)
+        self.assertGreater(prazos[0], 0)
+        self.assertLessEqual(prazos[0], 0.05)
+
+    def test_jitter_spreads_next_run(self):
+        """Teste próxima execução dentro de intervalo ± jitter"""
+        inicio = time.monotonic()
+        for i in range(20):
+            self.janitor.register_task(f't{i}', lambda deadline: 0)
+        atrasos = [self.janitor._next_run[f't{i}'] - inicio for i in range(20)]
+        self.assertTrue(all(79 <= a <= 121 for a in atrasos))
+        self.assertGreater(len(set(round(a, 3) for a in atrasos)), 1)
+
+    def test_not_due_tasks_are_skipped(self):
+        """Teste tarefas não vencidas não executam"""
+        chamadas = []
+        self.janitor.register_task('fake', lambda deadline: chamadas.append(1) or 0)
+        self.assertEqual(self.janitor.run_due_tasks(), {})
+        self.assertEqual(chamadas, [])
+
+    def test_failing_task_is_recorded(self):
+        """Teste erro registrado sem propagar exceção"""
+        def falha(deadline):
+            raise RuntimeError('falhou')
+        self.janitor.register_task('falha', falha)
+        resultado = self.janitor.run_due_tasks(force=True)['falha']
+        self.assertEqual(resultado['status'], 'error')
+        self.assertEqual(resultado['reclaimed'], 0)
+
+    def test_session_cache_purge(self):
+        """Teste remoção de principais vencidos do LRU"""
+        cache = SessionCache()
+        for i in range(5):
+            cache._store(CachedPrincipal(i, f'u{i}'), (0, 0), time.time() - 1)
+        cache._store(CachedPrincipal(99, 'vivo'), (0, 0), time.time() + 60)
+        self.assertEqual(cache.purge_expired(), 5)
+        self.assertEqual(len(cache), 1)
+
+    def test_session_cache_purge_honours_deadline(self):
+        """Teste varredura do LRU em lotes, parando no prazo"""
+        cache = SessionCache()
+        for i in range(5):
+            cache._store(CachedPrincipal(i, f'u{i}'), (0, 0), time.time() - 1)
+        self.assertEqual(cache.purge_expired(deadline=time.monotonic() - 1), 0)
+        self.assertEqual(cache.purge_expired(batch_size=2, deadline=time.monotonic() + 5), 5)
+        self.assertEqual(len(cache), 0)
+
+
+class TestExpiredSessionSweep(unittest.TestCase):
+    """Testes da limpeza de sessões expiradas em lotes"""
+
+    def setUp(self):
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.user = AuthUser.query.filter_by(username='zelador_teste').first()
+        if not self.user:
+            self.user = AuthUser(username='zelador_teste', email='zelador@teste.com',
+                                 first_name='Zelador', last_name='Teste')
+            self.user.password_hash = 'x'
+            db.session.add(self.user)
+            db.session.commit()
+        UserSession.query.filter_by(user_id=self.user.id).delete()
+        db.session.commit()
+
+        agora = datetime_brasilia()
+        for i in range(25):
+            db.session.add(UserSession(user_id=self.user.id, session_token=f'zelador-expirada-{i}',
+                                       expires_at=agora - timedelta(hours=1)))
+        for i in range(2):
+            db.session.add(UserSession(user_id=self.user.id, session_token=f'zelador-valida-{i}',
+                                       expires_at=agora + timedelta(hours=1)))
+        db.session.commit()
+
+    def tearDown(self):
+        UserSession.query.filter_by(user_id=self.user.id).delete()
+        db.session.delete(self.user)
+        db.session.commit()
+        db.session.remove()
+        self.app_context.pop()
+
+    def test_removes_only_expired_in_batches(self):
+        """Teste remoção em lotes mantendo sessões válidas"""
+        self.assertEqual(SessionService.cleanup_expired_sessions(batch_size=10), 25)
+        self.assertEqual(UserSession.query.filter_by(user_id=self.user.id).count(), 2)
+
+    def test_stops_at_deadline(self):
+        """Teste prazo vencido adia a limpeza para a próxima execução"""
+        self.assertEqual(SessionService.cleanup_expired_sessions(deadline=time.monotonic() - 1), 0)
+        self.assertEqual(UserSession.query.filter_by(user_id=self.user.id).count(), 27)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,185 @@
+"""
+Testes dos Rascunhos de Laudo
+Envio por diferença, salvamentos sem efeito, conflito de revisão e promoção
+"""
+
+import json
+import unittest
+from app import app, db
+from models import Exame, LaudoEcocardiograma, LaudoRascunho, Usuario
+from modules.core.exceptions import ValidationError
+from modules.reports.draft_service import LaudoDraftService
+from utils.session_cache import session_cache
+
+
+class TestLaudoDrafts(unittest.TestCase):
+    """Testes do serviço de rascunhos"""
+
+    def setUp(self):
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+        exame = Exame(nome_paciente='PACIENTE RASCUNHO TESTE', data_nascimento='1970-01-01',
+                      data_exame='2025-01-01', idade=55, sexo='Masculino')
+        db.session.add(exame)
+        db.session.flush()
+        db.session.add(LaudoEcocardiograma(exame_id=exame.id, conclusao='Normal.', recomendacoes='Rotina.'))
+        db.session.commit()
+        self.exam_id = exame.id
+
+    def tearDown(self):
+        LaudoRascunho.query.filter_by(exame_id=self.exam_id).delete()
+        LaudoEcocardiograma.query.filter_by(exame_id=self.exam_id).delete()
+        Exame.query.filter_by(id=self.exam_id).delete()
+        db.session.commit()
+        db.session.remove()
+        self.app_context.pop()
+
+    def _laudo(self):
+        db.session.expire_all()
+        return LaudoEcocardiograma.query.filter_by(exame_id=self.exam_id).order_by(LaudoEcocardiograma.id).first()
+
+    def test_patch_stores_only_changed_fields(self):
+        """Teste rascunho guarda só o que difere do laudo salvo"""
+        resultado = LaudoDraftService.apply_patch(self.exam_id, 0, {
+            'conclusao': 'Normal.', 'doppler_tecidual': 'Preservado.'})
+
+        self.assertEqual(resultado['status'], 'salvo')
+        self.assertEqual(resultado['revisao'], 1)
+        self.assertEqual(resultado['alterados'], ['doppler_tecidual'])
+        self.assertEqual(LaudoDraftService.get_draft(self.exam_id)['campos'], {'doppler_tecidual': 'Preservado.'})
+        # O laudo só muda no salvamento explícito
+        self.assertIsNone(self._laudo().doppler_tecidual)
+
+    def test_noop_patch_writes_nothing(self):
+        """Teste envio repetido não grava nem avança a revisão"""
+        LaudoDraftService.apply_patch(self.exam_id, 0, {'conclusao': 'Alterado.'})
+        rascunho = LaudoRascunho.query.filter_by(exame_id=self.exam_id).first()
+        gravado_em = rascunho.updated_at
+
+        resultado = LaudoDraftService.apply_patch(self.exam_id, 1, {'conclusao': 'Alterado.'})
+        self.assertEqual(resultado['status'], 'sem_alteracao')
+        self.assertEqual(resultado['revisao'], 1)
+        db.session.expire_all()
+        self.assertEqual(LaudoRascunho.query.filter_by(exame_id=self.exam_id).first().updated_at, gravado_em)
+
+    def test_field_reverted_to_saved_value_leaves_draft(self):
+        """Teste campo que volta ao valor salvo sai do rascunho"""
+        LaudoDraftService.apply_patch(self.exam_id, 0, {'conclusao': 'Alterado.'})
+        resultado = LaudoDraftService.apply_patch(self.exam_id, 1, {'conclusao': 'Normal.'})
+        self.assertEqual(resultado['status'], 'salvo')
+        self.assertEqual(LaudoDraftService.get_draft(self.exam_id)['campos'], {})
+
+    def test_stale_revision_conflicts(self):
+        """Teste revisão desatualizada devolve o rascunho do servidor"""
+        LaudoDraftService.apply_patch(self.exam_id, 0, {'conclusao': 'Aba 1.'})
+        resultado = LaudoDraftService.apply_patch(self.exam_id, 0, {'conclusao': 'Aba 2.'})
+        self.assertEqual(resultado['status'], 'conflito')
+        self.assertEqual(resultado['revisao'], 1)
+        self.assertEqual(resultado['campos'], {'conclusao': 'Aba 1.'})
+
+    def test_invalid_field_rejected(self):
+        """Teste campo fora do registro do laudo"""
+        with self.assertRaises(ValidationError):
+            LaudoDraftService.apply_patch(self.exam_id, 0, {'exame_id': '1'})
+
+    def test_promote_writes_changed_columns_and_clears_draft(self):
+        """Teste promoção grava o rascunho e preserva campos não enviados"""
+        LaudoDraftService.apply_patch(self.exam_id, 0, {'doppler_tecidual': 'Preservado.'})
+        alterados = LaudoDraftService.promote(self.exam_id, {'conclusao': 'Normal.'})
+
+        self.assertEqual(alterados, ['doppler_tecidual'])
+        laudo = self._laudo()
+        self.assertEqual(laudo.doppler_tecidual, 'Preservado.')
+        self.assertEqual(laudo.recomendacoes, 'Rotina.')
+        self.assertIsNone(LaudoRascunho.query.filter_by(exame_id=self.exam_id).first())
+
+    def test_promote_without_changes_keeps_updated_at(self):
+        """Teste salvamento sem alteração não reescreve o laudo"""
+        antes = self._laudo().updated_at
+        self.assertEqual(LaudoDraftService.promote(self.exam_id, {'conclusao': 'Normal.'}), [])
+        self.assertEqual(self._laudo().updated_at, antes)
+
+    def test_extra_laudo_does_not_shadow_main_one(self):
+        """Teste rascunho e promoção usam o laudo principal (menor id)"""
+        db.session.add(LaudoEcocardiograma(exame_id=self.exam_id, conclusao='Adendo.'))
+        db.session.commit()
+
+        resultado = LaudoDraftService.apply_patch(self.exam_id, 0, {'conclusao': 'Normal.'})
+        self.assertEqual(resultado['status'], 'sem_alteracao')
+
+        self.assertEqual(LaudoDraftService.promote(self.exam_id, {'conclusao': 'Revisado.'}), ['conclusao'])
+        laudos = LaudoEcocardiograma.query.filter_by(exame_id=self.exam_id).order_by(LaudoEcocardiograma.id).all()
+        self.assertEqual([l.conclusao for l in laudos], ['Revisado.', 'Adendo.'])
+
+
+class TestLaudoDraftRoutes(unittest.TestCase):
+    """Testes da API de rascunho e da página do laudo"""
+
+    def setUp(self):
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+        Usuario.query.filter_by(username='rascunho_teste').delete()
+        usuario = Usuario(username='rascunho_teste', email='rascunho@teste.com', role='user', ativo=True)
+        usuario.password_hash = 'x'
+        exame = Exame(nome_paciente='PACIENTE RASCUNHO ROTA', data_nascimento='1970-01-01',
+                      data_exame='2025-01-01', idade=55, sexo='Feminino')
+        db.session.add_all([usuario, exame])
+        db.session.commit()
+        self.exam_id = exame.id
+
+        self.client = app.test_client()
+        with self.client.session_transaction() as sess:
+            sess['_user_id'] = str(usuario.id)
+            sess['_fresh'] = True
+
+    def tearDown(self):
+        LaudoRascunho.query.filter_by(exame_id=self.exam_id).delete()
+        LaudoEcocardiograma.query.filter_by(exame_id=self.exam_id).delete()
+        Exame.query.filter_by(id=self.exam_id).delete()
+        Usuario.query.filter_by(username='rascunho_teste').delete()
+        db.session.commit()
+        db.session.remove()
+        self.app_context.pop()
+        session_cache.clear()
+
+    def _patch(self, revisao, campos):
+        return self.client.patch(f'/api/laudo/{self.exam_id}/rascunho',
+                                 data=json.dumps({'revisao': revisao, 'campos': campos}),
+                                 content_type='application/json')
+
+    def test_patch_conflict_and_validation(self):
+        """Teste códigos de resposta da API de rascunho"""
+        resposta = self._patch(0, {'conclusao': 'Hipertrofia concêntrica.'})
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.get_json()['revisao'], 1)
+
+        self.assertEqual(self._patch(0, {'conclusao': 'Outra aba.'}).status_code, 409)
+        self.assertEqual(self._patch(1, {'campo_invalido': 'x'}).status_code, 400)
+        self.assertEqual(self._patch(1, {'conclusao': 'Hipertrofia concêntrica.'}).get_json()['status'],
+                         'sem_alteracao')
+
+    def test_laudo_page_reopens_with_draft(self):
+        """Teste página do laudo exibe o rascunho pendente e sua revisão"""
+        self._patch(0, {'conclusao': 'Texto ainda não salvo.'})
+        resposta = self.client.get(f'/laudo/{self.exam_id}')
+        self.assertEqual(resposta.status_code, 200)
+        self.assertIn('Texto ainda não salvo.', resposta.get_data(as_text=True))
+        self.assertIn('data-rascunho-revisao="1"', resposta.get_data(as_text=True))
+
+    def test_explicit_save_promotes_draft(self):
+        """Teste salvamento do formulário grava no laudo e remove o rascunho"""
+        self.client.get(f'/laudo/{self.exam_id}')
+        self._patch(0, {'doppler_tecidual': 'Preservado.'})
+        resposta = self.client.post(f'/salvar_laudo/{self.exam_id}', data={'conclusao': 'Normal.'})
+        self.assertEqual(resposta.status_code, 302)
+
+        db.session.expire_all()
+        laudo = LaudoEcocardiograma.query.filter_by(exame_id=self.exam_id).first()
+        self.assertEqual((laudo.doppler_tecidual, laudo.conclusao), ('Preservado.', 'Normal.'))
+        self.assertIsNone(LaudoRascunho.query.filter_by(exame_id=self.exam_id).first())
+
+
+if __name__ == '__main__':
+    unittest.main()
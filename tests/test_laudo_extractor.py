@@ -0,0 +1,179 @@
+"""
+Testes da Extração de Medidas dos Laudos
+Regras compiladas, unidades e confiança, gravação paralela e retomada por checkpoint
+"""
+
+import shutil
+import tempfile
+import unittest
+from sqlalchemy import func, select
+from app import db
+from laudos_autenticos_completos import (LAUDOS_MEDICOS_AUTENTICOS, adaptar_conclusao, adaptar_doppler_conv,
+                                         adaptar_doppler_tec, adaptar_modo_m)
+from models import LaudoEcocardiograma, ParametrosEcocardiograma
+from modules.data_import import LaudoExtractor, extract_measurements
+from modules.exams.reference_ranges import FLAG_BITS
+from tests.helpers import ExamTestCase, criar_exame
+
+PACIENTE = 'PACIENTE EXTRACAO LAUDO TESTE'
+
+
+def _texto(laudo):
+    return '\n'.join((laudo['modo_m'], laudo['doppler_conv'], laudo['doppler_tec'], laudo['conclusao']))
+
+
+class TestExtractMeasurements(unittest.TestCase):
+    """Testes das regras sobre o texto"""
+
+    def test_authentic_laudos(self):
+        """Teste todos os laudos autênticos com as medidas completas e confiança máxima"""
+        for laudo in LAUDOS_MEDICOS_AUTENTICOS:
+            campos, rejeitados = extract_measurements(_texto(laudo))
+            self.assertEqual(rejeitados, 0)
+            self.assertGreaterEqual(len(campos), 13)
+            self.assertTrue(all(confianca == 1.0 for _, confianca in campos.values()))
+
+        campos, _ = extract_measurements(_texto(LAUDOS_MEDICOS_AUTENTICOS[0]))
+        self.assertEqual({campo: valor for campo, (valor, _) in campos.items()}, {
+            'diametro_diastolico_final_ve': 50.0, 'diametro_sistolico_final': 38.0,
+            'espessura_diastolica_septo': 12.0, 'espessura_diastolica_ppve': 12.0,
+            'atrio_esquerdo': 54.0, 'raiz_aorta': 30.0, 'relacao_atrio_esquerdo_aorta': 1.8,
+            'fracao_ejecao': 47.6, 'percentual_encurtamento': 24.0, 'volume_diastolico_final': 118.0,
+            'volume_sistolico_final': 62.0, 'volume_ejecao': 56.0, 'massa_ve': 294.0,
+            'frequencia_cardiaca': 68
+        })
+
+    def test_generated_laudos_round_trip(self):
+        """Teste texto gerado a partir dos parâmetros devolve os mesmos valores"""
+        texto = '\n'.join((adaptar_modo_m(None, 55, 40, 11, 10, 41, 33), adaptar_doppler_conv(None, 1.24, 62.5, 34),
+                           adaptar_doppler_tec(None, 140, 53, 87, 210), adaptar_conclusao(None, 62.5, 41, 74)))
+        campos, _ = extract_measurements(texto)
+        self.assertEqual(campos['diametro_diastolico_final_ve'], (55.0, 1.0))
+        self.assertEqual(campos['relacao_atrio_esquerdo_aorta'], (1.24, 1.0))
+        self.assertEqual(campos['volume_ejecao'], (87.0, 1.0))
+        self.assertEqual(campos['frequencia_cardiaca'], (74, 1.0))
+
+    def test_units_and_confidence(self):
+        """Teste conversão de unidades, unidade implícita, rejeição e valores divergentes"""
+        campos, rejeitados = extract_measurements(
+            'AE: 4,2 cm, Ao = 3,1 cm. DDVE 5,2. FE (Simpson) = 35 %. Massa VE normal e FC = 68 bpm. '
+            'Altura 1,70 m. PSAP: 45 mmHg. Septo = 40%. PPVE = 9 mm; PPVE = 11 mm.')
+        self.assertEqual(campos['atrio_esquerdo'], (42.0, 1.0))
+        self.assertEqual(campos['raiz_aorta'], (31.0, 1.0))
+        self.assertEqual(campos['diametro_diastolico_final_ve'], (52.0, 0.5))
+        self.assertEqual(campos['fracao_ejecao'], (35.0, 1.0))
+        self.assertEqual(campos['altura'], (170.0, 1.0))
+        self.assertEqual(campos['pressao_sistolica_vd'], (45.0, 1.0))
+        self.assertEqual(campos['espessura_diastolica_ppve'], (9.0, 0.5))
+        self.assertNotIn('massa_ve', campos)
+        self.assertNotIn('espessura_diastolica_septo', campos)
+        self.assertEqual(rejeitados, 1)
+        self.assertEqual(extract_measurements(None), ({}, 0))
+
+    def test_bare_abbreviations_need_case_and_separator(self):
+        """Teste siglas de duas letras só com a caixa do laudo e seguidas de '=' ou ':'"""
+        for texto in ('Encaminhado ao 2 andar', 'AO 31 mm', 'fe = 55%', 'Se FC 70 bpm', 'sc: 1,8 m²'):
+            self.assertEqual(extract_measurements(texto), ({}, 0), texto)
+        campos, _ = extract_measurements('AO: 31 mm; FE (Simpson) = 55%; FC=70 bpm; SC: 1,8 m²')
+        self.assertEqual({campo: valor for campo, (valor, _) in campos.items()}, {
+            'raiz_aorta': 31.0, 'fracao_ejecao': 55.0, 'frequencia_cardiaca': 70, 'superficie_corporal': 1.8})
+
+
+class TestLaudoExtractor(ExamTestCase):
+    """Testes com o banco"""
+
+    NOME = PACIENTE
+
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        # Processa só os laudos criados pelo teste: começa depois do último id existente
+        self.inicio = db.session.execute(select(func.max(LaudoEcocardiograma.id))).scalar() or 0
+
+    def tearDown(self):
+        super().tearDown()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _exame(self, sufixo, texto, sexo='Masculino', **parametros):
+        return criar_exame(f'{PACIENTE} {sufixo}', parametros or None, {'modo_m_bidimensional': texto},
+                           data_exame='01/01/2020', idade=60, sexo=sexo)
+
+    def _extrator(self, **opcoes):
+        extrator = LaudoExtractor(checkpoint_dir=self.directory, progress=lambda stats: None, **opcoes)
+        estado = LaudoExtractor._new_stats()
+        estado['ultimo_laudo_id'] = self.inicio
+        extrator.checkpoint().save(estado)
+        return extrator
+
+    def _parametros(self, exame):
+        db.session.expire_all()
+        return ParametrosEcocardiograma.query.filter_by(exame_id=exame.id).one()
+
+    def test_fills_empty_fields_and_stamps_flags(self):
+        """Teste só campos vazios são preenchidos, parâmetros criados e achados carimbados"""
+        existente = self._exame('A', _texto(LAUDOS_MEDICOS_AUTENTICOS[0]), fracao_ejecao=60.0)
+        anterior = self._parametros(existente).updated_at
+        novo = self._exame('B', 'DDFVE = 62mm, FE = 35%. PSAP: 50 mmHg')
+
+        stats = self._extrator(workers=1).run()
+
+        parametros = self._parametros(existente)
+        self.assertEqual(parametros.fracao_ejecao, 60.0)
+        self.assertEqual(parametros.massa_ve, 294.0)
+        self.assertEqual(parametros.atrio_esquerdo, 54.0)
+        self.assertGreater(parametros.updated_at, anterior)
+        self.assertTrue(parametros.anormalidades & FLAG_BITS['ae_dilatado'])
+        self.assertFalse(parametros.anormalidades & FLAG_BITS['fe_reduzida'])
+
+        criado = self._parametros(novo)
+        self.assertEqual((criado.diametro_diastolico_final_ve, criado.fracao_ejecao), (62.0, 35.0))
+        self.assertTrue(criado.anormalidades & FLAG_BITS['fe_menor_40'])
+
+        self.assertEqual((stats['lidos'], stats['parametros_atualizados'], stats['parametros_criados']), (2, 1, 1))
+        self.assertEqual(stats['por_campo']['fracao_ejecao'], {'extraidos': 2, 'gravados': 1, 'confianca_media': 1.0})
+        self.assertTrue(stats['concluido'])
+
+    def test_process_pool_and_overwrite(self):
+        """Teste lotes pequenos em processos paralelos, sobrescrevendo valores existentes"""
+        exames = [self._exame(f'C{i}', _texto(laudo), fracao_ejecao=10.0)
+                  for i, laudo in enumerate(LAUDOS_MEDICOS_AUTENTICOS)]
+
+        stats = self._extrator(workers=2, chunk_size=2, overwrite=True).run()
+
+        self.assertEqual(stats['lidos'], len(exames))
+        self.assertEqual(stats['lotes'], (len(exames) + 1) // 2)
+        for exame, laudo in zip(exames, LAUDOS_MEDICOS_AUTENTICOS):
+            esperado = extract_measurements(_texto(laudo))[0]['fracao_ejecao'][0]
+            self.assertEqual(self._parametros(exame).fracao_ejecao, esperado)
+
+    def test_low_confidence_is_not_written(self):
+        """Teste campo abaixo da confiança mínima é contado e não gravado"""
+        exame = self._exame('D', 'DDVE 5,2; FE = 55%')
+        stats = self._extrator(workers=1).run()
+        parametros = self._parametros(exame)
+        self.assertIsNone(parametros.diametro_diastolico_final_ve)
+        self.assertEqual(parametros.fracao_ejecao, 55.0)
+        self.assertEqual(stats['campos_baixa_confianca'], 1)
+
+    def test_resume_from_checkpoint(self):
+        """Teste retomada depois do último lote gravado e checkpoint removido ao concluir"""
+        primeiro = self._exame('E', 'FE = 50%')
+        segundo = self._exame('F', 'FE = 45%')
+        extrator = self._extrator(workers=1)
+        estado = extrator.checkpoint().load()['stats']
+        estado.update(ultimo_laudo_id=LaudoEcocardiograma.query.filter_by(exame_id=primeiro.id).one().id, lidos=1)
+        extrator.checkpoint().save(estado)
+
+        stats = extrator.run()
+
+        self.assertEqual((stats['lidos'], stats['retomado_de']), (2, estado['ultimo_laudo_id']))
+        self.assertIsNone(ParametrosEcocardiograma.query.filter_by(exame_id=primeiro.id).first())
+        self.assertEqual(self._parametros(segundo).fracao_ejecao, 45.0)
+        self.assertIsNone(extrator.checkpoint().load())
+
+        # Opções diferentes invalidam o checkpoint
+        self.assertIsNone(LaudoExtractor(checkpoint_dir=self.directory, overwrite=True).checkpoint().load())
+
+
+if __name__ == '__main__':
+    unittest.main()
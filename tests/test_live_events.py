@@ -0,0 +1,182 @@
+"""
+Testes dos Eventos ao Vivo
+Hub de fan-out, aperto de mão do relógio, mudanças reais e aba parada sem requisições
+"""
+
+import json
+import time
+import unittest
+from flask import request_started
+from app import app, db
+from models import Exame, Usuario
+from utils.live_events import LiveEventHub, live_hub
+from utils.session_cache import session_cache
+
+
+def parse_events(texto):
+    """Eventos (nome, dados) de um trecho text/event-stream"""
+    eventos = []
+    for bloco in texto.split('\n\n'):
+        campos = dict(linha.split(': ', 1) for linha in bloco.splitlines() if ': ' in linha and not linha.startswith(':'))
+        if 'event' in campos:
+            eventos.append((campos['event'], json.loads(campos['data'])))
+    return eventos
+
+
+class TestLiveEventHub(unittest.TestCase):
+    """Testes do hub sem banco"""
+
+    def setUp(self):
+        self.hub = LiveEventHub(poll_interval=60, heartbeat=0.05, max_stream_seconds=0.3, queue_size=2)
+        self.hub._ensure_watcher = lambda: None
+
+    def test_fan_out_to_all_subscribers(self):
+        """Teste um evento publicado chega a todas as conexões"""
+        a, b = self.hub.subscribe(), self.hub.subscribe()
+        self.hub.publish('contadores', {'total_exames': 10})
+        for assinatura in (a, b):
+            self.assertEqual(parse_events(assinatura.get(timeout=1)), [('contadores', {'total_exames': 10})])
+
+    def test_slow_subscriber_is_dropped(self):
+        """Teste conexão que não consome é descartada sem travar as demais"""
+        lenta, rapida = self.hub.subscribe(), self.hub.subscribe()
+        for i in range(3):
+            self.hub.publish('exame', {'id': i})
+            rapida.get(timeout=1)
+        self.assertTrue(lenta.closed)
+        self.assertEqual(self.hub.subscriber_count(), 1)
+
+    def test_stream_starts_with_clock_handshake(self):
+        """Teste hora do servidor enviada uma vez e ping quando ocioso"""
+        assinatura = self.hub.subscribe()
+        corpo = ''.join(self.hub.stream(assinatura, {'total_exames': 1}))
+        eventos = parse_events(corpo)
+
+        self.assertEqual(eventos[0][0], 'relogio')
+        self.assertAlmostEqual(eventos[0][1]['epoch_ms'] / 1000, time.time(), delta=5)
+        self.assertEqual(eventos[0][1]['utc_offset_min'], -180)
+        self.assertEqual(eventos[1], ('contadores', {'total_exames': 1}))
+        self.assertEqual([nome for nome, _ in eventos].count('relogio'), 1)
+        self.assertIn(': ping', corpo)
+        self.assertEqual(self.hub.subscriber_count(), 0)
+
+    def test_subscriber_limit(self):
+        """Teste limite de conexões longas por worker"""
+        self.hub.max_streams = 1
+        self.assertIsNotNone(self.hub.subscribe())
+        self.assertIsNone(self.hub.subscribe())
+
+
+class TestLiveEventsApp(unittest.TestCase):
+    """Testes com a aplicação e o banco"""
+
+    def setUp(self):
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+        Usuario.query.filter_by(username='ao_vivo_teste').delete()
+        usuario = Usuario(username='ao_vivo_teste', email='ao_vivo@teste.com', role='user', ativo=True)
+        usuario.password_hash = 'x'
+        db.session.add(usuario)
+        db.session.commit()
+        self.user_id = usuario.id
+        self.exames = []
+
+        self.hub = LiveEventHub(poll_interval=60, heartbeat=60)
+        self.hub.init_app(app)
+        # Verificações disparadas pelo teste, sem a thread observadora concorrendo
+        self.hub._ensure_watcher = lambda: None
+
+    def tearDown(self):
+        for exame_id in self.exames:
+            Exame.query.filter_by(id=exame_id).delete()
+        Usuario.query.filter_by(username='ao_vivo_teste').delete()
+        db.session.commit()
+        db.session.remove()
+        self.app_context.pop()
+        session_cache.clear()
+
+    def _criar_exame(self):
+        exame = Exame(nome_paciente='PACIENTE AO VIVO TESTE', data_nascimento='1975-01-01', data_exame='2025-01-01',
+                      idade=50, sexo='Feminino')
+        db.session.add(exame)
+        db.session.commit()
+        self.exames.append(exame.id)
+        return exame
+
+    def test_only_real_changes_are_pushed(self):
+        """Teste novos exames e apenas os contadores que mudaram"""
+        assinatura = self.hub.subscribe()
+        self.hub.poll_changes()
+        self.assertTrue(assinatura.queue.empty())
+
+        exame = self._criar_exame()
+        self.hub.poll_changes()
+        eventos = []
+        while not assinatura.queue.empty():
+            eventos.extend(parse_events(assinatura.get(timeout=1)))
+
+        self.assertIn(('exame', {'id': exame.id, 'nome_paciente': exame.nome_paciente,
+                                 'data_exame': '2025-01-01'}), eventos)
+        contadores = dict(eventos)['contadores']
+        self.assertIn('total_exames', contadores)
+        self.assertNotIn('templates_ativos', contadores)
+        self.assertNotIn('usuarios_sistema', contadores)
+
+        self.hub.poll_changes()
+        self.assertTrue(assinatura.queue.empty())
+
+    def test_dashboard_lists_recent_exams_and_listens_for_new_ones(self):
+        """Teste painel com exames recentes e ouvinte do evento de novo exame"""
+        exame = self._criar_exame()
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['_user_id'] = str(self.user_id)
+            sess['_fresh'] = True
+
+        html = client.get('/').get_data(as_text=True)
+        self.assertIn('id="exames-recentes"', html)
+        self.assertIn(f'/visualizar_exame/{exame.id}', html)
+        self.assertIn("addEventListener('exame'", html)
+
+    def test_idle_tab_request_rate_near_zero(self):
+        """Teste aba parada: uma conexão em vez de uma requisição por segundo"""
+        requisicoes = []
+
+        def contar(sender, **extra):
+            requisicoes.append(1)
+
+        heartbeat, maximo = live_hub.heartbeat, live_hub.max_stream_seconds
+        live_hub.heartbeat, live_hub.max_stream_seconds = 0.1, 60
+        request_started.connect(contar, app)
+        client = app.test_client()
+        try:
+            with client.session_transaction() as sess:
+                sess['_user_id'] = str(self.user_id)
+                sess['_fresh'] = True
+
+            resposta = client.get('/api/eventos', buffered=False)
+            self.assertEqual(resposta.status_code, 200)
+            self.assertEqual(resposta.mimetype, 'text/event-stream')
+
+            inicio, corpo = time.monotonic(), ''
+            for pedaco in resposta.response:
+                corpo += pedaco.decode() if isinstance(pedaco, bytes) else pedaco
+                if time.monotonic() - inicio > 2:
+                    break
+            duracao = time.monotonic() - inicio
+            resposta.close()
+        finally:
+            request_started.disconnect(contar, app)
+            live_hub.heartbeat, live_hub.max_stream_seconds = heartbeat, maximo
+
+        nomes = [nome for nome, _ in parse_events(corpo)]
+        self.assertEqual(nomes[:2], ['relogio', 'contadores'])
+        self.assertGreater(corpo.count(': ping'), 5)
+        # Antes: ~1 requisição/s por aba; agora a única requisição é a abertura do canal
+        self.assertEqual(len(requisicoes), 1)
+        self.assertLess(len(requisicoes) / duracao, 0.6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+"""
+Testes das Métricas de Desempenho
+Histogramas por worker e agregação entre processos
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from app import app
+from utils.metrics import Histogram, MetricsRegistry, metrics_registry
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    """Testes do registro de métricas"""
+
+    def setUp(self):
+        """Criar diretório compartilhado temporário"""
+        self.metrics_dir = tempfile.mkdtemp()
+        self.registry = MetricsRegistry(metrics_dir=self.metrics_dir, flush_interval=0)
+
+    def tearDown(self):
+        """Remover diretório temporário"""
+        shutil.rmtree(self.metrics_dir, ignore_errors=True)
+
+    def test_histogram_buckets(self):
+        """Teste distribuição das observações nos buckets"""
+        hist = Histogram('teste', 'Teste', (0.1, 1.0), ('rota',))
+        hist.observe(0.05, 'index')
+        hist.observe(0.5, 'index')
+        hist.observe(5.0, 'index')
+
+        counts, total, count = hist.series[('index',)]
+        self.assertEqual(counts, [1, 1])
+        self.assertEqual(count, 3)
+        self.assertAlmostEqual(total, 5.55)
+
+    def test_concurrent_observations(self):
+        """Teste observações de várias threads (worker gthread) sem perder contagens"""
+        hist = Histogram('teste', 'Teste', (0.1, 1.0), ('rota',))
+
+        def observar():
+            for _ in range(5000):
+                hist.observe(0.5, 'index')
+
+        threads = [threading.Thread(target=observar) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        counts, total, count = hist.series[('index',)]
+        self.assertEqual((counts, count), ([0, 20000], 20000))
+        self.assertAlmostEqual(total, 10000.0)
+
+    def test_failed_query_does_not_leak_start(self):
+        """Teste consulta com erro não deixa o início empilhado na conexão"""
+        self.registry._install_sql_listeners()
+        engine = create_engine('sqlite://')
+        with engine.connect() as conexao:
+            with self.assertRaises(OperationalError):
+                conexao.execute(text('SELECT * FROM tabela_inexistente'))
+            self.assertEqual(conexao.info.get('_metrics_query_start'), [])
+        engine.dispose()
+
+    def test_aggregate_across_workers(self):
+        """Teste soma dos snapshots gravados por outros workers"""
+        self.registry.pdf_render.observe(0.3, 'platypus')
+
+        outro = self.registry.snapshot()
+        outro['pid'] = 999999
+        with open(os.path.join(self.metrics_dir, 'worker_999999.json'), 'w') as f:
+            json.dump(outro, f)
+
+        merged, workers = self.registry.aggregate()
+        serie = merged['ecocardio_pdf_render_seconds']['series'][('platypus',)]
+        self.assertEqual(workers, 2)
+        self.assertEqual(serie[2], 2)
+
+    def test_render_prometheus_format(self):
+        """Teste formato texto com buckets cumulativos"""
+        self.registry.request_duration.observe(0.02, 'index', 'GET', '200')
+        self.registry.request_duration.observe(0.2, 'index', 'GET', '200')
+
+        texto = self.registry.render_prometheus()
+        self.assertIn('# TYPE ecocardio_request_duration_seconds histogram', texto)
+        self.assertIn('ecocardio_request_duration_seconds_bucket{endpoint="index",method="GET",status="200",le="0.025"} 1', texto)
+        self.assertIn('ecocardio_request_duration_seconds_bucket{endpoint="index",method="GET",status="200",le="+Inf"} 2', texto)
+        self.assertIn('ecocardio_request_duration_seconds_count{endpoint="index",method="GET",status="200"} 2', texto)
+
+
+class TestMetricsEndpoint(unittest.TestCase):
+    """Testes da instrumentação das requisições"""
+
+    def setUp(self):
+        """Configurar cliente de teste"""
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+
+    def test_request_is_recorded(self):
+        """Teste registro de latência e consultas da requisição"""
+        self.client.get('/health')
+
+        response = self.client.get('/metrics')
+        texto = response.get_data(as_text=True)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('endpoint="health_check"', texto)
+        self.assertIn('ecocardio_db_queries_per_request_count{endpoint="health_check"}', texto)
+        self.assertIn(('health_check',), metrics_registry.request_queries.series)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+"""
+Testes do Histórico do Paciente
+Projeção resumida, paginação por chave (created_at, id) e páginas do prontuário
+"""
+
+import unittest
+from datetime import datetime, timedelta
+from sqlalchemy import insert, text
+from app import app, db
+from models import Exame, LaudoEcocardiograma, ParametrosEcocardiograma, Usuario
+from modules.core.exceptions import ValidationError
+from modules.exams.patient_history import PatientHistoryService
+from tests.helpers import ExamTestCase
+
+NOME = 'PACIENTE HISTORICO TESTE'
+INICIO = datetime(2020, 1, 1, 8, 0)
+
+
+class TestPatientHistory(ExamTestCase):
+    """Testes com o banco"""
+
+    NOME = NOME
+    USUARIOS = ('historico_teste',)
+
+    def _preparar_banco(self):
+        with db.engine.begin() as conn:
+            for tabela in (Exame.__table__, ParametrosEcocardiograma.__table__, LaudoEcocardiograma.__table__):
+                for indice in tabela.indexes:
+                    indice.create(conn, checkfirst=True)
+
+    def _popular(self, total=45, empates=3):
+        """Exames com created_at crescente; os `empates` primeiros no mesmo instante"""
+        with db.engine.begin() as conn:
+            conn.execute(insert(Exame.__table__), [
+                {'nome_paciente': NOME, 'data_nascimento': '01/01/1950', 'idade': 70, 'sexo': 'Feminino',
+                 'data_exame': f'{(i % 28) + 1:02d}/01/2020',
+                 'created_at': INICIO + timedelta(days=max(i - empates + 1, 0))}
+                for i in range(total)
+            ])
+        return [e.id for e in Exame.query.filter_by(nome_paciente=NOME)
+                .order_by(Exame.created_at.desc(), Exame.id.desc())]
+
+    def test_keyset_pages_cover_history_once(self):
+        """Teste páginas em ordem decrescente, sem repetição, inclusive com empates"""
+        esperados = self._popular()
+        vistos, cursor, paginas = [], None, 0
+        while True:
+            pagina = PatientHistoryService.summary_page(NOME, cursor, limit=20)
+            vistos += [exame.id for exame in pagina['exames']]
+            paginas += 1
+            cursor = pagina['proximo_cursor']
+            if cursor is None:
+                break
+
+        self.assertEqual(paginas, 3)
+        self.assertEqual(vistos, esperados)
+
+    def test_summary_projection(self):
+        """Teste FE e trecho da conclusão do laudo principal"""
+        exame = Exame(nome_paciente=NOME, data_nascimento='01/01/1950', data_exame='10/05/2024', idade=74,
+                      sexo='Feminino', indicacao='x' * 300)
+        exame.parametros = ParametrosEcocardiograma(fracao_ejecao=62.0)
+        exame.laudos = [LaudoEcocardiograma(conclusao='Função sistólica preservada. ' * 20),
+                        LaudoEcocardiograma(conclusao='Segundo laudo')]
+        db.session.add(exame)
+        db.session.commit()
+
+        resumo = PatientHistoryService.summary_page(NOME)['exames'][0]
+        self.assertEqual(resumo.fracao_ejecao, 62.0)
+        self.assertTrue(resumo.conclusao.startswith('Função sistólica preservada.'))
+        self.assertEqual(len(resumo.conclusao), 160)
+        self.assertEqual(len(resumo.indicacao), 100)
+        self.assertEqual(resumo.to_dict()['id'], exame.id)
+
+    def test_header(self):
+        """Teste cabeçalho com total, último e primeiro exame em uma consulta"""
+        self._popular(total=5, empates=1)
+        paciente = PatientHistoryService.header(NOME)
+        self.assertEqual((paciente.total_exames, paciente.primeiro_exame, paciente.ultimo_exame),
+                         (5, '01/01/2020', '05/01/2020'))
+        self.assertIsNone(PatientHistoryService.header('PACIENTE INEXISTENTE HISTORICO'))
+
+    def test_invalid_cursor(self):
+        """Teste cursor adulterado"""
+        with self.assertRaises(ValidationError):
+            PatientHistoryService.summary_page(NOME, 'nao-e-um-cursor')
+
+    def test_page_query_uses_patient_index(self):
+        """Teste plano da página usa o índice (nome_paciente, created_at, id)"""
+        self._popular(total=3)
+        plano = ' '.join(str(linha[-1]) for linha in db.session.execute(text(
+            "EXPLAIN QUERY PLAN SELECT id FROM exames WHERE nome_paciente = :nome "
+            "ORDER BY created_at DESC, id DESC LIMIT 21"), {'nome': NOME}))
+        self.assertIn('ix_exames_paciente_recentes', plano)
+        self.assertNotIn('TEMP B-TREE', plano)
+
+    def test_prontuario_page_and_api(self):
+        """Teste página com a primeira página e API com as seguintes"""
+        esperados = self._popular()
+        usuario = Usuario(username='historico_teste', email='historico@teste.com', role='user', ativo=True)
+        usuario.password_hash = 'x'
+        db.session.add(usuario)
+        db.session.commit()
+
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['_user_id'] = str(usuario.id)
+            sess['_fresh'] = True
+
+        pagina = client.get(f'/prontuario/{NOME}')
+        self.assertEqual(pagina.status_code, 200)
+        html = pagina.get_data(as_text=True)
+        self.assertEqual(html.count('class="exam-item"'), 20)
+        self.assertIn('45 exames', html)
+
+        cursor = PatientHistoryService.summary_page(NOME)['proximo_cursor']
+        resposta = client.get(f'/api/prontuario/{NOME}/exames?cursor={cursor}')
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual([e['id'] for e in resposta.get_json()['exames']], esperados[20:40])
+        self.assertEqual(client.get(f'/api/prontuario/{NOME}/exames?cursor=@@').status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
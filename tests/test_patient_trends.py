@@ -0,0 +1,147 @@
+"""
+Testes das Tendências do Paciente
+Variações entre exames, consulta única, cache e invalidação após gravações
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from sqlalchemy import event
+from app import app, db
+from models import Usuario
+from modules.data_import import BulkImporter
+from modules.exams.trend_service import PatientTrendCache, PatientTrendService, trend_cache
+from utils.session_cache import RevocationGenerations
+from tests.helpers import ExamTestCase, criar_exame
+
+NOME = 'PACIENTE TENDENCIA TESTE'
+
+
+class TestPatientTrends(ExamTestCase):
+    """Testes com o banco e gerações em diretório temporário"""
+
+    NOME = NOME
+    USUARIOS = ('tendencia_teste',)
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.generations_path = os.path.join(self.tmpdir, 'geracoes.json')
+        self._original_generations = trend_cache._generations
+        trend_cache._generations = RevocationGenerations(self.generations_path)
+        trend_cache.clear()
+
+        super().setUp()
+
+        self.queries = []
+        event.listen(db.engine, 'before_cursor_execute', self._count)
+
+    def tearDown(self):
+        event.remove(db.engine, 'before_cursor_execute', self._count)
+        super().tearDown()
+        trend_cache._generations = self._original_generations
+        trend_cache.clear()
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def _count(self, conn, cursor, statement, parameters, context, executemany):
+        self.queries.append(statement)
+
+    def _exame(self, data_exame, **parametros):
+        return criar_exame(NOME, parametros, data_nascimento='01/01/1950', data_exame=data_exame, idade=70)
+
+    def _popular(self):
+        # Inseridos fora de ordem: a série segue a data do exame
+        return [
+            self._exame('01/01/2024', fracao_ejecao=55.0, massa_ve=180.0),
+            self._exame('01/01/2023', fracao_ejecao=60.0, massa_ve=170.0),
+            self._exame('2024-07-01', fracao_ejecao=50.0),
+        ]
+
+    def test_series_with_deltas_and_slopes(self):
+        """Teste ordem por data, variações, inclinações e valores ausentes"""
+        self._popular()
+        tendencias = PatientTrendService.get_trends(NOME)
+
+        self.assertEqual(tendencias['total_exames'], 3)
+        fe = tendencias['series']['fracao_ejecao']
+        self.assertEqual([p['valor'] for p in fe['pontos']], [60.0, 55.0, 50.0])
+        self.assertEqual([p['delta'] for p in fe['pontos']], [None, -5.0, -5.0])
+        self.assertEqual(fe['pontos'][1]['dias'], 365)
+        self.assertEqual(fe['pontos'][1]['inclinacao_ano'], -5.0)
+        self.assertLess(fe['pontos'][2]['inclinacao_ano'], -9.0)
+        self.assertLess(fe['inclinacao_ano'], -5.0)
+
+        massa = tendencias['series']['massa_ve']
+        self.assertEqual(len(massa['pontos']), 2)
+        self.assertIsNone(tendencias['series']['pressao_sistolica_vd']['inclinacao_ano'])
+        self.assertIsNone(PatientTrendService.get_trends('PACIENTE INEXISTENTE TENDENCIA'))
+
+    def test_single_query_then_cached(self):
+        """Teste uma consulta na primeira leitura e nenhuma no cache"""
+        self._popular()
+        self.queries.clear()
+        PatientTrendService.get_trends(NOME)
+        self.assertEqual(len(self.queries), 1)
+
+        self.queries.clear()
+        PatientTrendService.get_trends(NOME)
+        self.assertEqual(self.queries, [])
+
+    def test_parameter_commit_invalidates_other_workers(self):
+        """Teste gravação de parâmetros invalida o cache de todos os workers"""
+        exames = self._popular()
+        outro_worker = PatientTrendCache(generations=RevocationGenerations(self.generations_path))
+        geracao = outro_worker.generation(NOME)
+        outro_worker.put(NOME, geracao, PatientTrendService.build_trends(NOME))
+        PatientTrendService.get_trends(NOME)
+
+        exames[0].parametros.fracao_ejecao = 40.0
+        db.session.flush()
+        self.assertIsNotNone(outro_worker.get(NOME, outro_worker.generation(NOME)))
+        db.session.commit()
+
+        self.assertIsNone(outro_worker.get(NOME, outro_worker.generation(NOME)))
+        fe = PatientTrendService.get_trends(NOME)['series']['fracao_ejecao']
+        self.assertEqual(fe['pontos'][1]['valor'], 40.0)
+
+    def test_rollback_keeps_cache(self):
+        """Teste alteração desfeita não invalida o cache"""
+        exames = self._popular()
+        PatientTrendService.get_trends(NOME)
+        geracao = trend_cache.generation(NOME)
+
+        exames[0].parametros.fracao_ejecao = 10.0
+        db.session.flush()
+        db.session.rollback()
+        db.session.commit()
+        self.assertEqual(trend_cache.generation(NOME), geracao)
+
+    def test_bulk_import_invalidates(self):
+        """Teste importação em lote (sem ORM) invalida os pacientes gravados"""
+        self._popular()
+        PatientTrendService.get_trends(NOME)
+        BulkImporter().import_records([{'nome_paciente': NOME, 'data_exame': '01/01/2025', 'idade': 70,
+                                        'sexo': 'F', 'data_nascimento': '01/01/1950', 'fracao_ejecao': 45}])
+        self.assertEqual(PatientTrendService.get_trends(NOME)['total_exames'], 4)
+
+    def test_trends_api(self):
+        """Teste API de tendências do prontuário"""
+        self._popular()
+        usuario = Usuario(username='tendencia_teste', email='tendencia@teste.com', role='user', ativo=True)
+        usuario.password_hash = 'x'
+        db.session.add(usuario)
+        db.session.commit()
+
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['_user_id'] = str(usuario.id)
+            sess['_fresh'] = True
+
+        resposta = client.get(f'/api/prontuario/{NOME}/tendencias')
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(len(resposta.get_json()['series']['fracao_ejecao']['pontos']), 3)
+        self.assertEqual(client.get('/api/prontuario/NINGUEM TENDENCIA/tendencias').status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,141 @@
+"""
+Testes do Perfilador de Consultas
+Detecção de N+1 e orçamento de consultas das rotas críticas
+"""
+
+import unittest
+from flask import g
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from app import app, db
+from models import Usuario, Exame, ParametrosEcocardiograma, LaudoEcocardiograma
+from utils.query_profiler import (RequestProfile, QueryBudgetExceeded, fingerprint_sql,
+                                  count_queries, query_profiler)
+
+
+class TestQueryFingerprint(unittest.TestCase):
+    """Testes da normalização de SQL"""
+
+    def test_literals_are_normalized(self):
+        """Teste remoção de literais e parâmetros"""
+        a = fingerprint_sql("SELECT * FROM exames WHERE id = 10 AND nome = 'Ana'")
+        b = fingerprint_sql("SELECT *  FROM exames WHERE id = 7 AND nome = 'João'")
+        self.assertEqual(a, b)
+
+    def test_in_lists_are_collapsed(self):
+        """Teste listas IN de tamanhos diferentes"""
+        a = fingerprint_sql('SELECT * FROM exames WHERE id IN (?, ?)')
+        b = fingerprint_sql('SELECT * FROM exames WHERE id IN (?, ?, ?, ?)')
+        self.assertEqual(a, b)
+
+    def test_n_plus_one_detection(self):
+        """Teste sinalização de consulta repetida acima do limite"""
+        profile = RequestProfile('index', n_plus_one_threshold=3)
+        profile.record('SELECT * FROM exames')
+        for i in range(4):
+            profile.record(f'SELECT * FROM parametros_ecocardiograma WHERE exame_id = {i}')
+
+        reports = profile.n_plus_one()
+        self.assertEqual(profile.count, 5)
+        self.assertEqual(len(reports), 1)
+        self.assertEqual(reports[0]['count'], 4)
+        self.assertIn('test_query_profiler.py', reports[0]['location'])
+
+    def test_failed_query_is_recorded_without_leaking_start(self):
+        """Teste consulta com erro conta no perfil e não deixa o início empilhado"""
+        query_profiler._install_listeners()
+        engine = create_engine('sqlite://')
+        with app.test_request_context('/'):
+            g._query_profile = RequestProfile('index')
+            with engine.connect() as conexao:
+                with self.assertRaises(OperationalError):
+                    conexao.execute(text('SELECT * FROM tabela_inexistente'))
+                self.assertEqual(conexao.info.get('_profiler_query_start'), [])
+            self.assertEqual(g._query_profile.count, 1)
+        engine.dispose()
+
+
+class TestQueryBudget(unittest.TestCase):
+    """Testes do orçamento de consultas das rotas críticas"""
+
+    def setUp(self):
+        """Criar usuário, exame e sessão autenticada"""
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+
+        with app.app_context():
+            db.create_all()
+
+            usuario = Usuario.query.filter_by(username='perfilador').first()
+            if not usuario:
+                usuario = Usuario(username='perfilador', email='perfilador@vidah.com',
+                                  password_hash='x', role='admin')
+                db.session.add(usuario)
+
+            exame = Exame(nome_paciente='Paciente Perfilador', data_nascimento='01/01/1980',
+                          idade=45, sexo='Feminino', data_exame='01/02/2025')
+            db.session.add(exame)
+            db.session.flush()
+            db.session.add(ParametrosEcocardiograma(exame_id=exame.id, peso=60.0))
+            db.session.add(LaudoEcocardiograma(exame_id=exame.id, conclusao='Normal'))
+            db.session.commit()
+
+            self.usuario_id = usuario.id
+            self.exame_id = exame.id
+
+        with self.client.session_transaction() as sess:
+            sess['_user_id'] = str(self.usuario_id)
+            sess['_fresh'] = True
+
+    def tearDown(self):
+        """Remover exame de teste"""
+        app.config.pop('QUERY_BUDGETS', None)
+        with app.app_context():
+            exame = db.session.get(Exame, self.exame_id)
+            if exame:
+                db.session.delete(exame)
+                db.session.commit()
+            db.session.remove()
+
+    def test_hot_paths_within_budget(self):
+        """Teste rotas críticas dentro do orçamento declarado"""
+        urls = [
+            f'/visualizar_exame/{self.exame_id}',
+            '/api/ultimo-exame-paciente/Paciente Perfilador',
+            '/novo_exame?clone_paciente=Paciente Perfilador',
+            '/prontuario/buscar?q=perfilador',
+        ]
+        for url in urls:
+            response = self.client.get(url)
+            self.assertLess(response.status_code, 500, url)
+            self.assertIsNotNone(response.headers.get('X-Query-Count'), url)
+
+    def test_patient_search_single_query(self):
+        """Teste busca de pacientes sem consulta por paciente"""
+        antes = len(query_profiler.get_reports())
+        response = self.client.get('/prontuario/buscar?q=perfilador')
+        dados = response.get_json()
+
+        self.assertTrue(any(p['nome'] == 'Paciente Perfilador' for p in dados))
+        novos = query_profiler.get_reports()[antes:]
+        self.assertFalse([r for r in novos if r['endpoint'] == 'buscar_pacientes'])
+
+    def test_budget_violation_raises_in_tests(self):
+        """Teste erro quando a rota excede o orçamento"""
+        app.config['QUERY_BUDGETS'] = {'api_ultimo_exame_paciente': 1}
+
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get('/api/ultimo-exame-paciente/Paciente Perfilador')
+
+    def test_count_queries_block(self):
+        """Teste contador de consultas fora de requisições"""
+        with app.app_context():
+            with count_queries() as profile:
+                db.session.execute(text('SELECT 1'))
+                db.session.execute(text('SELECT 2'))
+
+        self.assertEqual(profile.count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
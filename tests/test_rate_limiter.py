@@ -0,0 +1,115 @@
+"""
+Testes do Limitador de Requisições
+GCRA, armazenamento compartilhado entre workers e nível local limitado
+"""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from flask import Flask, jsonify
+from auth.rate_limiter import RateLimiter, MemoryBackend, SQLiteBackend
+from auth.decorators import AuthDecorators
+
+
+class TestGCRA(unittest.TestCase):
+    """Testes do algoritmo com armazenamento em memória"""
+
+    def setUp(self):
+        self.limiter = RateLimiter(MemoryBackend())
+
+    def test_allows_burst_then_denies(self):
+        """Teste rajada até o limite e espera informada"""
+        resultados = [self.limiter.hit('ip:1', 3, 60) for _ in range(4)]
+        self.assertEqual([r.allowed for r in resultados], [True, True, True, False])
+        self.assertGreater(resultados[-1].retry_after, 0)
+        self.assertLessEqual(resultados[-1].retry_after, 20)
+
+    def test_peek_does_not_consume(self):
+        """Teste verificação sem contar a requisição"""
+        for _ in range(5):
+            self.assertTrue(self.limiter.peek('ip:2', 1, 60).allowed)
+        self.assertTrue(self.limiter.hit('ip:2', 1, 60).allowed)
+        self.assertFalse(self.limiter.peek('ip:2', 1, 60).allowed)
+
+    def test_reset(self):
+        """Teste liberação manual da chave"""
+        self.limiter.hit('ip:3', 1, 60)
+        self.assertFalse(self.limiter.hit('ip:3', 1, 60).allowed)
+        self.limiter.reset('ip:3')
+        self.assertTrue(self.limiter.hit('ip:3', 1, 60).allowed)
+
+    def test_local_tier_is_bounded(self):
+        """Teste memória limitada com muitos IPs"""
+        backend = MemoryBackend(max_keys=100)
+        limiter = RateLimiter(backend, local_max_keys=50)
+        for i in range(1000):
+            limiter.hit(f'ip:{i}', 1, 60)
+            limiter.hit(f'ip:{i}', 1, 60)
+        self.assertEqual(len(backend), 100)
+        self.assertEqual(len(limiter._blocked), 50)
+
+
+class TestSharedBackend(unittest.TestCase):
+    """Testes do armazenamento SQLite compartilhado"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'limites.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_limit_is_shared_between_workers(self):
+        """Teste dois limitadores (workers) sobre o mesmo arquivo"""
+        worker_a = RateLimiter(SQLiteBackend(self.path))
+        worker_b = RateLimiter(SQLiteBackend(self.path))
+
+        self.assertTrue(worker_a.hit('ip:9', 2, 60).allowed)
+        self.assertTrue(worker_b.hit('ip:9', 2, 60).allowed)
+        self.assertFalse(worker_a.hit('ip:9', 2, 60).allowed)
+        self.assertFalse(worker_b.hit('ip:9', 2, 60).allowed)
+
+    def test_purge_expired(self):
+        """Teste remoção de chaves expiradas"""
+        backend = SQLiteBackend(self.path)
+        limiter = RateLimiter(backend)
+        limiter.hit('ip:curto', 1, 0.001)
+        limiter.hit('ip:longo', 1, 60)
+        time.sleep(0.01)
+        self.assertEqual(limiter.purge_expired(), 1)
+
+    def test_purge_in_batches_until_deadline(self):
+        """Teste remoção em lotes, parando no prazo"""
+        limiter = RateLimiter(SQLiteBackend(self.path))
+        for i in range(5):
+            limiter.hit(f'ip:{i}', 1, 0.001)
+        time.sleep(0.01)
+        self.assertEqual(limiter.purge_expired(deadline=time.monotonic() - 1), 0)
+        self.assertEqual(limiter.purge_expired(batch_size=2, deadline=time.monotonic() + 5), 5)
+
+
+class TestRateLimitDecorator(unittest.TestCase):
+    """Testes do decorator rate_limit"""
+
+    def test_json_requests_get_429(self):
+        """Teste resposta 429 com retry_after"""
+        app = Flask('teste_rate_limit')
+        app.config['TESTING'] = True
+
+        @app.route('/limitada')
+        @AuthDecorators.rate_limit(max_requests=2, per_seconds=60)
+        def limitada():
+            return jsonify({'ok': True})
+
+        with app.test_client() as client:
+            codigos = [client.get('/limitada', json={}).status_code for _ in range(3)]
+            resposta = client.get('/limitada', json={})
+
+        self.assertEqual(codigos, [200, 200, 429])
+        self.assertGreaterEqual(resposta.get_json()['retry_after'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,171 @@
+"""
+Testes dos Valores de Referência
+Tabela compilada por estrato, achados vetorizados, gravação da máscara e consulta indexada
+"""
+
+import unittest
+import numpy as np
+from sqlalchemy import select, text, update
+from app import app, db
+from models import Exame, ParametrosEcocardiograma, Usuario
+from modules.data_import import BulkImporter
+from modules.exams.reference_ranges import (FLAG_BITS, REFERENCE_PARAMETERS, AbnormalityService,
+                                            reference_ranges)
+from modules.maintenance.abnormality_flags import migrate_abnormality_flags
+from utils.calculations import obter_valores_referencia, validar_parametros_normais
+from tests.helpers import ExamTestCase, criar_exame
+
+NOME = 'PACIENTE REFERENCIA TESTE'
+
+
+class Valores:
+    """Parâmetros avulsos (sem ORM)"""
+
+    def __init__(self, **valores):
+        self.__dict__.update(valores)
+
+
+class TestReferenceRangeTable(unittest.TestCase):
+    """Testes da tabela compilada"""
+
+    def test_ranges_by_stratum(self):
+        """Teste faixas por sexo, faixa etária e superfície corporal"""
+        self.assertEqual(reference_ranges.ranges('Masculino', 50)['diametro_diastolico_final_ve'],
+                         {'min': 42.0, 'max': 58.0})
+        self.assertEqual(reference_ranges.ranges('Feminino', 50)['diametro_diastolico_final_ve'],
+                         {'min': 38.0, 'max': 52.0})
+        self.assertEqual(reference_ranges.ranges()['diametro_diastolico_final_ve'], {'min': 35.0, 'max': 56.0})
+        self.assertNotIn('diametro_diastolico_final_ve', reference_ranges.ranges('Masculino', 10))
+        self.assertEqual(reference_ranges.ranges('Masculino', 50)['massa_ve'], {'max': 224.0})
+        self.assertNotIn('massa_ve', reference_ranges.ranges('Masculino', 50, 1.8))
+
+    def test_lookup_is_precompiled(self):
+        """Teste consulta repetida devolve o mesmo dicionário do estrato"""
+        self.assertIs(obter_valores_referencia(70, 'Feminino', 1.7), obter_valores_referencia(80, 'Feminino', 1.9))
+        self.assertIsNot(obter_valores_referencia(70, 'Feminino'), obter_valores_referencia(70, 'Masculino'))
+
+    def test_vectorized_flags_match_single_rows(self):
+        """Teste máscara do lote igual à calculada linha a linha"""
+        rng = np.random.default_rng(7)
+        n = 300
+        sexos = rng.choice(['Masculino', 'Feminino', ''], n).tolist()
+        idades = rng.integers(5, 90, n)
+        colunas = {nome: np.where(rng.random(n) < 0.2, np.nan, rng.uniform(5, 120, n))
+                   for nome in REFERENCE_PARAMETERS + ('superficie_corporal',)}
+        colunas['superficie_corporal'] = np.where(rng.random(n) < 0.3, np.nan, rng.uniform(1.2, 2.4, n))
+
+        lote = reference_ranges.flags_many(sexos, idades, colunas)
+        for i in range(n):
+            linha = Valores(**{nome: None if np.isnan(valores[i]) else valores[i] for nome, valores in colunas.items()})
+            self.assertEqual(lote[i], reference_ranges.flags_for(linha, sexos[i], int(idades[i])))
+
+    def test_flags_and_descriptions(self):
+        """Teste achados por faixa do estrato e por limite fixo"""
+        mascara = reference_ranges.flags_for(Valores(fracao_ejecao=35.0, atrio_esquerdo=45.0), 'Feminino', 60)
+        self.assertEqual(mascara, FLAG_BITS['fe_reduzida'] | FLAG_BITS['fe_menor_40'] | FLAG_BITS['ae_dilatado'])
+        self.assertEqual(reference_ranges.describe(mascara)[0]['descricao'], 'FE < 40%')
+        self.assertEqual(reference_ranges.flags_for(Valores(fracao_ejecao=53.0), 'Masculino', 60), 0)
+        self.assertEqual(reference_ranges.flags_for(Valores(fracao_ejecao=53.0), 'Feminino', 60),
+                         FLAG_BITS['fe_reduzida'])
+
+    def test_legacy_validation_uses_table(self):
+        """Teste validação legada em mm cobre todos os parâmetros com faixa"""
+        resultados = validar_parametros_normais(
+            Valores(atrio_esquerdo=36.0, diametro_diastolico_final_ve=60.0, fracao_ejecao=60.0,
+                    pressao_sistolica_vd=40.0, superficie_corporal=None), 50, 'Masculino')
+        self.assertTrue(resultados['atrio_esquerdo']['normal'])
+        self.assertEqual(resultados['diametro_diastolico_final_ve']['referencia'], '42-58')
+        self.assertFalse(resultados['diametro_diastolico_final_ve']['normal'])
+        self.assertEqual(resultados['fracao_ejecao']['referencia'], '≥52')
+        self.assertFalse(resultados['pressao_sistolica_vd']['normal'])
+
+
+class TestAbnormalityFlags(ExamTestCase):
+    """Testes com o banco"""
+
+    NOME = NOME
+    USUARIOS = ('referencia_teste',)
+
+    def _preparar_banco(self):
+        migrate_abnormality_flags()
+
+    def _exame(self, sufixo, sexo='Feminino', **parametros):
+        return criar_exame(f'{NOME} {sufixo}', parametros, sexo=sexo)
+
+    def test_flags_stamped_on_save(self):
+        """Teste máscara gravada ao inserir e atualizar pelo ORM e ao mudar o sexo"""
+        exame = self._exame('A', fracao_ejecao=60.0, diametro_diastolico_final_ve=55.0)
+        self.assertEqual(exame.parametros.anormalidades, FLAG_BITS['ve_dilatado'])
+
+        exame.parametros.fracao_ejecao = 35.0
+        db.session.commit()
+        self.assertEqual(exame.parametros.anormalidades,
+                         FLAG_BITS['ve_dilatado'] | FLAG_BITS['fe_reduzida'] | FLAG_BITS['fe_menor_40'])
+
+        exame.sexo = 'Masculino'
+        db.session.commit()
+        gravado = db.session.execute(select(ParametrosEcocardiograma.anormalidades)
+                                     .where(ParametrosEcocardiograma.exame_id == exame.id)).scalar()
+        self.assertEqual(gravado, FLAG_BITS['fe_reduzida'] | FLAG_BITS['fe_menor_40'])
+
+    def test_bulk_import_and_backfill(self):
+        """Teste importação em lote grava a máscara e a migração preenche linhas antigas"""
+        BulkImporter().import_records([{'nome_paciente': f'{NOME} B', 'data_exame': '01/01/2025', 'idade': 70,
+                                        'sexo': 'F', 'data_nascimento': '01/01/1955', 'fracao_ejecao': 25,
+                                        'atrio_esquerdo': 50}])
+        P = ParametrosEcocardiograma
+        consulta = (select(P.anormalidades).join(Exame, Exame.id == P.exame_id)
+                    .where(Exame.nome_paciente == f'{NOME} B'))
+        esperado = reference_ranges.mask_of(['fe_reduzida', 'fe_menor_40', 'fe_menor_30', 'ae_dilatado'])
+        self.assertEqual(db.session.execute(consulta).scalar(), esperado)
+
+        db.session.execute(update(P).where(P.exame_id.in_(
+            select(Exame.id).where(Exame.nome_paciente == f'{NOME} B'))).values(anormalidades=None))
+        db.session.commit()
+        self.assertGreaterEqual(migrate_abnormality_flags()['preenchidos'], 1)
+        self.assertEqual(db.session.execute(consulta).scalar(), esperado)
+
+    def test_find_exams_by_findings(self):
+        """Teste 'FE < 40% e AE dilatado' com paginação"""
+        alvos = [self._exame(f'C{i}', fracao_ejecao=30.0 + i, atrio_esquerdo=48.0) for i in range(3)]
+        self._exame('D', fracao_ejecao=30.0, atrio_esquerdo=35.0)
+        self._exame('E', fracao_ejecao=60.0, atrio_esquerdo=48.0)
+
+        pagina = AbnormalityService.find_exams(['fe_menor_40', 'ae_dilatado'], limit=2)
+        self.assertEqual([e['id'] for e in pagina['exames']], [alvos[2].id, alvos[1].id])
+        seguinte = AbnormalityService.find_exams(['fe_menor_40', 'ae_dilatado'], limit=2, before_id=pagina['proximo'])
+        self.assertEqual([e['id'] for e in seguinte['exames']], [alvos[0].id])
+        self.assertIsNone(seguinte['proximo'])
+        self.assertIn('AE dilatado', [a['descricao'] for a in seguinte['exames'][0]['achados']])
+
+    def test_findings_query_uses_index(self):
+        """Teste plano da consulta usa o índice (anormalidades, exame_id)"""
+        mascara = reference_ranges.mask_of(['fe_menor_40', 'ae_dilatado'])
+        plano = ' '.join(str(linha[-1]) for linha in db.session.execute(text(
+            "EXPLAIN QUERY PLAN SELECT exame_id FROM parametros_ecocardiograma "
+            "WHERE anormalidades >= :m AND (anormalidades & :m) = :m"), {'m': mascara}))
+        self.assertIn('ix_parametros_anormalidades', plano)
+
+    def test_findings_api(self):
+        """Teste API por achados e achado desconhecido"""
+        alvo = self._exame('F', fracao_ejecao=28.0, atrio_esquerdo=50.0)
+        usuario = Usuario(username='referencia_teste', email='referencia@teste.com', role='user', ativo=True)
+        usuario.password_hash = 'x'
+        db.session.add(usuario)
+        db.session.commit()
+
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['_user_id'] = str(usuario.id)
+            sess['_fresh'] = True
+
+        resposta = client.get('/api/exames/anormalidades?achados=fe_menor_30,ae_dilatado')
+        self.assertEqual(resposta.status_code, 200)
+        self.assertIn(alvo.id, [e['id'] for e in resposta.get_json()['exames']])
+        resposta = client.get('/api/exames/anormalidades?achados=inexistente')
+        self.assertEqual(resposta.status_code, 400)
+        self.assertIn('fe_menor_40', resposta.get_json()['achados_disponiveis'])
+
+
+if __name__ == '__main__':
+    unittest.main()
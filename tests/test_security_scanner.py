@@ -0,0 +1,91 @@
+"""
+Testes do Verificador de Segurança de Requisições
+Equivalência com os padrões originais, cache e inspeção de query/form/JSON
+"""
+
+import random
+import re
+import unittest
+from flask import Flask
+from auth.security import SecurityManager, scan_input, MAX_SCAN_LENGTH
+
+# Padrões originais, avaliados um a um (referência)
+PADROES_SQL = [r"'.*(?:or|and).*'", r"union.*select", r"drop.*table", r"insert.*into",
+               r"delete.*from", r"update.*set", r"exec.*\(", r"script.*>", r"<.*script"]
+PADROES_XSS = [r"<script", r"javascript:", r"onload=", r"onerror=", r"onclick=",
+               r"<iframe", r"<object", r"<embed"]
+
+
+def referencia(padroes, texto):
+    return any(re.search(p, texto.lower()) for p in padroes)
+
+
+class TestScanner(unittest.TestCase):
+    """Testes do verificador compilado"""
+
+    def test_matches_original_patterns(self):
+        """Teste mesmo resultado dos padrões originais em entradas aleatórias"""
+        rng = random.Random(36)
+        pedacos = ["'", " or ", "and", "\n", "union", " select", "drop", "table", "<", "script",
+                   ">", "exec", "(", "javascript:", "onload=", "<iframe", "normal", "d'água ", "x"]
+        for _ in range(3000):
+            texto = ''.join(rng.choice(pedacos) for _ in range(rng.randint(1, 12)))
+            scan_input.cache_clear()
+            self.assertEqual(SecurityManager.detect_sql_injection_attempt(texto),
+                             referencia(PADROES_SQL, texto), repr(texto))
+            self.assertEqual(SecurityManager.detect_xss_attempt(texto),
+                             referencia(PADROES_XSS, texto), repr(texto))
+
+    def test_repeated_values_are_memoized(self):
+        """Teste valores repetidos servidos pelo cache"""
+        scan_input.cache_clear()
+        texto = 'Ventrículo esquerdo com dimensões normais. ' * 200
+        scan_input(texto)
+        scan_input(texto)
+        self.assertEqual(scan_input.cache_info().hits, 1)
+
+    def test_scan_is_capped(self):
+        """Teste inspeção limitada ao início do valor"""
+        texto = 'a' * MAX_SCAN_LENGTH + '<script>'
+        self.assertEqual(scan_input(texto), frozenset())
+        self.assertIn('xss', scan_input('<script>' + texto))
+
+    def test_cache_keys_are_capped(self):
+        """Teste valores longos com o mesmo início compartilham a entrada do cache"""
+        scan_input.cache_clear()
+        inicio = 'Ventrículo esquerdo com dimensões normais. ' * 500
+        scan_input(inicio + 'primeira versão')
+        scan_input(inicio + 'segunda versão')
+        self.assertEqual(scan_input.cache_info().hits, 1)
+
+
+class TestRequestIntegrity(unittest.TestCase):
+    """Testes da validação sobre a requisição"""
+
+    def setUp(self):
+        self.app = Flask('teste_scanner')
+
+    def _avisos(self, **kwargs):
+        with self.app.test_request_context(headers={'User-Agent': 'Mozilla/5.0 teste', 'Referer': '/x'},
+                                           **kwargs):
+            from flask import request
+            return SecurityManager.validate_request_integrity(request)[1]
+
+    def test_query_form_and_json_are_scanned(self):
+        """Teste campos da query, formulário e JSON"""
+        avisos = self._avisos(method='POST', query_string={'q': "x' or '1"},
+                              data={'conclusao': '<script>alert(1)</script>'})
+        self.assertTrue(any("'q'" in a and 'SQL' in a for a in avisos))
+        self.assertTrue(any("'conclusao'" in a and 'XSS' in a for a in avisos))
+
+        avisos = self._avisos(method='POST', json={'laudo': {'textos': ['ok', 'javascript:alert(1)']}})
+        self.assertTrue(any("'laudo.textos[1]'" in a for a in avisos))
+
+    def test_clean_laudo_has_no_warnings(self):
+        """Teste laudo comum sem alertas"""
+        laudo = 'Átrio esquerdo de dimensões normais. Função sistólica preservada. ' * 300
+        self.assertEqual(self._avisos(method='POST', data={'conclusao': laudo}), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
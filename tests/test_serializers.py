@@ -0,0 +1,93 @@
+"""
+Testes dos Serializadores de Exame
+Registro de campos, conversão de entrada e consulta somente de colunas
+"""
+
+import unittest
+from app import app, db
+from models import Exame, ParametrosEcocardiograma, LaudoEcocardiograma
+from modules.exams.serializers import (exam_clone_serializer, parameter_serializer,
+                                       laudo_serializer, latest_exam_payload)
+
+
+class TestFieldRegistry(unittest.TestCase):
+    """Testes do registro de campos"""
+
+    def test_parameter_fields_from_schema(self):
+        """Teste registro com os 32 parâmetros, sem colunas de controle"""
+        self.assertEqual(len(parameter_serializer.names), 32)
+        self.assertNotIn('exame_id', parameter_serializer.names)
+        self.assertIn('pressao_sistolica_vd', parameter_serializer.names)
+
+    def test_decode_coerces_and_skips_invalid(self):
+        """Teste conversão por tipo de coluna"""
+        valores = parameter_serializer.decode({
+            'peso': '72.5',
+            'frequencia_cardiaca': '68',
+            'altura': '',
+            'fracao_ejecao': 'abc',
+            'campo_inexistente': 1
+        })
+        self.assertEqual(valores, {'peso': 72.5, 'frequencia_cardiaca': 68})
+
+    def test_laudo_decode_keeps_empty_text(self):
+        """Teste laudo com campos vazios gravados como texto vazio"""
+        valores = laudo_serializer.decode({'conclusao': None, 'recomendacoes': 'Retorno'})
+        self.assertEqual(valores, {'conclusao': '', 'recomendacoes': 'Retorno'})
+
+    def test_encode_matches_attributes(self):
+        """Teste codificação compilada igual ao acesso por atributo"""
+        parametros = ParametrosEcocardiograma(peso=60.0, fracao_ejecao=65.0)
+        dados = parameter_serializer.encode(parametros)
+        self.assertEqual(dados['peso'], 60.0)
+        self.assertEqual(dados['fracao_ejecao'], 65.0)
+        self.assertIsNone(dados['massa_ve'])
+
+
+class TestLatestExamPayload(unittest.TestCase):
+    """Testes da consulta somente de colunas"""
+
+    def setUp(self):
+        """Criar dois exames do mesmo paciente"""
+        app.config['TESTING'] = True
+        self.ids = []
+
+        with app.app_context():
+            db.create_all()
+            for data_exame, peso in (('01/01/2024', 70.0), ('01/01/2025', 68.0)):
+                exame = Exame(nome_paciente='Paciente Serializador', data_nascimento='02/02/1960',
+                              idade=64, sexo='Masculino', data_exame=data_exame, indicacao='Controle')
+                db.session.add(exame)
+                db.session.flush()
+                db.session.add(ParametrosEcocardiograma(exame_id=exame.id, peso=peso))
+                db.session.add(LaudoEcocardiograma(exame_id=exame.id, conclusao=f'Laudo {data_exame}'))
+                db.session.commit()
+                self.ids.append(exame.id)
+
+    def tearDown(self):
+        """Remover exames de teste"""
+        with app.app_context():
+            for exame_id in self.ids:
+                exame = db.session.get(Exame, exame_id)
+                if exame:
+                    db.session.delete(exame)
+            db.session.commit()
+            db.session.remove()
+
+    def test_payload_is_latest_exam(self):
+        """Teste último exame com parâmetros e laudo"""
+        with app.app_context():
+            dados = latest_exam_payload('Paciente Serializador')
+
+        self.assertEqual(set(dados['exame']), set(exam_clone_serializer.names))
+        self.assertEqual(dados['parametros']['peso'], 68.0)
+        self.assertEqual(dados['laudos']['conclusao'], 'Laudo 01/01/2025')
+
+    def test_unknown_patient(self):
+        """Teste paciente sem exames"""
+        with app.app_context():
+            self.assertIsNone(latest_exam_payload('Paciente Inexistente'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+"""
+Testes do Cache de Sessão
+Principal sem consulta ao banco, instantâneo na sessão e revogação entre workers
+"""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from flask import session
+from sqlalchemy import event
+from app import app, db, load_user
+from models import Usuario
+from utils.session_cache import SESSION_KEY, RevocationGenerations, SessionCache, session_cache
+
+
+class TestSessionCache(unittest.TestCase):
+    """Testes do load_user com cache"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.generations_path = os.path.join(self.tmpdir, 'geracoes.json')
+        self._original_generations = session_cache._generations
+        session_cache._generations = RevocationGenerations(self.generations_path)
+        session_cache.clear()
+
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+        Usuario.query.filter(Usuario.username.like('cache_teste%')).delete(synchronize_session=False)
+        usuario = Usuario(username='cache_teste', email='cache_teste@teste.com', role='user', ativo=True)
+        usuario.password_hash = 'x'
+        db.session.add(usuario)
+        db.session.commit()
+        self.user_id = usuario.id
+
+        self.queries = []
+        event.listen(db.engine, 'before_cursor_execute', self._count)
+
+    def tearDown(self):
+        event.remove(db.engine, 'before_cursor_execute', self._count)
+        Usuario.query.filter(Usuario.username.like('cache_teste%')).delete(synchronize_session=False)
+        db.session.commit()
+        db.session.remove()
+        self.app_context.pop()
+        session_cache.clear()
+        session_cache._generations = self._original_generations
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def _count(self, conn, cursor, statement, *args):
+        self.queries.append(statement)
+
+    def test_cached_load_does_not_query(self):
+        """Teste segunda requisição autenticada sem consulta"""
+        with app.test_request_context('/'):
+            principal = load_user(str(self.user_id))
+            self.assertEqual(principal.username, 'cache_teste')
+            self.assertEqual(len(self.queries), 1)
+
+            self.queries.clear()
+            principal = load_user(str(self.user_id))
+            self.assertEqual(self.queries, [])
+            self.assertFalse(principal.is_admin())
+            self.assertTrue(principal.is_authenticated)
+            self.assertEqual(principal.get_id(), str(self.user_id))
+
+    def test_session_snapshot_serves_cold_worker(self):
+        """Teste worker sem o usuário no LRU usa o instantâneo da sessão"""
+        with app.test_request_context('/'):
+            load_user(str(self.user_id))
+            snapshot = dict(session[SESSION_KEY])
+
+        session_cache.clear()
+        self.queries.clear()
+        with app.test_request_context('/'):
+            session[SESSION_KEY] = snapshot
+            principal = load_user(str(self.user_id))
+            self.assertEqual(principal.username, 'cache_teste')
+            self.assertEqual(self.queries, [])
+
+    def test_invalidate_reloads_changes(self):
+        """Teste edição do usuário visível na requisição seguinte"""
+        with app.test_request_context('/'):
+            load_user(str(self.user_id))
+            usuario = db.session.get(Usuario, self.user_id)
+            usuario.role = 'admin'
+            db.session.commit()
+            session_cache.invalidate(self.user_id)
+
+            self.queries.clear()
+            principal = load_user(str(self.user_id))
+            self.assertTrue(principal.is_admin())
+            self.assertEqual(len(self.queries), 1)
+
+    def test_deleted_user_is_logged_out(self):
+        """Teste usuário excluído não é mais carregado"""
+        with app.test_request_context('/'):
+            load_user(str(self.user_id))
+            db.session.delete(db.session.get(Usuario, self.user_id))
+            db.session.commit()
+            session_cache.invalidate(self.user_id)
+            self.assertIsNone(load_user(str(self.user_id)))
+
+    def test_revocation_reaches_other_workers(self):
+        """Teste geração compartilhada invalida o cache de outro worker"""
+        outro_worker = SessionCache(generations=RevocationGenerations(self.generations_path))
+        loader_calls = []
+
+        def loader(uid):
+            loader_calls.append(uid)
+            return db.session.get(Usuario, uid)
+
+        outro_worker.load(self.user_id, loader)
+        outro_worker.load(self.user_id, loader)
+        self.assertEqual(len(loader_calls), 1)
+
+        session_cache.invalidate(self.user_id)
+        outro_worker.load(self.user_id, loader)
+        self.assertEqual(len(loader_calls), 2)
+
+    def test_entries_expire_after_ttl(self):
+        """Teste TTL curto limita a defasagem"""
+        app.config['SESSION_CACHE_TTL'] = 0.05
+        try:
+            with app.test_request_context('/'):
+                load_user(str(self.user_id))
+                time.sleep(0.1)
+                self.queries.clear()
+                load_user(str(self.user_id))
+                self.assertEqual(len(self.queries), 1)
+        finally:
+            app.config.pop('SESSION_CACHE_TTL')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,164 @@
+"""
+Testes do Índice de Similaridade
+Vizinhos por força bruta e KD-tree, atualização incremental e API de exames semelhantes
+"""
+
+import unittest
+import numpy as np
+from app import app, db
+from models import ParametrosEcocardiograma, Usuario
+from modules.analytics.similarity_index import FEATURE_COLUMNS, SimilarityIndex, cKDTree
+from modules.core.exceptions import ValidationError
+from tests.helpers import ExamTestCase, criar_exame
+
+NOME = 'PACIENTE SIMILARIDADE TESTE'
+
+
+class TestSimilarityIndex(ExamTestCase):
+    """Testes com o banco"""
+
+    NOME = NOME
+    USUARIOS = ('similaridade_teste',)
+
+    def setUp(self):
+        super().setUp()
+        self.indice = SimilarityIndex()
+
+    def _preparar_banco(self):
+        with db.engine.begin() as conn:
+            for indice in ParametrosEcocardiograma.__table__.indexes:
+                indice.create(conn, checkfirst=True)
+
+    def _exame(self, sufixo, conclusao=None, **parametros):
+        return criar_exame(f'{NOME} {sufixo}', parametros, {'conclusao': conclusao} if conclusao else None,
+                           sexo='Masculino')
+
+    def _popular(self):
+        normal = dict(diametro_diastolico_final_ve=48.0, diametro_sistolico_final=30.0,
+                      espessura_diastolica_septo=9.0, espessura_diastolica_ppve=9.0, atrio_esquerdo=35.0,
+                      fracao_ejecao=65.0, massa_ve=150.0)
+        dilatado = dict(diametro_diastolico_final_ve=68.0, diametro_sistolico_final=58.0,
+                        espessura_diastolica_septo=8.0, espessura_diastolica_ppve=8.0, atrio_esquerdo=50.0,
+                        fracao_ejecao=28.0, massa_ve=290.0)
+        return {
+            'normal': self._exame('A', 'Exame normal', **normal),
+            'normal2': self._exame('B', 'Função preservada', **{**normal, 'fracao_ejecao': 63.0}),
+            'dilatado': self._exame('C', 'Cardiomiopatia dilatada', **dilatado),
+            'dilatado2': self._exame('D', 'Disfunção sistólica importante', **{**dilatado, 'massa_ve': 280.0}),
+            'vazio': self._exame('E', fracao_ejecao=60.0),
+        }
+
+    def test_nearest_matches_exact_distances(self):
+        """Teste força bruta por produto escalar confere com a distância euclidiana"""
+        exames = self._popular()
+        self.indice.rebuild()
+        consulta = self.indice.vector_for(exames['dilatado'].id)
+        vizinhos = self.indice.nearest(consulta, 10)
+
+        esperadas = np.sqrt(((self.indice._vectors - consulta) ** 2).sum(axis=1))
+        self.assertEqual(len(vizinhos), 4)
+        self.assertEqual([exame_id for exame_id, _ in vizinhos][:2],
+                         [exames['dilatado'].id, exames['dilatado2'].id])
+        self.assertTrue(np.allclose(sorted(d for _, d in vizinhos), np.sort(esperadas), atol=1e-3))
+
+    def test_similar_exams_with_conclusions(self):
+        """Teste exame semelhante com conclusão; exame sem medidas suficientes não é indexado"""
+        exames = self._popular()
+        similares = self.indice.similar_to_exam(exames['normal'].id, k=2)
+
+        self.assertEqual(len(similares), 2)
+        self.assertEqual(similares[0]['exame_id'], exames['normal2'].id)
+        self.assertEqual(similares[0]['conclusao'], 'Função preservada')
+        self.assertEqual(similares[0]['parametros']['fracao_ejecao'], 63.0)
+        self.assertNotIn(exames['normal'].id, [s['exame_id'] for s in similares])
+        self.assertIsNone(self.indice.similar_to_exam(exames['vazio'].id))
+
+    def test_incremental_update_and_deletion(self):
+        """Teste gravação posterior entra pelo buffer e exclusão some do resultado"""
+        exames = self._popular()
+        self.indice.rebuild()
+
+        exames['normal2'].parametros.fracao_ejecao = 25.0
+        exames['normal2'].parametros.diametro_diastolico_final_ve = 69.0
+        exames['normal2'].parametros.diametro_sistolico_final = 59.0
+        exames['normal2'].parametros.atrio_esquerdo = 51.0
+        exames['normal2'].parametros.massa_ve = 295.0
+        novo = self._exame('F', 'Novo exame dilatado', diametro_diastolico_final_ve=67.0,
+                           diametro_sistolico_final=57.0, fracao_ejecao=29.0, atrio_esquerdo=49.0,
+                           massa_ve=285.0, espessura_diastolica_septo=8.0, espessura_diastolica_ppve=8.0)
+        db.session.delete(exames['dilatado2'])
+        db.session.commit()
+
+        self.assertGreaterEqual(self.indice.sync(), 2)
+        self.assertEqual(self.indice.get_status()['substituidos'], 1)
+        similares = self.indice.similar_to_exam(exames['dilatado'].id, k=3)
+        ids = [s['exame_id'] for s in similares]
+        self.assertEqual(set(ids[:2]), {novo.id, exames['normal2'].id})
+        self.assertNotIn(exames['dilatado2'].id, ids)
+
+    def test_rebuild_when_buffer_overflows(self):
+        """Teste reconstrução da base quando o buffer passa do limite"""
+        exames = self._popular()
+        indice = SimilarityIndex(max_pending=1)
+        indice.rebuild()
+        for chave in ('normal', 'dilatado'):
+            exames[chave].parametros.massa_ve += 1
+        db.session.commit()
+
+        indice.sync()
+        self.assertEqual(indice.get_status()['pendentes'], 0)
+        self.assertEqual(indice.get_status()['vetores'], 4)
+
+    def test_query_by_partial_values(self):
+        """Teste consulta com medidas não gravadas considera só as informadas"""
+        exames = self._popular()
+        similares = self.indice.similar_to_values(
+            {'fracao_ejecao': 30, 'diametro_diastolico_final_ve': 66, 'atrio_esquerdo': '49'}, k=2)
+        self.assertEqual({s['exame_id'] for s in similares}, {exames['dilatado'].id, exames['dilatado2'].id})
+
+        with self.assertRaises(ValidationError):
+            self.indice.similar_to_values({'fracao_ejecao': 30})
+        with self.assertRaises(ValidationError):
+            self.indice.similar_to_values({'fracao_ejecao': 30, 'altura': 170, 'massa_ve': 100})
+        with self.assertRaises(ValidationError):
+            self.indice.similar_to_values({'fracao_ejecao': 'x', 'atrio_esquerdo': 1, 'massa_ve': 100})
+
+    @unittest.skipUnless(cKDTree, 'SciPy não instalado')
+    def test_tree_matches_brute_force(self):
+        """Teste KD-tree devolve os mesmos vizinhos da força bruta"""
+        exames = self._popular()
+        arvore = SimilarityIndex(tree_threshold=1)
+        arvore.rebuild()
+        self.indice.rebuild()
+        consulta = self.indice.vector_for(exames['normal'].id)
+        self.assertTrue(arvore.get_status()['arvore'])
+        self.assertEqual([i for i, _ in arvore.nearest(consulta, 3)], [i for i, _ in self.indice.nearest(consulta, 3)])
+
+    def test_similar_api(self):
+        """Teste API por exame e por medidas informadas"""
+        exames = self._popular()
+        usuario = Usuario(username='similaridade_teste', email='similaridade@teste.com', role='user', ativo=True)
+        usuario.password_hash = 'x'
+        db.session.add(usuario)
+        db.session.commit()
+
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['_user_id'] = str(usuario.id)
+            sess['_fresh'] = True
+
+        resposta = client.get(f"/api/exames/{exames['dilatado'].id}/similares?k=1")
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.get_json()['similares'][0]['exame_id'], exames['dilatado2'].id)
+        self.assertEqual(client.get(f"/api/exames/{exames['vazio'].id}/similares").status_code, 422)
+        self.assertEqual(client.get('/api/exames/999999999/similares').status_code, 404)
+
+        resposta = client.post('/api/exames/similares', json={
+            'parametros': {coluna: 1 for coluna in FEATURE_COLUMNS[:3]}, 'k': 2})
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(len(resposta.get_json()['similares']), 2)
+        self.assertEqual(client.post('/api/exames/similares', json={'parametros': {}}).status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
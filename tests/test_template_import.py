@@ -0,0 +1,89 @@
+"""
+Testes da Importação de Templates
+Mescla por diagnóstico, desativação dos ausentes e atomicidade
+"""
+
+import unittest
+from app import app, db
+from models import LaudoTemplate
+from modules.data_import import TemplateImporter
+
+PREFIXO = 'Template Importacao'
+
+
+def template(sufixo, conclusao='Conclusão'):
+    return {'ID': 0, 'Categoria': 'Adulto', 'Diagnóstico': f'{PREFIXO} {sufixo}',
+            'Modo_M_Bidimensional': 'Modo M', 'Doppler_Convencional': 'Doppler',
+            'Doppler_Tecidual': 'Tecidual', 'Conclusão': conclusao}
+
+
+class TestTemplateImporter(unittest.TestCase):
+    """Testes do importador via tabela de sombra"""
+
+    def setUp(self):
+        app.config['TESTING'] = True
+        with app.app_context():
+            db.create_all()
+
+    def tearDown(self):
+        """Remover templates de teste"""
+        with app.app_context():
+            LaudoTemplate.query.filter(LaudoTemplate.diagnostico.like(f'{PREFIXO}%')).delete(
+                synchronize_session=False)
+            db.session.commit()
+            db.session.remove()
+
+    def _catalogo_atual(self):
+        return [{'categoria': t.categoria, 'diagnostico': t.diagnostico,
+                 'modo_m_bidimensional': t.modo_m_bidimensional,
+                 'doppler_convencional': t.doppler_convencional,
+                 'doppler_tecidual': t.doppler_tecidual, 'conclusao': t.conclusao}
+                for t in LaudoTemplate.query.filter_by(ativo=True).all()]
+
+    def test_upsert_by_diagnostico(self):
+        """Teste reimportação atualiza sem duplicar"""
+        with app.app_context():
+            importer = TemplateImporter(batch_size=2)
+            stats = importer.import_records([template(i) for i in range(5)])
+            self.assertEqual((stats['inseridos'], stats['lotes']), (5, 3))
+
+            stats = importer.import_records([template(0, 'Nova conclusão'), template(5), {'Categoria': 'Adulto'}])
+            self.assertEqual((stats['inseridos'], stats['atualizados'], stats['invalidos']), (1, 1, 1))
+
+            registros = LaudoTemplate.query.filter_by(diagnostico=f'{PREFIXO} 0').all()
+            self.assertEqual(len(registros), 1)
+            self.assertEqual(registros[0].conclusao, 'Nova conclusão')
+
+    def test_deactivate_missing(self):
+        """Teste templates ausentes da fonte ficam inativos"""
+        with app.app_context():
+            existentes = self._catalogo_atual()
+            TemplateImporter().import_records(existentes + [template('A'), template('B')])
+
+            stats = TemplateImporter(deactivate_missing=True).import_records(existentes + [template('A')])
+            self.assertEqual(stats['desativados'], 1)
+
+            self.assertFalse(LaudoTemplate.query.filter_by(diagnostico=f'{PREFIXO} B').one().ativo)
+            self.assertTrue(LaudoTemplate.query.filter_by(diagnostico=f'{PREFIXO} A').one().ativo)
+
+    def test_failure_keeps_previous_catalog(self):
+        """Teste falha no meio da carga não altera o catálogo"""
+        with app.app_context():
+            TemplateImporter().import_records([template('Original', 'Antiga')])
+
+            def fonte_com_falha():
+                yield template('Original', 'Alterada')
+                yield template('Novo')
+                raise IOError('leitura interrompida')
+
+            with self.assertRaises(IOError):
+                TemplateImporter(batch_size=1, deactivate_missing=True).import_records(fonte_com_falha())
+
+            db.session.expire_all()
+            original = LaudoTemplate.query.filter_by(diagnostico=f'{PREFIXO} Original').one()
+            self.assertEqual(original.conclusao, 'Antiga')
+            self.assertEqual(LaudoTemplate.query.filter_by(diagnostico=f'{PREFIXO} Novo').count(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+"""
+Testes do Ciclo de Vida das Sessões com Workers Concorrentes
+Cada requisição (thread ou greenlet) usa sua própria sessão e devolve a
+conexão ao pool ao terminar
+"""
+
+import threading
+import unittest
+from sqlalchemy import text
+from app import app, db
+
+CONCORRENCIA = 4
+
+
+class TestConcurrentSessions(unittest.TestCase):
+    """Testes de sessões por contexto de aplicação"""
+
+    def setUp(self):
+        app.config['TESTING'] = True
+
+    def test_sessions_are_scoped_per_context(self):
+        """Teste contextos simultâneos recebem sessões distintas"""
+        sessoes = {}
+        antes, depois = threading.Barrier(CONCORRENCIA), threading.Barrier(CONCORRENCIA)
+
+        def requisicao(indice):
+            with app.app_context():
+                antes.wait()
+                db.session.execute(text('SELECT 1'))
+                sessoes[indice] = id(db.session())
+                depois.wait()
+
+        threads = [threading.Thread(target=requisicao, args=(i,)) for i in range(CONCORRENCIA)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(len(set(sessoes.values())), CONCORRENCIA)
+
+    def test_connections_return_to_pool(self):
+        """Teste requisições concorrentes não retêm conexões"""
+        status = []
+
+        def requisicao():
+            with app.test_client() as client:
+                status.append(client.get('/health').status_code)
+
+        threads = [threading.Thread(target=requisicao) for _ in range(CONCORRENCIA * 2)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(len(status), CONCORRENCIA * 2)
+        self.assertTrue(all(s < 500 for s in status))
+        with app.app_context():
+            self.assertEqual(db.engine.pool.checkedout(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+"""
+Thread Periódica por Worker - Base do amostrador de saúde e do zelador
+
+Cada processo do gunicorn nasce por fork, então a thread é iniciada na
+primeira requisição do worker (e não na importação). Os trabalhos
+registrados têm intervalos próprios; o loop executa os vencidos e dorme
+até o próximo, acordando imediatamente em stop().
+"""
+
+import os
+import time
+import logging
+import threading
+
+logger = logging.getLogger('background_worker')
+
+
+class BackgroundWorker:
+    """Ciclo de vida da thread e agenda dos trabalhos periódicos
+
+    Subclasses definem `thread_name`, `min_wait` e `_run_job`, que executa
+    um trabalho e retorna o registro do resultado.
+    """
+
+    thread_name = 'background-worker'
+    min_wait = 1.0
+    logger = logger
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._jobs = {}
+        self._next_run = {}
+        self._app = None
+        self._thread = None
+        self._pid = None
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+
+    def _register(self, name, func, interval, needs_app_context, first_run):
+        """Agenda um trabalho; retorna o dicionário mantido para ele"""
+        self._jobs[name] = {
+            'func': func,
+            'interval': float(interval or self.interval),
+            'needs_app_context': needs_app_context
+        }
+        self._next_run[name] = first_run(self._jobs[name]['interval'])
+        return self._jobs[name]
+
+    def init_app(self, app):
+        """Associa a aplicação e inicia a thread na primeira requisição do worker"""
+        self._app = app
+        app.before_request(self._ensure_started)
+
+    def _ensure_started(self):
+        """Garante uma thread por processo (workers do gunicorn nascem por fork)"""
+        if self._pid != os.getpid():
+            self.start()
+
+    def start(self):
+        """Inicia a thread"""
+        with self._lock:
+            if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._loop, name=self.thread_name, daemon=True)
+            self._thread.start()
+        self.logger.info(self._started_message())
+
+    def _started_message(self):
+        return f"Thread '{self.thread_name}' iniciada"
+
+    def stop(self):
+        """Para a thread"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        self._thread = None
+        self._pid = None
+
+    def is_running(self):
+        """Indica se a thread está ativa neste processo"""
+        return bool(self._thread and self._thread.is_alive() and self._pid == os.getpid())
+
+    def _loop(self):
+        """Loop principal: executa os trabalhos vencidos e dorme até o próximo"""
+        while not self._stop_event.is_set():
+            try:
+                self._run_due(force=False)
+            except Exception as e:
+                self.logger.error(f"Erro na thread '{self.thread_name}': {e}")
+
+            now = time.monotonic()
+            wait = min([self._next_run[name] - now for name in self._jobs] or [self.interval])
+            self._stop_event.wait(max(wait, self.min_wait))
+
+    def _run_due(self, force):
+        """Executa os trabalhos vencidos (ou todos, se force=True)"""
+        now = time.monotonic()
+        results = {}
+        for name, job in list(self._jobs.items()):
+            if force or now >= self._next_run[name]:
+                results[name] = self._run_job(name, job)
+                self._next_run[name] = time.monotonic() + self._next_interval(job['interval'])
+        return results
+
+    def _next_interval(self, interval):
+        return interval
+
+    def _call(self, job, *args):
+        """Chama o trabalho, dentro do contexto da aplicação quando necessário"""
+        if job['needs_app_context'] and self._app is not None:
+            with self._app.app_context():
+                try:
+                    return job['func'](*args)
+                finally:
+                    from app import db
+                    db.session.remove()
+        return job['func'](*args)
+
+    def _run_job(self, name, job):
+        raise NotImplementedError
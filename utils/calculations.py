@@ -252,38 +252,28 @@ def validar_parametros_normais(parametros, idade=None, sexo=None):
     """
     Valida se os parâmetros estão dentro dos valores de referência
     
+    Usa a tabela compilada por sexo, faixa etária e superfície corporal
+    (modules.exams.reference_ranges) para todos os parâmetros com faixa.
+    
     Returns:
         dict: Dicionário com os resultados da validação
     """
     resultados = {}
     
     try:
-        # Valores de referência (podem variar com idade e sexo)
-        referencias = obter_valores_referencia(idade, sexo)
-        
-        # Validar cada parâmetro
-        if parametros.frequencia_cardiaca:
-            resultados['frequencia_cardiaca'] = validar_faixa(
-                parametros.frequencia_cardiaca, 
-                referencias['frequencia_cardiaca']['min'], 
-                referencias['frequencia_cardiaca']['max']
-            )
-        
-        if parametros.atrio_esquerdo:
-            resultados['atrio_esquerdo'] = validar_faixa(
-                parametros.atrio_esquerdo,
-                referencias['atrio_esquerdo']['min'],
-                referencias['atrio_esquerdo']['max']
-            )
+        referencias = obter_valores_referencia(idade, sexo, getattr(parametros, 'superficie_corporal', None))
         
-        if parametros.fracao_ejecao:
-            resultados['fracao_ejecao'] = {
-                'normal': parametros.fracao_ejecao >= referencias['fracao_ejecao']['min'],
-                'valor': parametros.fracao_ejecao,
-                'referencia': f"≥{referencias['fracao_ejecao']['min']}%"
-            }
-        
-        # Adicionar mais validações conforme necessário
+        for nome, faixa in referencias.items():
+            valor = getattr(parametros, nome, None)
+            if valor is None:
+                continue
+            minimo, maximo = faixa.get('min'), faixa.get('max')
+            if minimo is not None and maximo is not None:
+                resultados[nome] = validar_faixa(valor, minimo, maximo)
+            elif minimo is not None:
+                resultados[nome] = {'normal': valor >= minimo, 'valor': valor, 'referencia': f"≥{minimo:g}"}
+            else:
+                resultados[nome] = {'normal': valor <= maximo, 'valor': valor, 'referencia': f"≤{maximo:g}"}
         
     except Exception as e:
         logger.error(f"Erro na validação de parâmetros: {e}")
@@ -297,44 +287,18 @@ def validar_faixa(valor, minimo, maximo):
     return {
         'normal': minimo <= valor <= maximo,
         'valor': valor,
-        'referencia': f"{minimo}-{maximo}"
+        'referencia': f"{minimo:g}-{maximo:g}"
     }
 
-def obter_valores_referencia(idade=None, sexo=None):
-    """
-    Obtém valores de referência baseados em idade e sexo
-    """
-    # Valores de referência padrão para adultos
-    referencias = {
-        'frequencia_cardiaca': {'min': 60, 'max': 100},
-        'atrio_esquerdo': {'min': 2.7, 'max': 3.8},
-        'raiz_aorta': {'min': 2.1, 'max': 3.4},
-        'diametro_diastolico_final_ve': {'min': 3.5, 'max': 5.6},
-        'diametro_sistolico_final': {'min': 2.1, 'max': 4.0},
-        'percentual_encurtamento': {'min': 25, 'max': 45},
-        'fracao_ejecao': {'min': 55},
-        'espessura_diastolica_septo': {'min': 0.6, 'max': 1.1},
-        'espessura_diastolica_ppve': {'min': 0.6, 'max': 1.1},
-        'relacao_e_a': {'min': 0.8, 'max': 1.5},
-        'pressao_sistolica_vd': {'max': 35}
-    }
-    
-    # Ajustes baseados em sexo
-    if sexo == 'Masculino':
-        referencias['indice_massa_ve'] = {'max': 115}
-    elif sexo == 'Feminino':
-        referencias['indice_massa_ve'] = {'max': 95}
-    
-    # Ajustes baseados em idade (implementar conforme necessário)
-    if idade:
-        if idade > 65:
-            # Ajustes para idosos
-            referencias['relacao_e_a']['min'] = 0.7
-        elif idade < 18:
-            # Ajustes para crianças/adolescentes
-            pass
+def obter_valores_referencia(idade=None, sexo=None, superficie_corporal=None):
+    """
+    Obtém valores de referência baseados em idade, sexo e superfície corporal
     
-    return referencias
+    As faixas vêm da tabela compilada uma única vez na inicialização; o
+    dicionário devolvido é compartilhado entre chamadas (somente leitura).
+    """
+    from modules.exams.reference_ranges import reference_ranges
+    return reference_ranges.ranges(sexo, idade, superficie_corporal)
 
 def calcular_z_score(valor, media_populacional, desvio_padrao):
     """
@@ -1,14 +1,21 @@
 """
 Monitor de Saúde do Sistema
 Monitoramento contínuo da integridade do banco de dados
+
+As sondas (banco, sistema operacional, aplicação) rodam em uma thread de
+amostragem em segundo plano; as rotas apenas leem o último snapshot do
+buffer circular, sem bloquear a requisição.
 """
 
 import os
 import sqlite3
 import logging
+import time
+from collections import deque
 from datetime import datetime, timedelta
 from pathlib import Path
-from utils.backup_security import create_manual_backup
+
+from utils.background_worker import BackgroundWorker
 
 logger = logging.getLogger('health_monitor')
 
@@ -126,6 +133,7 @@ class HealthMonitor:
         
         if needs_backup:
             try:
+                from utils.backup_security import create_manual_backup
                 backup_path = create_manual_backup()
                 if backup_path:
                     logger.warning(f"Backup de emergência criado devido a problemas: {backup_path}")
@@ -165,11 +173,172 @@ class HealthMonitor:
         
         return stats
 
+class HealthSampler(BackgroundWorker):
+    """
+    Amostrador de sondas de saúde em segundo plano
+
+    Cada sonda tem seu próprio intervalo. Os resultados vão para um buffer
+    circular compartilhado entre as threads do worker e o último resultado
+    de cada sonda fica disponível para leitura imediata.
+    """
+
+    thread_name = 'health-sampler'
+    min_wait = 0.5
+    logger = logger
+
+    def __init__(self, interval=None, capacity=120):
+        super().__init__(float(interval or os.environ.get('HEALTH_SAMPLE_INTERVAL', '30')))
+        self.buffer = deque(maxlen=capacity)
+        self._latest = {}
+
+    def register_probe(self, name, func, interval=None, needs_app_context=False):
+        """Registra uma sonda executada periodicamente pelo amostrador"""
+        self._register(name, func, interval, needs_app_context, first_run=lambda intervalo: 0.0)
+
+    def _started_message(self):
+        return f"Amostrador de saúde iniciado (intervalo padrão {self.interval:.0f}s)"
+
+    def run_due_probes(self, force=False):
+        """Executa as sondas cujo intervalo venceu (ou todas, se force=True)"""
+        self._run_due(force)
+
+    def _run_job(self, name, probe):
+        """Executa uma sonda e grava o resultado no buffer"""
+        started = time.perf_counter()
+        try:
+            data = self._call(probe)
+            status = 'ok'
+        except Exception as e:
+            data = {'error': str(e)}
+            status = 'error'
+            logger.warning(f"Sonda de saúde '{name}' falhou: {e}")
+
+        entry = {
+            'probe': name,
+            'status': status,
+            'data': data,
+            'sampled_at': datetime.now().isoformat(),
+            'sampled_monotonic': time.monotonic(),
+            'duration_ms': round((time.perf_counter() - started) * 1000, 2)
+        }
+        self.buffer.append(entry)
+        self._latest[name] = entry
+        return entry
+
+    def latest(self, name=None):
+        """Último resultado de uma sonda, ou de todas (cópia rasa)"""
+        if name is not None:
+            return self._latest.get(name)
+        return dict(self._latest)
+
+    def age_seconds(self, name):
+        """Idade, em segundos, do último resultado de uma sonda"""
+        entry = self._latest.get(name)
+        if not entry:
+            return None
+        return round(time.monotonic() - entry['sampled_monotonic'], 1)
+
+    def history(self, name=None, limit=None):
+        """Resultados recentes do buffer, do mais antigo para o mais novo"""
+        entries = [e for e in list(self.buffer) if name is None or e['probe'] == name]
+        if limit:
+            entries = entries[-limit:]
+        return entries
+
+    def get_status(self):
+        """Retorna status do amostrador"""
+        return {
+            'status': 'running' if self.is_running() else 'stopped',
+            'probes': {
+                name: {
+                    'interval': probe['interval'],
+                    'last_status': (self._latest.get(name) or {}).get('status'),
+                    'age_seconds': self.age_seconds(name)
+                }
+                for name, probe in self._jobs.items()
+            },
+            'buffer_size': len(self.buffer),
+            'buffer_capacity': self.buffer.maxlen
+        }
+
+
+def sample_system_metrics():
+    """Métricas do sistema operacional sem bloquear (psutil opcional)"""
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+
+    if psutil is not None:
+        # interval=None compara com a chamada anterior em vez de dormir 1s
+        memory = psutil.virtual_memory()
+        disk = psutil.disk_usage('/')
+        return {
+            'cpu': {
+                'usage_percent': psutil.cpu_percent(interval=None),
+                'core_count': psutil.cpu_count()
+            },
+            'memory': {
+                'total_gb': round(memory.total / (1024**3), 2),
+                'used_gb': round(memory.used / (1024**3), 2),
+                'usage_percent': memory.percent
+            },
+            'disk': {
+                'total_gb': round(disk.total / (1024**3), 2),
+                'used_gb': round(disk.used / (1024**3), 2),
+                'usage_percent': round((disk.used / disk.total) * 100, 2)
+            }
+        }
+
+    disk_usage = os.statvfs('/')
+    total = disk_usage.f_blocks * disk_usage.f_frsize
+    free = disk_usage.f_bavail * disk_usage.f_frsize
+    load_1m = os.getloadavg()[0] if hasattr(os, 'getloadavg') else 0
+    cores = os.cpu_count() or 1
+    return {
+        'cpu': {
+            'usage_percent': round(min(load_1m / cores, 1.0) * 100, 1),
+            'core_count': cores
+        },
+        'memory': {'total_gb': 0, 'used_gb': 0, 'usage_percent': 0},
+        'disk': {
+            'total_gb': round(total / (1024**3), 2),
+            'used_gb': round((total - free) / (1024**3), 2),
+            'usage_percent': round(((total - free) / total) * 100, 2) if total else 0
+        }
+    }
+
+
 # Instância global
 health_monitor = HealthMonitor()
+health_sampler = HealthSampler()
+
+def init_health_sampler(app):
+    """Registra as sondas padrão e associa o amostrador à aplicação"""
+    from modules.maintenance.system_service import SystemService
+
+    system_interval = float(os.environ.get('HEALTH_SYSTEM_INTERVAL', '15'))
+    database_interval = float(os.environ.get('HEALTH_DATABASE_INTERVAL', '60'))
+
+    health_sampler.register_probe('system', sample_system_metrics, interval=system_interval)
+    health_sampler.register_probe('database', SystemService._check_database_health,
+                                  interval=database_interval, needs_app_context=True)
+    health_sampler.register_probe('database_file', health_monitor.check_database_health,
+                                  interval=database_interval * 5)
+    health_sampler.register_probe('application', SystemService._get_application_status,
+                                  interval=database_interval, needs_app_context=True)
+    health_sampler.init_app(app)
+    return health_sampler
+
+def get_health_sampler():
+    """Retorna a instância do amostrador"""
+    return health_sampler
 
 def quick_health_check():
-    """Verificação rápida de saúde"""
+    """Verificação rápida de saúde (último snapshot, sem abrir conexão)"""
+    cached = health_sampler.latest('database_file')
+    if cached:
+        return cached['data']
     return health_monitor.check_database_health()
 
 def get_system_statistics():
@@ -0,0 +1,159 @@
+"""
+Zelador - Limpeza periódica de sessões e caches em memória
+
+Uma thread por worker executa varreduras curtas, cada uma com orçamento de
+tempo: sessões expiradas no banco, caches de segurança (limitador de
+requisições) e o cache de sessão. Os intervalos têm jitter para que os
+workers não varram todos ao mesmo tempo. Cada execução registra quanto foi
+liberado e o RSS do processo, o que permite conferir que a memória do
+worker se mantém estável entre os ciclos de max_requests.
+"""
+
+import os
+import random
+import time
+import logging
+from datetime import datetime
+
+from utils.background_worker import BackgroundWorker
+
+logger = logging.getLogger('janitor')
+
+
+def current_rss_mb():
+    """RSS do processo em MB (Linux, sem psutil); None se indisponível"""
+    try:
+        with open('/proc/self/statm') as f:
+            paginas = int(f.read().split()[1])
+        return round(paginas * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024), 1)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class Janitor(BackgroundWorker):
+    """Agendador de varreduras de manutenção com orçamento de tempo"""
+
+    thread_name = 'janitor'
+    min_wait = 1.0
+    logger = logger
+
+    def __init__(self, interval=None, jitter=None, budget_ms=None):
+        super().__init__(float(interval or os.environ.get('JANITOR_INTERVAL', '300')))
+        self.jitter = float(jitter if jitter is not None else os.environ.get('JANITOR_JITTER', '0.2'))
+        self.budget = float(budget_ms or os.environ.get('JANITOR_BUDGET_MS', '200')) / 1000
+
+    def register_task(self, name, func, interval=None, needs_app_context=False):
+        """Registra uma varredura: func(deadline) -> número de itens liberados
+
+        `deadline` é um instante de time.monotonic(); a tarefa deve parar ao
+        atingi-lo e deixar o restante para a próxima execução.
+        """
+        task = self._register(name, func, interval, needs_app_context,
+                              first_run=lambda intervalo: time.monotonic() + self._jittered(intervalo))
+        task.update(runs=0, reclaimed_total=0, last=None)
+
+    def _jittered(self, interval):
+        return interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    _next_interval = _jittered
+
+    def _started_message(self):
+        return f"Zelador iniciado (intervalo {self.interval:.0f}s, orçamento {self.budget * 1000:.0f}ms)"
+
+    def run_due_tasks(self, force=False):
+        """Executa as varreduras vencidas (ou todas, se force=True)"""
+        return self._run_due(force)
+
+    def _run_job(self, name, task):
+        """Executa uma varredura dentro do orçamento e registra o resultado"""
+        started = time.monotonic()
+        deadline = started + self.budget
+        try:
+            reclaimed = self._call(task, deadline)
+            status = 'ok'
+        except Exception as e:
+            reclaimed = 0
+            status = 'error'
+            logger.warning(f"Varredura '{name}' falhou: {e}")
+
+        duration = time.monotonic() - started
+        entry = {
+            'status': status,
+            'reclaimed': int(reclaimed or 0),
+            'duration_ms': round(duration * 1000, 2),
+            'over_budget': duration > self.budget,
+            'rss_mb': current_rss_mb(),
+            'ran_at': datetime.now().isoformat()
+        }
+        task['runs'] += 1
+        task['reclaimed_total'] += entry['reclaimed']
+        task['last'] = entry
+
+        if entry['reclaimed']:
+            logger.info(f"Zelador '{name}': {entry['reclaimed']} itens liberados em "
+                        f"{entry['duration_ms']}ms (RSS {entry['rss_mb']} MB)")
+        return entry
+
+    def get_status(self):
+        """Retorna status do zelador e o resultado da última varredura de cada tarefa"""
+        now = time.monotonic()
+        return {
+            'status': 'running' if self.is_running() else 'stopped',
+            'rss_mb': current_rss_mb(),
+            'budget_ms': round(self.budget * 1000),
+            'tasks': {
+                name: {
+                    'interval': task['interval'],
+                    'runs': task['runs'],
+                    'reclaimed_total': task['reclaimed_total'],
+                    'next_run_in': round(max(self._next_run[name] - now, 0), 1),
+                    'last': task['last']
+                }
+                for name, task in self._jobs.items()
+            }
+        }
+
+
+def sweep_expired_sessions(deadline):
+    """Sessões expiradas em user_sessions, em lotes até o prazo"""
+    from sqlalchemy import inspect
+    from app import db
+    from auth.services import SessionService
+
+    # O sistema de autenticação modular é opcional: sem a tabela, nada a fazer
+    if not inspect(db.engine).has_table('user_sessions'):
+        return 0
+    return SessionService.cleanup_expired_sessions(deadline=deadline)
+
+
+def sweep_security_caches(deadline):
+    """Tentativas de login, IPs suspeitos e limites de requisição expirados"""
+    from auth.security import SecurityManager
+    return SecurityManager.cleanup_security_caches(deadline=deadline)
+
+
+def sweep_session_cache(deadline):
+    """Principais vencidos no cache de sessão do worker"""
+    from utils.session_cache import session_cache
+    return session_cache.purge_expired(deadline=deadline)
+
+
+# Instância global do zelador
+janitor = Janitor()
+
+
+def init_janitor(app):
+    """Registra as varreduras padrão e associa o zelador à aplicação"""
+    sessions_interval = float(os.environ.get('JANITOR_SESSIONS_INTERVAL', '900'))
+
+    janitor.register_task('sessions', sweep_expired_sessions, interval=sessions_interval,
+                          needs_app_context=True)
+    janitor.register_task('security_caches', sweep_security_caches, needs_app_context=True)
+    janitor.register_task('session_cache', sweep_session_cache)
+    janitor.init_app(app)
+    return janitor
+
+
+def get_janitor():
+    """Retorna a instância do zelador"""
+    return janitor
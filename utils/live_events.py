@@ -0,0 +1,236 @@
+"""
+Eventos ao Vivo - Canal SSE do painel
+
+O painel consultava /api/hora-atual a cada segundo por aba aberta. Agora
+cada aba abre uma única conexão Server-Sent Events: recebe a hora do
+servidor uma vez (o navegador calcula a diferença de relógio e avança o
+relógio localmente) e depois apenas mudanças reais - novos exames e os
+contadores de /api/estatisticas que mudaram.
+
+Um único hub por worker distribui os eventos para todas as conexões. Uma
+thread observadora, ativa só enquanto há assinantes, consulta os contadores
+a cada LIVE_POLL_INTERVAL segundos (uma consulta por worker, não por aba) e
+é acordada imediatamente quando o próprio worker grava um exame.
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+import logging
+from datetime import datetime, timedelta, timezone
+
+logger = logging.getLogger('live_events')
+
+BRASILIA_TZ = timezone(timedelta(hours=-3))
+
+
+def dashboard_counters():
+    """Contadores do painel (requer contexto da aplicação)"""
+    from sqlalchemy import func
+    from app import db
+    from models import Exame, LaudoTemplate, Usuario
+    from modules.core.dates import day_bounds, in_range, month_bounds, today_brasilia
+
+    hoje = today_brasilia()
+    return {
+        'total_exames': Exame.query.count(),
+        'total_pacientes': db.session.query(func.count(func.distinct(Exame.nome_paciente))).scalar(),
+        'exames_hoje': Exame.query.filter(in_range(Exame.created_at, day_bounds(hoje))).count(),
+        'exames_mes': Exame.query.filter(in_range(Exame.created_at, month_bounds(hoje))).count(),
+        'templates_ativos': LaudoTemplate.query.filter_by(ativo=True).count(),
+        'usuarios_sistema': Usuario.query.count()
+    }
+
+
+def format_sse(event, data=None, event_id=None, retry_ms=None):
+    """Serializa um evento no formato text/event-stream"""
+    linhas = []
+    if retry_ms is not None:
+        linhas.append(f'retry: {int(retry_ms)}')
+    if event_id is not None:
+        linhas.append(f'id: {event_id}')
+    linhas.append(f'event: {event}')
+    linhas.append(f'data: {json.dumps(data, ensure_ascii=False, default=str)}')
+    return '\n'.join(linhas) + '\n\n'
+
+
+def clock_handshake():
+    """Hora do servidor para o cálculo da diferença de relógio no navegador"""
+    agora = datetime.now(BRASILIA_TZ)
+    return {
+        'epoch_ms': int(agora.timestamp() * 1000),
+        'utc_offset_min': int(agora.utcoffset().total_seconds() // 60),
+        'hora': agora.strftime('%H:%M:%S'),
+        'data': agora.strftime('%d/%m/%Y')
+    }
+
+
+class Subscription:
+    """Fila limitada de uma conexão; assinante lento é desconectado (reconecta com estado novo)"""
+
+    def __init__(self, maxsize):
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.closed = False
+
+    def offer(self, message):
+        if self.closed:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            self.closed = True
+
+    def get(self, timeout):
+        return self.queue.get(timeout=timeout)
+
+
+class LiveEventHub:
+    """Hub de fan-out por worker com observador de mudanças no banco"""
+
+    def __init__(self, poll_interval=None, heartbeat=None, max_stream_seconds=None, queue_size=100):
+        self.poll_interval = float(poll_interval or os.environ.get('LIVE_POLL_INTERVAL', '5'))
+        self.heartbeat = float(heartbeat or os.environ.get('LIVE_HEARTBEAT', '25'))
+        self.max_stream_seconds = float(max_stream_seconds or os.environ.get('LIVE_MAX_STREAM_SECONDS', '600'))
+        self.max_streams = int(os.environ.get('LIVE_MAX_STREAMS', '0')) or None
+        self.queue_size = queue_size
+        self.counters = None
+        self.last_exam_id = None
+        self.published = 0
+        self._subscribers = set()
+        self._app = None
+        self._thread = None
+        self._pid = None
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self._app = app
+        if self.max_streams is None:
+            # No gthread cada conexão ocupa uma thread: metade delas fica para as demais rotas
+            worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+            threads = int(os.environ.get('GUNICORN_THREADS', '4'))
+            self.max_streams = max(threads // 2, 1) if worker_class == 'gthread' else 1000
+
+    # --- Assinantes ---
+
+    def subscribe(self):
+        """Nova conexão; None quando o worker já atende o máximo de streams"""
+        with self._lock:
+            if self.max_streams and len(self._subscribers) >= self.max_streams:
+                return None
+            subscription = Subscription(self.queue_size)
+            self._subscribers.add(subscription)
+        self._ensure_watcher()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def publish(self, event, data):
+        """Envia um evento para todas as conexões do worker"""
+        with self._lock:
+            self.published += 1
+            message = format_sse(event, data, event_id=self.published)
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.offer(message)
+            if subscription.closed:
+                self.unsubscribe(subscription)
+
+    def notify_change(self):
+        """Acorda o observador (ex.: após gravar um exame neste worker)"""
+        self._wake.set()
+
+    def stream(self, subscription, counters=None):
+        """Gerador text/event-stream de uma conexão"""
+        try:
+            yield format_sse('relogio', clock_handshake(), retry_ms=5000)
+            if counters is not None:
+                yield format_sse('contadores', counters)
+
+            deadline = time.monotonic() + self.max_stream_seconds
+            while not subscription.closed and time.monotonic() < deadline:
+                try:
+                    yield subscription.get(timeout=self.heartbeat)
+                except queue.Empty:
+                    # Comentário mantém a conexão viva em proxies; o navegador não o entrega
+                    yield ': ping\n\n'
+            # Ao reconectar, o navegador refaz o aperto de mão do relógio
+        finally:
+            self.unsubscribe(subscription)
+
+    # --- Observador ---
+
+    def _ensure_watcher(self):
+        with self._lock:
+            # Após o fork, a thread do processo pai não existe no worker
+            if self._pid == os.getpid() and self._thread is not None:
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._watch_loop, name='live-events', daemon=True)
+            self._thread.start()
+
+    def _watch_loop(self):
+        """Verifica mudanças enquanto houver assinantes; encerra com o último"""
+        while True:
+            with self._lock:
+                if not self._subscribers:
+                    self._thread = None
+                    return
+            try:
+                self.poll_changes()
+            except Exception as e:
+                logger.warning(f"Erro ao verificar mudanças do painel: {e}")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def poll_changes(self):
+        """Publica novos exames e os contadores que mudaram desde a última verificação"""
+        from app import db
+        from models import Exame
+
+        with self._app.app_context():
+            try:
+                counters = dashboard_counters()
+                novos = []
+                if self.last_exam_id is not None:
+                    novos = Exame.query.filter(Exame.id > self.last_exam_id)\
+                                       .order_by(Exame.id).limit(20).all()
+                    novos = [{'id': e.id, 'nome_paciente': e.nome_paciente, 'data_exame': e.data_exame}
+                             for e in novos]
+                ultimo_id = db.session.query(db.func.max(Exame.id)).scalar() or 0
+            finally:
+                db.session.remove()
+
+        for exame in novos:
+            self.publish('exame', exame)
+
+        if self.counters is not None:
+            delta = {k: v for k, v in counters.items() if self.counters.get(k) != v}
+            if delta:
+                self.publish('contadores', delta)
+
+        self.counters = counters
+        self.last_exam_id = max(ultimo_id, self.last_exam_id or 0)
+        return counters
+
+
+# Instância global (uma por worker)
+live_hub = LiveEventHub()
+
+
+def init_live_events(app):
+    """Associa o hub à aplicação"""
+    live_hub.init_app(app)
+    return live_hub
+
+
+def get_live_hub():
+    """Obtém o hub de eventos global"""
+    return live_hub
@@ -218,6 +218,12 @@ def log_security_event(evento, detalhes=None):
 
 def log_performance_metric(operacao, tempo_execucao, detalhes=None):
     """Registra métricas de performance"""
+    try:
+        from utils.metrics import metrics_registry
+        metrics_registry.observe_operation(operacao, tempo_execucao)
+    except ImportError:
+        pass
+    
     log_system_event(
         'DEBUG',
         f'Performance: {operacao} executado em {tempo_execucao:.3f}s',
@@ -0,0 +1,369 @@
+"""
+Métricas de Desempenho - Formato Prometheus
+Latência por rota, consultas ao banco por requisição e tempo de geração de PDF
+
+Cada worker do gunicorn mantém seus próprios histogramas em memória. Com o
+worker gthread as threads do mesmo processo observam os mesmos histogramas,
+então cada histograma protege suas séries com um lock (a seção crítica é
+só o incremento dos contadores). Periodicamente o snapshot do worker é
+gravado em um diretório compartilhado (/dev/shm por padrão) e o endpoint
+/metrics agrega os arquivos de todos os workers.
+"""
+
+import os
+import json
+import time
+import logging
+import tempfile
+import threading
+from bisect import bisect_left
+from functools import wraps
+
+from flask import g, request, has_request_context
+
+logger = logging.getLogger('metrics')
+
+METRIC_PREFIX = 'ecocardio'
+
+# Limites dos buckets (segundos) - mesmos padrões do cliente Prometheus
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_TIME_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+PDF_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0)
+
+
+def _default_metrics_dir():
+    """Diretório compartilhado entre workers (memória compartilhada quando disponível)"""
+    configured = (os.environ.get('METRICS_MULTIPROC_DIR')
+                  or os.environ.get('PROMETHEUS_MULTIPROC_DIR'))
+    if configured:
+        return configured
+    base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    return os.path.join(base, 'ecocardio_metrics')
+
+
+class Histogram:
+    """Histograma com buckets fixos e séries por combinação de rótulos"""
+
+    def __init__(self, name, help_text, buckets, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(float(b) for b in buckets)
+        self.labelnames = tuple(labelnames)
+        # chave: tupla de valores dos rótulos -> [contagens por bucket, soma, total]
+        self.series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        """Registra uma observação"""
+        indice = bisect_left(self.buckets, value)
+        with self._lock:
+            serie = self.series.get(labelvalues)
+            if serie is None:
+                serie = self.series[labelvalues] = [[0] * len(self.buckets), 0.0, 0]
+
+            if indice < len(self.buckets):
+                serie[0][indice] += 1
+            serie[1] += value
+            serie[2] += 1
+
+    def snapshot(self):
+        """Estado serializável do histograma (cópia consistente das séries)"""
+        with self._lock:
+            series = [
+                {'labels': list(labels), 'counts': list(counts), 'sum': total, 'count': count}
+                for labels, (counts, total, count) in self.series.items()
+            ]
+        return {
+            'help': self.help_text,
+            'buckets': list(self.buckets),
+            'labelnames': list(self.labelnames),
+            'series': series
+        }
+
+
+class MetricsRegistry:
+    """Registro de métricas do worker com agregação entre processos"""
+
+    def __init__(self, metrics_dir=None, flush_interval=None):
+        self.metrics_dir = metrics_dir or _default_metrics_dir()
+        self.flush_interval = flush_interval if flush_interval is not None else float(
+            os.environ.get('METRICS_FLUSH_INTERVAL', '5'))
+        self.histograms = {}
+        self._last_flush = 0.0
+        self._flush_lock = threading.Lock()
+        self._sql_listeners = False
+
+        self.request_duration = self.histogram(
+            'request_duration_seconds', 'Latência das requisições HTTP por rota',
+            LATENCY_BUCKETS, ('endpoint', 'method', 'status'))
+        self.request_queries = self.histogram(
+            'db_queries_per_request', 'Quantidade de consultas SQL por requisição',
+            QUERY_COUNT_BUCKETS, ('endpoint',))
+        self.request_query_time = self.histogram(
+            'db_query_seconds_per_request', 'Tempo total de SQL por requisição',
+            QUERY_TIME_BUCKETS, ('endpoint',))
+        self.pdf_render = self.histogram(
+            'pdf_render_seconds', 'Tempo de geração de PDF',
+            PDF_BUCKETS, ('generator',))
+        self.operation_duration = self.histogram(
+            'operation_duration_seconds', 'Duração de operações registradas pelo sistema de logs',
+            LATENCY_BUCKETS, ('operacao',))
+
+    def histogram(self, name, help_text, buckets, labelnames=()):
+        """Cria (ou retorna) um histograma registrado"""
+        full_name = f'{METRIC_PREFIX}_{name}'
+        if full_name not in self.histograms:
+            self.histograms[full_name] = Histogram(full_name, help_text, buckets, labelnames)
+        return self.histograms[full_name]
+
+    # ===== INSTRUMENTAÇÃO =====
+
+    def init_app(self, app):
+        """Registra hooks do Flask e eventos do SQLAlchemy"""
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        self._install_sql_listeners()
+
+    def _install_sql_listeners(self):
+        """Escuta a execução de cursores em todas as engines"""
+        if self._sql_listeners:
+            return
+
+        from sqlalchemy import event
+        from sqlalchemy.engine import Engine
+
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_cursor_error)
+        self._sql_listeners = True
+
+    def _before_request(self):
+        g._metrics_start = time.perf_counter()
+        g._metrics_queries = 0
+        g._metrics_query_time = 0.0
+
+    def _after_request(self, response):
+        start = g.pop('_metrics_start', None)
+        if start is None:
+            return response
+
+        try:
+            elapsed = time.perf_counter() - start
+            endpoint = request.endpoint or 'not_found'
+
+            self.request_duration.observe(elapsed, endpoint, request.method, str(response.status_code))
+            self.request_queries.observe(g.pop('_metrics_queries', 0), endpoint)
+            self.request_query_time.observe(g.pop('_metrics_query_time', 0.0), endpoint)
+
+            self.maybe_flush()
+        except Exception as e:
+            logger.debug(f"Erro ao registrar métricas da requisição: {e}")
+
+        return response
+
+    def observe_pdf(self, generator, seconds):
+        """Registra tempo de geração de PDF"""
+        self.pdf_render.observe(seconds, generator)
+
+    def observe_operation(self, operacao, seconds):
+        """Registra duração de uma operação nomeada"""
+        self.operation_duration.observe(seconds, str(operacao))
+
+    # ===== AGREGAÇÃO ENTRE WORKERS =====
+
+    def _worker_file(self, pid=None):
+        return os.path.join(self.metrics_dir, f'worker_{pid or os.getpid()}.json')
+
+    def snapshot(self):
+        """Snapshot serializável das métricas do worker atual"""
+        return {
+            'pid': os.getpid(),
+            'written_at': time.time(),
+            'histograms': {name: hist.snapshot() for name, hist in list(self.histograms.items())}
+        }
+
+    def maybe_flush(self):
+        """Grava o snapshot se o intervalo de flush já passou"""
+        now = time.monotonic()
+        if now - self._last_flush < self.flush_interval:
+            return
+        # Outra thread do worker já está gravando o mesmo arquivo
+        if not self._flush_lock.acquire(blocking=False):
+            return
+        try:
+            if now - self._last_flush >= self.flush_interval:
+                self._write_snapshot()
+        finally:
+            self._flush_lock.release()
+
+    def flush(self):
+        """Grava o snapshot do worker no diretório compartilhado (escrita atômica)"""
+        with self._flush_lock:
+            self._write_snapshot()
+
+    def _write_snapshot(self):
+        try:
+            os.makedirs(self.metrics_dir, exist_ok=True)
+            destino = self._worker_file()
+            temporario = f'{destino}.tmp'
+            with open(temporario, 'w') as f:
+                json.dump(self.snapshot(), f)
+            os.replace(temporario, destino)
+            self._last_flush = time.monotonic()
+        except OSError as e:
+            logger.warning(f"Não foi possível gravar métricas do worker: {e}")
+
+    def collect(self):
+        """Lê os snapshots de todos os workers (o atual direto da memória)"""
+        snapshots = [self.snapshot()]
+        atual = os.path.basename(self._worker_file())
+
+        if os.path.isdir(self.metrics_dir):
+            for nome in sorted(os.listdir(self.metrics_dir)):
+                if not nome.endswith('.json') or nome == atual:
+                    continue
+                try:
+                    with open(os.path.join(self.metrics_dir, nome)) as f:
+                        snapshots.append(json.load(f))
+                except (OSError, ValueError) as e:
+                    logger.debug(f"Snapshot de métricas ignorado ({nome}): {e}")
+
+        return snapshots
+
+    def aggregate(self):
+        """Soma os histogramas de todos os workers"""
+        snapshots = self.collect()
+        merged = {}
+
+        for snapshot in snapshots:
+            for name, hist in snapshot.get('histograms', {}).items():
+                destino = merged.setdefault(name, {
+                    'help': hist['help'],
+                    'buckets': hist['buckets'],
+                    'labelnames': hist['labelnames'],
+                    'series': {}
+                })
+                if destino['buckets'] != hist['buckets']:
+                    continue
+
+                for serie in hist['series']:
+                    chave = tuple(serie['labels'])
+                    atual = destino['series'].get(chave)
+                    if atual is None:
+                        destino['series'][chave] = [list(serie['counts']), serie['sum'], serie['count']]
+                    else:
+                        atual[0] = [a + b for a, b in zip(atual[0], serie['counts'])]
+                        atual[1] += serie['sum']
+                        atual[2] += serie['count']
+
+        return merged, len(snapshots)
+
+    def render_prometheus(self):
+        """Exposição em formato texto do Prometheus (versão 0.0.4)"""
+        merged, workers = self.aggregate()
+        linhas = []
+
+        for name in sorted(merged):
+            hist = merged[name]
+            linhas.append(f'# HELP {name} {hist["help"]}')
+            linhas.append(f'# TYPE {name} histogram')
+
+            for labels in sorted(hist['series']):
+                counts, total, count = hist['series'][labels]
+                pares = list(zip(hist['labelnames'], labels))
+
+                acumulado = 0
+                for limite, quantidade in zip(hist['buckets'], counts):
+                    acumulado += quantidade
+                    linhas.append(f'{name}_bucket{_format_labels(pares + [("le", _format_float(limite))])} {acumulado}')
+                linhas.append(f'{name}_bucket{_format_labels(pares + [("le", "+Inf")])} {count}')
+                linhas.append(f'{name}_sum{_format_labels(pares)} {total}')
+                linhas.append(f'{name}_count{_format_labels(pares)} {count}')
+
+        linhas.append(f'# HELP {METRIC_PREFIX}_metrics_workers Workers com snapshot de métricas')
+        linhas.append(f'# TYPE {METRIC_PREFIX}_metrics_workers gauge')
+        linhas.append(f'{METRIC_PREFIX}_metrics_workers {workers}')
+
+        return '\n'.join(linhas) + '\n'
+
+    def clear(self):
+        """Remove snapshots gravados (chamado pelo master ao iniciar)"""
+        if not os.path.isdir(self.metrics_dir):
+            return
+        for nome in os.listdir(self.metrics_dir):
+            if nome.startswith('worker_'):
+                try:
+                    os.remove(os.path.join(self.metrics_dir, nome))
+                except OSError:
+                    pass
+
+
+def _format_float(value):
+    return repr(float(value))
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(pares):
+    if not pares:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape_label(v)}"' for k, v in pares) + '}'
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('_metrics_query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    inicio = conn.info.get('_metrics_query_start')
+    if not inicio:
+        return
+    elapsed = time.perf_counter() - inicio.pop()
+
+    # Consultas fora de requisições (threads de sondas, scripts) não contam
+    if has_request_context() and hasattr(g, '_metrics_queries'):
+        g._metrics_queries += 1
+        g._metrics_query_time += elapsed
+
+
+def _handle_cursor_error(context):
+    # after_cursor_execute não dispara quando o cursor falha: descarta o início
+    # empilhado para não parear as próximas consultas da conexão com ele
+    conexao = context.connection
+    if conexao is None or context.execution_context is None:
+        return
+    inicio = conexao.info.get('_metrics_query_start')
+    if inicio:
+        inicio.pop()
+
+
+# Instância global
+metrics_registry = MetricsRegistry()
+
+
+def init_metrics(app):
+    """Inicializar instrumentação de métricas"""
+    metrics_registry.init_app(app)
+    return metrics_registry
+
+
+def get_metrics_registry():
+    """Obter instância do registro de métricas"""
+    return metrics_registry
+
+
+def observe_pdf_render(generator):
+    """Decorator que mede o tempo de geração de PDF"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                metrics_registry.observe_pdf(generator, time.perf_counter() - inicio)
+        return wrapper
+    return decorator
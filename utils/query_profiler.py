@@ -0,0 +1,274 @@
+"""
+Perfilador de Consultas SQL
+Contagem de consultas por requisição, detecção de N+1 e orçamento por rota
+
+Cada requisição amostrada registra a "impressão digital" das consultas
+(SQL normalizado, sem literais). Quando o mesmo formato se repete acima do
+limite, o padrão é registrado como possível N+1 junto com a rota e o ponto
+do código que disparou a consulta. Rotas podem declarar um orçamento
+máximo de consultas com @query_budget; em testes o excesso gera erro.
+"""
+
+import os
+import re
+import time
+import random
+import logging
+import traceback
+from collections import deque
+from contextlib import contextmanager
+
+from flask import g, request, current_app, has_request_context
+
+logger = logging.getLogger('query_profiler')
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_INSTRUMENTATION_FILES = (
+    os.path.abspath(__file__).replace('.pyc', '.py'),
+    os.path.join(PROJECT_ROOT, 'utils', 'metrics.py'),
+)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\bIN\s*\((?:\s*[?%]s?\s*,?)+\)', re.IGNORECASE)
+_NAMED_PARAM = re.compile(r'(?:%\(\w+\)s|:\w+|\$\d+)')
+_WHITESPACE = re.compile(r'\s+')
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Rota executou mais consultas que o orçamento declarado"""
+    pass
+
+
+def fingerprint_sql(statement):
+    """Normaliza o SQL para agrupar consultas de mesmo formato"""
+    sql = _STRING_LITERAL.sub('?', statement)
+    sql = _NAMED_PARAM.sub('?', sql)
+    sql = _NUMBER_LITERAL.sub('?', sql)
+    sql = _IN_LIST.sub('IN (?+)', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+def _caller_location():
+    """Primeiro frame do código do projeto que originou a consulta"""
+    for frame in reversed(traceback.extract_stack()[:-1]):
+        filename = os.path.abspath(frame.filename)
+        if (filename.startswith(PROJECT_ROOT)
+                and 'site-packages' not in filename
+                and filename not in _INSTRUMENTATION_FILES):
+            return f'{os.path.relpath(filename, PROJECT_ROOT)}:{frame.lineno} em {frame.name}'
+    return 'desconhecido'
+
+
+def query_budget(max_queries):
+    """Declara o número máximo de consultas SQL de uma rota"""
+    def decorator(func):
+        # functools.wraps (login_required, admin_required) propaga o atributo
+        func._query_budget = max_queries
+        return func
+    return decorator
+
+
+class RequestProfile:
+    """Consultas executadas em uma única requisição"""
+
+    def __init__(self, endpoint=None, n_plus_one_threshold=5):
+        self.endpoint = endpoint
+        self.threshold = n_plus_one_threshold
+        self.count = 0
+        self.total_time = 0.0
+        self.fingerprints = {}
+        self.locations = {}
+
+    def record(self, statement, duration=0.0):
+        """Registra uma consulta executada"""
+        fingerprint = fingerprint_sql(statement)
+        self.count += 1
+        self.total_time += duration
+
+        vezes = self.fingerprints.get(fingerprint, 0) + 1
+        self.fingerprints[fingerprint] = vezes
+
+        # Captura a pilha apenas quando o padrão cruza o limite (custo único)
+        if vezes == self.threshold:
+            self.locations[fingerprint] = _caller_location()
+
+    def n_plus_one(self):
+        """Formatos de SQL repetidos acima do limite"""
+        return [
+            {
+                'endpoint': self.endpoint,
+                'fingerprint': fingerprint,
+                'count': vezes,
+                'location': self.locations.get(fingerprint, 'desconhecido')
+            }
+            for fingerprint, vezes in self.fingerprints.items()
+            if vezes >= self.threshold
+        ]
+
+
+class QueryProfiler:
+    """Perfilador de consultas por requisição"""
+
+    def __init__(self, sample_rate=None, n_plus_one_threshold=None, capacity=200):
+        self.sample_rate = sample_rate
+        self.threshold = n_plus_one_threshold or int(os.environ.get('QUERY_PROFILER_N1_THRESHOLD', '5'))
+        self.reports = deque(maxlen=capacity)
+        self.app = None
+        self.profiled_requests = 0
+        self.budget_violations = 0
+        self._listeners = False
+
+    def init_app(self, app):
+        """Registra hooks do Flask e eventos do SQLAlchemy"""
+        self.app = app
+
+        if self.sample_rate is None:
+            configured = os.environ.get('QUERY_PROFILER_SAMPLE_RATE')
+            if configured is not None:
+                self.sample_rate = float(configured)
+            else:
+                # Desenvolvimento/testes: todas as requisições; produção: amostragem
+                self.sample_rate = 1.0 if (app.debug or app.testing) else 0.05
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        self._install_listeners()
+
+    def _install_listeners(self):
+        if self._listeners:
+            return
+
+        from sqlalchemy import event
+        from sqlalchemy.engine import Engine
+
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_cursor_error)
+        self._listeners = True
+
+    def _sampled(self):
+        if current_app.testing:
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def _before_request(self):
+        if self._sampled():
+            g._query_profile = RequestProfile(request.endpoint, self.threshold)
+
+    def _after_request(self, response):
+        profile = g.pop('_query_profile', None)
+        if profile is None:
+            return response
+
+        self.profiled_requests += 1
+
+        for report in profile.n_plus_one():
+            report['timestamp'] = time.time()
+            self.reports.append(report)
+            logger.warning(
+                f"Possível N+1 em {report['endpoint']}: {report['count']}x "
+                f"\"{report['fingerprint'][:120]}\" ({report['location']})"
+            )
+
+        budget = self.budget_for(request.endpoint)
+        if budget is not None and profile.count > budget:
+            self.budget_violations += 1
+            mensagem = (f"Rota {request.endpoint} executou {profile.count} consultas "
+                        f"(orçamento: {budget})")
+            if current_app.config.get('QUERY_BUDGET_STRICT', current_app.testing):
+                raise QueryBudgetExceeded(mensagem)
+            logger.warning(mensagem)
+
+        if current_app.debug or current_app.testing:
+            response.headers['X-Query-Count'] = str(profile.count)
+
+        return response
+
+    def budget_for(self, endpoint):
+        """Orçamento da rota (configuração QUERY_BUDGETS tem prioridade)"""
+        if not endpoint:
+            return None
+
+        budgets = current_app.config.get('QUERY_BUDGETS') or {}
+        if endpoint in budgets:
+            return budgets[endpoint]
+
+        view = current_app.view_functions.get(endpoint)
+        return getattr(view, '_query_budget', None)
+
+    def get_reports(self, limit=None):
+        """Padrões N+1 detectados recentemente"""
+        reports = list(self.reports)
+        return reports[-limit:] if limit else reports
+
+    def get_status(self):
+        """Status do perfilador"""
+        return {
+            'sample_rate': self.sample_rate,
+            'n_plus_one_threshold': self.threshold,
+            'profiled_requests': self.profiled_requests,
+            'budget_violations': self.budget_violations,
+            'reports': len(self.reports)
+        }
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and '_query_profile' in g:
+        conn.info.setdefault('_profiler_query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if not has_request_context() or '_query_profile' not in g:
+        return
+
+    inicio = conn.info.get('_profiler_query_start')
+    duration = time.perf_counter() - inicio.pop() if inicio else 0.0
+    g._query_profile.record(statement, duration)
+
+
+def _handle_cursor_error(context):
+    # after_cursor_execute não dispara quando o cursor falha: descarta o início
+    # empilhado e conta a consulta que falhou no perfil da requisição
+    conexao = context.connection
+    if conexao is None or context.execution_context is None:
+        return
+    if not has_request_context() or '_query_profile' not in g:
+        return
+
+    inicio = conexao.info.get('_profiler_query_start')
+    duration = time.perf_counter() - inicio.pop() if inicio else 0.0
+    g._query_profile.record(context.statement, duration)
+
+
+@contextmanager
+def count_queries(n_plus_one_threshold=5):
+    """Conta consultas executadas no bloco (uso em testes e scripts)"""
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    profile = RequestProfile('bloco', n_plus_one_threshold)
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        profile.record(statement)
+
+    event.listen(Engine, 'after_cursor_execute', _record)
+    try:
+        yield profile
+    finally:
+        event.remove(Engine, 'after_cursor_execute', _record)
+
+
+# Instância global
+query_profiler = QueryProfiler()
+
+
+def init_query_profiler(app):
+    """Inicializar perfilador de consultas"""
+    query_profiler.init_app(app)
+    return query_profiler
+
+
+def get_query_profiler():
+    """Obter instância do perfilador"""
+    return query_profiler
@@ -0,0 +1,250 @@
+"""
+Cache de Sessão - Usuário autenticado sem consulta ao banco por requisição
+
+O load_user do Flask-Login consultava `usuarios` em toda requisição. Agora o
+principal (id, username, email, role, ativo) fica em um LRU por worker e,
+como instantâneo, na sessão do Flask (cookie assinado com a SECRET_KEY), de
+modo que um worker recém-iniciado também dispensa a consulta.
+
+Ambos valem por um TTL curto e carregam a geração de revogação do usuário.
+As gerações ficam em um arquivo compartilhado entre os workers (/dev/shm
+por padrão): revogar sessões, editar ou excluir o usuário incrementa a
+geração e qualquer worker passa a recarregar do banco. Verificar a geração
+custa um stat() do arquivo; o conteúdo só é relido quando ele muda.
+"""
+
+import fcntl
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from itertools import islice
+from typing import Callable, Dict, Optional
+
+from flask import current_app, has_app_context, has_request_context, session
+from flask_login import UserMixin
+
+logger = logging.getLogger('session_cache')
+
+DEFAULT_TTL_SECONDS = 30
+DEFAULT_MAX_ENTRIES = 5000
+SESSION_KEY = '_principal'
+
+
+def _default_generations_path():
+    """Arquivo de gerações compartilhado entre workers"""
+    configured = os.environ.get('SESSION_GENERATIONS_PATH')
+    if configured:
+        return configured
+    base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    return os.path.join(base, 'ecocardio_session_generations.json')
+
+
+class CachedPrincipal(UserMixin):
+    """Instantâneo do usuário autenticado, desvinculado da sessão do SQLAlchemy"""
+
+    FIELDS = ('id', 'username', 'email', 'role', 'ativo')
+
+    def __init__(self, id, username, email=None, role='user', ativo=True):
+        self.id = id
+        self.username = username
+        self.email = email
+        self.role = role
+        self.ativo = ativo
+
+    @classmethod
+    def from_user(cls, user) -> 'CachedPrincipal':
+        return cls(user.id, user.username, user.email, user.role, bool(user.ativo))
+
+    def to_dict(self) -> Dict:
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    @property
+    def is_active(self):
+        return bool(self.ativo)
+
+    def is_admin(self):
+        """Verifica se o usuário é administrador"""
+        return self.role == 'admin'
+
+    def __repr__(self):
+        return f'<CachedPrincipal {self.username}>'
+
+
+class RevocationGenerations:
+    """Gerações de revogação por usuário em um arquivo JSON compartilhado"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or _default_generations_path()
+        self._generations: Dict[str, int] = {}
+        self._mtime_ns = None
+        self._lock = threading.Lock()
+
+    def get(self, user_id) -> int:
+        self._refresh()
+        return self._generations.get(str(user_id), 0)
+
+    def bump(self, user_id) -> int:
+        """Incrementa a geração do usuário (visível para todos os workers)"""
+        return self.bump_many([user_id])[str(user_id)]
+
+    def bump_many(self, keys) -> Dict[str, int]:
+        """Incrementa várias gerações com uma única regravação do arquivo"""
+        keys = {str(key) for key in keys}
+        with self._lock, open(self.path + '.lock', 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            generations = self._read()
+            for key in keys:
+                generations[key] = generations.get(key, 0) + 1
+
+            tmp_path = f'{self.path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(generations, f)
+            os.replace(tmp_path, self.path)
+
+            self._generations = generations
+            self._mtime_ns = os.stat(self.path).st_mtime_ns
+            return {key: generations[key] for key in keys}
+
+    def _refresh(self) -> None:
+        try:
+            mtime_ns = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime_ns != self._mtime_ns:
+            with self._lock:
+                self._generations = self._read()
+                self._mtime_ns = mtime_ns
+
+    def _read(self) -> Dict[str, int]:
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Arquivo de gerações ilegível ({e}); recarregando usuários do banco")
+            return {'*': time.time_ns()}
+
+
+class SessionCache:
+    """LRU de principais por worker + instantâneo assinado na sessão"""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, generations: Optional[RevocationGenerations] = None):
+        self.max_entries = max_entries
+        self._generations = generations
+        # user_id -> (principal, geração, expira_em)
+        self._entries: 'OrderedDict[int, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def generations(self) -> RevocationGenerations:
+        if self._generations is None:
+            self._generations = RevocationGenerations()
+        return self._generations
+
+    @property
+    def ttl(self) -> float:
+        config = current_app.config if has_app_context() else {}
+        return float(config.get('SESSION_CACHE_TTL') or os.environ.get('SESSION_CACHE_TTL', DEFAULT_TTL_SECONDS))
+
+    def _generation(self, user_id) -> tuple:
+        # A chave '*' invalida todos (arquivo corrompido)
+        return self.generations.get(user_id), self.generations.get('*')
+
+    def load(self, user_id: int, loader: Callable) -> Optional[CachedPrincipal]:
+        """Principal do cache; `loader(user_id)` (consulta ao banco) só na falta"""
+        principal = self.get(user_id)
+        if principal is not None:
+            self.hits += 1
+            return principal
+
+        self.misses += 1
+        user = loader(user_id)
+        if user is None:
+            return None
+        return self.put(CachedPrincipal.from_user(user))
+
+    def get(self, user_id: int) -> Optional[CachedPrincipal]:
+        now = time.time()
+        generation = self._generation(user_id)
+
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                principal, entry_generation, expires_at = entry
+                if entry_generation == generation and expires_at > now:
+                    self._entries.move_to_end(user_id)
+                    return principal
+                del self._entries[user_id]
+
+        snapshot = session.get(SESSION_KEY) if has_request_context() else None
+        if (snapshot and snapshot.get('id') == user_id and tuple(snapshot.get('gen', ())) == generation
+                and snapshot.get('exp', 0) > now):
+            principal = CachedPrincipal(**{f: snapshot.get(f) for f in CachedPrincipal.FIELDS})
+            self._store(principal, generation, snapshot['exp'])
+            return principal
+        return None
+
+    def put(self, principal: CachedPrincipal) -> CachedPrincipal:
+        """Guarda o principal recém-carregado no LRU e na sessão"""
+        generation = self._generation(principal.id)
+        expires_at = time.time() + self.ttl
+        self._store(principal, generation, expires_at)
+
+        if has_request_context():
+            session[SESSION_KEY] = dict(principal.to_dict(), gen=list(generation), exp=expires_at)
+        return principal
+
+    def invalidate(self, user_id: int) -> None:
+        """Descarta o principal em todos os workers (revogação, edição, exclusão)"""
+        self.generations.bump(user_id)
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def purge_expired(self, batch_size: int = 500, deadline: float = None) -> int:
+        """Remove do LRU os principais vencidos (manutenção)
+
+        Remove em lotes de `batch_size`, liberando o lock entre eles, e para
+        ao atingir `deadline` (time.monotonic()).
+        """
+        now = time.time()
+        count = 0
+        while deadline is None or time.monotonic() < deadline:
+            with self._lock:
+                expired = list(islice(
+                    (uid for uid, (_, _, expires_at) in self._entries.items() if expires_at <= now), batch_size))
+                for uid in expired:
+                    del self._entries[uid]
+            count += len(expired)
+            if len(expired) < batch_size:
+                break
+        return count
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _store(self, principal: CachedPrincipal, generation: tuple, expires_at: float) -> None:
+        with self._lock:
+            self._entries[principal.id] = (principal, generation, expires_at)
+            self._entries.move_to_end(principal.id)
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+# Instância global (uma por worker)
+session_cache = SessionCache()
+
+
+def get_session_cache():
+    """Obtém o cache de sessão global"""
+    return session_cache